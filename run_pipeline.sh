@@ -8,6 +8,11 @@ set -e;
 
 job_id=$1;
 
+# Optional: previous job, whose sequences are extended by the sequences
+# of this job (incremental mode, unaligned sequences only).
+# Only the new pairs are aligned (see FASTA_to_extendedPairwiseQuantifier).
+previous_job_id=$2;
+
 # =====================================================================|======|
 # Preparations for this job.
 
@@ -36,6 +41,19 @@ signal_file_name=signal.txt;
 # (Will only exist, if there are warnings.)
 warning_file_name=warning.txt;
 
+# Substitution matrix.
+substmat_file_name=EBLOSUM62;
+substmat_dir_path=/usr/local/EMBOSS-6.6.0/emboss/data;
+substmat_file_path=${substmat_dir_path}/${substmat_file_name};
+
+# Store of the results of finished jobs
+# (identical jobs are NOT calculated again, see "Look up result").
+# At most result_store_size entries are kept, the least recently used
+# entries are evicted (see "Store result").
+memoize=False;
+result_store_dir_path=${run_dir_path}/src/webserver/static/tmp/result_store;
+result_store_size=100;
+
 # Paths.
 start_mainfile_path=${start_dir_path}/${start_mainfile_name};
 start_dimfile_path=${start_dir_path}/${start_dimfile_name};
@@ -64,11 +82,42 @@ then
     object_type='object';
 fi;
 
+# Incremental mode: sanity check of the previous job.
+# - only for unaligned sequences (an MSA can NOT be extended by entries
+#   of another width)
+# - job-id only (no path, e.g. '../x')
+# - finished results of the previous job
+if [ -n "$previous_job_id" ];
+then
+    previous_job_dir_path=${run_dir_path}/src/webserver/static/tmp/${previous_job_id};
+    if [ $state != 'unaligned' ] \
+        || ! [[ $previous_job_id =~ ^[A-Za-z0-9_-]+$ ]] \
+        || [ "$previous_job_id" == "$job_id" ] \
+        || [ ! -f ${previous_job_dir_path}/1_input_secure/input_secure.fas ] \
+        || [ ! -f ${previous_job_dir_path}/1_input_secure/input_secure_spaceless.fas ] \
+        || [ ! -f ${previous_job_dir_path}/3_connectivity/connectivity.csv ] \
+        || [ ! -f ${previous_job_dir_path}/4_quantifier/quantifier.ssv ] \
+        || [ ! -f ${previous_job_dir_path}/4_quantifier/info.csv ];
+    then
+        printf "%s\n" \
+               "It was not possible to extend the previous job." \
+               "Please make sure that the previous job exists, was" \
+               "started with unaligned sequences and finished," \
+               "and that this job contains unaligned sequences as well." \
+               > $signal_file_path;
+        exit 1;
+    fi;
+fi;
+
 # FB.
 echo "job_id: $job_id";
 echo "   dim: $dim";
 echo " state: $state";
 echo " count: $count";
+if [ -n "$previous_job_id" ];
+then
+    echo "  previous_job_id: $previous_job_id";
+fi;
 echo '\--------------------------------------------------------------------/';
 
 # =====================================================================|======|
@@ -125,6 +174,34 @@ then
     # FB.
     echo "-> created secure FASTA-file (without spaces).";
 
+    # Incremental mode:
+    # Keep the new entries separately and prepend the entries of the
+    # previous job (i.e. all following checks cover all entries).
+    if [ -n "$previous_job_id" ];
+    then
+
+        # Previous job (see sanity check above).
+        previous_dir_path=${previous_job_dir_path}/1_input_secure;
+
+        # New entries only.
+        out_result_new_file_path=${out_dir_path}/input_secure_new.fas;
+        out_result_spaceless_new_file_path=${out_dir_path}/input_secure_spaceless_new.fas;
+        mv $out_result_file_path $out_result_new_file_path;
+        mv $out_result_spaceless_file_path $out_result_spaceless_new_file_path;
+
+        # Previous entries, then new entries.
+        cat ${previous_dir_path}/${out_result_file_name} \
+            $out_result_new_file_path \
+            > $out_result_file_path;
+        cat ${previous_dir_path}/${out_result_spaceless_file_name} \
+            $out_result_spaceless_new_file_path \
+            > $out_result_spaceless_file_path;
+
+        # FB.
+        echo "-> prepended FASTA-entries of previous job '$previous_job_id'.";
+
+    fi;
+
     # Map aliases of the FASTA-headers.
     # Alias: 1st word of the secure FASTA-header (separated by space).
     # (Will be needed for the labelled plots at the end of the pipeline.)
@@ -308,6 +385,114 @@ then
 
 fi;
 
+# =====================================================================|======|
+# Look up result of an identical job.
+
+# Incremental jobs depend on their previous job.
+if [ -n "$previous_job_id" ];
+then
+    memoize=False;
+fi;
+
+if [ $memoize == True ];
+then
+
+    # FB.
+    echo '/====================================================================\';
+    echo "Look up result of an identical job.";
+    echo "----------------------------------------------------------------------";
+
+    # Normalised input.
+    if [ $state == 'unaligned' ] || [ $state == 'aligned' ];
+    then
+        in_file_path=${job_dir_path}/1_input_secure/input_secure.fas;
+    elif [ $state == 'quantifier' ];
+    then
+        in_file_path=$start_mainfile_path;
+    fi;
+
+    # Digest of everything that determines the result:
+    # parameters of the job, input, substitution matrix and pipeline
+    # (this script with its parameters and all programs).
+    job_digest=$( { echo "state: $state";
+                    echo "dim: $dim";
+                    echo "count: $count";
+                    sha256sum $in_file_path \
+                              $substmat_file_path \
+                              ${run_dir_path}/run_pipeline.sh \
+                              ${run_dir_path}/src/modules/*.py \
+                              ${run_dir_path}/src/pipeline/*.py \
+                        | awk '{print $1}';
+                  } | sha256sum | awk '{print $1}' );
+    result_store_entry_path=${result_store_dir_path}/${job_digest};
+
+    # FB.
+    echo "job_digest: $job_digest";
+
+    # If the result exists:
+    # Materialise its files (hardlinks, else copy-on-write, if possible)
+    # in a temporary directory first, i.e. the results of the previous
+    # steps are kept, if the entry is evicted concurrently (then the
+    # result is calculated).
+    materialised=False;
+    if [ -d $result_store_entry_path ];
+    then
+        tmp_result_dir_path=`mktemp -d ${job_dir_path}/.result_store.XXXXXX`;
+        if cp -a --link ${result_store_entry_path}/. ${tmp_result_dir_path}/ 2> /dev/null \
+            || cp -a --remove-destination --reflink=auto \
+                  ${result_store_entry_path}/. ${tmp_result_dir_path}/ 2> /dev/null;
+        then
+            materialised=True;
+        else
+            rm -rf $tmp_result_dir_path;
+        fi;
+    fi;
+
+    # Add the symlinks and finish.
+    if [ $materialised == True ];
+    then
+
+        # Replace the results of the previous steps.
+        rm -r ${job_dir_path}/1_input_secure;
+        rm -f $warning_file_path;
+        mv ${tmp_result_dir_path}/* ${job_dir_path}/;
+        rmdir $tmp_result_dir_path;
+
+        # Symlinks (same as created by the following steps).
+        for link in connectivity.csv:3_connectivity/connectivity+header.csv \
+                    pairwise.txt:4_quantifier/quantifier.ssv \
+                    numbering.csv:4_quantifier/info+header.csv \
+                    coordinates.csv:5_cc_analysis/vec+info2+header.csv \
+                    plot0.svg:5_cc_analysis/vec+info2_0.svg \
+                    plot0_numbered.svg:5_cc_analysis/vec+info2_numbered_0.svg \
+                    plot0_labelled.svg:5_cc_analysis/vec+info2_labelled_0.svg \
+                    plot1.svg:5_cc_analysis/vec+info2_1.svg \
+                    plot1_numbered.svg:5_cc_analysis/vec+info2_numbered_1.svg \
+                    plot1_labelled.svg:5_cc_analysis/vec+info2_labelled_1.svg;
+        do
+            ln -s ${job_dir_path}/${link#*:} ${job_dir_path}/${job_id}_${link%%:*};
+        done;
+
+        # Mark the entry as recently used (see "Store result").
+        touch -c $result_store_entry_path 2> /dev/null || true;
+
+        # Signal success.
+        touch $signal_file_path;
+
+        # FB.
+        echo "-> materialised result of an identical job.";
+        echo '\--------------------------------------------------------------------/';
+
+        exit 0;
+
+    fi;
+
+    # FB.
+    echo "-> no result of an identical job.";
+    echo '\--------------------------------------------------------------------/';
+
+fi;
+
 # =====================================================================|======|
 # Get pairwise alignments.
 
@@ -341,96 +526,297 @@ if [ $state == 'unaligned' ];
 then
 
     # -----------------------------------------------------------------|------|
-    # needleall.
+    # needleall -> pairwiseQuantifier.
 
     # FB.
-    echo "needleall.";
+    echo "needleall -> pairwiseQuantifier.";
     echo "----------------------------------------------------------------------";
 
     # Additional output.
     out_log_file_name=log.txt;
+    out_quantifier_file_name=quantifier.ssv;
+    out_map_file_name=info.csv;
+    out_connectivity_file_name=connectivity.csv;
 
-    # Additional path.
+    # Additional paths.
     out_log_file_path=${out_dir_path}/${out_log_file_name};
+    out_quantifier_file_path=${out_dir_path}/${out_quantifier_file_name};
+    out_map_file_path=${out_dir_path}/${out_map_file_name};
+    out_connectivity_file_path=${out_dir_path}/${out_connectivity_file_name};
 
     # Set parameters.
     gapopen_penalty=10.0;
     gapextend_penalty=0.5;
     apply_end_gap_penalties=True;
     minscore=1.0;
+    # Number of worker-processes (all available cores).
+    workers=`nproc`;
+    # Pairwise aligner:
+    # - needleall: EMBOSS.
+    # - native:    src.modules.gotoh (same scoring scheme).
+    aligner=needleall;
+    # Sparse mode: only align the candidate pairs with shared k-mers
+    # (see FASTA_to_candidatePairs, native aligner only).
+    sparse=False;
+    # - minimum number of shared 3-mers of a candidate pair
+    min_shared_kmers=5;
+    # - minimum number of standard deviations above the shared 3-mers
+    #   of unrelated sequences (by chance)
+    min_significance=4.0;
+    # - minimum number of partners of each sequence
+    #   (>= dim, with a margin for the pairs below minscore)
+    min_partners=$(( $dim * 2 ));
+    # Landmark mode: only align the pairs with diverse landmarks
+    # (see FASTA_to_landmarkPairs, native aligner only, overrides the
+    # sparse mode).
+    landmarks=False;
+    # - number of landmarks (> dim)
+    landmark_count=100;
+    # - number of held-out pairs (estimation of the embedding error)
+    heldout_size=1000;
+    # Deduplication: only align each unique FASTA-body once
+    # (see FASTA_to_pairwiseQuantifier --dedup, native aligner only).
+    dedup=False;
+    # Cache of the results across jobs: only align the pairs of
+    # FASTA-bodies that were NOT aligned by a previous job
+    # (see src.modules.paircache, native aligner only).
+    cache=False;
+    # - shared by all jobs
+    cache_file_path=${run_dir_path}/src/webserver/static/tmp/pair_cache.sqlite;
+    # - maximum number of pairs (least recently used pairs are evicted)
+    cache_size=10000000;
+
+    # The pipeline fails, if any of its commands fails.
+    set -o pipefail;
+
+    if [ $sparse == True ];
+    then
 
-    # Run all-against-all Needleman-Wunsch with all fasta-entries in input_file.
-    # -auto: turn off prompts.
-    # -stdout: write to STDOUT.
-    # -aformat3: format of output.
-    time needleall -asequence $in_file_path \
-                   -bsequence $in_file_path \
-                   -gapopen $gapopen_penalty \
-                   -gapextend $gapextend_penalty \
-                   -endweight $apply_end_gap_penalties \
-                   -endopen $gapopen_penalty \
-                   -endextend $gapextend_penalty \
-                   -minscore $minscore \
-                   -auto \
-                   -stdout \
-                   -aformat3 fasta \
-                   -errfile $out_log_file_path \
-                   > $out_result_file_path;
+        # Additional output.
+        out_pair_file_name=candidate_pairs.csv;
+        out_pair_file_path=${out_dir_path}/${out_pair_file_name};
 
-    # FB.
-    echo '\--------------------------------------------------------------------/';
+        # Select the candidate pairs (inverted k-mer index).
+        time python -m src.pipeline.FASTA_to_candidatePairs \
+                    $in_file_path \
+                    --min_shared_kmers $min_shared_kmers \
+                    --min_significance $min_significance \
+                    --min_partners $min_partners \
+                    --verbose \
+                    > $out_pair_file_path;
 
-elif [ $state == 'aligned' ];
-then
+        # FB.
+        echo "-> selected candidate pairs.";
 
-    # -----------------------------------------------------------------|------|
-    # Reformat MSA.
+        # Only the native aligner aligns selected pairs.
+        aligner=native;
 
-    # FB.
-    echo "MSA -> pairwiseFASTA.";
-    echo "----------------------------------------------------------------------";
+    fi;
 
-    # Run program.
-    python -m src.pipeline.MSA_to_pairwiseFASTA \
-       $in_file_path \
-       --verbose \
-       > $out_result_file_path;
+    if [ $landmarks == True ];
+    then
 
-    # FB.
-    echo '\--------------------------------------------------------------------/';
+        # Additional output.
+        out_pair_file_name=landmark_pairs.csv;
+        out_landmark_file_name=landmarks.txt;
+        out_heldout_file_name=heldout_pairs.csv;
+        out_pair_file_path=${out_dir_path}/${out_pair_file_name};
+        out_landmark_file_path=${out_dir_path}/${out_landmark_file_name};
+        out_heldout_file_path=${out_dir_path}/${out_heldout_file_name};
+
+        # Select the landmarks (farthest-point selection on k-mer
+        # profiles), their pairs and the held-out pairs.
+        time python -m src.pipeline.FASTA_to_landmarkPairs \
+                    $in_file_path \
+                    $out_landmark_file_path \
+                    $out_heldout_file_path \
+                    --landmark_count $landmark_count \
+                    --heldout_size $heldout_size \
+                    --verbose \
+                    > $out_pair_file_path;
 
-fi;
+        # FB.
+        echo "-> selected landmark pairs.";
 
-# =====================================================================|======|
-# Reformat pairwise alignments.
+        # Only the native aligner aligns selected pairs.
+        aligner=native;
 
-# If the starting data contains sequences.
-if [ $state == 'unaligned' ] || [ $state == 'aligned' ];
-then
+    fi;
+
+    # Only the native aligner deduplicates and uses the cache.
+    if [ $dedup == True ] || [ $cache == True ];
+    then
+        aligner=native;
+    fi;
+
+    if [ -n "$previous_job_id" ];
+    then
+
+        # Native Needleman-Wunsch (src.modules.gotoh) of the new pairs
+        # only (new-vs-previous and new-vs-new), merged with the
+        # quantifier and connectivity of the previous job
+        # (numbering of the previous job is kept).
+        time python -m src.pipeline.FASTA_to_extendedPairwiseQuantifier \
+                    ${previous_job_dir_path}/1_input_secure/input_secure_spaceless.fas \
+                    ${in_dir_path}/input_secure_spaceless_new.fas \
+                    $substmat_file_path \
+                    ${previous_job_dir_path}/4_quantifier/quantifier.ssv \
+                    ${previous_job_dir_path}/4_quantifier/info.csv \
+                    ${previous_job_dir_path}/3_connectivity/connectivity.csv \
+                    $out_map_file_path \
+                    $out_connectivity_file_path \
+                    --gapopen_penalty $gapopen_penalty \
+                    --gapextend_penalty $gapextend_penalty \
+                    `[ $apply_end_gap_penalties == True ] && echo --endweight` \
+                    --endopen_penalty $gapopen_penalty \
+                    --endextend_penalty $gapextend_penalty \
+                    --minscore $minscore \
+                    --workers $workers \
+                    --verbose \
+                    > $out_quantifier_file_path \
+            || { printf "%s\n" \
+                        "It was not possible to extend the pairwise" \
+                        "similarities of the previous job." \
+                        "Please make sure that the previous job was" \
+                        "started with unaligned sequences and finished." \
+                        > $signal_file_path;
+                 exit 1;
+               };
+
+    elif [ $aligner == 'needleall' ];
+    then
+
+        # Run all-against-all Needleman-Wunsch with all fasta-entries in input_file.
+        # Blocks of entries are aligned by concurrent needleall-processes;
+        # only the diagonal block-pairs and the block-pairs above the
+        # diagonal are aligned, and their outputs are merged in a
+        # deterministic order (see FASTA_to_pairwiseFASTA).
+        #
+        # The pairwise alignments are quantified while they are still
+        # being calculated (read from the pipe, see
+        # pairwiseFASTA_to_pairwiseQuantifier), and also kept in
+        # alignments.fas (tee).
+        # The quantifier and the connectivity are determined together.
+        #
+        # Both run at the same time, i.e. they share the cores:
+        # a quarter for the quantification (at least 1), the rest for
+        # needleall (at least 1).
+        quantifier_workers=$(( $workers / 4 > 1 ? $workers / 4 : 1 ));
+        aligner_workers=$(( $workers - $quantifier_workers > 1 ? $workers - $quantifier_workers : 1 ));
+        time python -m src.pipeline.FASTA_to_pairwiseFASTA \
+                    $in_file_path \
+                    --gapopen_penalty $gapopen_penalty \
+                    --gapextend_penalty $gapextend_penalty \
+                    `[ $apply_end_gap_penalties == True ] && echo --endweight` \
+                    --endopen_penalty $gapopen_penalty \
+                    --endextend_penalty $gapextend_penalty \
+                    --minscore $minscore \
+                    --workers $aligner_workers \
+                    --tmp_dir $out_dir_path \
+                    --log_file $out_log_file_path \
+                    --verbose \
+            | tee $out_result_file_path \
+            | python -m src.pipeline.pairwiseFASTA_to_pairwiseQuantifier \
+                     - \
+                     $substmat_file_path \
+                     $out_map_file_path \
+                     $out_connectivity_file_path \
+                     --gapopen_penalty $gapopen_penalty \
+                     --gapextend_penalty $gapextend_penalty \
+                     --count $unique_headers_count \
+                     --workers $quantifier_workers \
+                     --verbose \
+                     > $out_quantifier_file_path \
+            || { printf "%s\n" \
+                        "It was not possible to quantify the pairwise" \
+                        "similarities." \
+                        "Please make sure that enough sequences can be globally" \
+                        "aligned to each other." \
+                        > $signal_file_path;
+                 exit 1;
+               };
+
+    else
+
+        # Native all-against-all Needleman-Wunsch (src.modules.gotoh)
+        # with the same scoring scheme.
+        # The alignments are quantified in memory (no alignments.fas).
+        time python -m src.pipeline.FASTA_to_pairwiseQuantifier \
+                    $in_file_path \
+                    $substmat_file_path \
+                    $out_map_file_path \
+                    $out_connectivity_file_path \
+                    --gapopen_penalty $gapopen_penalty \
+                    --gapextend_penalty $gapextend_penalty \
+                    `[ $apply_end_gap_penalties == True ] && echo --endweight` \
+                    --endopen_penalty $gapopen_penalty \
+                    --endextend_penalty $gapextend_penalty \
+                    --minscore $minscore \
+                    `[ $sparse == True -o $landmarks == True ] && echo --pair_file $out_pair_file_path` \
+                    `[ $dedup == True ] && echo --dedup` \
+                    `[ $cache == True ] && echo --cache_file $cache_file_path --cache_size $cache_size` \
+                    --workers $workers \
+                    --verbose \
+                    > $out_quantifier_file_path \
+            || { printf "%s\n" \
+                        "It was not possible to quantify the pairwise" \
+                        "similarities." \
+                        "Please make sure that enough sequences can be globally" \
+                        "aligned to each other." \
+                        > $signal_file_path;
+                 exit 1;
+               };
+
+    fi;
 
     # FB.
-    echo '/====================================================================\';
-    echo "pairwiseFASTA -> pairwiseCSV.";
-    echo "----------------------------------------------------------------------";
+    echo '\--------------------------------------------------------------------/';
 
-    # Working directory.
-    work_dir_path=${job_dir_path}/2_alignment;
+elif [ $state == 'aligned' ];
+then
 
-    # Input.
-    in_file_name=alignments.fas;
+    # -----------------------------------------------------------------|------|
+    # Quantify MSA.
+    # (All pairwise alignments are quantified directly from the MSA,
+    #  without pairwise intermediates.)
+
+    # FB.
+    echo "MSA -> pairwiseQuantifier.";
+    echo "----------------------------------------------------------------------";
 
     # Output.
-    out_file_name=alignments.csv;
+    out_quantifier_file_name=quantifier.ssv;
+    out_map_file_name=info.csv;
+    out_connectivity_file_name=connectivity.csv;
 
     # Paths.
-    in_file_path=${work_dir_path}/${in_file_name};
-    out_file_path=${work_dir_path}/${out_file_name};
+    out_quantifier_file_path=${out_dir_path}/${out_quantifier_file_name};
+    out_map_file_path=${out_dir_path}/${out_map_file_name};
+    out_connectivity_file_path=${out_dir_path}/${out_connectivity_file_name};
+
+    # Set parameters.
+    # Number of worker-processes (all available cores).
+    workers=`nproc`;
+    # Memory-budget (in MiB) of all worker-processes.
+    memory=4096;
 
     # Run program.
-    python -m src.pipeline.pairwiseFASTA_to_pairwiseCSV \
-           $in_file_path \
-           --verbose \
-           > $out_file_path;
+    time python -m src.pipeline.MSA_to_pairwiseQuantifier \
+         $in_file_path \
+         $substmat_file_path \
+         $out_map_file_path \
+         --out_connectivity_file $out_connectivity_file_path \
+         --memory $memory \
+         --workers $workers \
+         --verbose \
+         > $out_quantifier_file_path \
+        || { printf "%s\n" \
+                    "It was not possible to quantify the pairwise" \
+                    "similarities." \
+                    "Please make sure that the input is a valid MSA." \
+                    > $signal_file_path;
+             exit 1;
+           };
 
     # FB.
     echo '\--------------------------------------------------------------------/';
@@ -458,23 +844,20 @@ out_headed_file_path=${out_dir_path}/${out_headed_file_name};
 mkdir $out_dir_path;
 
 # If the starting data contains sequences:
-# Determine connectivity of needleall-result.
+# Get connectivity of pairwise alignments
+# (already determined during quantification).
 if [ $state == 'unaligned' ] || [ $state == 'aligned' ];
 then
 
     # Input.
     in_dir_path=${job_dir_path}/2_alignment;
-    in_file_name=alignments.csv;
+    in_file_name=connectivity.csv;
 
     # Paths.
     in_file_path=${in_dir_path}/${in_file_name};
 
-    # Run program.
-    python -m src.pipeline.pairwise_to_connectivity \
-           $in_file_path \
-           --separator ',' \
-           --verbose \
-           > $out_file_path;
+    # Copy.
+    cp $in_file_path $out_file_path;
 
 # If the starting data contains quantifiers.
 # Determine connectivity of starting data.
@@ -552,12 +935,11 @@ then
 
     # FB.
     echo '/====================================================================\';
-    echo "pairwiseCSV -> pairwiseQuantifier.";
+    echo "Get pairwiseQuantifier.";
     echo "----------------------------------------------------------------------";
 
     # Input.
     in_dir_path=${job_dir_path}/2_alignment;
-    in_file_name=alignments.csv;
 
     # Output.
     out_dir_path=${job_dir_path}/4_quantifier;
@@ -568,7 +950,6 @@ then
     out_result_map_file_name=quantifier+info.ssv;
 
     # Paths.
-    in_file_path=${in_dir_path}/${in_file_name};
     out_result_file_path=${out_dir_path}/${out_result_file_name};
     out_map_file_path=${out_dir_path}/${out_map_file_name};
     out_headed_map_file_path=${out_dir_path}/${out_headed_map_file_name};
@@ -578,32 +959,10 @@ then
     # Create output-directory.
     mkdir $out_dir_path;
 
-    # Set parameters.
-    gapopen_penalty=10.0;
-    gapextend_penalty=0.5;
-
-    # Substitution matrix.
-    substmat_file_name=EBLOSUM62;
-    substmat_dir_path=/usr/local/EMBOSS-6.6.0/emboss/data;
-    substmat_file_path=${substmat_dir_path}/${substmat_file_name};
-
-    # Run program.
-    time python -m src.pipeline.pairwiseCSV_to_pairwiseQuantifier \
-         $in_file_path \
-         $substmat_file_path \
-         $out_map_file_path \
-         --gapopen_penalty $gapopen_penalty \
-         --gapextend_penalty $gapextend_penalty \
-         --verbose \
-         > $out_result_file_path \
-        || { printf "%s\n" \
-                    "It was not possible to quantify the pairwise" \
-                    "similarities." \
-                    "Please make sure that enough sequences can be globally" \
-                    "aligned to each other." \
-                    > $signal_file_path;
-             exit 1;
-           };
+    # Move results to output-directory.
+    # (Already calculated, see "Get pairwise alignments".)
+    mv ${in_dir_path}/quantifier.ssv $out_result_file_path;
+    mv ${in_dir_path}/info.csv $out_map_file_path;
 
 # If the starting data contains quantifiers.
 elif [ $state == 'quantifier' ];
@@ -718,45 +1077,122 @@ out_vec_map2_headed_file_path=${out_dir_path}/${out_vec_map2_headed_file_name};
 # Create output-directory.
 mkdir $out_dir_path;
 
-# Go to directory of input.
-cd $in_dir_path;
+# Engine:
+# - binary: cc_analysis binary.
+# - native: src.modules.cc_analysis (in-process least squares on the
+#           quantifiers, exits with non-zero status on connectivity
+#           problems).
+# - sparse: same as native, but only the known pairs are kept in memory
+#           (for large datasets with many missing pairs).
+cc_engine=binary;
+
+# Landmark mode (see "Get pairwise alignments"):
+# the landmarks are mapped and the other sequences are projected
+# (the embedding error of the held-out pairs is reported in the log).
+landmark_file_path=${job_dir_path}/2_alignment/landmarks.txt;
+heldout_file_path=${job_dir_path}/2_alignment/heldout_pairs.csv;
+
+if [ -f $landmark_file_path ];
+then
 
-# Run program in directory of input,
-# because cc_analysis has problems with long paths.
-#
-# If cc_analysis encounters connectivity problems, it does NOT seem to
-# exit with non-zero status.
-# Therefore, do sanity-check later (when moving the result-file).
-time cc_analysis -dim $dim \
-                 -f \
-                 $in_relation_file_name \
-                 $out_vec_ssv_file_name \
-                 &> $out_log_file_name;
-
-# Go back to directory that is running the pipeline.
-cd $run_dir_path;
-
-# Move log-file to output-directory.
-# (Even if cc_analysis failed, the log-file exists.)
-mv ${in_dir_path}/${out_log_file_name} $out_log_file_path;
-# Move output-file to output-directory.
-# (If cc_analysis failed, the output-file will NOT exist.)
-mv ${in_dir_path}/${out_vec_ssv_file_name} $out_vec_ssv_file_path \
-    || { printf "%s\n" \
-                "It was not possible to map the pairwise similarities." \
-                "This was caused by the presence of 2 (or more) loose groups" \
-                "in the dataset." \
-                "I.e. the requirement of <i>connections</i> &ge; <i>dim</i>" \
-                "was only fulfilled on the inter-${object_type} level," \
-                "but not on the inter-group level." \
-                "<br>" \
-                "The loose groups can be manually identified with the" \
-                "output-file 'pairwise.txt'." \
-                "Please split your dataset into these loose groups and" \
-                "re-run the query on each separate dataset." \
-                > $signal_file_path;
-         exit 1;
-       };
+    # Run program.
+    time python -m src.pipeline.pairwiseQuantifier_to_landmarkMap \
+                $in_relation_file_path \
+                $in_map_file_path \
+                $landmark_file_path \
+                $dim \
+                --heldout_file $heldout_file_path \
+                --verbose \
+                > $out_vec_ssv_file_path \
+                2> $out_log_file_path \
+        || { printf "%s\n" \
+                    "It was not possible to map the pairwise similarities" \
+                    "with landmarks." \
+                    "I.e. the requirement of <i>connections</i> &ge; <i>dim</i>" \
+                    "was not fulfilled among the landmarks or between a" \
+                    "${object_type} and the landmarks." \
+                    "Please re-run the query with more landmarks or without" \
+                    "the landmark mode." \
+                    > $signal_file_path;
+             exit 1;
+           };
+
+elif [ $cc_engine == 'native' ] || [ $cc_engine == 'sparse' ];
+then
+
+    # Number of objects (same as in the map-file, i.e. an object without
+    # any pair fails the connectivity check instead of being dropped,
+    # see "Combine result with original labels").
+    object_count=`cat $in_map_file_path | wc -l`;
+
+    # Run program.
+    time python -m src.pipeline.pairwiseQuantifier_to_ccAnalysis \
+                $in_relation_file_path \
+                $dim \
+                --count $object_count \
+                `[ $cc_engine == 'sparse' ] && echo --sparse` \
+                --verbose \
+                > $out_vec_ssv_file_path \
+                2> $out_log_file_path \
+        || { printf "%s\n" \
+                    "It was not possible to map the pairwise similarities." \
+                    "This was caused by the presence of 2 (or more) loose groups" \
+                    "in the dataset." \
+                    "I.e. the requirement of <i>connections</i> &ge; <i>dim</i>" \
+                    "was only fulfilled on the inter-${object_type} level," \
+                    "but not on the inter-group level." \
+                    "<br>" \
+                    "The loose groups can be manually identified with the" \
+                    "output-file 'pairwise.txt'." \
+                    "Please split your dataset into these loose groups and" \
+                    "re-run the query on each separate dataset." \
+                    > $signal_file_path;
+             exit 1;
+           };
+
+else
+
+    # Go to directory of input.
+    cd $in_dir_path;
+
+    # Run program in directory of input,
+    # because cc_analysis has problems with long paths.
+    #
+    # If cc_analysis encounters connectivity problems, it does NOT seem to
+    # exit with non-zero status.
+    # Therefore, do sanity-check later (when moving the result-file).
+    time cc_analysis -dim $dim \
+                     -f \
+                     $in_relation_file_name \
+                     $out_vec_ssv_file_name \
+                     &> $out_log_file_name;
+
+    # Go back to directory that is running the pipeline.
+    cd $run_dir_path;
+
+    # Move log-file to output-directory.
+    # (Even if cc_analysis failed, the log-file exists.)
+    mv ${in_dir_path}/${out_log_file_name} $out_log_file_path;
+    # Move output-file to output-directory.
+    # (If cc_analysis failed, the output-file will NOT exist.)
+    mv ${in_dir_path}/${out_vec_ssv_file_name} $out_vec_ssv_file_path \
+        || { printf "%s\n" \
+                    "It was not possible to map the pairwise similarities." \
+                    "This was caused by the presence of 2 (or more) loose groups" \
+                    "in the dataset." \
+                    "I.e. the requirement of <i>connections</i> &ge; <i>dim</i>" \
+                    "was only fulfilled on the inter-${object_type} level," \
+                    "but not on the inter-group level." \
+                    "<br>" \
+                    "The loose groups can be manually identified with the" \
+                    "output-file 'pairwise.txt'." \
+                    "Please split your dataset into these loose groups and" \
+                    "re-run the query on each separate dataset." \
+                    > $signal_file_path;
+             exit 1;
+           };
+
+fi;
 
 # FB.
 echo "----------------------------------------------------------------------";
@@ -942,6 +1378,59 @@ done;
 # FB.
 echo '\--------------------------------------------------------------------/';
 
+# =====================================================================|======|
+# Store result for identical jobs.
+
+if [ $memoize == True ];
+then
+
+    # FB.
+    echo '/====================================================================\';
+    echo "Store result for identical jobs.";
+    echo "----------------------------------------------------------------------";
+
+    mkdir -p $result_store_dir_path;
+
+    # Prepare the entry under a temporary name
+    # (i.e. concurrent jobs never see an incomplete entry).
+    # Symlinks are replaced by their targets, i.e. the entry does NOT
+    # depend on this job.
+    tmp_entry_path=`mktemp -d ${result_store_dir_path}/.${job_digest}.XXXXXX`;
+    result_dir_path_s=`ls -d ${job_dir_path}/[1-5]_*`;
+    if [ -f $warning_file_path ];
+    then
+        result_dir_path_s="$result_dir_path_s $warning_file_path";
+    fi;
+    cp -a -L --link $result_dir_path_s $tmp_entry_path/ 2> /dev/null \
+        || cp -a -L --remove-destination --reflink=auto \
+              $result_dir_path_s $tmp_entry_path/;
+
+    # Publish the entry (the first of concurrent identical jobs wins).
+    mv -T $tmp_entry_path $result_store_entry_path 2> /dev/null \
+        || rm -r $tmp_entry_path;
+
+    # Evict the least recently used entries
+    # (modification time, see "Look up result").
+    # Entries are renamed before they are removed, i.e. concurrent jobs
+    # never see an incomplete entry.
+    for evicted_entry_path in `ls -d -t ${result_store_dir_path}/*/ 2> /dev/null \
+                                   | tail -n +$(( $result_store_size + 1 ))`;
+    do
+        evicted_tmp_path=${result_store_dir_path}/.evicted.`basename $evicted_entry_path`.$$;
+        mv -T $evicted_entry_path $evicted_tmp_path 2> /dev/null \
+            && rm -r $evicted_tmp_path;
+    done;
+
+    # Remove leftovers of crashed jobs (older than 1 day).
+    find $result_store_dir_path -mindepth 1 -maxdepth 1 -name '.*' \
+         -mmin +1440 -exec rm -r {} + 2> /dev/null || true;
+
+    # FB.
+    echo "-> stored result: $job_digest";
+    echo '\--------------------------------------------------------------------/';
+
+fi;
+
 # =====================================================================|======|
 # If pipeline finished successfully:
 # Signal success.
@@ -0,0 +1,1290 @@
+"""\
+Native cc_analysis (multidimensional scaling of pairwise relations).
+
+Each object i is represented by a vector x_i in dim dimensions, so that
+the dot products fit the pairwise relations r_ij in the least-squares
+sense:
+
+    minimise  sum over all known pairs i<j of  (r_ij - x_i . x_j)^2
+
+Missing pairs are allowed (they do NOT contribute), i.e. each object
+needs at least dim connections and the objects must NOT fall apart into
+loose groups (see check_connectivity).
+
+The vectors are initialised with the leading eigenvectors of the
+relation matrix (missing pairs and diagonal are zero) and refined by
+alternating least squares: each vector is the least-squares solution
+for fixed other vectors (a dim*dim system per object), all vectors are
+updated together and the step is damped, if the residual would
+increase.
+
+The relations are kept in a dense float32-matrix (zero: missing pair)
+with a boolean matrix of the known pairs (NOT needed, if all pairs are
+known) and processed in blocks of rows, i.e. there are no other n*n
+temporaries.
+
+For large n with few known pairs, the relations can instead be kept in
+compressed sparse rows (see SparseRelations and cc_analysis_sparse):
+memory and time per iteration are proportional to the number of known
+pairs (times dim*dim).
+
+New objects can be placed into the frame of existing vectors without
+recomputing them (see project_vectors): time O(new objects * references).
+
+The solution is only unique up to a rotation, so the vectors are
+rotated to their principal axes (ascending variance, i.e. the last
+coordinate is the most significant one, as for the cc_analysis binary)
+with positive mean coordinates.
+"""
+
+from typing import Callable, Iterable, NamedTuple, Optional, TextIO, Tuple
+
+import numpy as np
+
+from src.modules.pairwise import CondensedPairs
+from src.modules.pairwise import iterate_ssv_blocks
+
+
+# Maximum number of refinement-iterations.
+MAX_ITERATION_COUNT = 500
+
+# Stop, if the residual decreases by less than this fraction.
+# (The products are calculated in single precision.)
+TOLERANCE = 1e-6
+
+# Stop, if no coordinate changes by more than this
+# (precision of the output, see write_vec_ssv).
+STEP_TOLERANCE = 1e-6
+
+# Number of rows per block.
+BLOCK_SIZE = 1024
+
+# Number of known pairs per block (sparse relations).
+SPARSE_BLOCK_SIZE = 2 ** 18
+
+
+def condensed_to_matrix(
+        pair_to_quantifier: CondensedPairs
+        ) -> Tuple[np.ndarray, np.ndarray]:
+    """\
+    Expand the condensed relations to dense symmetric matrices.
+
+    :param pair_to_quantifier:
+        CondensedPairs
+
+    :return:
+        Tuple (index: number - 1):
+        - np.ndarray (float32, shape: (n, n)): relations
+          (zero: missing pair and diagonal)
+        - np.ndarray (bool, shape: (n, n)): known pairs
+    """
+    rel_mat = np.zeros((pair_to_quantifier.n, pair_to_quantifier.n),
+                       dtype=np.float32)
+    known_mat = np.zeros(rel_mat.shape, dtype=bool)
+    for num_smaller_s, num_larger_s, value_s in \
+            pair_to_quantifier.iterate_blocks():
+        rel_mat[num_smaller_s - 1, num_larger_s - 1] = value_s
+        rel_mat[num_larger_s - 1, num_smaller_s - 1] = value_s
+        known_mat[num_smaller_s - 1, num_larger_s - 1] = True
+        known_mat[num_larger_s - 1, num_smaller_s - 1] = True
+
+    return rel_mat, known_mat
+
+
+def pairs_to_matrix(
+        n: int,
+        num_a_s: np.ndarray,
+        num_b_s: np.ndarray,
+        value_s: np.ndarray
+        ) -> Tuple[np.ndarray, np.ndarray]:
+    """\
+    Expand the pairwise relations (e.g. from
+    src.modules.pairwise.parse_ssv) to dense symmetric matrices.
+
+    :param n:
+        int
+
+        Number of objects (numbered from 1 to n).
+
+    :param num_a_s:
+        np.ndarray (int)
+
+    :param num_b_s:
+        np.ndarray (int)
+
+    :param value_s:
+        np.ndarray (float)
+
+    :return:
+        Tuple (see condensed_to_matrix)
+    """
+    if len(num_a_s) and (min(num_a_s.min(), num_b_s.min()) < 1
+                         or max(num_a_s.max(), num_b_s.max()) > n):
+        raise ValueError(f'Faulty numbers of objects:\n'
+                         f'not within 1 to {n}')
+
+    # Without self-pairs.
+    is_other = num_a_s != num_b_s
+    idx_a_s = num_a_s[is_other] - 1
+    idx_b_s = num_b_s[is_other] - 1
+    value_s = value_s[is_other]
+
+    rel_mat = np.zeros((n, n), dtype=np.float32)
+    rel_mat[idx_a_s, idx_b_s] = value_s
+    rel_mat[idx_b_s, idx_a_s] = value_s
+    known_mat = np.zeros((n, n), dtype=bool)
+    known_mat[idx_a_s, idx_b_s] = True
+    known_mat[idx_b_s, idx_a_s] = True
+
+    return rel_mat, known_mat
+
+
+def _iterate_row_blocks(
+        n: int,
+        block_size: int = BLOCK_SIZE
+        ) -> Iterable[slice]:
+    for start in range(0, n, block_size):
+        yield slice(start, min(start + block_size, n))
+
+
+def _is_complete(
+        known_mat: np.ndarray
+        ) -> bool:
+    """\
+    All pairs (apart from the diagonal) are known.
+    """
+    n = len(known_mat)
+    return int(np.count_nonzero(known_mat)) == n * (n - 1)
+
+
+def get_components(
+        known_mat: np.ndarray
+        ) -> np.ndarray:
+    """\
+    Find the connected components of the known pairs
+    (breadth-first search, each row is visited once).
+
+    :param known_mat:
+        np.ndarray (bool, shape: (n, n)), see pairs_to_matrix
+
+    :return:
+        np.ndarray (int64, shape: (n,)):
+        smallest index of the component of each object
+    """
+    n = len(known_mat)
+    label_s = np.full(n, -1, dtype=np.int64)
+    for start in range(n):
+        if label_s[start] >= 0:
+            continue
+        label_s[start] = start
+        frontier_s = np.array([start])
+        while len(frontier_s):
+            is_reached = known_mat[frontier_s].any(axis=0)
+            frontier_s = np.flatnonzero(is_reached & (label_s < 0))
+            label_s[frontier_s] = start
+
+    return label_s
+
+
+def check_connectivity(
+        known_mat: np.ndarray,
+        dim: int
+        ):
+    """\
+    Sanity check: fail, if the vectors are NOT determined by the known
+    pairs.
+
+    :param known_mat:
+        np.ndarray (bool, shape: (n, n)), see pairs_to_matrix
+
+    :param dim:
+        int (positive)
+
+    :raise ValueError:
+        - if an object has less than dim connections.
+        - if the objects fall apart into loose groups.
+    """
+    _check_connectivity(np.count_nonzero(known_mat, axis=1),
+                        get_components(known_mat),
+                        dim)
+
+
+def _check_connectivity(
+        count_s: np.ndarray,
+        label_s: np.ndarray,
+        dim: int):
+    """\
+    :param count_s:
+        np.ndarray (int): number of known pairs of each object
+
+    :param label_s:
+        np.ndarray (int): component of each object
+    """
+    loose_idx_s = np.flatnonzero(count_s < dim)
+    if len(loose_idx_s):
+        raise ValueError(f'Faulty connectivity:\n'
+                         f'{len(loose_idx_s)} objects with less than {dim} '
+                         f'connections, e.g. number {loose_idx_s[0] + 1}')
+
+    group_count = len(np.unique(label_s))
+    if group_count > 1:
+        raise ValueError(f'Faulty connectivity:\n'
+                         f'{group_count} loose groups of objects')
+
+
+def initialise_vectors(
+        rel_mat: np.ndarray,
+        dim: int,
+        iteration_count: int = 20,
+        seed: int = 0
+        ) -> np.ndarray:
+    """\
+    Leading eigenvectors of the relation matrix (missing pairs and
+    diagonal are zero), scaled with the square roots of their
+    eigenvalues (subspace iteration with Rayleigh-Ritz).
+
+    :param rel_mat:
+        np.ndarray (float32, shape: (n, n)), see pairs_to_matrix
+
+    :param dim:
+        int (positive)
+
+    :param iteration_count:
+        int
+
+    :param seed:
+        int (deterministic start)
+
+    :return:
+        np.ndarray (float64, shape: (n, dim))
+    """
+    return _initialise(lambda basis: rel_mat @ basis.astype(np.float32),
+                       len(rel_mat), dim, iteration_count, seed)
+
+
+def _initialise(
+        multiply: Callable[[np.ndarray], np.ndarray],
+        n: int,
+        dim: int,
+        iteration_count: int,
+        seed: int
+        ) -> np.ndarray:
+    """\
+    :param multiply:
+        Callable: product of the relation matrix with vectors
+        (shape: (n, k))
+    """
+    # Oversampling (for convergence of the leading eigenvectors).
+    k = min(n, dim + 8)
+
+    basis = np.random.default_rng(seed).standard_normal((n, k))
+    basis, _ = np.linalg.qr(basis)
+    for _ in range(iteration_count):
+        basis, _ = np.linalg.qr(multiply(basis))
+
+    # Rayleigh-Ritz.
+    eigval_s, eigvec_s = np.linalg.eigh(basis.T @ multiply(basis))
+    # Largest eigenvalues.
+    # (Only positive eigenvalues are dot products, but the vectors should
+    #  NOT start in a subspace, i.e. small positive lower bound.)
+    order_s = np.argsort(eigval_s)[::-1][:dim]
+    scale_s = np.sqrt(np.clip(eigval_s[order_s],
+                              1e-3 * max(eigval_s.max(), 1e-12), None))
+
+    return (basis @ eigvec_s[:, order_s]) * scale_s
+
+
+def get_residual(
+        rel_mat: np.ndarray,
+        known_mat: np.ndarray,
+        vec_s: np.ndarray
+        ) -> float:
+    """\
+    Sum of the squared residuals of all known pairs i<j.
+
+    :param rel_mat:
+        np.ndarray (float32, shape: (n, n)), see pairs_to_matrix
+
+    :param known_mat:
+        np.ndarray (bool, shape: (n, n)), see pairs_to_matrix
+
+    :param vec_s:
+        np.ndarray (shape: (n, dim))
+
+    :return:
+        float
+    """
+    is_complete = _is_complete(known_mat)
+    vec32_s = vec_s.astype(np.float32)
+
+    residual = 0.0
+    for rows in _iterate_row_blocks(len(rel_mat)):
+        diff_s = rel_mat[rows] - vec32_s[rows] @ vec32_s.T
+        if is_complete:
+            # Without the diagonal.
+            # (Zeroed in place instead of subtracted afterwards, i.e. NO
+            #  cancellation, the residual can NOT become negative.)
+            diff_s[np.arange(rows.stop - rows.start),
+                   np.arange(rows.start, rows.stop)] = 0.0
+        else:
+            diff_s *= known_mat[rows]
+        residual += float(np.einsum('ij,ij->', diff_s, diff_s,
+                                    dtype=np.float64))
+
+    # Each pair occurs twice.
+    return residual / 2
+
+
+def _solve_vectors(
+        rel_mat: np.ndarray,
+        known_mat: np.ndarray,
+        vec_s: np.ndarray
+        ) -> np.ndarray:
+    """\
+    Least-squares solution of each vector for fixed other vectors.
+    """
+    n, dim = vec_s.shape
+    outer_s = (vec_s[:, :, None] * vec_s[:, None, :]).reshape(n, dim * dim)
+
+    # Sum of x_j x_j^T of the known partners j of each object.
+    if _is_complete(known_mat):
+        lhs_s = outer_s.sum(axis=0) - outer_s
+    else:
+        outer32_s = outer_s.astype(np.float32)
+        lhs_s = np.empty((n, dim * dim))
+        for rows in _iterate_row_blocks(n):
+            lhs_s[rows] = known_mat[rows].astype(np.float32) @ outer32_s
+    lhs_s = lhs_s.reshape(n, dim, dim)
+
+    # Sum of r_ij x_j of the known partners j of each object.
+    rhs_s = (rel_mat @ vec_s.astype(np.float32)).astype(np.float64)
+
+    return _solve_systems(lhs_s, rhs_s)
+
+
+def _solve_systems(
+        lhs_s: np.ndarray,
+        rhs_s: np.ndarray
+        ) -> np.ndarray:
+    """\
+    Solve the dim*dim system of each object.
+
+    :param lhs_s:
+        np.ndarray (shape: (n, dim, dim))
+
+    :param rhs_s:
+        np.ndarray (shape: (n, dim))
+    """
+    dim = rhs_s.shape[1]
+
+    # Regularise (nearly) singular systems slightly.
+    ridge = 1e-12 * np.trace(lhs_s, axis1=1, axis2=2).max()
+    lhs_s += ridge * np.eye(dim)
+
+    return np.linalg.solve(lhs_s, rhs_s[:, :, None])[:, :, 0]
+
+
+def refine_vectors(
+        rel_mat: np.ndarray,
+        known_mat: np.ndarray,
+        vec_s: np.ndarray,
+        max_iteration_count: int = MAX_ITERATION_COUNT,
+        tolerance: float = TOLERANCE
+        ) -> Tuple[np.ndarray, float, int]:
+    """\
+    Alternating least squares (all vectors together, damped steps).
+
+    :param rel_mat:
+        np.ndarray (float32, shape: (n, n)), see pairs_to_matrix
+
+    :param known_mat:
+        np.ndarray (bool, shape: (n, n)), see pairs_to_matrix
+
+    :param vec_s:
+        np.ndarray (shape: (n, dim)): start
+
+    :param max_iteration_count:
+        int
+
+    :param tolerance:
+        float
+
+        Stop, if the residual decreases by less than this fraction
+        (or if no coordinate changes by more than STEP_TOLERANCE).
+
+    :return:
+        Tuple:
+        - np.ndarray (float64, shape: (n, dim))
+        - float: residual (see get_residual)
+        - int: number of iterations
+    """
+    return _refine(lambda vec_s: _solve_vectors(rel_mat, known_mat, vec_s),
+                   lambda vec_s: get_residual(rel_mat, known_mat, vec_s),
+                   vec_s, max_iteration_count, tolerance)
+
+
+def _refine(
+        solve: Callable[[np.ndarray], np.ndarray],
+        get_residual_of: Callable[[np.ndarray], float],
+        vec_s: np.ndarray,
+        max_iteration_count: int,
+        tolerance: float
+        ) -> Tuple[np.ndarray, float, int]:
+    """\
+    :param solve:
+        Callable: least-squares solution of each vector for fixed other
+        vectors
+
+    :param get_residual_of:
+        Callable: residual of the vectors
+    """
+    vec_s = np.asarray(vec_s, dtype=np.float64)
+    residual = get_residual_of(vec_s)
+
+    iteration = 0
+    for iteration in range(1, max_iteration_count + 1):
+        step_s = solve(vec_s) - vec_s
+
+        # Damp the step, until the residual decreases.
+        fraction = 1.0
+        while True:
+            new_vec_s = vec_s + fraction * step_s
+            new_residual = get_residual_of(new_vec_s)
+            if new_residual <= residual or fraction < 1e-3:
+                break
+            fraction /= 2
+
+        # Converged.
+        if new_residual > residual:
+            break
+        is_converged = (residual - new_residual <= tolerance * residual
+                        or np.abs(fraction * step_s).max() <= STEP_TOLERANCE)
+        vec_s, residual = new_vec_s, new_residual
+        if is_converged:
+            break
+
+    return vec_s, residual, iteration
+
+
+def rotate_to_principal_axes(
+        vec_s: np.ndarray
+        ) -> np.ndarray:
+    """\
+    Rotate the vectors to their principal axes (ascending variance),
+    with positive mean coordinates.
+
+    :param vec_s:
+        np.ndarray (shape: (n, dim))
+
+    :return:
+        np.ndarray (float64, shape: (n, dim))
+    """
+    _, axis_s = np.linalg.eigh(vec_s.T @ vec_s)
+    vec_s = vec_s @ axis_s
+    sign_s = np.where(vec_s.sum(axis=0) < 0, -1.0, 1.0)
+
+    return vec_s * sign_s
+
+
+def cc_analysis(
+        rel_mat: np.ndarray,
+        known_mat: np.ndarray,
+        dim: int,
+        max_iteration_count: int = MAX_ITERATION_COUNT,
+        tolerance: float = TOLERANCE
+        ) -> Tuple[np.ndarray, float, int]:
+    """\
+    Represent each object by a vector, so that the dot products fit the
+    pairwise relations.
+
+    :param rel_mat:
+        np.ndarray (float32, shape: (n, n)), see pairs_to_matrix
+        (or condensed_to_matrix)
+
+    :param known_mat:
+        np.ndarray (bool, shape: (n, n)), see pairs_to_matrix
+
+    :param dim:
+        int (positive)
+
+    :param max_iteration_count:
+        int
+
+    :param tolerance:
+        float
+
+    :raise ValueError:
+        see check_connectivity
+
+    :return:
+        Tuple:
+        - np.ndarray (float64, shape: (n, dim)):
+          vectors (see rotate_to_principal_axes)
+        - float: residual (see get_residual)
+        - int: number of iterations (see refine_vectors)
+    """
+    if dim < 1:
+        raise ValueError(f'Faulty dim:\n'
+                         f'{dim}')
+
+    check_connectivity(known_mat, dim)
+
+    vec_s = initialise_vectors(rel_mat, dim)
+    vec_s, residual, iteration_count = refine_vectors(
+        rel_mat, known_mat, vec_s, max_iteration_count, tolerance)
+
+    return rotate_to_principal_axes(vec_s), residual, iteration_count
+
+
+# ---------------------------------------------------------------------|------|
+# Sparse relations.
+
+
+class SparseRelations(NamedTuple):
+    """\
+    Known pairs in compressed sparse rows (both directions, without
+    self-pairs, partners sorted), i.e. memory O(number of known pairs)
+    instead of O(n*n).
+
+    The entries of row i are indptr[i]:indptr[i+1].
+    """
+    # Number of objects.
+    n: int
+    # np.ndarray (int64, shape: (n+1,)).
+    indptr: np.ndarray
+    # np.ndarray (int32): index of each partner.
+    indices: np.ndarray
+    # np.ndarray (float32): relation to each partner.
+    values: np.ndarray
+
+
+def pairs_to_sparse(
+        n: int,
+        num_a_s: np.ndarray,
+        num_b_s: np.ndarray,
+        value_s: np.ndarray
+        ) -> SparseRelations:
+    """\
+    Compress the pairwise relations (e.g. from
+    src.modules.pairwise.parse_ssv) to sparse symmetric rows.
+
+    :param n:
+        int
+
+        Number of objects (numbered from 1 to n).
+
+    :param num_a_s:
+        np.ndarray (int)
+
+    :param num_b_s:
+        np.ndarray (int)
+
+    :param value_s:
+        np.ndarray (float)
+
+        (Repeated pairs: the last one counts, as for pairs_to_matrix.)
+
+    :return:
+        SparseRelations (index: number - 1)
+    """
+    num_a_s = np.asarray(num_a_s, dtype=np.int64)
+    num_b_s = np.asarray(num_b_s, dtype=np.int64)
+    if len(num_a_s) and (min(num_a_s.min(), num_b_s.min()) < 1
+                         or max(num_a_s.max(), num_b_s.max()) > n):
+        raise ValueError(f'Faulty numbers of objects:\n'
+                         f'not within 1 to {n}')
+
+    # Without self-pairs.
+    is_other = num_a_s != num_b_s
+    idx_smaller_s = np.minimum(num_a_s, num_b_s)[is_other] - 1
+    idx_larger_s = np.maximum(num_a_s, num_b_s)[is_other] - 1
+    value_s = np.asarray(value_s, dtype=np.float32)[is_other]
+
+    # Both directions.
+    return _to_rows(n, n,
+                    np.concatenate([idx_smaller_s, idx_larger_s]),
+                    np.concatenate([idx_larger_s, idx_smaller_s]),
+                    np.concatenate([value_s, value_s]))
+
+
+def _to_rows(
+        row_count: int,
+        col_count: int,
+        row_s: np.ndarray,
+        col_s: np.ndarray,
+        value_s: np.ndarray
+        ) -> SparseRelations:
+    """\
+    Compressed sparse rows of the entries (sorted by row and partner,
+    the last of repeated entries is kept).
+    """
+    _, last_s = np.unique((row_s * col_count + col_s)[::-1],
+                          return_index=True)
+    keep_s = len(row_s) - 1 - last_s
+
+    indptr = np.zeros(row_count + 1, dtype=np.int64)
+    np.cumsum(np.bincount(row_s[keep_s], minlength=row_count),
+              out=indptr[1:])
+
+    return SparseRelations(row_count, indptr,
+                           col_s[keep_s].astype(np.int32),
+                           np.asarray(value_s, dtype=np.float32)[keep_s])
+
+
+def _count_rows(
+        count_s: np.ndarray,
+        row_s: np.ndarray
+        ):
+    """\
+    Add the number of entries of each row (in place).
+    """
+    unique_row_s, row_count_s = np.unique(row_s, return_counts=True)
+    count_s[unique_row_s] += row_count_s
+
+
+def _take_positions(
+        position_s: np.ndarray,
+        row_s: np.ndarray
+        ) -> np.ndarray:
+    """\
+    Positions of the entries in their rows (in the order of the entries)
+    and advance the next free position of each row (in place).
+    """
+    order_s = np.argsort(row_s, kind='stable')
+    sorted_row_s = row_s[order_s]
+
+    # First entry of each row.
+    is_first_s = np.ones(len(row_s), dtype=bool)
+    np.not_equal(sorted_row_s[1:], sorted_row_s[:-1], out=is_first_s[1:])
+    first_s = np.flatnonzero(is_first_s)
+    count_s = np.diff(np.append(first_s, len(row_s)))
+
+    # Next free position of the row plus rank within the row.
+    taken_s = np.empty(len(row_s), dtype=np.int64)
+    taken_s[order_s] = (position_s[sorted_row_s]
+                        + np.arange(len(row_s))
+                        - np.repeat(first_s, count_s))
+    position_s[sorted_row_s[first_s]] += count_s
+
+    return taken_s
+
+
+def _sorted_pairs_to_sparse(
+        lower_count_s: np.ndarray,
+        upper_count_s: np.ndarray,
+        block_s: Iterable[Tuple[np.ndarray, np.ndarray, np.ndarray]]
+        ) -> SparseRelations:
+    """\
+    Fill sparse symmetric rows with unique pairs that are sorted by
+    (idx_smaller, idx_larger), block by block, i.e. without temporaries
+    for all pairs.
+
+    (The partners of each row are sorted: the smaller partners come in
+     the order of idx_smaller, before the larger partners in the order
+     of idx_larger.)
+
+    :param lower_count_s:
+        np.ndarray (int64): number of smaller partners of each object
+
+    :param upper_count_s:
+        np.ndarray (int64): number of larger partners of each object
+
+    :param block_s:
+        Iterable of Tuple:
+        - np.ndarray (int): idx_smaller
+        - np.ndarray (int): idx_larger
+        - np.ndarray (float): relation
+
+    :return:
+        SparseRelations
+    """
+    n = len(lower_count_s)
+    indptr = np.zeros(n + 1, dtype=np.int64)
+    np.cumsum(lower_count_s + upper_count_s, out=indptr[1:])
+    indices = np.empty(indptr[-1], dtype=np.int32)
+    values = np.empty(indptr[-1], dtype=np.float32)
+
+    # Next free position of the smaller and the larger partners of each
+    # object.
+    lower_position_s = indptr[:-1].copy()
+    upper_position_s = indptr[:-1] + lower_count_s
+
+    for idx_smaller_s, idx_larger_s, value_s in block_s:
+        position_s = _take_positions(upper_position_s, idx_smaller_s)
+        indices[position_s] = idx_larger_s
+        values[position_s] = value_s
+        position_s = _take_positions(lower_position_s, idx_larger_s)
+        indices[position_s] = idx_smaller_s
+        values[position_s] = value_s
+
+    return SparseRelations(n, indptr, indices, values)
+
+
+def condensed_to_sparse(
+        pair_to_quantifier: CondensedPairs
+        ) -> SparseRelations:
+    """\
+    Compress the condensed relations to sparse symmetric rows
+    (block by block, see _sorted_pairs_to_sparse).
+
+    :param pair_to_quantifier:
+        CondensedPairs
+
+    :return:
+        SparseRelations (see pairs_to_sparse)
+    """
+    n = pair_to_quantifier.n
+
+    # Number of partners of each object.
+    lower_count_s = np.zeros(n, dtype=np.int64)
+    upper_count_s = np.zeros(n, dtype=np.int64)
+    for num_smaller_s, num_larger_s, _ in \
+            pair_to_quantifier.iterate_blocks():
+        _count_rows(upper_count_s, num_smaller_s - 1)
+        _count_rows(lower_count_s, num_larger_s - 1)
+
+    return _sorted_pairs_to_sparse(
+        lower_count_s, upper_count_s,
+        ((num_smaller_s - 1, num_larger_s - 1, value_s)
+         for num_smaller_s, num_larger_s, value_s
+         in pair_to_quantifier.iterate_blocks()))
+
+
+def parse_ssv_as_sparse(
+        f: TextIO,
+        n: Optional[int] = None
+        ) -> SparseRelations:
+    """\
+    Parse pairwise relations in space-separated-format directly into
+    sparse symmetric rows (see src.modules.pairwise.iterate_ssv_blocks).
+
+    The file is read twice (count, then fill), i.e. the pairs are NOT
+    kept in memory apart from the sparse rows, if they are unique and
+    sorted (as written by src.modules.pairwise.write_ssv_blocks).
+    Otherwise, they are compressed together (see pairs_to_sparse).
+
+    Self-pairs are ignored, repeated pairs: the last one counts.
+
+    :param f:
+        TextIO (opened for reading, seekable)
+
+    :param n:
+        int
+
+        Number of objects (numbered from 1 to n).
+
+        (default: None, i.e. highest number in the file.)
+
+    :raise ValueError:
+        - if the file can NOT be parsed (see iterate_ssv_blocks).
+        - if a number is NOT within 1 to n.
+
+    :return:
+        SparseRelations
+    """
+    def iterate_pairs():
+        for num_a_s, num_b_s, value_s in iterate_ssv_blocks(f):
+            # Without self-pairs.
+            is_other = num_a_s != num_b_s
+            yield (np.minimum(num_a_s, num_b_s)[is_other] - 1,
+                   np.maximum(num_a_s, num_b_s)[is_other] - 1,
+                   value_s[is_other])
+
+    # Number of partners of each object
+    # (grows with the highest number, if n is NOT given).
+    lower_count_s = np.zeros(0 if n is None else n, dtype=np.int64)
+    upper_count_s = np.zeros(0 if n is None else n, dtype=np.int64)
+
+    # Whether the pairs are unique and sorted.
+    is_sorted = True
+    last_pair = (-1, -1)
+
+    start = f.tell()
+    for idx_smaller_s, idx_larger_s, _ in iterate_pairs():
+
+        # Trivial case:
+        # Nothing to do.
+        if not len(idx_smaller_s):
+            continue
+
+        # Sanity check: fail.
+        # Numbers outside of the numbering.
+        max_num = int(idx_larger_s.max()) + 1
+        if (int(idx_smaller_s.min()) < 0
+                or (n is not None and max_num > n)):
+            raise ValueError(f'Faulty numbers of objects:\n'
+                             f'not within 1 to {n or max_num}')
+
+        # Grow to the highest number.
+        if max_num > len(lower_count_s):
+            lower_count_s = np.append(
+                lower_count_s, np.zeros(max_num - len(lower_count_s),
+                                        dtype=np.int64))
+            upper_count_s = np.append(
+                upper_count_s, np.zeros(max_num - len(upper_count_s),
+                                        dtype=np.int64))
+
+        _count_rows(upper_count_s, idx_smaller_s)
+        _count_rows(lower_count_s, idx_larger_s)
+
+        # Compare each pair with the previous one.
+        previous_smaller_s = np.append(last_pair[0], idx_smaller_s[:-1])
+        previous_larger_s = np.append(last_pair[1], idx_larger_s[:-1])
+        is_sorted = is_sorted and bool(np.all(
+            (idx_smaller_s > previous_smaller_s)
+            | ((idx_smaller_s == previous_smaller_s)
+               & (idx_larger_s > previous_larger_s))))
+        last_pair = (idx_smaller_s[-1], idx_larger_s[-1])
+
+    f.seek(start)
+
+    # Unique and sorted pairs.
+    if is_sorted:
+        return _sorted_pairs_to_sparse(lower_count_s, upper_count_s,
+                                       iterate_pairs())
+
+    # Other pairs:
+    # Compress all pairs together (see pairs_to_sparse).
+    idx_smaller_s, idx_larger_s, value_s = (
+        np.concatenate(part_s) for part_s in zip(*iterate_pairs()))
+
+    return pairs_to_sparse(len(lower_count_s),
+                           idx_smaller_s + 1, idx_larger_s + 1, value_s)
+
+
+def _iterate_entry_blocks(
+        indptr: np.ndarray,
+        block_size: int = SPARSE_BLOCK_SIZE
+        ) -> Iterable[slice]:
+    """\
+    Blocks of rows with at most block_size entries
+    (or a single row with more entries).
+    """
+    n = len(indptr) - 1
+    start = 0
+    while start < n:
+        stop = int(np.searchsorted(indptr, indptr[start] + block_size,
+                                   side='right')) - 1
+        stop = min(max(stop, start + 1), n)
+        yield slice(start, stop)
+        start = stop
+
+
+def _get_entries(
+        indptr: np.ndarray,
+        row_s: np.ndarray
+        ) -> np.ndarray:
+    """\
+    Indices of the entries of the rows (concatenated).
+    """
+    start_s = indptr[row_s]
+    count_s = indptr[row_s + 1] - start_s
+    offset_s = np.cumsum(count_s) - count_s
+
+    return (np.repeat(start_s - offset_s, count_s)
+            + np.arange(int(count_s.sum())))
+
+
+def _multiply_sparse(
+        relations: SparseRelations,
+        mat_s: np.ndarray
+        ) -> np.ndarray:
+    """\
+    Product of the relation matrix (missing pairs and diagonal are zero)
+    with mat_s, i.e. sum of r_ij times row j of mat_s over the known
+    partners j of each object i.
+
+    :return:
+        np.ndarray (float32, shape: mat_s.shape)
+    """
+    indptr, indices, values = relations[1:]
+    mat32_s = mat_s.astype(np.float32)
+    product_s = np.zeros(mat32_s.shape, dtype=np.float32)
+    for rows in _iterate_entry_blocks(indptr):
+        start, stop = indptr[rows.start], indptr[rows.stop]
+        # Rows without partners: zero
+        # (reduceat does NOT sum empty segments).
+        is_filled = np.diff(indptr[rows.start:rows.stop + 1]) > 0
+        product_s[rows][is_filled] = np.add.reduceat(
+            values[start:stop, None] * mat32_s[indices[start:stop]],
+            indptr[rows.start:rows.stop][is_filled] - start, axis=0)
+
+    return product_s
+
+
+def get_sparse_components(
+        relations: SparseRelations
+        ) -> np.ndarray:
+    """\
+    Find the connected components of the known pairs
+    (breadth-first search, each entry is visited once).
+
+    :param relations:
+        SparseRelations, see pairs_to_sparse
+
+    :return:
+        np.ndarray (int64, shape: (n,)):
+        smallest index of the component of each object
+    """
+    label_s = np.full(relations.n, -1, dtype=np.int64)
+    for start in range(relations.n):
+        if label_s[start] >= 0:
+            continue
+        label_s[start] = start
+        frontier_s = np.array([start])
+        while len(frontier_s):
+            partner_s = relations.indices[_get_entries(relations.indptr,
+                                                       frontier_s)]
+            frontier_s = np.unique(partner_s[label_s[partner_s] < 0])
+            label_s[frontier_s] = start
+
+    return label_s
+
+
+def check_sparse_connectivity(
+        relations: SparseRelations,
+        dim: int
+        ):
+    """\
+    Sanity check (see check_connectivity).
+
+    :param relations:
+        SparseRelations, see pairs_to_sparse
+
+    :param dim:
+        int (positive)
+
+    :raise ValueError:
+        - if an object has less than dim connections.
+        - if the objects fall apart into loose groups.
+    """
+    _check_connectivity(np.diff(relations.indptr),
+                        get_sparse_components(relations),
+                        dim)
+
+
+def initialise_sparse_vectors(
+        relations: SparseRelations,
+        dim: int,
+        iteration_count: int = 20,
+        seed: int = 0
+        ) -> np.ndarray:
+    """\
+    Leading eigenvectors of the relation matrix (see initialise_vectors).
+
+    :param relations:
+        SparseRelations, see pairs_to_sparse
+
+    :return:
+        np.ndarray (float64, shape: (n, dim))
+    """
+    return _initialise(lambda basis: _multiply_sparse(relations, basis),
+                       relations.n, dim, iteration_count, seed)
+
+
+def get_sparse_residual(
+        relations: SparseRelations,
+        vec_s: np.ndarray
+        ) -> float:
+    """\
+    Sum of the squared residuals of all known pairs i<j.
+
+    :param relations:
+        SparseRelations, see pairs_to_sparse
+
+    :param vec_s:
+        np.ndarray (shape: (n, dim))
+
+    :return:
+        float
+    """
+    indptr, indices, values = relations[1:]
+    vec32_s = vec_s.astype(np.float32)
+
+    residual = 0.0
+    for rows in _iterate_entry_blocks(indptr):
+        start, stop = indptr[rows.start], indptr[rows.stop]
+        row_s = np.repeat(np.arange(rows.start, rows.stop),
+                          np.diff(indptr[rows.start:rows.stop + 1]))
+        diff_s = values[start:stop] - np.einsum(
+            'ij,ij->i', vec32_s[row_s], vec32_s[indices[start:stop]])
+        residual += float(np.dot(diff_s, diff_s.astype(np.float64)))
+
+    # Each pair occurs twice.
+    return residual / 2
+
+
+def _solve_sparse_vectors(
+        relations: SparseRelations,
+        partner_vec_s: np.ndarray
+        ) -> np.ndarray:
+    """\
+    Least-squares solution of the vector of each row for fixed partner
+    vectors (the partners are gathered once per block, and the sums of
+    each row are calculated together).
+    """
+    n, dim = relations.n, partner_vec_s.shape[1]
+    indptr, indices, values = relations[1:]
+    partner_vec_s = np.asarray(partner_vec_s, dtype=np.float64)
+
+    lhs_s = np.zeros((n, dim * dim))
+    rhs_s = np.zeros((n, dim))
+    # (Blocks with as many products as SPARSE_BLOCK_SIZE * dim.)
+    for rows in _iterate_entry_blocks(indptr,
+                                      max(SPARSE_BLOCK_SIZE // dim, 1)):
+        start, stop = indptr[rows.start], indptr[rows.stop]
+        # Rows without partners: zero
+        # (reduceat does NOT sum empty segments).
+        is_filled = np.diff(indptr[rows.start:rows.stop + 1]) > 0
+        offset_s = indptr[rows.start:rows.stop][is_filled] - start
+        partner_s = partner_vec_s[indices[start:stop]]
+        # Sum of r_ij x_j of the known partners j of each object.
+        rhs_s[rows][is_filled] = np.add.reduceat(
+            values[start:stop, None] * partner_s, offset_s, axis=0)
+        # Sum of x_j x_j^T of the known partners j of each object.
+        lhs_s[rows][is_filled] = np.add.reduceat(
+            np.einsum('ij,ik->ijk', partner_s, partner_s)
+            .reshape(-1, dim * dim),
+            offset_s, axis=0)
+
+    return _solve_systems(lhs_s.reshape(n, dim, dim), rhs_s)
+
+
+def refine_sparse_vectors(
+        relations: SparseRelations,
+        vec_s: np.ndarray,
+        max_iteration_count: int = MAX_ITERATION_COUNT,
+        tolerance: float = TOLERANCE
+        ) -> Tuple[np.ndarray, float, int]:
+    """\
+    Alternating least squares (see refine_vectors).
+
+    :param relations:
+        SparseRelations, see pairs_to_sparse
+
+    :return:
+        Tuple:
+        - np.ndarray (float64, shape: (n, dim))
+        - float: residual (see get_sparse_residual)
+        - int: number of iterations
+    """
+    return _refine(lambda vec_s: _solve_sparse_vectors(relations, vec_s),
+                   lambda vec_s: get_sparse_residual(relations, vec_s),
+                   vec_s, max_iteration_count, tolerance)
+
+
+def cc_analysis_sparse(
+        relations: SparseRelations,
+        dim: int,
+        max_iteration_count: int = MAX_ITERATION_COUNT,
+        tolerance: float = TOLERANCE
+        ) -> Tuple[np.ndarray, float, int]:
+    """\
+    Same as cc_analysis, but for sparse relations, i.e. memory and time
+    per iteration O(number of known pairs) instead of O(n*n).
+
+    :param relations:
+        SparseRelations, see pairs_to_sparse (or condensed_to_sparse)
+
+    :param dim:
+        int (positive)
+
+    :param max_iteration_count:
+        int
+
+    :param tolerance:
+        float
+
+    :raise ValueError:
+        see check_sparse_connectivity
+
+    :return:
+        Tuple (see cc_analysis)
+    """
+    if dim < 1:
+        raise ValueError(f'Faulty dim:\n'
+                         f'{dim}')
+
+    check_sparse_connectivity(relations, dim)
+
+    vec_s = initialise_sparse_vectors(relations, dim)
+    vec_s, residual, iteration_count = refine_sparse_vectors(
+        relations, vec_s, max_iteration_count, tolerance)
+
+    return rotate_to_principal_axes(vec_s), residual, iteration_count
+
+
+# ---------------------------------------------------------------------|------|
+# Projection.
+
+
+def project_vectors(
+        ref_vec_s: np.ndarray,
+        new_count: int,
+        idx_new_s: np.ndarray,
+        idx_ref_s: np.ndarray,
+        value_s: np.ndarray
+        ) -> Tuple[np.ndarray, float]:
+    """\
+    Place new objects into the frame of existing vectors (out-of-sample
+    projection): the vector of each new object is the least-squares
+    solution for its relations to the fixed reference vectors, i.e. time
+    O(known pairs * dim*dim) and the reference vectors are NOT changed.
+
+    :param ref_vec_s:
+        np.ndarray (shape: (n_ref, dim)), e.g. from parse_vec_ssv
+
+    :param new_count:
+        int
+
+        Number of new objects.
+
+    :param idx_new_s:
+        np.ndarray (int): index of the new object (0 to new_count-1)
+
+    :param idx_ref_s:
+        np.ndarray (int): index of the reference (0 to n_ref-1)
+
+    :param value_s:
+        np.ndarray (float): relation
+
+        (Pairs among new objects or among references are NOT needed;
+         repeated pairs: the last one counts.)
+
+    :raise ValueError:
+        - if an index is out of range.
+        - if a new object has less than dim references.
+
+    :return:
+        Tuple:
+        - np.ndarray (float64, shape: (new_count, dim))
+        - float: sum of the squared residuals of all pairs
+    """
+    ref_count, dim = ref_vec_s.shape
+    idx_new_s = np.asarray(idx_new_s, dtype=np.int64)
+    idx_ref_s = np.asarray(idx_ref_s, dtype=np.int64)
+    if len(idx_new_s) and (min(idx_new_s.min(), idx_ref_s.min()) < 0
+                           or idx_new_s.max() >= new_count
+                           or idx_ref_s.max() >= ref_count):
+        raise ValueError(f'Faulty indices of objects:\n'
+                         f'not within {new_count} new objects and '
+                         f'{ref_count} references')
+
+    relations = _to_rows(new_count, ref_count, idx_new_s, idx_ref_s,
+                         value_s)
+
+    count_s = np.diff(relations.indptr)
+    loose_idx_s = np.flatnonzero(count_s < dim)
+    if len(loose_idx_s):
+        raise ValueError(f'Faulty connectivity:\n'
+                         f'{len(loose_idx_s)} new objects with less than '
+                         f'{dim} references, e.g. index {loose_idx_s[0]}')
+
+    vec_s = _solve_sparse_vectors(relations, ref_vec_s)
+
+    diff_s = relations.values - np.einsum(
+        'ij,ij->i', np.repeat(vec_s, count_s, axis=0),
+        ref_vec_s[relations.indices])
+
+    return vec_s, float(np.dot(diff_s, diff_s))
+
+
+# ---------------------------------------------------------------------|------|
+# Output.
+
+
+def get_lengths_and_angles(
+        vec_s: np.ndarray
+        ) -> Tuple[np.ndarray, np.ndarray]:
+    """\
+    Hyperspherical coordinates of the vectors.
+
+    :param vec_s:
+        np.ndarray (shape: (n, dim))
+
+    :return:
+        Tuple:
+        - np.ndarray (shape: (n,)): length of each vector
+        - np.ndarray (shape: (n, dim-1)): angles in degrees
+          (angle k: between coordinate k and coordinates k+1, ..., dim)
+    """
+    # Length of the coordinates k, ..., dim.
+    tail_length_s = np.sqrt(np.cumsum(vec_s[:, ::-1] ** 2, axis=1))[:, ::-1]
+    angle_s = np.degrees(np.arctan2(tail_length_s[:, 1:], vec_s[:, :-1]))
+
+    # Last angle: full circle.
+    if vec_s.shape[1] > 1:
+        angle_s[:, -1] = np.degrees(np.arctan2(vec_s[:, -1], vec_s[:, -2]))
+
+    return tail_length_s[:, 0], angle_s
+
+
+def parse_vec_ssv(
+        f: TextIO
+        ) -> Tuple[np.ndarray, np.ndarray]:
+    """\
+    Parse vectors in ssv-format (see write_vec_ssv, e.g. vec.ssv of a
+    previous job).
+
+    :param f:
+        TextIO
+
+    :return:
+        Tuple:
+        - np.ndarray (int64, shape: (n,)): numbers
+        - np.ndarray (float64, shape: (n, dim)): vectors
+    """
+    row_s = [line.split() for line in f if line.strip()]
+    if not row_s:
+        return np.empty(0, dtype=np.int64), np.empty((0, 0))
+
+    # number, dim coordinates, length, dim-1 angles.
+    dim = (len(row_s[0]) - 1) // 2
+    if any(len(row) != 2 * dim + 1 for row in row_s) or dim < 1:
+        raise ValueError(f'Faulty ssv-format of vectors:\n'
+                         f'{" ".join(row_s[0])}')
+
+    num_s = np.array([int(row[0]) for row in row_s], dtype=np.int64)
+    vec_s = np.array([row[1:1 + dim] for row in row_s], dtype=np.float64)
+
+    return num_s, vec_s
+
+
+def write_vec_ssv(
+        f: TextIO,
+        vec_s: np.ndarray,
+        num_s: Optional[np.ndarray] = None
+        ):
+    """\
+    Write the vectors in ssv-format (same layout as the cc_analysis
+    binary).
+
+    each line:
+    ssv-elements of a single object:
+    - number
+    - dim coordinates
+    - length
+    - dim-1 angles
+
+    :param f:
+        TextIO
+
+    :param vec_s:
+        np.ndarray (shape: (n, dim))
+
+    :param num_s:
+        np.ndarray (int) or None
+
+        (default: None, i.e. numbered from 1 to n)
+    """
+    if num_s is None:
+        num_s = np.arange(1, len(vec_s) + 1)
+
+    length_s, angle_s = get_lengths_and_angles(vec_s)
+    for num, vec, length, angles in zip(num_s.tolist(), vec_s, length_s,
+                                        angle_s):
+        f.write(' '.join([str(num)]
+                         + [f'{value:.6f}' for value in vec]
+                         + [f'{length:.6f}']
+                         + [f'{value:.6f}' for value in angles])
+                + '\n')
@@ -11,7 +11,7 @@ FASTA-entry:
         >= 1 line
 """
 
-from typing import Generator, TextIO, Tuple
+from typing import Generator, List, Sequence, TextIO, Tuple
 
 from src.modules.utils import is_ascii
 
@@ -262,3 +262,72 @@ def iterate_fasta(
 
         # Yield last FASTA-entry.
         yield (header, body)
+
+
+def iterate_fasta_pairs(
+        opened_infile: TextIO,
+        **kwargs
+        ) -> Generator[Tuple[Tuple[str, str], Tuple[str, str]], None, None]:
+    """\
+    Iterate over consecutive pairs of FASTA-entries of FASTA-file,
+    e.g. pairwise alignments (entry 1 and 2, entry 3 and 4, ...).
+
+    Lazy:
+    Only the current pair of FASTA-entries is kept in memory.
+
+    Throw ValueError, if the file does NOT have FASTA-format.
+
+    Special case:
+    If the file contains an odd number of FASTA-entries, the last
+    FASTA-entry (without partner) is ignored.
+
+    :param opened_infile:
+        TextIO
+
+    :param kwargs:
+        (see iterate_fasta)
+
+    :yield:
+        Tuple: pair of FASTA-entries
+        - Tuple: FASTA-entry A
+            - str: header
+            - str: body (without '\n')
+        - Tuple: FASTA-entry B
+            - str: header
+            - str: body (without '\n')
+    """
+    # Get FASTA-entries from infile.
+    entry_s = iterate_fasta(opened_infile, **kwargs)
+
+    # Take 2 FASTA-entries at a time.
+    for entry_a in entry_s:
+        entry_b = next(entry_s, None)
+
+        # Special case:
+        # The last FASTA-entry does NOT have a partner.
+        if entry_b is None:
+            return
+
+        yield entry_a, entry_b
+
+
+def map_unique_bodies(
+        body_s: Sequence[str]
+        ) -> Tuple[List[str], List[int]]:
+    """\
+    Map each FASTA-body to its unique FASTA-body.
+
+    :param body_s:
+        Sequence of str: FASTA-bodies (may be redundant)
+
+    :return:
+        Tuple:
+        - List of str: unique FASTA-bodies (in the order of their 1st
+          occurrence)
+        - List of int: index of the unique FASTA-body of each FASTA-body
+    """
+    body_to_idx = {}
+    body_idx_s = [body_to_idx.setdefault(body, len(body_to_idx))
+                  for body in body_s]
+
+    return list(body_to_idx), body_idx_s
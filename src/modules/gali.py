@@ -2,18 +2,28 @@
 Handle global sequence alignments.
 """
 
-import sys
-from typing import Tuple, Union
+from typing import Sequence, Tuple, Union
 
+import numpy as np
 import pandas as pd
 
 from src.modules.ali import get_ali_length
 from src.modules.ali import ali_to_indelfree_ali
+from src.modules.substmat import GAP_CHAR
+from src.modules.substmat import UNKNOWN_CODE
+from src.modules.substmat import CompiledSubstmat
+from src.modules.substmat import as_compiled_substmat
+from src.modules.substmat import encode_seq
+
+
+# Maximum number of (padded) alignment-positions that are quantified
+# together (see quantify_batch).
+BATCH_POSITION_COUNT = 1 << 20
 
 
 def gali_to_score(
         gali: Tuple[str, str],
-        substmat: pd.DataFrame,
+        substmat: Union[pd.DataFrame, CompiledSubstmat],
         gapopen_penalty: float = 10.0,
         gapextend_penalty: float = 0.5
         ) -> float:
@@ -47,6 +57,14 @@ def gali_to_score(
              ...,
              [rowN_col1, rowN_col2, ..., rowN_colN]]
 
+        - or -
+
+        CompiledSubstmat
+
+        Substitution matrix compiled for table-lookups
+        (see src.modules.substmat.compile_substmat).
+        Preferable, if the function is called repeatedly.
+
     :param gapopen_penalty:
         float (positive)
 
@@ -62,80 +80,98 @@ def gali_to_score(
     :return:
         float
     """
+    # Compile substitution matrix (if necessary).
+    substmat = as_compiled_substmat(substmat)
+
     # Unpack the 2 sequences of the input alignment.
     seq_a, seq_b = gali
 
-    # Initialise result.
-    total_score = 0.0
-
-    # Initialise states.
-    #
-    # If the element in the sequence happens to be a gap:
-    # is it an opening (or an extending) gap?
-    gap_a_is_opening_gap = True
-    gap_b_is_opening_gap = True
+    # Sanity check: fail.
+    # The 2 aligned sequences do NOT have the same length.
+    get_ali_length(gali)
 
-    # For each aligned pair.
-    for el_a, el_b in zip(seq_a, seq_b):
+    # Encode the 2 sequences as residue-codes.
+    codes_a = encode_seq(seq_a, substmat)
+    codes_b = encode_seq(seq_b, substmat)
 
-        # If it is a gap-gap-pair.
-        if el_a == '-' and el_b == '-':
+    # Classify each aligned pair.
+    #
+    # Gap-gap-pairs are ignored, i.e. they belong to none of the
+    # following classes.
+    is_gap_a = codes_a == substmat.gap_code
+    is_gap_b = codes_b == substmat.gap_code
+    # Residue-residue-pairs.
+    is_res_res = ~is_gap_a & ~is_gap_b
+    # Sequence A has a gap (and sequence B does NOT).
+    is_gap_res = is_gap_a & ~is_gap_b
+    # Sequence B has a gap (and sequence A does NOT).
+    is_res_gap = ~is_gap_a & is_gap_b
+
+    # Residue-residue-pairs:
+    # Refer to substitution matrix.
+    total_score = float(
+        substmat.scores[codes_a[is_res_res], codes_b[is_res_res]].sum())
+
+    # Gaps:
+    # Apply gapopen-penalty to opening gaps and gapextend-penalty to
+    # extending gaps.
+    for is_gap in [is_gap_res, is_res_gap]:
+        open_count = _count_opening_gaps(is_gap, is_res_res)
+        extend_count = int(is_gap.sum()) - open_count
+        total_score -= open_count * gapopen_penalty
+        total_score -= extend_count * gapextend_penalty
 
-            # Ignore the current position.
-            position_score = 0
+    # Return final result.
+    return total_score
 
-        # If sequence A has a gap
-        # (and sequence B does NOT).
-        elif el_a == '-':
 
-            # If it is an opening gap.
-            if gap_a_is_opening_gap:
-                # Apply gapopen-penalty.
-                position_score = -1 * gapopen_penalty
-                # Toggle state for potential following gaps.
-                gap_a_is_opening_gap = False
+def _count_opening_gaps(
+        is_gap: np.ndarray,
+        is_res_res: np.ndarray
+        ) -> int:
+    """\
+    Count the opening gaps of one sequence of an alignment.
 
-            # If it is an extending gap.
-            else:
-                # Apply gapextend-penalty.
-                position_score = -1 * gapextend_penalty
+    A gap is an opening gap, if there is no other gap of the same
+    sequence since the last residue-residue-pair (or since the start of
+    the alignment).
 
-        # If sequence B has a gap
-        # (and sequence A does NOT).
-        elif el_b == '-':
+    :param is_gap:
+        np.ndarray (bool)
 
-            # If it is an opening gap.
-            if gap_b_is_opening_gap:
-                # Apply gapopen-penalty.
-                position_score = -1 * gapopen_penalty
-                # Toggle state for potential following gaps.
-                gap_b_is_opening_gap = False
+        Positions where the sequence has a gap (and the other sequence
+        does NOT).
 
-            # If it is an extending gap.
-            else:
-                # Apply gapextend-penalty.
-                position_score = -1 * gapextend_penalty
+    :param is_res_res:
+        np.ndarray (bool)
 
-        # If it is a residue-residue-pair.
-        else:
+        Positions of the residue-residue-pairs.
 
-            # Refer to substitution matrix.
-            position_score = substmat.at[el_a, el_b]
+    :return:
+        int
+    """
+    # Position-indices.
+    idx_s = np.arange(len(is_gap))
 
-            # Reset states for potential following gaps.
-            gap_a_is_opening_gap = True
-            gap_b_is_opening_gap = True
+    # For each position:
+    # index of the last residue-residue-pair at or before it (or -1).
+    last_res_res_idx_s = np.maximum.accumulate(
+        np.where(is_res_res, idx_s, -1))
+    # For each position:
+    # index of the last gap strictly before it (or -1).
+    last_gap_idx_s = np.maximum.accumulate(
+        np.where(is_gap, idx_s, -1))
+    prev_gap_idx_s = np.concatenate([[-1], last_gap_idx_s[:-1]])
 
-        # Update result.
-        total_score += position_score
+    # Opening gaps.
+    is_opening_gap = is_gap & (prev_gap_idx_s <= last_res_res_idx_s)
 
-    # Return final result.
-    return total_score
+    return int(is_opening_gap.sum())
 
 
 def indelfree_gali_to_max_score(
         gali: Tuple[str, str],
-        substmat: pd.DataFrame
+        substmat: Union[pd.DataFrame, CompiledSubstmat]
         ) -> float:
     """\
     Calculate the maximum score for the input indel-free global
@@ -171,9 +207,20 @@ def indelfree_gali_to_max_score(
              ...,
              [rowN_col1, rowN_col2, ..., rowN_colN]]
 
+        - or -
+
+        CompiledSubstmat
+
+        Substitution matrix compiled for table-lookups
+        (see src.modules.substmat.compile_substmat).
+        Preferable, if the function is called repeatedly.
+
     :return:
         float
     """
+    # Compile substitution matrix (if necessary).
+    substmat = as_compiled_substmat(substmat)
+
     # Unpack the 2 sequences of the input alignment.
     seq_a, seq_b = gali
 
@@ -191,7 +238,7 @@ def indelfree_gali_to_max_score(
 
 def indelfree_gali_to_mean_score(
         gali: Tuple[str, str],
-        substmat: pd.DataFrame
+        substmat: Union[pd.DataFrame, CompiledSubstmat]
         ) -> float:
     """\
     Calculate the mean score for the input indel-free global alignment.
@@ -226,6 +273,14 @@ def indelfree_gali_to_mean_score(
              ...,
              [rowN_col1, rowN_col2, ..., rowN_colN]]
 
+        - or -
+
+        CompiledSubstmat
+
+        Substitution matrix compiled for table-lookups
+        (see src.modules.substmat.compile_substmat).
+        Preferable, if the function is called repeatedly.
+
     :return:
         float
     """
@@ -250,26 +305,18 @@ def indelfree_gali_to_mean_score(
     # For each of the 2 aligned sequences:
     # Count absolute frequency for all residues.
 
-    # Initialise memory.
-    # - key: residue
-    # - value: count.
-    seq_a_res_to_count = {}
-    seq_b_res_to_count = {}
-
-    # For each of the 2 aligned sequences.
-    for seq, res_to_count in zip([seq_a, seq_b],
-                                 [seq_a_res_to_count, seq_b_res_to_count]):
+    # Compile substitution matrix (if necessary).
+    substmat = as_compiled_substmat(substmat)
 
-        # For each sequence-position.
-        for res in seq:
+    # Number of residue-codes (including the gap-code).
+    code_count = len(substmat.scores)
 
-            # If this residue is new to the memory.
-            if res not in res_to_count:
-                # Initialise new entry for residue.
-                res_to_count[res] = 0
-
-            # Update memory.
-            res_to_count[res] += 1
+    # Compositions:
+    # index: residue-code, value: count.
+    seq_a_composition = np.bincount(encode_seq(seq_a, substmat),
+                                    minlength=code_count)
+    seq_b_composition = np.bincount(encode_seq(seq_b, substmat),
+                                    minlength=code_count)
 
     # -----------------------------------------------------------------|------|
     # Calculate mean score.
@@ -279,19 +326,10 @@ def indelfree_gali_to_mean_score(
     # mean_score = ----------------------------------------------
     #                             gali_length
 
-    # For all combinations of residue-pairs.
-    for res_a in seq_a_res_to_count.keys():
-        for res_b in seq_b_res_to_count.keys():
-
-            # Get absolute frequency for the residues in the pair.
-            count_a = seq_a_res_to_count[res_a]
-            count_b = seq_b_res_to_count[res_b]
-
-            # Get substitution-score for pair.
-            score_ab = substmat.at[res_a, res_b]
-
-            # Sum over all combinations of residue-pairs.
-            mean_score += count_a * count_b * score_ab
+    # Sum over all combinations of residue-pairs.
+    mean_score = int(seq_a_composition
+                     @ substmat.scores
+                     @ seq_b_composition)
 
     # Final mean score.
     mean_score /= gali_length
@@ -302,7 +340,7 @@ def indelfree_gali_to_mean_score(
 
 def dense_gali_to_quantifier(
         gali: Tuple[str, str],
-        substmat: pd.DataFrame,
+        substmat: Union[pd.DataFrame, CompiledSubstmat],
         gapopen_penalty: float = 10.0,
         gapextend_penalty: float = 0.5
         ) -> Union[float, None]:
@@ -340,6 +378,14 @@ def dense_gali_to_quantifier(
              ...,
              [rowN_col1, rowN_col2, ..., rowN_colN]]
 
+        - or -
+
+        CompiledSubstmat
+
+        Substitution matrix compiled for table-lookups
+        (see src.modules.substmat.compile_substmat).
+        Preferable, if the function is called repeatedly.
+
     :param gapopen_penalty:
         float (positive)
 
@@ -363,6 +409,10 @@ def dense_gali_to_quantifier(
     # -----------------------------------------------------------------|------|
     # Preparations.
 
+    # Compile substitution matrix (if necessary),
+    # only once for all of the following steps.
+    substmat = as_compiled_substmat(substmat)
+
     # Unpack the 2 sequences of the input alignment.
     seq_a, seq_b = gali
 
@@ -428,3 +478,366 @@ def dense_gali_to_quantifier(
 
     # Return result.
     return quantifier
+
+
+def encoded_gali_to_quantifier(
+        encoded_gali: Tuple[np.ndarray, np.ndarray],
+        substmat: CompiledSubstmat
+        ) -> Union[float, None]:
+    """\
+    Quantify the quality of the input encoded global alignment.
+
+    Same result as dense_gali_to_quantifier, but the alignment is only
+    traversed once:
+    The score and the residue-compositions of the indel-free alignment
+    are gathered in a single pass, the self-alignment-scores and the
+    mean score are then derived from the compositions.
+
+    The gap-penalties are NOT needed, because the indel-free alignment
+    does NOT contain gaps.
+
+    :param encoded_gali:
+        Tuple: alignment
+        - np.ndarray: residue-codes of sequence A
+        - np.ndarray: residue-codes of sequence B
+
+        (see src.modules.substmat.encode_seq)
+
+        The alignment may contain gaps.
+        The alignment may contain gap-gap-pairs.
+
+    :param substmat:
+        CompiledSubstmat
+
+    :return:
+        float
+
+        - or -
+
+        None: Signal that quantifier can NOT be calculated
+              (when max_score == mean_score).
+    """
+    # -----------------------------------------------------------------|------|
+    # Preparations.
+
+    # Unpack the 2 sequences of the input alignment.
+    codes_a, codes_b = encoded_gali
+
+    # Sanity check: fail.
+    # The 2 aligned sequences do NOT have the same length.
+    if len(codes_a) != len(codes_b):
+        raise ValueError(
+            f'Faulty alignment:\n'
+            f'  The 2 aligned sequences do NOT have the same length.')
+
+    # Residue-positions of each sequence.
+    is_res_a = codes_a != substmat.gap_code
+    is_res_b = codes_b != substmat.gap_code
+
+    # -----------------------------------------------------------------|------|
+    # Single pass over the indel-free alignment.
+
+    # Residue-residue-pairs.
+    is_res_res = is_res_a & is_res_b
+    indelfree_codes_a = codes_a[is_res_res]
+    indelfree_codes_b = codes_b[is_res_res]
+
+    # Get length of the indel-free alignment.
+    indelfree_gali_length = len(indelfree_codes_a)
+
+    # Get score.
+    score = float(substmat.scores[indelfree_codes_a,
+                                  indelfree_codes_b].sum())
+
+    # Get compositions:
+    # index: residue-code, value: count.
+    code_count = len(substmat.scores)
+    composition_a = np.bincount(indelfree_codes_a, minlength=code_count)
+    composition_b = np.bincount(indelfree_codes_b, minlength=code_count)
+
+    # -----------------------------------------------------------------|------|
+    # Derive the remaining scores from the compositions.
+
+    # Get max-score:
+    # lower score of the 2 self-alignments.
+    self_score_s = np.diagonal(substmat.scores)
+    max_score = float(min(composition_a @ self_score_s,
+                          composition_b @ self_score_s))
+
+    # Get mean-score.
+    # (Trivial case: the indel-free alignment is empty.)
+    mean_score = 0.0
+    if indelfree_gali_length != 0:
+        mean_score = (int(composition_a @ substmat.scores @ composition_b)
+                      / indelfree_gali_length)
+
+    # Special case:
+    #
+    # The quantifier can NOT be calculated,
+    # because the denominator would be zero for the quantifier of the
+    # indel-free alignment.
+    if max_score == mean_score:
+        # Signal that quantifier can NOT be calculated.
+        return None
+
+    # Do feature scaling.
+    indelfree_quanitfier = (score - mean_score) / (max_score - mean_score)
+
+    # -----------------------------------------------------------------|------|
+    # Determine coverage of indel-free alignment in relation to the
+    # input alignment.
+
+    # Get residue-count for longer sequence of the input alignment.
+    gali_longseq_length = max(int(is_res_a.sum()),
+                              int(is_res_b.sum()))
+
+    # Calculate coverage.
+    coverage = indelfree_gali_length / gali_longseq_length
+
+    # Adjust quantifier.
+    quantifier = indelfree_quanitfier * coverage
+
+    # Return result.
+    return quantifier
+
+
+def encode_gali_batch(
+        gali_s: Sequence[Tuple[str, str]],
+        substmat: CompiledSubstmat
+        ) -> Tuple[np.ndarray, np.ndarray]:
+    """\
+    Encode the input global alignments as padded matrices of
+    residue-codes.
+
+    Each alignment occupies one row of the 2 matrices.  Shorter
+    alignments are padded with gap-gap-pairs, which do NOT influence any
+    score.
+
+    Throw ValueError, if an alignment is NOT valid or contains
+    characters that are NOT part of the substitution matrix.
+
+    :param gali_s:
+        Sequence of Tuple: alignment
+        - str: sequence A
+        - str: sequence B
+
+        The alignments may contain gaps.
+        The alignments may contain gap-gap-pairs.
+
+    :param substmat:
+        CompiledSubstmat
+
+    :return:
+        Tuple:
+        - np.ndarray (uint8, shape: (len(gali_s), max_length)):
+            residue-codes of all sequences A
+        - np.ndarray (uint8, shape: (len(gali_s), max_length)):
+            residue-codes of all sequences B
+    """
+    # Length of the longest alignment.
+    max_length = max([len(seq_a) for seq_a, _ in gali_s], default=0)
+
+    # Padding-character.
+    pad = GAP_CHAR.encode('ascii')
+
+    # Do the same for sequences A and sequences B.
+    codes_s = []
+    for seq_s in zip(*gali_s) if gali_s else [(), ()]:
+
+        # Join all padded sequences in a single buffer.
+        try:
+            buffer = b''.join([seq.encode('ascii').ljust(max_length, pad)
+                               for seq in seq_s])
+        # Sanity check: fail.
+        # NON-ASCII-characters can NOT be encoded.
+        except UnicodeEncodeError:
+            raise ValueError(
+                f'Faulty alignments:\n'
+                f'  The alignments contain NON-ASCII-characters.')
+
+        # Look up residue-code of each character.
+        codes = substmat.code_table[np.frombuffer(buffer, dtype=np.uint8)]
+        codes_s.append(codes.reshape(len(gali_s), max_length))
+
+    codes_a, codes_b = codes_s
+
+    # Sanity check: fail.
+    # The 2 aligned sequences do NOT have the same length.
+    for seq_a, seq_b in gali_s:
+        if len(seq_a) != len(seq_b):
+            raise ValueError(
+                f'Faulty alignment:\n'
+                f'  seq_a: {seq_a}\n'
+                f'  seq_b: {seq_b}\n'
+                f'  The 2 aligned sequences do NOT have the same length.')
+
+    # Sanity check: fail.
+    # Characters that are NOT part of the substitution matrix.
+    if (codes_a == UNKNOWN_CODE).any() or (codes_b == UNKNOWN_CODE).any():
+        raise ValueError(
+            f'Faulty alignments:\n'
+            f'  The alignments contain residues that are NOT part of the '
+            f'substitution matrix.')
+
+    return codes_a, codes_b
+
+
+def quantify_batch(
+        gali_s: Sequence[Tuple[str, str]],
+        substmat: Union[pd.DataFrame, CompiledSubstmat],
+        position_count: int = BATCH_POSITION_COUNT
+        ) -> np.ndarray:
+    """\
+    Quantify the quality of many global alignments at once.
+
+    Same results as dense_gali_to_quantifier (and
+    encoded_gali_to_quantifier) for each alignment, but the alignments
+    are processed together with vectorised operations.
+
+    The alignments are sorted by length and split into sub-batches of
+    similar length with at most position_count padded positions, i.e.
+    a few long alignments do NOT inflate the padding (and the memory)
+    of all the others.
+
+    :param gali_s:
+        Sequence of Tuple: alignment
+        - str: sequence A
+        - str: sequence B
+
+        The alignments may contain gaps.
+        The alignments may contain gap-gap-pairs.
+
+    :param substmat:
+        pd.DataFrame (as returned by parse_substmat_as_df)
+
+        - or -
+
+        CompiledSubstmat
+
+    :param position_count:
+        int
+
+        Maximum number of padded positions per sub-batch
+        (a longer alignment is quantified alone).
+
+    :return:
+        np.ndarray (float64, shape: (len(gali_s),))
+
+        Quantifier of each alignment.
+        NaN signals that the quantifier can NOT be calculated
+        (when max_score == mean_score).
+    """
+    # Compile substitution matrix (if necessary).
+    substmat = as_compiled_substmat(substmat)
+
+    # Sort by length (stable).
+    length_s = np.array([len(seq_a) for seq_a, _ in gali_s], dtype=np.int64)
+    order_s = np.argsort(length_s, kind='stable')
+
+    quantifier_s = np.full(len(gali_s), np.nan)
+    start = 0
+    while start < len(order_s):
+
+        # Extend the sub-batch, while its padded size fits.
+        # (Sorted, i.e. the last alignment is the longest.)
+        end = start + 1
+        while (end < len(order_s)
+               and (end + 1 - start) * length_s[order_s[end]]
+               <= position_count):
+            end += 1
+
+        idx_s = order_s[start:end]
+        quantifier_s[idx_s] = _quantify_padded_batch(
+            [gali_s[idx] for idx in idx_s.tolist()], substmat)
+        start = end
+
+    return quantifier_s
+
+
+def _quantify_padded_batch(
+        gali_s: Sequence[Tuple[str, str]],
+        substmat: CompiledSubstmat
+        ) -> np.ndarray:
+    """\
+    Quantify the alignments together in padded matrices
+    (see quantify_batch).
+    """
+    # -----------------------------------------------------------------|------|
+    # Preparations.
+
+    # Pack all alignments into padded matrices.
+    codes_a, codes_b = encode_gali_batch(gali_s, substmat)
+    gali_count, max_length = codes_a.shape
+
+    # Residue-positions of each sequence.
+    is_res_a = codes_a != substmat.gap_code
+    is_res_b = codes_b != substmat.gap_code
+    # Residue-residue-pairs.
+    is_res_res = is_res_a & is_res_b
+
+    # -----------------------------------------------------------------|------|
+    # Indel-free alignments.
+
+    # Get lengths.
+    indelfree_gali_length_s = is_res_res.sum(axis=1)
+
+    # Get scores.
+    # (Positions with a gap score zero in the compiled substitution
+    #  matrix, i.e. they do NOT have to be masked.)
+    score_s = substmat.scores[codes_a, codes_b].sum(axis=1).astype(float)
+
+    # Get compositions:
+    # row: alignment, column: residue-code, value: count.
+    code_count = len(substmat.scores)
+    row_offset_s = (np.arange(gali_count) * code_count)[:, np.newaxis]
+    composition_s = []
+    for codes in [codes_a, codes_b]:
+        # Only count the residues of the indel-free alignment.
+        indelfree_codes = np.where(is_res_res, codes, substmat.gap_code)
+        composition = np.bincount(
+            (row_offset_s + indelfree_codes).ravel(),
+            minlength=gali_count * code_count)
+        composition_s.append(composition.reshape(gali_count, code_count))
+    composition_a_s, composition_b_s = composition_s
+
+    # Get max-scores:
+    # lower score of the 2 self-alignments.
+    self_score_s = np.diagonal(substmat.scores)
+    max_score_s = np.minimum(composition_a_s @ self_score_s,
+                             composition_b_s @ self_score_s).astype(float)
+
+    # Get mean-scores.
+    # (Trivial case: the indel-free alignment is empty.)
+    mean_score_s = np.zeros(gali_count)
+    is_nonempty = indelfree_gali_length_s != 0
+    mean_score_s[is_nonempty] = (
+        ((composition_a_s @ substmat.scores) * composition_b_s).sum(axis=1)
+        [is_nonempty]
+        / indelfree_gali_length_s[is_nonempty])
+
+    # Special case:
+    #
+    # The quantifier can NOT be calculated,
+    # because the denominator would be zero for the quantifier of the
+    # indel-free alignment.
+    is_valid = max_score_s != mean_score_s
+
+    # Do feature scaling.
+    quantifier_s = np.full(gali_count, np.nan)
+    quantifier_s[is_valid] = (
+        (score_s[is_valid] - mean_score_s[is_valid])
+        / (max_score_s[is_valid] - mean_score_s[is_valid]))
+
+    # -----------------------------------------------------------------|------|
+    # Determine coverage of indel-free alignments in relation to the
+    # input alignments.
+
+    # Get residue-count for longer sequence of each input alignment.
+    gali_longseq_length_s = np.maximum(is_res_a.sum(axis=1),
+                                       is_res_b.sum(axis=1))
+
+    # Adjust quantifiers.
+    quantifier_s[is_valid] *= (indelfree_gali_length_s[is_valid]
+                               / gali_longseq_length_s[is_valid])
+
+    return quantifier_s
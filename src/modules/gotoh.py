@@ -0,0 +1,1646 @@
+"""\
+Calculate pairwise global alignments (Needleman-Wunsch with affine gap
+penalties, Gotoh).
+
+Native replacement for EMBOSS needleall: the scoring scheme matches the
+needleall-parameters -gapopen, -gapextend, -endweight, -endopen and
+-endextend, but the alignments are kept in memory, i.e. they can be
+quantified directly (see src.modules.quantify.PairwiseQuantifier)
+without a process per job and without parsing text-output.
+
+The dynamic programming matrices are filled row by row with vectorised
+operations:
+- substitutions and gaps in sequence B depend on the previous row only;
+- gaps in sequence A (within a row) are resolved with a prefix-maximum
+  (np.maximum.accumulate).
+All scores are integers (the penalties are scaled, see
+get_score_scale), i.e. the results do NOT depend on rounding.
+
+Near-identical pairs only need a band of diagonals and pairs below a
+score threshold do NOT need a traceback (see align_global_adaptive).
+"""
+
+import collections
+import multiprocessing
+from typing import Dict, Generator, Iterable, List, Sequence, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+from src.modules.gali import quantify_batch
+from src.modules.substmat import GAP_CHAR
+from src.modules.substmat import CompiledSubstmat
+from src.modules.substmat import as_compiled_substmat
+from src.modules.substmat import encode_seq
+
+
+# States of the dynamic programming.
+# - residue-residue-pair
+MATCH = 0
+# - sequence B has a gap (residue of sequence A, vertical step)
+GAP_B = 1
+# - sequence A has a gap (residue of sequence B, horizontal step)
+GAP_A = 2
+
+# Score of impossible states.
+# (Far below any real score, but far above the minimum of int64, i.e.
+#  adding scores does NOT overflow.)
+IMPOSSIBLE_SCORE = -(1 << 60)
+
+# Largest factor tried to turn the penalties into integers.
+MAX_SCORE_SCALE = 1000
+
+# Batched alignment (see align_global_batch):
+# - maximum number of pairs that are aligned together
+LANE_COUNT = 256
+# - maximum memory of their traceback (in bytes)
+TRACE_MEMORY = 1 << 26
+
+# Number of pairs per chunk of all-pairs alignment (see
+# iterate_all_pair_alignments).
+PAIR_CHUNK_SIZE = 4096
+
+# Adaptive alignment (see align_global_adaptive):
+# - margin of the 1st band around the diagonals of the 1st and the last
+#   cell
+BAND_MARGIN = 16
+# - paths of the computation
+PATH_FULL = 'full'
+PATH_BANDED = 'banded'
+PATH_REJECTED = 'rejected'
+
+
+def get_score_scale(
+        penalty_s: Sequence[float]
+        ) -> int:
+    """\
+    Get the smallest factor that turns all input penalties into
+    integers.
+
+    Throw ValueError, if there is no such factor up to MAX_SCORE_SCALE.
+
+    :param penalty_s:
+        Sequence of float
+
+        (e.g.: [10.0, 0.5] -> 2)
+
+    :return:
+        int
+    """
+    for scale in range(1, MAX_SCORE_SCALE + 1):
+        if all(abs(penalty * scale - round(penalty * scale)) < 1e-6
+               for penalty in penalty_s):
+            return scale
+
+    # Sanity check: fail.
+    # The penalties have too many decimals.
+    raise ValueError(
+        f'Faulty penalties:\n'
+        f'  {list(penalty_s)}\n'
+        f'  The penalties can NOT be scaled to integers (maximum factor: '
+        f'{MAX_SCORE_SCALE}).')
+
+
+def _get_integer_penalties(
+        gapopen_penalty: float,
+        gapextend_penalty: float,
+        endweight: bool,
+        endopen_penalty: float,
+        endextend_penalty: float
+        ) -> Tuple[int, int, int, int, int]:
+    """\
+    Scale the input penalties to integers (see get_score_scale).
+
+    :return:
+        Tuple:
+        - int: scale
+        - int: gapopen
+        - int: gapextend
+        - int: endopen (0, if NOT endweight)
+        - int: endextend (0, if NOT endweight)
+    """
+    # End gaps are free.
+    if not endweight:
+        endopen_penalty = endextend_penalty = 0.0
+
+    penalty_s = [gapopen_penalty, gapextend_penalty,
+                 endopen_penalty, endextend_penalty]
+    scale = get_score_scale(penalty_s)
+
+    return (scale,) + tuple(round(penalty * scale) for penalty in penalty_s)
+
+
+def _max_of_3(
+        score_0: np.ndarray,
+        score_1: np.ndarray,
+        score_2: np.ndarray
+        ) -> Tuple[np.ndarray, np.ndarray]:
+    """\
+    Element-wise maximum of 3 arrays and the index of the (1st) array
+    that contains it.
+
+    Same as np.stack(...).max(axis=0) and np.stack(...).argmax(axis=0),
+    but without the strided reductions.
+
+    :return:
+        Tuple:
+        - np.ndarray: maximum
+        - np.ndarray (uint8): index (0, 1 or 2)
+    """
+    max_s = np.maximum(score_0, score_1)
+    idx_s = (score_1 > score_0).view(np.uint8)
+    is_2 = score_2 > max_s
+    idx_s = np.where(is_2, np.uint8(2), idx_s)
+    np.maximum(max_s, score_2, out=max_s)
+    return max_s, idx_s
+
+
+def _traceback(
+        trace: np.ndarray,
+        state: int,
+        seq_a: str,
+        seq_b: str,
+        min_diagonal: Union[int, None] = None
+        ) -> Tuple[str, str]:
+    """\
+    Walk back from the last cell to the 1st cell.
+
+    :param trace:
+        np.ndarray (uint8, shape: (3, len(seq_a)+1, len(seq_b)+1) or
+        larger)
+
+        For each state and cell, the state of the previous cell.
+
+        - or -
+
+        np.ndarray (uint8, shape: (3, len(seq_a)+1, band width))
+
+        Same, but only for the cells of a band (see _fill_band).
+
+    :param state:
+        int
+
+        Best state of the last cell.
+
+    :param min_diagonal:
+        int
+
+        1st diagonal (j - i) of the band.
+        (None: the trace contains all cells.)
+
+    :return:
+        Tuple: alignment
+        - str: aligned sequence A
+        - str: aligned sequence B
+    """
+    ali_a = []
+    ali_b = []
+    i = len(seq_a)
+    j = len(seq_b)
+    while i > 0 or j > 0:
+        if min_diagonal is None:
+            prev_state = trace[state, i, j]
+        else:
+            prev_state = trace[state, i, j - i - min_diagonal]
+        if state == MATCH:
+            i -= 1
+            j -= 1
+            ali_a.append(seq_a[i])
+            ali_b.append(seq_b[j])
+        elif state == GAP_B:
+            i -= 1
+            ali_a.append(seq_a[i])
+            ali_b.append(GAP_CHAR)
+        else:
+            j -= 1
+            ali_a.append(GAP_CHAR)
+            ali_b.append(seq_b[j])
+        state = prev_state
+
+    return ''.join(reversed(ali_a)), ''.join(reversed(ali_b))
+
+
+def align_global(
+        seq_a: str,
+        seq_b: str,
+        substmat: Union[pd.DataFrame, CompiledSubstmat],
+        gapopen_penalty: float = 10.0,
+        gapextend_penalty: float = 0.5,
+        endweight: bool = False,
+        endopen_penalty: float = 10.0,
+        endextend_penalty: float = 0.5
+        ) -> Tuple[float, Tuple[str, str]]:
+    """\
+    Calculate an optimal global alignment of the 2 input sequences.
+
+    A gap of length k costs:
+      gapopen_penalty + (k-1) * gapextend_penalty
+    End gaps (before the first or after the last residue of a sequence)
+    cost:
+      endopen_penalty + (k-1) * endextend_penalty
+    if endweight, otherwise nothing (same as for needleall).
+
+    If there are several optimal alignments, the ties are broken
+    (walking from the end of the alignment) in the order:
+    residue-residue-pair, gap in sequence B, gap in sequence A.
+
+    :param seq_a:
+        str
+
+    :param seq_b:
+        str
+
+        The 2 sequences (gaps are ignored).
+
+    :param substmat:
+        pd.DataFrame (as returned by parse_substmat_as_df)
+
+        - or -
+
+        CompiledSubstmat
+
+    :param gapopen_penalty:
+        float (positive)
+
+        (default: 10.0,
+         same default as for needleall.)
+
+    :param gapextend_penalty:
+        float (positive)
+
+        (default: 0.5,
+         same default as for needleall.)
+
+    :param endweight:
+        bool
+
+        Apply end gap penalties.
+
+        (default: False,
+         same default as for needleall.)
+
+    :param endopen_penalty:
+        float (positive)
+
+        (default: 10.0,
+         same default as for needleall.)
+
+    :param endextend_penalty:
+        float (positive)
+
+        (default: 0.5,
+         same default as for needleall.)
+
+    :return:
+        Tuple:
+        - float: score of the alignment
+        - Tuple: alignment
+          - str: aligned sequence A
+          - str: aligned sequence B
+    """
+    # -----------------------------------------------------------------|------|
+    # Preparations.
+
+    # Compile substitution matrix (if necessary).
+    substmat = as_compiled_substmat(substmat)
+
+    # Remove gaps.
+    seq_a = seq_a.replace(GAP_CHAR, '')
+    seq_b = seq_b.replace(GAP_CHAR, '')
+
+    # Encode the 2 sequences as residue-codes.
+    codes_a = encode_seq(seq_a, substmat)
+    codes_b = encode_seq(seq_b, substmat)
+    length_a = len(codes_a)
+    length_b = len(codes_b)
+
+    # Integer penalties.
+    scale, gapopen, gapextend, endopen, endextend = _get_integer_penalties(
+        gapopen_penalty, gapextend_penalty,
+        endweight, endopen_penalty, endextend_penalty)
+
+    # Scores of sequence B against each residue of sequence A.
+    score_s = substmat.scores[:, codes_b] * scale
+
+    # Penalties for gaps in sequence B (in each column).
+    # (Gaps after the last residue of sequence B are end gaps.)
+    col_open_s = np.full(length_b + 1, gapopen, dtype=np.int64)
+    col_extend_s = np.full(length_b + 1, gapextend, dtype=np.int64)
+    col_open_s[-1] = endopen
+    col_extend_s[-1] = endextend
+
+    # Column-indices.
+    col_idx_s = np.arange(length_b + 1, dtype=np.int64)
+
+    # Traceback:
+    # For each cell and state, the state of the previous cell.
+    trace = np.empty((3, length_a + 1, length_b + 1), dtype=np.uint8)
+
+    # -----------------------------------------------------------------|------|
+    # 1st row: gaps in sequence A before its first residue.
+
+    # Scores of the current row (for each state).
+    row = np.full((3, length_b + 1), IMPOSSIBLE_SCORE, dtype=np.int64)
+    row[MATCH, 0] = 0
+    row[GAP_A, 1:] = -(endopen + (col_idx_s[1:] - 1) * endextend)
+    trace[:, 0, :] = GAP_A
+    trace[GAP_A, 0, 1:2] = MATCH
+
+    # -----------------------------------------------------------------|------|
+    # Remaining rows.
+
+    for i in range(1, length_a + 1):
+        prev_row = row
+        row = np.full((3, length_b + 1), IMPOSSIBLE_SCORE, dtype=np.int64)
+
+        # Residue-residue-pairs:
+        # Best state of the previous diagonal cell.
+        best_prev_s, trace[MATCH, i, 1:] = _max_of_3(*prev_row[:, :-1])
+        row[MATCH, 1:] = best_prev_s + score_s[codes_a[i - 1]]
+
+        # Gaps in sequence B:
+        # Open (after a pair or a gap in sequence A) or extend.
+        row[GAP_B], trace[GAP_B, i] = _max_of_3(
+            prev_row[MATCH] - col_open_s,
+            prev_row[GAP_B] - col_extend_s,
+            prev_row[GAP_A] - col_open_s)
+
+        # 1st column: gaps in sequence B before its first residue.
+        row[GAP_B, 0] = -(endopen + (i - 1) * endextend)
+        trace[GAP_B, i, 0] = GAP_B if i > 1 else MATCH
+
+        # Gaps in sequence A:
+        # (After the last residue of sequence A, they are end gaps.)
+        if i == length_a:
+            row_open, row_extend = endopen, endextend
+        else:
+            row_open, row_extend = gapopen, gapextend
+
+        # Best state (that can open a gap) of each cell in this row.
+        open_state_s = (row[GAP_B] > row[MATCH]).astype(np.uint8)
+        open_score_s = np.maximum(row[MATCH], row[GAP_B])
+
+        # Gap in sequence A from column k to column j:
+        #   open_score[k] - row_open - (j-1-k) * row_extend
+        # i.e. the best k is found with a prefix-maximum.
+        prefix_max_s = np.maximum.accumulate(open_score_s
+                                             + col_idx_s * row_extend)
+        row[GAP_A, 1:] = (prefix_max_s[:-1]
+                          - row_open
+                          - col_idx_s[:-1] * row_extend)
+
+        # Traceback: open (preferred) or extend.
+        is_open = (open_score_s[:-1] - row_open
+                   >= row[GAP_A, :-1] - row_extend)
+        trace[GAP_A, i, 1:] = np.where(is_open, open_state_s[:-1], GAP_A)
+
+    # -----------------------------------------------------------------|------|
+    # Traceback.
+
+    # Best state of the last cell.
+    state = int(row[:, -1].argmax())
+    score = int(row[state, -1]) / scale
+
+    # Return final result.
+    return score, _traceback(trace, state, seq_a, seq_b)
+
+
+# ---------------------------------------------------------------------|------|
+# Adaptive alignment.
+
+def _score_full(
+        codes_a: np.ndarray,
+        codes_b: np.ndarray,
+        score_s: np.ndarray,
+        gapopen: int,
+        gapextend: int,
+        endopen: int,
+        endextend: int,
+        min_score: Union[float, None] = None,
+        remaining_s: Union[np.ndarray, None] = None
+        ) -> int:
+    """\
+    Calculate the score of an optimal global alignment, without
+    traceback.
+
+    Same dynamic programming as align_global (all scores are scaled
+    integers).
+
+    Early abandonment (X-drop):
+    Every global alignment passes each row, i.e. its score is at most
+    the best score of the row plus the upper bound for the remaining
+    rows.  If this is below min_score, the calculation stops.
+
+    :param codes_a, codes_b:
+        np.ndarray (uint8): residue-codes of the 2 sequences
+
+    :param score_s:
+        np.ndarray (int64, shape: (K+1, len(codes_b)))
+
+        Scaled scores of sequence B against each residue-code.
+
+    :param gapopen, gapextend, endopen, endextend:
+        int (see _get_integer_penalties)
+
+    :param min_score:
+        float
+
+        (default: None, i.e. NO early abandonment.)
+
+    :param remaining_s:
+        np.ndarray (see _get_substitution_bounds)
+
+        Required for min_score.
+
+    :return:
+        int
+
+        Score (or an upper bound below min_score, if abandoned).
+    """
+    length_a = len(codes_a)
+    length_b = len(codes_b)
+
+    # Penalties for gaps in sequence B (see align_global).
+    col_open_s = np.full(length_b + 1, gapopen, dtype=np.int64)
+    col_extend_s = np.full(length_b + 1, gapextend, dtype=np.int64)
+    col_open_s[-1] = endopen
+    col_extend_s[-1] = endextend
+
+    col_idx_s = np.arange(length_b + 1, dtype=np.int64)
+
+    # 1st row.
+    row = np.full((3, length_b + 1), IMPOSSIBLE_SCORE, dtype=np.int64)
+    row[MATCH, 0] = 0
+    row[GAP_A, 1:] = -(endopen + (col_idx_s[1:] - 1) * endextend)
+
+    # Remaining rows.
+    for i in range(1, length_a + 1):
+        prev_row = row
+        row = np.full((3, length_b + 1), IMPOSSIBLE_SCORE, dtype=np.int64)
+
+        row[MATCH, 1:] = prev_row.max(axis=0)[:-1] + score_s[codes_a[i - 1]]
+        row[GAP_B] = np.maximum(
+            np.maximum(prev_row[MATCH], prev_row[GAP_A]) - col_open_s,
+            prev_row[GAP_B] - col_extend_s)
+        row[GAP_B, 0] = -(endopen + (i - 1) * endextend)
+
+        if i == length_a:
+            row_open, row_extend = endopen, endextend
+        else:
+            row_open, row_extend = gapopen, gapextend
+        prefix_max_s = np.maximum.accumulate(
+            np.maximum(row[MATCH], row[GAP_B]) + col_idx_s * row_extend)
+        row[GAP_A, 1:] = (prefix_max_s[:-1]
+                          - row_open
+                          - col_idx_s[:-1] * row_extend)
+
+        # Early abandonment.
+        if min_score is not None:
+            max_score = int(row.max()) + int(remaining_s[i])
+            if max_score < min_score:
+                return max_score
+
+    return int(row[:, -1].max())
+
+
+def _fill_band(
+        codes_a: np.ndarray,
+        codes_b: np.ndarray,
+        score_s: np.ndarray,
+        gapopen: int,
+        gapextend: int,
+        endopen: int,
+        endextend: int,
+        min_diagonal: int,
+        max_diagonal: int,
+        min_score: Union[float, None] = None,
+        remaining_s: Union[np.ndarray, None] = None
+        ) -> Union[Tuple[np.ndarray, np.ndarray], None]:
+    """\
+    Same dynamic programming as align_global, but only for the cells
+    (i, j) of the band min_diagonal <= j - i <= max_diagonal, i.e. only
+    alignments within the band are considered.
+
+    The cells are stored by diagonal: cell (i, j) of the band has the
+    index j - i - min_diagonal in row i.  Then, the diagonal predecessor
+    (i-1, j-1) has the same index, the vertical predecessor (i-1, j) the
+    next index and the horizontal predecessor (i, j-1) the previous
+    index.
+
+    :param codes_a, codes_b, score_s, gapopen, gapextend, endopen,
+           endextend:
+        see _score_full
+
+    :param min_diagonal:
+        int (<= min(0, len(codes_b) - len(codes_a)))
+
+    :param max_diagonal:
+        int (>= max(0, len(codes_b) - len(codes_a)))
+
+    :param min_score, remaining_s:
+        Early abandonment, if NO alignment within the band can reach
+        min_score (see _score_full).
+
+    :return:
+        Tuple:
+        - np.ndarray (int64, shape: (3,)):
+          scores of the last cell (for each state)
+        - np.ndarray (uint8, shape: (3, len(codes_a)+1, band width)):
+          traceback (see _traceback)
+
+        - or -
+
+        None (if abandoned)
+    """
+    # -----------------------------------------------------------------|------|
+    # Preparations.
+
+    length_a = len(codes_a)
+    length_b = len(codes_b)
+    band_width = max_diagonal - min_diagonal + 1
+
+    # Penalties for gaps in sequence B (see align_global).
+    col_open_s = np.full(length_b + 1, gapopen, dtype=np.int64)
+    col_extend_s = np.full(length_b + 1, gapextend, dtype=np.int64)
+    col_open_s[-1] = endopen
+    col_extend_s[-1] = endextend
+
+    col_idx_s = np.arange(length_b + 1, dtype=np.int64)
+
+    trace = np.empty((3, length_a + 1, band_width), dtype=np.uint8)
+
+    def get_cell_range(i):
+        """\
+        Indices [start; end) of the cells of row i within the matrix
+        (all other cells of the band are impossible).
+        """
+        return (max(0, -(i + min_diagonal)),
+                min(band_width, length_b - i - min_diagonal + 1))
+
+    # -----------------------------------------------------------------|------|
+    # 1st row: gaps in sequence A before its first residue.
+    # (An additional impossible cell at the end of each row is the
+    #  vertical predecessor of the last cell of the next row.)
+
+    row = np.full((3, band_width + 1), IMPOSSIBLE_SCORE, dtype=np.int64)
+    start, end = get_cell_range(0)
+    row[MATCH, start] = 0
+    row[GAP_A, start + 1:end] = -(endopen
+                                  + (col_idx_s[:end - start - 1]
+                                     * endextend))
+    trace[:, 0] = GAP_A
+    trace[GAP_A, 0, start + 1:start + 2] = MATCH
+
+    # -----------------------------------------------------------------|------|
+    # Remaining rows.
+
+    for i in range(1, length_a + 1):
+        prev_row = row
+        row = np.full((3, band_width + 1), IMPOSSIBLE_SCORE, dtype=np.int64)
+
+        start, end = get_cell_range(i)
+        # Columns of these cells.
+        first_col = i + min_diagonal + start
+        col_s = slice(first_col, first_col + end - start)
+
+        # Residue-residue-pairs:
+        # Best state of the diagonal predecessor (same index).
+        best_prev_s, trace[MATCH, i] = _max_of_3(*prev_row[:, :-1])
+        match_start = start + (first_col == 0)
+        row[MATCH, match_start:end] = (
+            best_prev_s[match_start:end]
+            + score_s[codes_a[i - 1],
+                      first_col + match_start - start - 1:col_s.stop - 1])
+
+        # Gaps in sequence B:
+        # Vertical predecessor (next index).
+        up_row = prev_row[:, start + 1:end + 1]
+        row[GAP_B, start:end], trace[GAP_B, i, start:end] = _max_of_3(
+            up_row[MATCH] - col_open_s[col_s],
+            up_row[GAP_B] - col_extend_s[col_s],
+            up_row[GAP_A] - col_open_s[col_s])
+
+        # 1st column: gaps in sequence B before its first residue.
+        if first_col == 0:
+            row[GAP_B, start] = -(endopen + (i - 1) * endextend)
+            trace[GAP_B, i, start] = GAP_B if i > 1 else MATCH
+
+        # Gaps in sequence A:
+        # Horizontal predecessor (previous index, see align_global).
+        if i == length_a:
+            row_open, row_extend = endopen, endextend
+        else:
+            row_open, row_extend = gapopen, gapextend
+
+        cell_s = row[:, start:end]
+        open_state_s = (cell_s[GAP_B] > cell_s[MATCH]).astype(np.uint8)
+        open_score_s = np.maximum(cell_s[MATCH], cell_s[GAP_B])
+
+        prefix_max_s = np.maximum.accumulate(open_score_s
+                                             + col_idx_s[col_s] * row_extend)
+        cell_s[GAP_A, 1:] = (prefix_max_s[:-1]
+                             - row_open
+                             - col_idx_s[col_s][:-1] * row_extend)
+
+        is_open = (open_score_s[:-1] - row_open
+                   >= cell_s[GAP_A, :-1] - row_extend)
+        trace[GAP_A, i, start + 1:end] = np.where(is_open,
+                                                  open_state_s[:-1],
+                                                  GAP_A)
+
+        # Early abandonment.
+        if (min_score is not None
+                and int(cell_s.max()) + int(remaining_s[i]) < min_score):
+            return None
+
+    # Last cell.
+    return row[:, length_b - length_a - min_diagonal], trace
+
+
+def _get_substitution_bounds(
+        codes_a: np.ndarray,
+        codes_b: np.ndarray,
+        score_s: np.ndarray
+        ) -> Tuple[int, np.ndarray]:
+    """\
+    Upper bounds of the summed substitution scores of any alignment of
+    the 2 sequences.
+
+    Each residue is part of at most 1 residue-residue-pair, i.e. it
+    contributes at most its best score against any residue of the other
+    sequence (or zero, if it is aligned to a gap).
+
+    :param codes_a, codes_b, score_s:
+        see _score_full
+
+    :return:
+        Tuple:
+        - int: upper bound for the whole alignment
+        - np.ndarray (int64, shape: (len(codes_a)+1,)):
+          upper bound for the rows after row i
+          (i.e. for the residues codes_a[i:])
+    """
+    # Trivial case:
+    # No residue-residue-pairs.
+    if len(codes_a) == 0 or len(codes_b) == 0:
+        return 0, np.zeros(len(codes_a) + 1, dtype=np.int64)
+
+    # score_s: rows indexed by residue-code, columns by positions of B.
+    best_a_s = np.maximum(score_s.max(axis=1), 0)[codes_a]
+    best_b_s = np.maximum(score_s[np.unique(codes_a)].max(axis=0), 0)
+
+    remaining_s = np.zeros(len(codes_a) + 1, dtype=np.int64)
+    remaining_s[:-1] = np.cumsum(best_a_s[::-1])[::-1]
+
+    return int(min(remaining_s[0], best_b_s.sum())), remaining_s
+
+
+def _get_min_gap_penalty(
+        gap_count: int,
+        min_open: int,
+        min_extend: int
+        ) -> int:
+    """\
+    Lower bound of the gap penalties of an alignment that leaves a band:
+    it has at least 1 gap in each sequence with gap_count gap-positions
+    in total.
+
+    :param gap_count:
+        int (>= 2)
+
+    :param min_open, min_extend:
+        int: smallest (scaled) gapopen- and gapextend-penalty (including
+        the end gap penalties)
+
+    :return:
+        int
+    """
+    return min(2 * min_open + (gap_count - 2) * min_extend,
+               gap_count * min_open)
+
+
+def _get_band_margin(
+        max_score: int,
+        score: int,
+        length_diff: int,
+        min_open: int,
+        min_extend: int
+        ) -> Union[int, None]:
+    """\
+    Get the smallest band margin, such that every alignment that leaves
+    the band scores less than the input score.
+
+    An alignment that leaves the band
+      min(0, length_diff) - margin <= j - i <= max(0, length_diff) + margin
+    has at least
+      |length_diff| + 2 * margin + 2
+    gap-positions, i.e. its score is at most max_score minus
+    _get_min_gap_penalty.
+
+    :param max_score:
+        int: upper bound of the summed substitution scores
+        (see _get_substitution_bounds)
+
+    :param score:
+        int: score of an alignment within the band (or of an optimal
+        alignment)
+
+    :param length_diff:
+        int: len(seq_b) - len(seq_a)
+
+    :param min_open, min_extend:
+        see _get_min_gap_penalty
+
+    :return:
+        int
+
+        - or -
+
+        None (if there is NO such margin)
+    """
+    # Necessary gap penalties.
+    need = max_score - score
+
+    def smallest_margin(penalty, slope):
+        """\
+        Smallest margin with penalty + slope * margin > need.
+        """
+        if penalty > need:
+            return 0
+        if slope <= 0:
+            return None
+        return (need - penalty) // slope + 1
+
+    margin_s = [smallest_margin(2 * min_open + abs(length_diff) * min_extend,
+                                2 * min_extend),
+                smallest_margin((abs(length_diff) + 2) * min_open,
+                                2 * min_open)]
+
+    if None in margin_s:
+        return None
+
+    return max(margin_s)
+
+
+def align_global_adaptive(
+        seq_a: str,
+        seq_b: str,
+        substmat: Union[pd.DataFrame, CompiledSubstmat],
+        gapopen_penalty: float = 10.0,
+        gapextend_penalty: float = 0.5,
+        endweight: bool = False,
+        endopen_penalty: float = 10.0,
+        endextend_penalty: float = 0.5,
+        minscore: Union[float, None] = None,
+        band_margin: int = BAND_MARGIN
+        ) -> Tuple[str, float, Union[Tuple[str, str], None]]:
+    """\
+    Same result as align_global, but the cheapest exact computation is
+    chosen for each pair:
+
+    1. Banded:
+       Only a band of diagonals (band_margin around the diagonals of the
+       1st and the last cell) is computed.  The result is kept, if no
+       alignment that leaves the band can reach its score (see
+       _get_band_margin), i.e. all optimal alignments are within the
+       band and the traceback is the same as for align_global.
+    2. Score-only (only if minscore):
+       The score is calculated without traceback.  Pairs below minscore
+       are rejected (as soon as the remaining rows can NOT reach
+       minscore, see _score_full).  Otherwise, the exact score
+       determines the band that is needed (as in 1.).
+    3. Full:
+       align_global.
+
+    Bands are only possible with end gap penalties (otherwise, a path
+    along the border of the matrix does NOT cost anything).
+
+    :param seq_a, seq_b, substmat, gapopen_penalty, gapextend_penalty,
+           endweight, endopen_penalty, endextend_penalty:
+        see align_global
+
+    :param minscore:
+        float
+
+        Reject alignments with a score below this threshold
+        (without traceback).
+
+        (default: None, i.e. NO alignment is rejected.)
+
+    :param band_margin:
+        int
+
+        Margin of the 1st band.
+
+    :return:
+        Tuple:
+        - str: path of the computation
+               (PATH_BANDED, PATH_REJECTED or PATH_FULL)
+        - float: score of the alignment
+          (if rejected: the score or an upper bound below minscore)
+        - Tuple: alignment (see align_global)
+          (None, if rejected)
+    """
+    # -----------------------------------------------------------------|------|
+    # Preparations.
+
+    # Compile substitution matrix (if necessary).
+    substmat = as_compiled_substmat(substmat)
+
+    # Remove gaps.
+    seq_a = seq_a.replace(GAP_CHAR, '')
+    seq_b = seq_b.replace(GAP_CHAR, '')
+
+    # Encode the 2 sequences as residue-codes.
+    codes_a = encode_seq(seq_a, substmat)
+    codes_b = encode_seq(seq_b, substmat)
+    length_diff = len(codes_b) - len(codes_a)
+
+    # Integer penalties.
+    penalty_s = _get_integer_penalties(
+        gapopen_penalty, gapextend_penalty,
+        endweight, endopen_penalty, endextend_penalty)
+    scale, gapopen, gapextend, endopen, endextend = penalty_s
+
+    # Scores of sequence B against each residue-code.
+    score_s = substmat.scores[:, codes_b] * scale
+
+    # Bounds.
+    max_score, remaining_s = _get_substitution_bounds(codes_a, codes_b,
+                                                      score_s)
+    min_open = min(gapopen, endopen)
+    min_extend = min(gapextend, endextend)
+
+    def align_band(margin, min_score=None):
+        """\
+        Banded alignment (score, alignment).
+        (None, if abandoned.)
+        """
+        min_diagonal = min(0, length_diff) - margin
+        band = _fill_band(codes_a, codes_b, score_s, *penalty_s[1:],
+                          min_diagonal, max(0, length_diff) + margin,
+                          min_score=min_score, remaining_s=remaining_s)
+        if band is None:
+            return None
+        last_cell_s, trace = band
+        state = int(last_cell_s.argmax())
+        return (int(last_cell_s[state]),
+                _traceback(trace, state, seq_a, seq_b, min_diagonal))
+
+    def is_narrow(margin):
+        """\
+        The band is narrower than a row of the full matrix.
+        """
+        return (margin is not None
+                and abs(length_diff) + 2 * margin + 1 < len(codes_b) + 1)
+
+    def is_rejected(score):
+        return minscore is not None and score / scale < minscore
+
+    # -----------------------------------------------------------------|------|
+    # 1. Banded.
+
+    # (Abandoned, as soon as its score can NOT exceed the best score of
+    #  the alignments outside of the band.)
+
+    if is_narrow(band_margin):
+        outside_score = max_score - _get_min_gap_penalty(
+            abs(length_diff) + 2 * band_margin + 2, min_open, min_extend)
+        result = align_band(band_margin, min_score=outside_score + 1)
+        if result is not None and result[0] > outside_score:
+            score, gali = result
+            if is_rejected(score):
+                return PATH_REJECTED, score / scale, None
+            return PATH_BANDED, score / scale, gali
+
+    # -----------------------------------------------------------------|------|
+    # 2. Score-only.
+    # (Abandoned, as soon as its score can NOT reach minscore.)
+
+    if minscore is not None:
+        score = _score_full(codes_a, codes_b, score_s, *penalty_s[1:],
+                            min_score=minscore * scale,
+                            remaining_s=remaining_s)
+        if is_rejected(score):
+            return PATH_REJECTED, score / scale, None
+
+        margin = _get_band_margin(max_score, score, length_diff,
+                                  min_open, min_extend)
+        if is_narrow(margin):
+            score, gali = align_band(margin)
+            return PATH_BANDED, score / scale, gali
+
+    # -----------------------------------------------------------------|------|
+    # 3. Full.
+
+    score, gali = align_global(seq_a, seq_b, substmat,
+                               gapopen_penalty=gapopen_penalty,
+                               gapextend_penalty=gapextend_penalty,
+                               endweight=endweight,
+                               endopen_penalty=endopen_penalty,
+                               endextend_penalty=endextend_penalty)
+
+    return PATH_FULL, score, gali
+
+
+# ---------------------------------------------------------------------|------|
+# Batched alignment.
+
+def _align_lanes(
+        seq_a_s: Sequence[str],
+        seq_b_s: Sequence[str],
+        substmat: CompiledSubstmat,
+        scale: int,
+        gapopen: int,
+        gapextend: int,
+        endopen: int,
+        endextend: int
+        ) -> List[Tuple[float, Tuple[str, str]]]:
+    """\
+    Calculate the global alignments of several pairs at once.
+
+    Same dynamic programming as align_global, but each pair occupies one
+    lane of the state-arrays (shape: (3, number of pairs, columns)).
+    The sequences are padded to the longest sequences; the padding does
+    NOT influence the cells of a pair (each cell only depends on cells
+    with smaller or equal indices), and the result of each pair is taken
+    from its own last cell.
+
+    :param seq_a_s:
+        Sequence of str: sequences A (without gaps)
+
+    :param seq_b_s:
+        Sequence of str: sequences B (without gaps)
+
+    :param substmat:
+        CompiledSubstmat
+
+    :param scale, gapopen, gapextend, endopen, endextend:
+        int (see _get_integer_penalties)
+
+    :return:
+        List of Tuple (see align_global)
+    """
+    # -----------------------------------------------------------------|------|
+    # Preparations.
+
+    lane_count = len(seq_a_s)
+    length_a_s = np.array([len(seq_a) for seq_a in seq_a_s])
+    length_b_s = np.array([len(seq_b) for seq_b in seq_b_s])
+    max_length_a = int(length_a_s.max())
+    max_length_b = int(length_b_s.max())
+    lane_idx_s = np.arange(lane_count)
+
+    # Encode the sequences as padded matrices of residue-codes.
+    # (Padding: gap-code.)
+    codes_a = np.full((lane_count, max_length_a), substmat.gap_code,
+                      dtype=np.uint8)
+    codes_b = np.full((lane_count, max_length_b), substmat.gap_code,
+                      dtype=np.uint8)
+    for lane_idx, (seq_a, seq_b) in enumerate(zip(seq_a_s, seq_b_s)):
+        codes_a[lane_idx, :len(seq_a)] = encode_seq(seq_a, substmat)
+        codes_b[lane_idx, :len(seq_b)] = encode_seq(seq_b, substmat)
+
+    # Integer scores.
+    scores = substmat.scores * scale
+
+    # Column-indices.
+    col_idx_s = np.arange(max_length_b + 1, dtype=np.int64)
+
+    # Penalties for gaps in sequence B (in each lane and column).
+    # (Gaps after the last residue of sequence B are end gaps.)
+    is_end_col = col_idx_s == length_b_s[:, None]
+    col_open_s = np.where(is_end_col, endopen, gapopen)
+    col_extend_s = np.where(is_end_col, endextend, gapextend)
+
+    # Traceback:
+    # For each state, row, lane and column, the state of the previous
+    # cell.
+    trace = np.empty((3, max_length_a + 1, lane_count, max_length_b + 1),
+                     dtype=np.uint8)
+
+    # Scores of the last cell of each lane (for each state).
+    last_cell_s = np.empty((3, lane_count), dtype=np.int64)
+
+    # -----------------------------------------------------------------|------|
+    # 1st row: gaps in sequence A before its first residue.
+
+    # Scores of the current row (for each state and lane).
+    row = np.full((3, lane_count, max_length_b + 1), IMPOSSIBLE_SCORE,
+                  dtype=np.int64)
+    row[MATCH, :, 0] = 0
+    row[GAP_A, :, 1:] = -(endopen + (col_idx_s[1:] - 1) * endextend)
+    trace[:, 0] = GAP_A
+    trace[GAP_A, 0, :, 1:2] = MATCH
+
+    # Lanes whose sequence A is empty.
+    is_last_row = length_a_s == 0
+    last_cell_s[:, is_last_row] = row[:, lane_idx_s[is_last_row],
+                                      length_b_s[is_last_row]]
+
+    # -----------------------------------------------------------------|------|
+    # Remaining rows.
+
+    for i in range(1, max_length_a + 1):
+        prev_row = row
+        row = np.full((3, lane_count, max_length_b + 1), IMPOSSIBLE_SCORE,
+                      dtype=np.int64)
+
+        # Residue-residue-pairs:
+        # Best state of the previous diagonal cell.
+        best_prev_s, trace[MATCH, i, :, 1:] = _max_of_3(
+            *prev_row[:, :, :-1])
+        row[MATCH, :, 1:] = (best_prev_s
+                             + scores[codes_a[:, i - 1, None], codes_b])
+
+        # Gaps in sequence B:
+        # Open (after a pair or a gap in sequence A) or extend.
+        row[GAP_B], trace[GAP_B, i] = _max_of_3(
+            prev_row[MATCH] - col_open_s,
+            prev_row[GAP_B] - col_extend_s,
+            prev_row[GAP_A] - col_open_s)
+
+        # 1st column: gaps in sequence B before its first residue.
+        row[GAP_B, :, 0] = -(endopen + (i - 1) * endextend)
+        trace[GAP_B, i, :, 0] = GAP_B if i > 1 else MATCH
+
+        # Gaps in sequence A:
+        # (After the last residue of sequence A, they are end gaps.)
+        is_last_row = length_a_s == i
+        row_open_s = np.where(is_last_row, endopen, gapopen)[:, None]
+        row_extend_s = np.where(is_last_row, endextend, gapextend)[:, None]
+
+        # Best state (that can open a gap) of each cell in this row.
+        open_state_s = (row[GAP_B] > row[MATCH]).astype(np.uint8)
+        open_score_s = np.maximum(row[MATCH], row[GAP_B])
+
+        # Gap in sequence A from column k to column j
+        # (see align_global).
+        prefix_max_s = np.maximum.accumulate(open_score_s
+                                             + col_idx_s * row_extend_s,
+                                             axis=1)
+        row[GAP_A, :, 1:] = (prefix_max_s[:, :-1]
+                             - row_open_s
+                             - col_idx_s[:-1] * row_extend_s)
+
+        # Traceback: open (preferred) or extend.
+        is_open = (open_score_s[:, :-1] - row_open_s
+                   >= row[GAP_A, :, :-1] - row_extend_s)
+        trace[GAP_A, i, :, 1:] = np.where(is_open,
+                                          open_state_s[:, :-1],
+                                          GAP_A)
+
+        # Memorise the last cell of the lanes that end in this row.
+        last_cell_s[:, is_last_row] = row[:, lane_idx_s[is_last_row],
+                                          length_b_s[is_last_row]]
+
+    # -----------------------------------------------------------------|------|
+    # Traceback of each lane.
+
+    # Best state of the last cell.
+    state_s = last_cell_s.argmax(axis=0)
+    score_s = last_cell_s[state_s, lane_idx_s] / scale
+
+    return [(float(score_s[lane_idx]),
+             _traceback(trace[:, :, lane_idx], int(state_s[lane_idx]),
+                        seq_a_s[lane_idx], seq_b_s[lane_idx]))
+            for lane_idx in range(lane_count)]
+
+
+def align_global_batch(
+        seq_pair_s: Sequence[Tuple[str, str]],
+        substmat: Union[pd.DataFrame, CompiledSubstmat],
+        gapopen_penalty: float = 10.0,
+        gapextend_penalty: float = 0.5,
+        endweight: bool = False,
+        endopen_penalty: float = 10.0,
+        endextend_penalty: float = 0.5,
+        lane_count: int = LANE_COUNT,
+        trace_memory: int = TRACE_MEMORY
+        ) -> List[Tuple[float, Tuple[str, str]]]:
+    """\
+    Calculate an optimal global alignment of each input pair of
+    sequences.
+
+    Same results as align_global for each pair, but the pairs are sorted
+    by length and many pairs of similar length are aligned together with
+    vectorised operations (each pair in one lane, see _align_lanes).
+
+    :param seq_pair_s:
+        Sequence of Tuple:
+        - str: sequence A
+        - str: sequence B
+
+        (gaps are ignored)
+
+    :param substmat:
+        pd.DataFrame (as returned by parse_substmat_as_df)
+
+        - or -
+
+        CompiledSubstmat
+
+    :param gapopen_penalty, gapextend_penalty, endweight,
+           endopen_penalty, endextend_penalty:
+        see align_global
+
+    :param lane_count:
+        int
+
+        Maximum number of pairs that are aligned together.
+
+    :param trace_memory:
+        int
+
+        Maximum memory (in bytes) of the traceback of the pairs that are
+        aligned together.
+        (Long pairs are aligned in fewer lanes, at least 1.)
+
+    :return:
+        List of Tuple (see align_global)
+        (in the order of the input pairs)
+    """
+    # -----------------------------------------------------------------|------|
+    # Preparations.
+
+    # Compile substitution matrix (if necessary).
+    substmat = as_compiled_substmat(substmat)
+
+    # Remove gaps.
+    seq_pair_s = [(seq_a.replace(GAP_CHAR, ''), seq_b.replace(GAP_CHAR, ''))
+                  for seq_a, seq_b in seq_pair_s]
+
+    # Integer penalties.
+    penalty_s = _get_integer_penalties(
+        gapopen_penalty, gapextend_penalty,
+        endweight, endopen_penalty, endextend_penalty)
+
+    # Sort pairs by length
+    # (i.e. pairs of similar length share the padding).
+    order = sorted(range(len(seq_pair_s)),
+                   key=lambda k: (len(seq_pair_s[k][0]),
+                                  len(seq_pair_s[k][1])))
+
+    # -----------------------------------------------------------------|------|
+    # Align groups of pairs.
+
+    result_s = [None] * len(seq_pair_s)
+
+    start = 0
+    while start < len(order):
+
+        # Extend the group, while the traceback stays within the memory.
+        # (The length of sequence A increases with each pair.)
+        end = start + 1
+        max_length_b = len(seq_pair_s[order[start]][1])
+        while end < len(order) and end - start < lane_count:
+            length_a, length_b = map(len, seq_pair_s[order[end]])
+            max_length_b = max(max_length_b, length_b)
+            if (3 * (end - start + 1) * (length_a + 1) * (max_length_b + 1)
+                    > trace_memory):
+                break
+            end += 1
+
+        # Align group.
+        idx_s = order[start:end]
+        for idx, result in zip(idx_s, _align_lanes(
+                [seq_pair_s[idx][0] for idx in idx_s],
+                [seq_pair_s[idx][1] for idx in idx_s],
+                substmat,
+                *penalty_s)):
+            result_s[idx] = result
+
+        start = end
+
+    return result_s
+
+
+# ---------------------------------------------------------------------|------|
+# All pairs.
+
+# Input of each worker-process (see _init_worker).
+_worker_state = {}
+
+
+def _init_worker(
+        seq_s: Sequence[str],
+        substmat: CompiledSubstmat):
+    """\
+    Store the input of each worker-process once
+    (instead of sending it with each chunk of pairs).
+    """
+    _worker_state['seq_s'] = seq_s
+    _worker_state['substmat'] = substmat
+
+
+def _iterate_pair_chunks(
+        seq_count: int,
+        chunk_size: int,
+        pair_s: Union[Iterable[Tuple[int, int]], None] = None
+        ) -> Generator[List[Tuple[int, int]], None, None]:
+    """\
+    Split all pairs (idx_a < idx_b) or the input pairs into chunks (in
+    the order of iterate_all_pair_alignments).
+    """
+    if pair_s is None:
+        pair_s = ((idx_a, idx_b)
+                  for idx_a in range(seq_count - 1)
+                  for idx_b in range(idx_a + 1, seq_count))
+
+    chunk = []
+    for pair in pair_s:
+        chunk.append(pair)
+        if len(chunk) == chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _align_pairs(
+        pair_s: Sequence[Tuple[int, int]],
+        seq_s: Sequence[str],
+        substmat: CompiledSubstmat,
+        engine: str,
+        minscore: Union[float, None] = None,
+        **kwargs
+        ) -> Tuple[list, collections.Counter]:
+    """\
+    Align the input pairs of sequences.
+
+    :return:
+        Tuple:
+        - List of Tuple: (idx_a, idx_b, score, alignment)
+        - collections.Counter: number of pairs per path of the
+          computation (see align_global_adaptive)
+    """
+    path_count = collections.Counter()
+
+    # One pair at a time.
+    if engine == 'single':
+        result_s = [align_global(seq_s[idx_a], seq_s[idx_b],
+                                 substmat, **kwargs)
+                    for idx_a, idx_b in pair_s]
+
+    # One pair at a time, with the cheapest exact computation.
+    elif engine == 'adaptive':
+        result_s = []
+        for idx_a, idx_b in pair_s:
+            path, score, gali = align_global_adaptive(
+                seq_s[idx_a], seq_s[idx_b], substmat,
+                minscore=minscore, **kwargs)
+            path_count[path] += 1
+            result_s.append((score, gali))
+
+    # Many pairs together.
+    elif engine == 'batch':
+        result_s = align_global_batch([(seq_s[idx_a], seq_s[idx_b])
+                                       for idx_a, idx_b in pair_s],
+                                      substmat, **kwargs)
+
+    # Sanity check: fail.
+    # Unknown engine.
+    else:
+        raise ValueError(
+            f'Faulty engine:\n'
+            f'  {engine}\n'
+            f'  Available engines: single, batch, adaptive.')
+
+    # The other engines always compute the full matrix.
+    if engine != 'adaptive':
+        path_count[PATH_FULL] = len(pair_s)
+
+    return ([pair + result for pair, result in zip(pair_s, result_s)],
+            path_count)
+
+
+def _align_pairs_in_worker(
+        pair_s: Sequence[Tuple[int, int]],
+        **kwargs
+        ) -> Tuple[list, collections.Counter]:
+    """\
+    Run _align_pairs in a worker-process.
+    """
+    return _align_pairs(pair_s,
+                        _worker_state['seq_s'],
+                        _worker_state['substmat'],
+                        **kwargs)
+
+
+def iterate_all_pair_alignments(
+        seq_s: Sequence[str],
+        substmat: Union[pd.DataFrame, CompiledSubstmat],
+        workers: int = 1,
+        engine: str = 'single',
+        chunk_size: int = PAIR_CHUNK_SIZE,
+        minscore: Union[float, None] = None,
+        path_count: Union[collections.Counter, None] = None,
+        pair_s: Union[Iterable[Tuple[int, int]], None] = None,
+        **kwargs
+        ) -> Generator[Tuple[int, int, float, Union[Tuple[str, str], None]],
+                       None, None]:
+    """\
+    Calculate the global alignments of all pairs of the input sequences.
+
+    The pairs are yielded in the order of needleall with the same file
+    as -asequence and -bsequence, but without self-alignments and
+    without the redundant 2nd alignment of each pair:
+      (0, 1), (0, 2), ..., (0, n-1), (1, 2), ..., (n-2, n-1)
+
+    :param seq_s:
+        Sequence of str: sequences
+
+    :param substmat:
+        pd.DataFrame (as returned by parse_substmat_as_df)
+
+        - or -
+
+        CompiledSubstmat
+
+    :param workers:
+        int
+
+        Number of worker-processes.
+        (Each worker-process aligns a chunk of pairs at a time; the
+         order of the results is the same as for a single process.)
+
+    :param engine:
+        str
+
+        - 'single': align one pair at a time (see align_global).
+        - 'batch':  align many pairs of similar length together
+                    (see align_global_batch).
+        - 'adaptive': align one pair at a time, with a band or a
+                      score-only pass where possible
+                      (see align_global_adaptive).
+
+        All engines yield the same results (apart from the alignments
+        below minscore for 'adaptive').
+
+    :param chunk_size:
+        int
+
+        Number of pairs per chunk.
+
+    :param minscore:
+        float
+
+        Only for engine 'adaptive':
+        the alignments with a score below this threshold are NOT
+        calculated (their alignment is None).
+
+        (default: None)
+
+    :param path_count:
+        collections.Counter
+
+        Is updated with the number of pairs per path of the computation
+        (see align_global_adaptive).
+
+        (default: None, i.e. NOT counted.)
+
+    :param pair_s:
+        Iterable of Tuple: (idx_a, idx_b)
+
+        Only align these pairs (sparse mode, see
+        src.modules.kmer.select_candidate_pairs), in their order.
+
+        (default: None, i.e. all pairs.)
+
+    :param kwargs:
+        Penalties (see align_global).
+
+    :return:
+        Generator of Tuple:
+        - int: index of sequence A
+        - int: index of sequence B
+        - float: score of the alignment
+        - Tuple: alignment (see align_global)
+          (None, if rejected by engine 'adaptive')
+    """
+    # Compile substitution matrix (if necessary).
+    substmat = as_compiled_substmat(substmat)
+
+    if path_count is None:
+        path_count = collections.Counter()
+
+    # Chunks of pairs.
+    pair_chunk_s = _iterate_pair_chunks(len(seq_s), chunk_size, pair_s)
+
+    # Single process.
+    if workers == 1:
+        for pair_s in pair_chunk_s:
+            result_s, chunk_path_count = _align_pairs(
+                pair_s, seq_s, substmat, engine, minscore=minscore, **kwargs)
+            path_count.update(chunk_path_count)
+            yield from result_s
+
+    # Several processes.
+    else:
+        with multiprocessing.Pool(workers,
+                                  initializer=_init_worker,
+                                  initargs=(seq_s, substmat)) as pool:
+
+            # Chunks that are being aligned (in order).
+            # (At most workers + 1 chunks in flight, i.e. the finished
+            #  chunks do NOT pile up, if the consumer is slow.)
+            pending_s = collections.deque()
+
+            for pair_s in pair_chunk_s:
+                pending_s.append(pool.apply_async(
+                    _align_pairs_in_worker,
+                    (pair_s,),
+                    dict(kwargs, engine=engine, minscore=minscore)))
+
+                # Yield finished chunks,
+                # while keeping all worker-processes busy.
+                while len(pending_s) > workers:
+                    result_s, chunk_path_count = pending_s.popleft().get()
+                    path_count.update(chunk_path_count)
+                    yield from result_s
+
+            # Yield remaining chunks.
+            while pending_s:
+                result_s, chunk_path_count = pending_s.popleft().get()
+                path_count.update(chunk_path_count)
+                yield from result_s
+
+
+# ---------------------------------------------------------------------|------|
+# Deduplicated all-pairs alignment.
+
+def get_unique_body_pairs(
+        body_idx_s: Sequence[int],
+        pair_s: Union[Sequence[Tuple[int, int]], None] = None
+        ) -> Generator[Tuple[int, int], None, None]:
+    """\
+    Iterate over the pairs of unique bodies that have to be aligned for
+    all pairs (idx_a < idx_b) or the input pairs of sequences.
+
+    The pairs are ordered (unique body of sequence A, unique body of
+    sequence B), i.e. both orientations are aligned, if both occur
+    (the alignments may differ for co-optimal paths).  Pairs of
+    identical bodies are omitted (see align_unique_bodies).
+
+    :param body_idx_s:
+        Sequence of int
+
+        Index of the unique body of each sequence
+        (see src.modules.fasta.map_unique_bodies).
+
+    :param pair_s:
+        Sequence of Tuple: (idx_a, idx_b)
+
+        (default: None, i.e. all pairs.)
+
+    :yield:
+        Tuple: (body_idx_a, body_idx_b), sorted
+    """
+    # Input pairs.
+    if pair_s is not None:
+        yield from sorted({(body_idx_s[idx_a], body_idx_s[idx_b])
+                           for idx_a, idx_b in pair_s
+                           if body_idx_s[idx_a] != body_idx_s[idx_b]})
+        return
+
+    # All pairs:
+    # Body A occurs before body B, if its 1st occurrence is before the
+    # last occurrence of body B.
+    body_idx_s = np.asarray(body_idx_s, dtype=np.int64)
+    body_count = int(body_idx_s.max()) + 1 if len(body_idx_s) else 0
+    seq_idx_s = np.arange(len(body_idx_s))
+    first_s = np.full(body_count, len(body_idx_s), dtype=np.int64)
+    last_s = np.full(body_count, -1, dtype=np.int64)
+    np.minimum.at(first_s, body_idx_s, seq_idx_s)
+    np.maximum.at(last_s, body_idx_s, seq_idx_s)
+
+    for body_idx_a in range(body_count):
+        body_idx_b_s = np.flatnonzero(last_s > first_s[body_idx_a])
+        for body_idx_b in body_idx_b_s.tolist():
+            if body_idx_b != body_idx_a:
+                yield body_idx_a, body_idx_b
+
+
+def align_unique_bodies(
+        body_s: Sequence[str],
+        substmat: Union[pd.DataFrame, CompiledSubstmat],
+        body_pair_s: Iterable[Tuple[int, int]],
+        minscore: Union[float, None] = None,
+        chunk_size: int = PAIR_CHUNK_SIZE,
+        **kwargs
+        ) -> Tuple[Dict[Tuple[int, int], float],
+                   Dict[Tuple[int, int], float]]:
+    """\
+    Align and quantify each input pair of unique bodies once and each
+    unique body with itself.
+
+    The results are stored only for the aligned pairs, i.e. the memory
+    grows with the number of input pairs (NOT with the square of the
+    number of unique bodies, e.g. in sparse mode).
+
+    The results of sequences with redundant bodies are the results of
+    their unique bodies:
+    - 2 sequences with different bodies: the ordered pair of their
+      unique bodies (see get_unique_body_pairs).
+    - 2 sequences with the same body: the unique body with itself
+      (same alignment as for the 2 sequences).
+
+    :param body_s:
+        Sequence of str: unique bodies
+
+    :param substmat:
+        pd.DataFrame (as returned by parse_substmat_as_df)
+
+        - or -
+
+        CompiledSubstmat
+
+    :param body_pair_s:
+        Iterable of Tuple: (body_idx_a, body_idx_b)
+        (see get_unique_body_pairs)
+
+    :param minscore:
+        float
+
+        The alignments with a score below this threshold are NOT
+        quantified.
+
+        (default: None)
+
+    :param chunk_size:
+        int
+
+        Number of alignments that are quantified together.
+
+    :param kwargs:
+        see iterate_all_pair_alignments (workers, engine, path_count and
+        penalties)
+
+    :return:
+        Tuple:
+        - Dict: (body_idx_a, body_idx_b) -> score of each aligned pair
+          (incl. (body_idx, body_idx) of each unique body)
+        - Dict: (body_idx_a, body_idx_b) -> quantifier of each aligned
+          pair above minscore
+          (NaN: quantifier could NOT be calculated, see
+           src.modules.gali.quantify_batch)
+    """
+    # Compile substitution matrix (if necessary).
+    substmat = as_compiled_substmat(substmat)
+
+    pair_to_score = {}
+    pair_to_quantifier = {}
+
+    # Alignments that still have to be quantified:
+    # ((body_idx_a, body_idx_b), alignment).
+    pending_s = []
+
+    def flush():
+        if pending_s:
+            body_pair_s, gali_s = zip(*pending_s)
+            pair_to_quantifier.update(
+                zip(body_pair_s, quantify_batch(gali_s, substmat).tolist()))
+            pending_s.clear()
+
+    # Each unique body with itself
+    # (same engine and worker-processes as for the pairs, but NOT
+    #  counted in path_count).
+    for body_idx, _, score, gali in iterate_all_pair_alignments(
+            body_s,
+            substmat,
+            chunk_size=chunk_size,
+            pair_s=((body_idx, body_idx)
+                    for body_idx in range(len(body_s))),
+            **{key: value for key, value in kwargs.items()
+               if key != 'path_count'}):
+
+        pair_to_score[body_idx, body_idx] = score
+
+        pending_s.append(((body_idx, body_idx), gali))
+        if len(pending_s) >= chunk_size:
+            flush()
+
+    flush()
+
+    # Pairs of unique bodies.
+    for body_idx_a, body_idx_b, score, gali in iterate_all_pair_alignments(
+            body_s,
+            substmat,
+            chunk_size=chunk_size,
+            minscore=minscore,
+            pair_s=body_pair_s,
+            **kwargs):
+
+        pair_to_score[body_idx_a, body_idx_b] = score
+
+        # Below the threshold.
+        if gali is None or (minscore is not None and score < minscore):
+            continue
+
+        pending_s.append(((body_idx_a, body_idx_b), gali))
+        if len(pending_s) >= chunk_size:
+            flush()
+
+    flush()
+
+    return pair_to_score, pair_to_quantifier
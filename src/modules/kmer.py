@@ -0,0 +1,253 @@
+"""\
+Select candidate pairs of sequences by shared k-mers (sparse mode).
+
+Pairs without (enough) shared k-mers are hopeless for a meaningful
+alignment.  Only the candidate pairs are aligned, i.e. the number of
+alignments grows with n * partners instead of n^2.
+
+cc_analysis copes with missing pairs, as long as each sequence has
+enough connections (>= dim), so each sequence keeps at least a minimum
+number of partners (its best candidates, even below the threshold).
+"""
+
+from typing import Dict, Iterator, List, Sequence, Set, Tuple
+
+import numpy as np
+
+from src.modules.substmat import GAP_CHAR
+
+
+# Length of the k-mers.
+KMER_SIZE = 3
+
+# Minimum number of shared k-mers of a candidate pair.
+MIN_SHARED_KMERS = 5
+
+# Minimum number of standard deviations above the number of shared k-mers
+# of unrelated sequences.
+MIN_SIGNIFICANCE = 4.0
+
+# Maximum fraction of the sequences with a k-mer (more frequent k-mers
+# are ignored).
+MAX_KMER_FRACTION = 0.5
+
+
+def get_kmers(
+        seq: str,
+        kmer_size: int = KMER_SIZE
+        ) -> Set[str]:
+    """\
+    Get the distinct k-mers of the sequence.
+
+    :param seq:
+        str (gaps are removed, case is ignored)
+
+    :param kmer_size:
+        int (positive)
+
+    :return:
+        Set of str
+        (empty, if the sequence is shorter than kmer_size)
+    """
+    seq = seq.replace(GAP_CHAR, '').upper()
+    return {seq[idx:idx + kmer_size]
+            for idx in range(len(seq) - kmer_size + 1)}
+
+
+def build_kmer_index(
+        seq_s: Sequence[str],
+        kmer_size: int = KMER_SIZE
+        ) -> Dict[str, np.ndarray]:
+    """\
+    Build the inverted k-mer index of the sequences.
+
+    :param seq_s:
+        Sequence of str
+
+    :param kmer_size:
+        int (positive)
+
+    :return:
+        Dict:
+        - key: k-mer
+        - value: np.ndarray (int64): sorted indices of the sequences that
+          contain the k-mer
+    """
+    kmer_to_idx_s = {}
+    for idx, seq in enumerate(seq_s):
+        for kmer in get_kmers(seq, kmer_size):
+            kmer_to_idx_s.setdefault(kmer, []).append(idx)
+
+    return {kmer: np.array(idx_s, dtype=np.int64)
+            for kmer, idx_s in kmer_to_idx_s.items()}
+
+
+def count_shared_kmers(
+        seq_s: Sequence[str],
+        kmer_size: int = KMER_SIZE,
+        max_kmer_fraction: float = 1.0
+        ) -> Iterator[Tuple[np.ndarray, np.ndarray]]:
+    """\
+    Count the shared distinct k-mers of each sequence with the other
+    sequences (via the inverted k-mer index, i.e. only the sequences
+    with at least 1 shared k-mer are visited).
+
+    The counts are yielded one sequence at a time, i.e. only the
+    partners of a single sequence are held in memory.
+
+    :param seq_s:
+        Sequence of str
+
+    :param kmer_size:
+        int (positive)
+
+    :param max_kmer_fraction:
+        float
+
+        Ignore k-mers that occur in more than this fraction of the
+        sequences (they do NOT discriminate, but their long posting
+        lists dominate the time).
+
+    :return:
+        Iterator (for each sequence) of Tuple:
+        - np.ndarray (int64): sorted indices of the other sequences with
+          at least 1 shared k-mer
+        - np.ndarray (int64): their numbers of shared k-mers
+    """
+    seq_count = len(seq_s)
+    kmer_index = build_kmer_index(seq_s, kmer_size)
+    max_posting_size = max_kmer_fraction * seq_count
+
+    for idx, seq in enumerate(seq_s):
+        posting_s = [kmer_index[kmer] for kmer in get_kmers(seq, kmer_size)
+                     if len(kmer_index[kmer]) <= max_posting_size]
+        if posting_s:
+            count_of_all_s = np.bincount(np.concatenate(posting_s),
+                                         minlength=seq_count)
+            # Without the sequence itself.
+            count_of_all_s[idx] = 0
+            partner_s = np.flatnonzero(count_of_all_s)
+            count_s = count_of_all_s[partner_s]
+        else:
+            partner_s = count_s = np.zeros(0, dtype=np.int64)
+        yield partner_s, count_s
+
+
+def get_expected_shared_kmers(
+        seq_s: Sequence[str],
+        kmer_size: int = KMER_SIZE
+        ) -> Tuple[np.ndarray, float]:
+    """\
+    Background of the shared k-mers: unrelated sequences with a and b
+    distinct k-mers share about a * b / alphabet_size^kmer_size k-mers by
+    chance (alphabet of the sequences, uniform k-mers).
+
+    :param seq_s:
+        Sequence of str
+
+    :param kmer_size:
+        int (positive)
+
+    :return:
+        Tuple:
+        - np.ndarray (int64): number of distinct k-mers of each sequence
+        - float: expected number of shared k-mers per product of the
+          numbers of distinct k-mers
+    """
+    size_s = np.array([len(get_kmers(seq, kmer_size)) for seq in seq_s],
+                      dtype=np.int64)
+    alphabet = set().union(*(seq.replace(GAP_CHAR, '').upper()
+                             for seq in seq_s))
+
+    return size_s, 1.0 / max(len(alphabet), 1) ** kmer_size
+
+
+def select_candidate_pairs(
+        seq_s: Sequence[str],
+        kmer_size: int = KMER_SIZE,
+        min_shared_kmers: int = MIN_SHARED_KMERS,
+        min_partners: int = 0,
+        min_significance: float = MIN_SIGNIFICANCE,
+        max_kmer_fraction: float = MAX_KMER_FRACTION
+        ) -> List[Tuple[int, int]]:
+    """\
+    Select the candidate pairs of sequences.
+
+    A pair is a candidate, if
+    - its sequences share at least min_shared_kmers distinct k-mers and
+      at least min_significance standard deviations more than expected
+      by chance (Poisson, see get_expected_shared_kmers), or
+    - it is one of the min_partners best pairs of one of its sequences
+      (most shared k-mers, ties by index; also pairs without any shared
+      k-mer, if necessary).
+
+    I.e. unrelated sequences yield about n * min_partners pairs.
+
+    :param seq_s:
+        Sequence of str
+
+    :param kmer_size:
+        int (positive)
+
+    :param min_shared_kmers:
+        int
+
+    :param min_partners:
+        int
+
+        Minimum number of partners of each sequence
+        (e.g. >= dim for cc_analysis).
+        (At most all other sequences.)
+
+    :param min_significance:
+        float
+
+    :param max_kmer_fraction:
+        float (see count_shared_kmers)
+
+    :return:
+        List of Tuple: (idx_a, idx_b) with idx_a < idx_b, sorted
+        (i.e. in the order of needleall, see
+         src.modules.gotoh.iterate_all_pair_alignments)
+    """
+    seq_count = len(seq_s)
+    size_s, background = get_expected_shared_kmers(seq_s, kmer_size)
+    min_partners = min(min_partners, seq_count - 1)
+
+    pair_s = set()
+    for idx, (partner_s, count_s) in enumerate(count_shared_kmers(
+            seq_s, kmer_size, max_kmer_fraction)):
+
+        # Above the threshold and above the background.
+        expected_s = background * size_s[idx] * size_s[partner_s]
+        is_selected = ((count_s >= min_shared_kmers)
+                       & (count_s >= expected_s
+                          + min_significance * np.sqrt(expected_s)))
+        selected_s = partner_s[is_selected].tolist()
+
+        # Best partners (if necessary).
+        if len(selected_s) < min_partners:
+            # Most shared k-mers first, ties by index
+            # (only among the partners of the sequence).
+            key_s = -count_s * seq_count + partner_s
+            if len(key_s) > min_partners:
+                key_s = key_s[np.argpartition(key_s, min_partners)
+                              [:min_partners]]
+            best_s = (np.sort(key_s) % seq_count).tolist()
+
+            # Sequences without any shared k-mer (ties by index).
+            if len(best_s) < min_partners:
+                is_partner = set(partner_s.tolist())
+                is_partner.add(idx)
+                for other in range(seq_count):
+                    if len(best_s) == min_partners:
+                        break
+                    if other not in is_partner:
+                        best_s.append(other)
+
+            selected_s.extend(best_s)
+
+        pair_s.update((min(idx, other), max(idx, other))
+                      for other in selected_s)
+
+    return sorted(pair_s)
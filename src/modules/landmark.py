@@ -0,0 +1,333 @@
+"""\
+Map large datasets with landmarks (landmark mode).
+
+k diverse landmark sequences are selected by farthest-point selection on
+their k-mer profiles (Jaccard distance of the distinct k-mers, see
+src.modules.kmer).  Only the pairs among the landmarks and the pairs of
+each other sequence with the landmarks are aligned, i.e. the number of
+alignments grows with n * k instead of n^2.
+
+The landmarks are mapped by cc_analysis, the other sequences are placed
+into the same frame by projection (see src.modules.cc_analysis).
+
+The quality of the map is estimated on a random sample of held-out pairs
+of other sequences: these pairs are aligned as well, but NOT used for
+the map.
+"""
+
+from typing import Dict, List, Sequence, Set, Tuple
+
+import numpy as np
+
+from src.modules.cc_analysis import MAX_ITERATION_COUNT
+from src.modules.cc_analysis import TOLERANCE
+from src.modules.cc_analysis import cc_analysis
+from src.modules.cc_analysis import pairs_to_matrix
+from src.modules.cc_analysis import project_vectors
+from src.modules.kmer import KMER_SIZE
+from src.modules.kmer import build_kmer_index
+from src.modules.kmer import get_kmers
+
+
+# Number of landmarks.
+LANDMARK_COUNT = 100
+
+# Number of held-out pairs.
+HELDOUT_SIZE = 1000
+
+
+def _get_kmer_distances(
+        kmer_index: Dict[str, np.ndarray],
+        kmer_s: Set[str],
+        size_s: np.ndarray
+        ) -> np.ndarray:
+    """\
+    Jaccard distances of the k-mers of a sequence to all sequences
+    (via the inverted k-mer index).
+    """
+    posting_s = [kmer_index[kmer] for kmer in kmer_s]
+    shared_s = np.zeros(len(size_s), dtype=np.int64)
+    if posting_s:
+        shared_s += np.bincount(np.concatenate(posting_s),
+                                minlength=len(size_s))
+    union_s = size_s + len(kmer_s) - shared_s
+
+    # Sequences without k-mers: maximum distance.
+    return 1.0 - shared_s / np.maximum(union_s, 1)
+
+
+def select_landmarks(
+        seq_s: Sequence[str],
+        landmark_count: int = LANDMARK_COUNT,
+        kmer_size: int = KMER_SIZE
+        ) -> List[int]:
+    """\
+    Select diverse landmarks by farthest-point selection:
+    The 1st landmark has the most distinct k-mers, each further landmark
+    has the largest distance to its closest landmark (Jaccard distance
+    of the distinct k-mers, ties by index).
+
+    :param seq_s:
+        Sequence of str
+
+    :param landmark_count:
+        int (positive)
+
+        (At most all sequences.)
+
+    :param kmer_size:
+        int (positive)
+
+    :return:
+        List of int: indices of the landmarks (in order of selection)
+    """
+    kmer_set_s = [get_kmers(seq, kmer_size) for seq in seq_s]
+    size_s = np.array([len(kmer_s) for kmer_s in kmer_set_s],
+                      dtype=np.int64)
+    kmer_index = build_kmer_index(seq_s, kmer_size)
+
+    landmark_s = []
+    min_distance_s = np.full(len(seq_s), np.inf)
+    idx = int(np.argmax(size_s)) if len(seq_s) else None
+    while idx is not None and len(landmark_s) < landmark_count:
+        landmark_s.append(idx)
+
+        # Distance to the closest landmark.
+        np.minimum(min_distance_s,
+                   _get_kmer_distances(kmer_index, kmer_set_s[idx], size_s),
+                   out=min_distance_s)
+        min_distance_s[idx] = -np.inf
+
+        idx = int(np.argmax(min_distance_s))
+        if min_distance_s[idx] == -np.inf:
+            idx = None
+
+    return landmark_s
+
+
+def select_landmark_pairs(
+        seq_count: int,
+        landmark_s: Sequence[int]
+        ) -> List[Tuple[int, int]]:
+    """\
+    Select the pairs among the landmarks and the pairs of each other
+    sequence with the landmarks.
+
+    :param seq_count:
+        int
+
+    :param landmark_s:
+        Sequence of int: indices of the landmarks
+
+    :return:
+        List of Tuple: (idx_a, idx_b) with idx_a < idx_b, sorted
+        (i.e. in the order of needleall, see
+         src.modules.gotoh.iterate_all_pair_alignments)
+    """
+    is_landmark = np.zeros(seq_count, dtype=bool)
+    is_landmark[list(landmark_s)] = True
+    sorted_landmark_s = np.flatnonzero(is_landmark)
+
+    pair_s = []
+    for idx in range(seq_count):
+        # Landmark: all later sequences, else: all later landmarks.
+        if is_landmark[idx]:
+            partner_s = range(idx + 1, seq_count)
+        else:
+            partner_s = sorted_landmark_s[sorted_landmark_s > idx].tolist()
+        pair_s.extend((idx, other) for other in partner_s)
+
+    return pair_s
+
+
+def sample_heldout_pairs(
+        seq_count: int,
+        landmark_s: Sequence[int],
+        sample_size: int = HELDOUT_SIZE,
+        seed: int = 0
+        ) -> List[Tuple[int, int]]:
+    """\
+    Draw a random sample of distinct pairs of other sequences
+    (NOT landmarks, i.e. NOT among the pairs of select_landmark_pairs).
+
+    :param seq_count:
+        int
+
+    :param landmark_s:
+        Sequence of int: indices of the landmarks
+
+    :param sample_size:
+        int
+
+        (At most all pairs of other sequences.)
+
+    :param seed:
+        int (deterministic sample)
+
+    :return:
+        List of Tuple: (idx_a, idx_b) with idx_a < idx_b, sorted
+    """
+    is_landmark = np.zeros(seq_count, dtype=bool)
+    is_landmark[list(landmark_s)] = True
+    other_s = np.flatnonzero(~is_landmark)
+    other_count = len(other_s)
+    all_pair_count = other_count * (other_count - 1) // 2
+    sample_size = min(sample_size, all_pair_count)
+
+    rng = np.random.default_rng(seed)
+
+    # Few pairs: sample from all pairs.
+    if all_pair_count <= 4 * sample_size:
+        pos_a_s, pos_b_s = np.triu_indices(other_count, 1)
+        chosen_s = rng.choice(all_pair_count, sample_size, replace=False)
+        pair_s = set(zip(other_s[pos_a_s[chosen_s]].tolist(),
+                         other_s[pos_b_s[chosen_s]].tolist()))
+
+    # Many pairs: draw (and reject repeated pairs).
+    else:
+        pair_s = set()
+        while len(pair_s) < sample_size:
+            pos_s = rng.integers(0, other_count, (sample_size, 2))
+            pos_s = pos_s[pos_s[:, 0] != pos_s[:, 1]]
+            for pos_a, pos_b in np.sort(other_s[pos_s], axis=1).tolist():
+                if len(pair_s) == sample_size:
+                    break
+                pair_s.add((pos_a, pos_b))
+
+    return sorted(pair_s)
+
+
+def map_with_landmarks(
+        n: int,
+        num_a_s: np.ndarray,
+        num_b_s: np.ndarray,
+        value_s: np.ndarray,
+        landmark_num_s: Sequence[int],
+        dim: int,
+        max_iteration_count: int = MAX_ITERATION_COUNT,
+        tolerance: float = TOLERANCE
+        ) -> Tuple[np.ndarray, float, float]:
+    """\
+    Map the landmarks by cc_analysis (pairs among the landmarks) and
+    project the other objects (pairs with the landmarks).  Pairs among
+    other objects are ignored (e.g. held-out pairs).
+
+    :param n:
+        int
+
+        Number of objects (numbered from 1 to n).
+
+    :param num_a_s:
+        np.ndarray (int)
+
+    :param num_b_s:
+        np.ndarray (int)
+
+    :param value_s:
+        np.ndarray (float)
+
+    :param landmark_num_s:
+        Sequence of int: numbers of the landmarks
+
+    :param dim:
+        int (positive)
+
+    :param max_iteration_count:
+        int
+
+    :param tolerance:
+        float
+
+    :raise ValueError:
+        - if the landmarks are NOT connected enough
+          (see src.modules.cc_analysis.check_connectivity).
+        - if an other object has less than dim landmarks
+          (see src.modules.cc_analysis.project_vectors).
+
+    :return:
+        Tuple:
+        - np.ndarray (float64, shape: (n, dim)): vectors
+          (index: number - 1)
+        - float: residual of the pairs among the landmarks
+        - float: residual of the pairs with the landmarks
+    """
+    if len(num_a_s) and (min(num_a_s.min(), num_b_s.min()) < 1
+                         or max(num_a_s.max(), num_b_s.max()) > n):
+        raise ValueError(f'Faulty numbers of objects:\n'
+                         f'not within 1 to {n}')
+
+    # Landmarks: index among the landmarks (or -1),
+    # other objects: index among the other objects (or -1).
+    is_landmark = np.zeros(n + 1, dtype=bool)
+    is_landmark[list(landmark_num_s)] = True
+    is_landmark[0] = False
+    landmark_idx_of_num = np.full(n + 1, -1, dtype=np.int64)
+    landmark_idx_of_num[is_landmark] = np.arange(int(is_landmark.sum()))
+    other_idx_of_num = np.full(n + 1, -1, dtype=np.int64)
+    is_other = ~is_landmark
+    is_other[0] = False
+    other_idx_of_num[is_other] = np.arange(int(is_other.sum()))
+
+    # Map the landmarks.
+    is_among = is_landmark[num_a_s] & is_landmark[num_b_s]
+    rel_mat, known_mat = pairs_to_matrix(
+        int(is_landmark.sum()),
+        landmark_idx_of_num[num_a_s[is_among]] + 1,
+        landmark_idx_of_num[num_b_s[is_among]] + 1,
+        value_s[is_among])
+    landmark_vec_s, landmark_residual, _ = cc_analysis(
+        rel_mat, known_mat, dim,
+        max_iteration_count=max_iteration_count,
+        tolerance=tolerance)
+
+    # Project the other objects (either order).
+    is_other_landmark = is_other[num_a_s] & is_landmark[num_b_s]
+    is_landmark_other = is_landmark[num_a_s] & is_other[num_b_s]
+    other_vec_s, other_residual = project_vectors(
+        landmark_vec_s, int(is_other.sum()),
+        np.concatenate([other_idx_of_num[num_a_s[is_other_landmark]],
+                        other_idx_of_num[num_b_s[is_landmark_other]]]),
+        np.concatenate([landmark_idx_of_num[num_b_s[is_other_landmark]],
+                        landmark_idx_of_num[num_a_s[is_landmark_other]]]),
+        np.concatenate([value_s[is_other_landmark],
+                        value_s[is_landmark_other]]))
+
+    vec_s = np.zeros((n, dim))
+    vec_s[is_landmark[1:]] = landmark_vec_s
+    vec_s[is_other[1:]] = other_vec_s
+
+    return vec_s, landmark_residual, other_residual
+
+
+def get_embedding_error(
+        vec_s: np.ndarray,
+        num_a_s: np.ndarray,
+        num_b_s: np.ndarray,
+        value_s: np.ndarray
+        ) -> float:
+    """\
+    Root-mean-square error of the dot products of the vectors for the
+    pairs (e.g. held-out pairs).
+
+    :param vec_s:
+        np.ndarray (shape: (n, dim), index: number - 1)
+
+    :param num_a_s:
+        np.ndarray (int)
+
+    :param num_b_s:
+        np.ndarray (int)
+
+    :param value_s:
+        np.ndarray (float)
+
+    :return:
+        float (NaN, if there are no pairs)
+    """
+    if not len(value_s):
+        return float('nan')
+
+    diff_s = value_s - np.einsum('ij,ij->i', vec_s[num_a_s - 1],
+                                 vec_s[num_b_s - 1])
+
+    return float(np.sqrt(np.mean(diff_s ** 2)))
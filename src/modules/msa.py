@@ -0,0 +1,497 @@
+"""\
+Quantify all pairwise alignments contained in a multiple sequence
+alignment (MSA).
+
+Each pair of aligned sequences of the MSA is a pairwise global
+alignment.  Instead of quantifying these alignments one by one, the MSA
+is encoded once as a matrix of residue-codes and the quantifiers of
+whole tiles of pairs are calculated with matrix-multiplications.
+"""
+
+import collections
+import multiprocessing
+from typing import Generator, Sequence, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+from src.modules.substmat import CompiledSubstmat
+from src.modules.substmat import UNKNOWN_CODE
+from src.modules.substmat import as_compiled_substmat
+
+
+# Default memory-budget of the MSA all-pairs computation (in bytes).
+MSA_MEMORY_BUDGET = 1 << 30
+
+# Approximate working memory per pair (in bytes):
+# - results of a block of rows:
+#   quantifier (8), masks (2), indices of the present pairs (16),
+#   num_smaller/num_larger/quantifier of the output (24) and
+#   temporaries.
+ROW_PAIR_BYTES = 56
+# - tile:
+#   3 arrays per residue-code (compositions, weighted compositions)
+#   and about 12 further arrays.
+TILE_PAIR_BYTES_PER_CODE = 3 * 8
+TILE_PAIR_BYTES = 12 * 8
+
+
+def encode_msa(
+        seq_s: Sequence[str],
+        substmat: CompiledSubstmat
+        ) -> np.ndarray:
+    """\
+    Encode the aligned sequences of the input MSA as a matrix of
+    residue-codes.
+
+    Columns that only contain gaps are removed, because they do NOT
+    influence any quantifier.
+
+    Throw ValueError, if the aligned sequences do NOT have the same
+    length or contain characters that are NOT part of the substitution
+    matrix.
+
+    :param seq_s:
+        Sequence of str: aligned sequences
+
+    :param substmat:
+        CompiledSubstmat
+
+    :return:
+        np.ndarray (uint8, shape: (len(seq_s), number of columns))
+
+        (see src.modules.substmat.encode_seq)
+    """
+    # Length of the MSA.
+    msa_length = len(seq_s[0]) if seq_s else 0
+
+    # Sanity check: fail.
+    # The aligned sequences do NOT have the same length.
+    for seq in seq_s:
+        if len(seq) != msa_length:
+            raise ValueError(
+                f'Faulty MSA:\n'
+                f'  The aligned sequences do NOT have the same length.')
+
+    # Join all sequences in a single buffer.
+    try:
+        buffer = ''.join(seq_s).encode('ascii')
+    # Sanity check: fail.
+    # NON-ASCII-characters can NOT be encoded.
+    except UnicodeEncodeError:
+        raise ValueError(
+            f'Faulty MSA:\n'
+            f'  The MSA contains NON-ASCII-characters.')
+
+    # Look up residue-code of each character.
+    codes = substmat.code_table[np.frombuffer(buffer, dtype=np.uint8)]
+    codes = codes.reshape(len(seq_s), msa_length)
+
+    # Sanity check: fail.
+    # Characters that are NOT part of the substitution matrix.
+    if (codes == UNKNOWN_CODE).any():
+        raise ValueError(
+            f'Faulty MSA:\n'
+            f'  The MSA contains residues that are NOT part of the '
+            f'substitution matrix.')
+
+    # Remove columns that only contain gaps.
+    is_gap_column = (codes == substmat.gap_code).all(axis=0)
+
+    return np.ascontiguousarray(codes[:, ~is_gap_column])
+
+
+def quantify_msa_tile(
+        codes_a: np.ndarray,
+        codes_b: np.ndarray,
+        substmat: CompiledSubstmat
+        ) -> np.ndarray:
+    """\
+    Quantify the pairwise alignments between 2 groups of rows of an
+    encoded MSA.
+
+    Same result as src.modules.gali.quantify_batch for each pairwise
+    alignment (sequence A: row of codes_a, sequence B: row of codes_b).
+
+    All sums are sums of integers, which are calculated exactly with
+    float64-matrix-multiplications, i.e. the results are identical.
+
+    For each residue-code k, the tile is built from
+    - X_k: positions with residue k (one-hot)
+    - G:   positions with any residue
+    and the following matrix-multiplications over the columns:
+    - length of the indel-free alignments: G_a @ G_b.T
+    - scores:                  sum over k of S[A, k] @ X_bk.T
+    - compositions of A:       X_ak @ G_b.T
+    - compositions of B:       G_a @ X_bk.T
+    - self-alignment-scores:   diag(S)[A] @ G_b.T, G_a @ diag(S)[B].T
+
+    :param codes_a:
+        np.ndarray (uint8, shape: (count_a, length))
+
+        (see encode_msa)
+
+    :param codes_b:
+        np.ndarray (uint8, shape: (count_b, length))
+
+        (see encode_msa)
+
+    :param substmat:
+        CompiledSubstmat
+
+    :return:
+        np.ndarray (float64, shape: (count_a, count_b))
+
+        Quantifier of each pairwise alignment.
+        NaN signals that the quantifier can NOT be calculated
+        (when max_score == mean_score).
+    """
+    # -----------------------------------------------------------------|------|
+    # Preparations.
+
+    scores = substmat.scores.astype(np.float64)
+
+    # Residue-codes that are present in the tile.
+    # (Only these contribute to the scores and compositions.)
+    code_s = np.union1d(np.unique(codes_a), np.unique(codes_b))
+    code_s = code_s[code_s != substmat.gap_code]
+
+    # Residue-positions of each sequence.
+    is_res_a = (codes_a != substmat.gap_code).astype(np.float64)
+    is_res_b = (codes_b != substmat.gap_code).astype(np.float64)
+
+    # -----------------------------------------------------------------|------|
+    # Indel-free alignments.
+
+    # Get lengths.
+    indelfree_gali_length_s = is_res_a @ is_res_b.T
+
+    # Get scores and compositions:
+    # index: residue-code (of code_s), row: sequence A, column: sequence B,
+    # value: count.
+    score_s = np.zeros(indelfree_gali_length_s.shape)
+    composition_a_s = np.empty((len(code_s),) + score_s.shape)
+    composition_b_s = np.empty((len(code_s),) + score_s.shape)
+    for idx, code in enumerate(code_s):
+        is_code_a = (codes_a == code).astype(np.float64)
+        is_code_b = (codes_b == code).astype(np.float64)
+
+        # (Positions with a gap score zero in the compiled substitution
+        #  matrix, i.e. they do NOT have to be masked.)
+        score_s += scores[codes_a, code] @ is_code_b.T
+
+        composition_a_s[idx] = is_code_a @ is_res_b.T
+        composition_b_s[idx] = is_res_a @ is_code_b.T
+
+    # Get max-scores:
+    # lower score of the 2 self-alignments.
+    self_score_s = np.diagonal(scores)
+    max_score_s = np.minimum(self_score_s[codes_a] @ is_res_b.T,
+                             is_res_a @ self_score_s[codes_b].T)
+
+    # Get mean-scores:
+    # composition_a @ substmat @ composition_b / length.
+    # (Trivial case: the indel-free alignment is empty.)
+    weighted_b_s = np.tensordot(scores[np.ix_(code_s, code_s)],
+                                composition_b_s,
+                                axes=(1, 0))
+    mean_score_s = np.zeros(score_s.shape)
+    is_nonempty = indelfree_gali_length_s != 0
+    mean_score_s[is_nonempty] = (
+        np.einsum('kij,kij->ij', composition_a_s, weighted_b_s)[is_nonempty]
+        / indelfree_gali_length_s[is_nonempty])
+
+    # Special case:
+    #
+    # The quantifier can NOT be calculated,
+    # because the denominator would be zero for the quantifier of the
+    # indel-free alignment.
+    is_valid = max_score_s != mean_score_s
+
+    # Do feature scaling.
+    quantifier_s = np.full(score_s.shape, np.nan)
+    quantifier_s[is_valid] = (
+        (score_s[is_valid] - mean_score_s[is_valid])
+        / (max_score_s[is_valid] - mean_score_s[is_valid]))
+
+    # -----------------------------------------------------------------|------|
+    # Determine coverage of indel-free alignments in relation to the
+    # input alignments.
+
+    # Get residue-count for longer sequence of each input alignment.
+    gali_longseq_length_s = np.maximum(is_res_a.sum(axis=1)[:, np.newaxis],
+                                       is_res_b.sum(axis=1)[np.newaxis, :])
+
+    # Adjust quantifiers.
+    quantifier_s[is_valid] *= (indelfree_gali_length_s[is_valid]
+                               / gali_longseq_length_s[is_valid])
+
+    return quantifier_s
+
+
+def get_msa_block_sizes(
+        n: int,
+        code_count: int,
+        memory_budget: int,
+        workers: int = 1
+        ) -> Tuple[int, int]:
+    """\
+    Choose the block-sizes of the MSA all-pairs computation, such that
+    the working memory stays within the input memory-budget.
+
+    Each worker-process gets an equal share of the memory-budget:
+    - half of it for the results of a block of rows
+      (row_block_size * n pairs, about ROW_PAIR_BYTES each),
+    - half of it for a tile
+      (row_block_size * col_block_size pairs, about
+       TILE_PAIR_BYTES_PER_CODE * code_count + TILE_PAIR_BYTES each).
+
+    I.e. the row-blocks get smaller as n grows, while the memory stays
+    the same.  There are at least 4 row-blocks per worker-process (if
+    n is large enough) to balance the load.
+
+    :param n:
+        int
+
+        Number of sequences.
+
+    :param code_count:
+        int
+
+        Number of residue-codes (see quantify_msa_tile).
+
+    :param memory_budget:
+        int
+
+        Memory-budget in bytes.
+
+    :param workers:
+        int
+
+        Number of worker-processes.
+
+    :return:
+        Tuple:
+        - int: row_block_size
+        - int: col_block_size
+    """
+    # Memory-budget of each worker-process.
+    worker_budget = memory_budget // max(1, workers)
+
+    # Number of rows, whose results fit into half of the budget.
+    row_block_size = (worker_budget // 2) // (ROW_PAIR_BYTES * max(1, n))
+    # At least 4 row-blocks per worker-process.
+    row_block_size = min(row_block_size, -(-n // (4 * max(1, workers))))
+    row_block_size = max(1, row_block_size)
+
+    # Number of columns, whose tile fits into the other half.
+    tile_pair_bytes = (TILE_PAIR_BYTES_PER_CODE * code_count
+                       + TILE_PAIR_BYTES)
+    col_block_size = (worker_budget // 2) // (tile_pair_bytes
+                                              * row_block_size)
+    col_block_size = max(1, min(col_block_size, n))
+
+    return row_block_size, col_block_size
+
+
+def quantify_msa_rows(
+        codes: np.ndarray,
+        substmat: CompiledSubstmat,
+        row_start: int,
+        row_end: int,
+        col_block_size: int
+        ) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """\
+    Quantify all pairs of a block of rows of the encoded MSA with all
+    following sequences (see iterate_msa_quantifiers).
+
+    The pairs are quantified in tiles of
+    (row_end - row_start) * col_block_size pairs.
+
+    :param codes:
+        np.ndarray (uint8, shape: (n, length))
+
+        (see encode_msa)
+
+    :param substmat:
+        CompiledSubstmat
+
+    :param row_start:
+        int
+
+        (index starts with 0)
+
+    :param row_end:
+        int
+
+        (exclusive)
+
+    :param col_block_size:
+        int
+
+    :return:
+        Tuple: quantified pairs in sorted order
+        (pairs, whose quantifier can NOT be calculated, are omitted)
+        - np.ndarray (int64): num_smaller
+        - np.ndarray (int64): num_larger
+        - np.ndarray (float64): quantifier
+    """
+    n = len(codes)
+
+    # Quantifiers of the rows with all following sequences
+    # (row: num_smaller, column: num_larger).
+    quantifier_s = np.full((row_end - row_start, n - row_start), np.nan)
+    for col_start in range(row_start, n, col_block_size):
+        col_end = min(col_start + col_block_size, n)
+        quantifier_s[:, col_start - row_start:col_end - row_start] = \
+            quantify_msa_tile(codes[col_start:col_end],
+                              codes[row_start:row_end],
+                              substmat).T
+
+    # Only pairs of different sequences with num_smaller < num_larger,
+    # whose quantifier can be calculated.
+    row_s, col_s = np.nonzero(
+        np.triu(~np.isnan(quantifier_s), k=1))
+
+    return (row_s + row_start + 1,
+            col_s + row_start + 1,
+            quantifier_s[row_s, col_s])
+
+
+# Encoded MSA and substitution matrix of a worker-process
+# (see iterate_msa_quantifiers).
+_worker_state = {}
+
+
+def _init_worker(
+        codes: np.ndarray,
+        substmat: CompiledSubstmat):
+    """\
+    Store the input of each worker-process once
+    (instead of sending it with each block of rows).
+    """
+    _worker_state['codes'] = codes
+    _worker_state['substmat'] = substmat
+
+
+def _quantify_msa_rows_in_worker(
+        row_range: Tuple[int, int],
+        col_block_size: int
+        ) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """\
+    Run quantify_msa_rows in a worker-process.
+    """
+    row_start, row_end = row_range
+    return quantify_msa_rows(_worker_state['codes'],
+                             _worker_state['substmat'],
+                             row_start,
+                             row_end,
+                             col_block_size)
+
+
+def iterate_msa_quantifiers(
+        codes: np.ndarray,
+        substmat: Union[pd.DataFrame, CompiledSubstmat],
+        block_size: Union[int, None] = None,
+        memory_budget: int = MSA_MEMORY_BUDGET,
+        workers: int = 1
+        ) -> Generator[Tuple[np.ndarray, np.ndarray, np.ndarray],
+                       None, None]:
+    """\
+    Quantify all pairs of different aligned sequences of the encoded MSA.
+
+    The sequences are numbered in the order of the MSA (starts with 1).
+    For the pair of num_smaller and num_larger, the pairwise alignment
+    has the sequence num_larger as sequence A and the sequence
+    num_smaller as sequence B (i.e. the 1st occurrence of this pair in
+    the output of src.pipeline.MSA_to_pairwiseFASTA).
+
+    The pairs are quantified in tiles (see quantify_msa_tile) and
+    yielded in sorted order, one block of rows (num_smaller) at a time.
+    The blocks of rows can be quantified by several worker-processes in
+    parallel; they are still yielded in sorted order.
+
+    :param codes:
+        np.ndarray (uint8, shape: (n, length))
+
+        (see encode_msa)
+
+    :param substmat:
+        pd.DataFrame (as returned by parse_substmat_as_df)
+
+        - or -
+
+        CompiledSubstmat
+
+    :param block_size:
+        int
+
+        Number of sequences per tile-side.
+
+        (default: None, i.e. chosen by get_msa_block_sizes)
+
+    :param memory_budget:
+        int
+
+        Memory-budget in bytes (see get_msa_block_sizes).
+        (Only used, if block_size is None.)
+
+    :param workers:
+        int
+
+        Number of worker-processes.
+
+    :yield:
+        Tuple: block of quantified pairs
+        (pairs, whose quantifier can NOT be calculated, are omitted)
+        - np.ndarray (int64): num_smaller
+        - np.ndarray (int64): num_larger
+        - np.ndarray (float64): quantifier
+    """
+    # Compile substitution matrix (if necessary).
+    substmat = as_compiled_substmat(substmat)
+
+    n = len(codes)
+
+    # Choose block-sizes.
+    if block_size is None:
+        code_count = len(np.unique(codes))
+        row_block_size, col_block_size = get_msa_block_sizes(
+            n, code_count, memory_budget, workers)
+    else:
+        row_block_size, col_block_size = block_size, block_size
+
+    # Blocks of rows.
+    row_range_s = [(row_start, min(row_start + row_block_size, n))
+                   for row_start in range(0, n, row_block_size)]
+
+    # Single process.
+    if workers == 1:
+        for row_start, row_end in row_range_s:
+            yield quantify_msa_rows(codes, substmat,
+                                    row_start, row_end, col_block_size)
+
+    # Several processes.
+    else:
+        with multiprocessing.Pool(workers,
+                                  initializer=_init_worker,
+                                  initargs=(codes, substmat)) as pool:
+
+            # Blocks of rows that are being quantified (in sorted order).
+            # (At most workers + 1 blocks in flight, i.e. the finished
+            #  blocks do NOT pile up, if the consumer is slow.)
+            pending_s = collections.deque()
+
+            for row_range in row_range_s:
+                pending_s.append(pool.apply_async(
+                    _quantify_msa_rows_in_worker,
+                    (row_range, col_block_size)))
+
+                # Yield finished blocks,
+                # while keeping all worker-processes busy.
+                while len(pending_s) > workers:
+                    yield pending_s.popleft().get()
+
+            # Yield remaining blocks.
+            while pending_s:
+                yield pending_s.popleft().get()
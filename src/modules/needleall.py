@@ -0,0 +1,496 @@
+"""\
+Calculate all pairwise global alignments of a FASTA-file in parallel
+blocks.
+
+`needleall -asequence X -bsequence X` aligns all n*n ordered pairs on a
+single core.  Instead, the FASTA-entries are split into blocks and only
+the diagonal block-pairs and the block-pairs above the diagonal are
+aligned (as separate needleall-processes or with the native aligner,
+see src.modules.gotoh):
+
+    block   0   1   2
+        0   x   x   x
+        1       x   x
+        2           x
+
+The outputs are merged in a deterministic order: for each entry A, its
+alignments with all entries B of its own and the following blocks.
+This contains every self-alignment and the 1st occurrence of every pair
+of the full output (in the same order), i.e. the quantifiers, the
+numbering and the connectivity are the same
+(see src.modules.quantify.PairwiseQuantifier).
+"""
+
+import collections
+import functools
+import multiprocessing
+import os
+import subprocess
+from typing import Dict, Generator, List, Sequence, TextIO, Tuple
+
+from src.modules.fasta import iterate_fasta_pairs
+from src.modules.gotoh import align_global_batch
+from src.modules.substmat import CompiledSubstmat
+
+
+def get_block_count(
+        seq_count: int,
+        workers: int
+        ) -> int:
+    """\
+    Get the number of blocks, such that there are at least 4 block-pairs
+    per worker-process (for load-balancing).
+
+    :param seq_count:
+        int
+
+    :param workers:
+        int
+
+    :return:
+        int (at most seq_count, at least 1)
+    """
+    block_count = 1
+    while (block_count * (block_count + 1) // 2 < 4 * workers
+           and block_count < seq_count):
+        block_count += 1
+
+    return block_count
+
+
+def split_into_blocks(
+        length_s: Sequence[int],
+        block_count: int
+        ) -> List[Tuple[int, int]]:
+    """\
+    Split the input sequences into consecutive blocks with (about) the
+    same summed length.
+
+    The cost of a block-pair is the sum of L_a * L_b over its pairs,
+    i.e. the product of the summed lengths of the 2 blocks (see
+    plan_block_pairs).  Blocks with the same summed length result in
+    block-pairs with the same cost (also on the diagonal).
+
+    :param length_s:
+        Sequence of int: length of each sequence
+
+    :param block_count:
+        int
+
+    :return:
+        List of Tuple: (start, end) index-range of each NON-empty block
+    """
+    # Cumulative length at the end of each sequence.
+    total_length = sum(length_s)
+    cum_length = 0
+
+    block_range_s = []
+    start = 0
+    for idx, length in enumerate(length_s):
+        cum_length += length
+
+        # Close the block at the next boundary
+        # (or when the remaining sequences are needed for the remaining
+        #  blocks).
+        boundary = total_length * (len(block_range_s) + 1) / block_count
+        remaining_block_count = block_count - len(block_range_s) - 1
+        if (cum_length >= boundary
+                or len(length_s) - idx - 1 <= remaining_block_count):
+            block_range_s.append((start, idx + 1))
+            start = idx + 1
+
+        if len(block_range_s) == block_count - 1:
+            break
+
+    # Last block.
+    if start < len(length_s):
+        block_range_s.append((start, len(length_s)))
+
+    return block_range_s
+
+
+def plan_block_pairs(
+        length_s: Sequence[int],
+        block_range_s: Sequence[Tuple[int, int]]
+        ) -> List[Tuple[int, int, int]]:
+    """\
+    Plan the diagonal block-pairs and the block-pairs above the
+    diagonal (in the order of the merged output).
+
+    :param length_s:
+        Sequence of int: length of each sequence
+
+    :param block_range_s:
+        Sequence of Tuple (see split_into_blocks)
+
+    :return:
+        List of Tuple:
+        - int: index of block A
+        - int: index of block B (>= block A)
+        - int: estimated cost (sum of L_a * L_b over all aligned pairs)
+    """
+    # Summed length of each block.
+    block_length_s = [sum(length_s[start:end])
+                      for start, end in block_range_s]
+
+    return [(block_a, block_b,
+             block_length_s[block_a] * block_length_s[block_b])
+            for block_a in range(len(block_range_s))
+            for block_b in range(block_a, len(block_range_s))]
+
+
+def write_fasta(
+        f: TextIO,
+        entry_s: Sequence[Tuple[str, str]]):
+    """\
+    Write the input FASTA-entries (as returned by iterate_fasta).
+
+    :param f:
+        TextIO
+
+    :param entry_s:
+        Sequence of Tuple: FASTA-entry
+        - str: header (starting with '>')
+        - str: body
+    """
+    for header, body in entry_s:
+        f.write(f"{header}\n{body}\n")
+
+
+# ---------------------------------------------------------------------|------|
+# Block-pairs.
+
+def _run_needleall(
+        block_pair: Tuple[int, int],
+        block_path_s: Sequence[str],
+        tmp_dir_path: str,
+        executable: str,
+        penalty_kwargs: Dict,
+        minscore: float
+        ) -> Tuple[str, str]:
+    """\
+    Align a block-pair with needleall.
+
+    :return:
+        Tuple:
+        - str: path of the pairwise alignments (FASTA-format)
+        - str: path of the log (errfile of needleall)
+    """
+    block_a, block_b = block_pair
+    out_path = os.path.join(tmp_dir_path, f"{block_a}_{block_b}.fas")
+    log_path = os.path.join(tmp_dir_path, f"{block_a}_{block_b}.log")
+
+    # Same arguments as in run_pipeline.sh.
+    arg_s = [executable,
+             '-asequence', block_path_s[block_a],
+             '-bsequence', block_path_s[block_b],
+             '-gapopen', str(penalty_kwargs['gapopen_penalty']),
+             '-gapextend', str(penalty_kwargs['gapextend_penalty']),
+             '-endweight', str(penalty_kwargs['endweight']),
+             '-endopen', str(penalty_kwargs['endopen_penalty']),
+             '-endextend', str(penalty_kwargs['endextend_penalty'])]
+    if minscore is not None:
+        arg_s += ['-minscore', str(minscore)]
+    arg_s += ['-auto',
+              '-stdout',
+              '-aformat3', 'fasta',
+              '-errfile', log_path]
+
+    # Throw CalledProcessError, if needleall fails.
+    with open(out_path, 'w') as f:
+        subprocess.run(arg_s, stdout=f, check=True)
+
+    return out_path, log_path
+
+
+def _run_native(
+        block_pair: Tuple[int, int],
+        block_entry_s_s: Sequence[Sequence[Tuple[str, str]]],
+        substmat: CompiledSubstmat,
+        tmp_dir_path: str,
+        penalty_kwargs: Dict,
+        minscore: float
+        ) -> Tuple[str, None]:
+    """\
+    Align a block-pair with the native aligner
+    (same output-format as needleall).
+
+    :return:
+        Tuple:
+        - str: path of the pairwise alignments (FASTA-format)
+        - None: there is NO log
+    """
+    block_a, block_b = block_pair
+    out_path = os.path.join(tmp_dir_path, f"{block_a}_{block_b}.fas")
+
+    # All ordered pairs (same order as needleall).
+    entry_pair_s = [(entry_a, entry_b)
+                    for entry_a in block_entry_s_s[block_a]
+                    for entry_b in block_entry_s_s[block_b]]
+
+    result_s = align_global_batch([(entry_a[1], entry_b[1])
+                                   for entry_a, entry_b in entry_pair_s],
+                                  substmat,
+                                  **penalty_kwargs)
+
+    with open(out_path, 'w') as f:
+        for (entry_a, entry_b), (score, (ali_a, ali_b)) in zip(entry_pair_s,
+                                                               result_s):
+            # Omit alignments below the threshold.
+            if minscore is not None and score < minscore:
+                continue
+            write_fasta(f, [(entry_a[0], ali_a), (entry_b[0], ali_b)])
+
+    return out_path, None
+
+
+def _get_name(
+        header: str
+        ) -> str:
+    """\
+    Name of an entry in the output of needleall
+    (FASTA-header without '>' up to the 1st whitespace).
+    """
+    return header.lstrip('>').split(maxsplit=1)[0]
+
+
+def merge_block_row(
+        f: TextIO,
+        entry_s: Sequence[Tuple[str, str]],
+        out_path_s: Sequence[str]) -> int:
+    """\
+    Write the alignments of a row of block-pairs: for each entry A of the
+    block, its alignments with the entries B of each block-pair (in
+    order).
+
+    :param f:
+        TextIO
+
+    :param entry_s:
+        Sequence of Tuple: FASTA-entries of block A
+
+    :param out_path_s:
+        Sequence of str: path of the output of each block-pair of the row
+        (in order)
+
+    :return:
+        int: number of written alignments
+    """
+    ali_count = 0
+
+    opened_file_s = [open(out_path) for out_path in out_path_s]
+    try:
+        # Alignments of each block-pair.
+        # (The output is empty, if all alignments are below minscore.)
+        ali_s_s = [iterate_fasta_pairs(opened_file)
+                   if os.path.getsize(opened_file.name) else iter(())
+                   for opened_file in opened_file_s]
+        # Next alignment of each block-pair (None: exhausted).
+        next_ali_s = [next(ali_s, None) for ali_s in ali_s_s]
+
+        # For each entry A.
+        for header, _ in entry_s:
+            name = _get_name(header)
+
+            # Alignments of entry A in each block-pair.
+            # (needleall writes all alignments of an entry A together.)
+            for k, ali_s in enumerate(ali_s_s):
+                while (next_ali_s[k] is not None
+                       and _get_name(next_ali_s[k][0][0]) == name):
+                    write_fasta(f, next_ali_s[k])
+                    ali_count += 1
+                    next_ali_s[k] = next(ali_s, None)
+
+        # Sanity check: fail.
+        # Alignments that do NOT belong to any entry A of the block.
+        for next_ali in next_ali_s:
+            if next_ali is not None:
+                raise ValueError(
+                    f'Faulty alignments:\n'
+                    f'  {next_ali[0][0]}\n'
+                    f'  The alignments are NOT in the order of the entries '
+                    f'of the block.')
+    finally:
+        for opened_file in opened_file_s:
+            opened_file.close()
+
+    return ali_count
+
+
+def iterate_block_rows(
+        entry_s: Sequence[Tuple[str, str]],
+        tmp_dir_path: str,
+        block_count: int,
+        workers: int = 1,
+        aligner: str = 'needleall',
+        executable: str = 'needleall',
+        substmat: CompiledSubstmat = None,
+        minscore: float = None,
+        gapopen_penalty: float = 10.0,
+        gapextend_penalty: float = 0.5,
+        endweight: bool = False,
+        endopen_penalty: float = 10.0,
+        endextend_penalty: float = 0.5
+        ) -> Generator[Tuple[Sequence[Tuple[str, str]], List[str],
+                             List[str]], None, None]:
+    """\
+    Align all block-pairs (see plan_block_pairs) and yield the outputs
+    row by row, as soon as all block-pairs of a row are finished.
+
+    :param entry_s:
+        Sequence of Tuple: FASTA-entries (as returned by iterate_fasta)
+
+    :param tmp_dir_path:
+        str
+
+        Directory for the blocks and the outputs of the block-pairs.
+
+    :param block_count:
+        int
+
+    :param workers:
+        int
+
+        Number of worker-processes, i.e. block-pairs that are aligned
+        concurrently.
+
+    :param aligner:
+        str
+
+        - 'needleall': EMBOSS needleall (or a compatible executable).
+        - 'native':    src.modules.gotoh.align_global_batch.
+
+    :param executable:
+        str
+
+        needleall-executable (only used, if aligner is 'needleall').
+
+    :param substmat:
+        CompiledSubstmat (only used, if aligner is 'native')
+
+    :param minscore:
+        float
+
+        Omit alignments with a score below this threshold.
+        (None: all alignments are kept.)
+
+    :param gapopen_penalty, gapextend_penalty, endweight,
+           endopen_penalty, endextend_penalty:
+        see src.modules.gotoh.align_global
+        (same defaults as for needleall)
+
+    :yield:
+        Tuple:
+        - Sequence of Tuple: FASTA-entries of block A
+        - List of str: paths of the output of each block-pair of the row
+        - List of str: paths of the log of each block-pair of the row
+                       (None, if there is NO log)
+    """
+    # -----------------------------------------------------------------|------|
+    # Plan the work.
+
+    length_s = [len(body) for _, body in entry_s]
+    block_range_s = split_into_blocks(length_s, block_count)
+    block_entry_s_s = [entry_s[start:end] for start, end in block_range_s]
+
+    # Block-pairs in the order of the merged output.
+    # (The blocks have about the same summed length, i.e. the block-pairs
+    #  have about the same cost, and the rows are finished one after the
+    #  other.)
+    block_pair_s = [(block_a, block_b) for block_a, block_b, _
+                    in plan_block_pairs(length_s, block_range_s)]
+
+    # -----------------------------------------------------------------|------|
+    # Prepare the aligner.
+
+    penalty_kwargs = dict(gapopen_penalty=gapopen_penalty,
+                          gapextend_penalty=gapextend_penalty,
+                          endweight=endweight,
+                          endopen_penalty=endopen_penalty,
+                          endextend_penalty=endextend_penalty)
+
+    if aligner == 'needleall':
+
+        # Write each block as FASTA-file.
+        block_path_s = []
+        for block_idx, block_entry_s in enumerate(block_entry_s_s):
+            block_path = os.path.join(tmp_dir_path, f"block_{block_idx}.fas")
+            with open(block_path, 'w') as f:
+                write_fasta(f, block_entry_s)
+            block_path_s.append(block_path)
+
+        run = functools.partial(_run_needleall,
+                                block_path_s=block_path_s,
+                                tmp_dir_path=tmp_dir_path,
+                                executable=executable,
+                                penalty_kwargs=penalty_kwargs,
+                                minscore=minscore)
+
+    elif aligner == 'native':
+        run = functools.partial(_run_native,
+                                block_entry_s_s=block_entry_s_s,
+                                substmat=substmat,
+                                tmp_dir_path=tmp_dir_path,
+                                penalty_kwargs=penalty_kwargs,
+                                minscore=minscore)
+
+    # Sanity check: fail.
+    # Unknown aligner.
+    else:
+        raise ValueError(
+            f'Faulty aligner:\n'
+            f'  {aligner}\n'
+            f'  Available aligners: needleall, native.')
+
+    # -----------------------------------------------------------------|------|
+    # Align block-pairs and collect rows.
+
+    def collect_rows(result_s):
+        """\
+        Collect the results of the block-pairs row by row.
+        """
+        out_path_s = []
+        log_path_s = []
+        for (block_a, block_b), (out_path, log_path) in zip(block_pair_s,
+                                                            result_s):
+            out_path_s.append(out_path)
+            log_path_s.append(log_path)
+
+            # The row is complete.
+            if block_b == len(block_range_s) - 1:
+                yield block_entry_s_s[block_a], out_path_s, log_path_s
+                out_path_s = []
+                log_path_s = []
+
+    # Single process.
+    if workers == 1:
+        yield from collect_rows(map(run, block_pair_s))
+
+    # Several processes.
+    # (The block-pairs are started in order, i.e. the rows are finished
+    #  one after the other.)
+    else:
+        with multiprocessing.Pool(workers) as pool:
+
+            def iterate_results():
+                """\
+                Yield the results of the block-pairs in order,
+                with at most workers + 1 block-pairs in flight (i.e. the
+                finished outputs do NOT pile up, if the consumer is
+                slow).
+                """
+                pending_s = collections.deque()
+
+                for block_pair in block_pair_s:
+                    pending_s.append(pool.apply_async(run, (block_pair,)))
+
+                    # Yield finished block-pairs,
+                    # while keeping all worker-processes busy.
+                    while len(pending_s) > workers:
+                        yield pending_s.popleft().get()
+
+                # Yield remaining block-pairs.
+                while pending_s:
+                    yield pending_s.popleft().get()
+
+            yield from collect_rows(iterate_results())
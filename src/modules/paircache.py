@@ -0,0 +1,544 @@
+"""\
+Cache the results of pairwise alignments across jobs
+(content-addressed, SQLite).
+
+The same pairs of sequences (e.g. reference proteins) occur in many jobs.
+Each result is stored under a hash of both FASTA-bodies and the scoring
+scheme (substitution matrix, gap penalties, end gap penalties), i.e. it
+does NOT depend on FASTA-headers, on the numbering or on the job.
+
+A row of the cache holds:
+- score: score of the alignment, or an upper bound of the score, if the
+  alignment is below the threshold of the job (see
+  src.modules.gotoh.align_global_adaptive).
+- quantifier: only known, if the alignment was quantified
+  (NaN, if the quantifier can NOT be calculated).
+- alignment: optional.
+
+The cache is bounded (least recently used rows are evicted) and can be
+shared by concurrent processes (write-ahead log, transactions).
+"""
+
+import collections
+import hashlib
+import itertools
+import math
+import sqlite3
+import time
+from typing import (Callable, Generator, Iterable, List, Optional,
+                    Sequence, Tuple, Union)
+
+import numpy as np
+import pandas as pd
+
+from src.modules.substmat import CompiledSubstmat
+from src.modules.substmat import as_compiled_substmat
+
+
+# Maximum number of rows of the cache.
+CACHE_SIZE = 10_000_000
+
+# Number of pairs that are looked up together (see merge_cached_results).
+CACHE_CHUNK_SIZE = 1 << 16
+
+# Smallest positive float (subnormal).
+_MIN_POSITIVE = 5e-324
+
+# Maximum number of keys per SQL-statement
+# (below the limit of old SQLite-versions: 999).
+_QUERY_SIZE = 500
+
+
+def get_settings_digest(
+        substmat: Union[pd.DataFrame, CompiledSubstmat],
+        gapopen_penalty: float = 10.0,
+        gapextend_penalty: float = 0.5,
+        endweight: bool = False,
+        endopen_penalty: float = 10.0,
+        endextend_penalty: float = 0.5
+        ) -> bytes:
+    """\
+    Hash the scoring scheme of the alignments
+    (same parameters as src.modules.gotoh.align_global).
+
+    :param substmat:
+        pd.DataFrame (as returned by parse_substmat_as_df)
+        or CompiledSubstmat
+
+    :return:
+        bytes (SHA-256)
+        (end gap penalties are ignored without endweight)
+    """
+    csmat = as_compiled_substmat(substmat)
+
+    # End gap penalties only matter with endweight.
+    end_penalty_s = ((float(endopen_penalty), float(endextend_penalty))
+                     if endweight else None)
+
+    settings = hashlib.sha256()
+    settings.update(repr(csmat.labels).encode())
+    settings.update(np.ascontiguousarray(csmat.scores, dtype=np.int64)
+                    .tobytes())
+    settings.update(repr((float(gapopen_penalty), float(gapextend_penalty),
+                          end_penalty_s)).encode())
+
+    return settings.digest()
+
+
+def get_pair_key(
+        seq_a: str,
+        seq_b: str,
+        settings_digest: bytes
+        ) -> bytes:
+    """\
+    Hash a pair of FASTA-bodies together with the scoring scheme.
+
+    :param seq_a:
+        str
+
+    :param seq_b:
+        str
+
+        (The pair is ordered, i.e. (seq_a, seq_b) and (seq_b, seq_a) have
+         different keys.)
+
+    :param settings_digest:
+        bytes (see get_settings_digest)
+
+    :return:
+        bytes (SHA-256)
+    """
+    key = hashlib.sha256(settings_digest)
+    key.update(seq_a.encode())
+    key.update(b'\0')
+    key.update(seq_b.encode())
+
+    return key.digest()
+
+
+class PairCache:
+    """\
+    Bounded cache of scores, quantifiers and (optionally) alignments of
+    pairs of FASTA-bodies in a SQLite-file.
+
+    Hits and misses are counted (see report).
+    """
+
+    def __init__(
+            self,
+            path: str,
+            max_entries: int = CACHE_SIZE,
+            store_alignments: bool = False,
+            timeout: float = 60.0
+            ):
+        """\
+        :param path:
+            str
+
+            SQLite-file (created, if it does NOT exist).
+
+        :param max_entries:
+            int (positive)
+
+            Maximum number of rows.  The least recently used rows are
+            evicted.
+
+        :param store_alignments:
+            bool
+
+            Also store the alignments (otherwise only scores and
+            quantifiers).
+
+        :param timeout:
+            float
+
+            Seconds to wait for the lock of a concurrent process.
+        """
+        if max_entries < 1:
+            raise ValueError(f'Faulty max_entries:\n'
+                             f'{max_entries}')
+
+        self.max_entries = max_entries
+        self.store_alignments = store_alignments
+
+        # FB.
+        self.hit_count = 0
+        self.miss_count = 0
+        self.evicted_count = 0
+
+        # Transactions are started explicitly.
+        self.connection = sqlite3.connect(path, timeout=timeout,
+                                          isolation_level=None)
+        # Readers do NOT block the writer (and vice versa).
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        self.connection.execute(
+            'CREATE TABLE IF NOT EXISTS pair ('
+            ' key BLOB PRIMARY KEY,'
+            ' score REAL NOT NULL,'
+            ' quantified INTEGER NOT NULL,'
+            ' quantifier REAL,'
+            ' ali_a TEXT,'
+            ' ali_b TEXT,'
+            ' last_used REAL NOT NULL)')
+        self.connection.execute(
+            'CREATE INDEX IF NOT EXISTS pair_last_used ON pair (last_used)')
+        # Number of rows (instead of counting them for each write).
+        self.connection.execute(
+            'CREATE TABLE IF NOT EXISTS meta ('
+            ' name TEXT PRIMARY KEY,'
+            ' value INTEGER NOT NULL)')
+        # (Counted once, if the cache has NO row count yet.)
+        self.connection.execute('BEGIN IMMEDIATE')
+        try:
+            if self._get_row_count() is None:
+                self.connection.execute(
+                    'INSERT INTO meta (name, value)'
+                    " SELECT 'row_count', COUNT(*) FROM pair")
+        except BaseException:
+            self.connection.execute('ROLLBACK')
+            raise
+        self.connection.execute('COMMIT')
+
+    def close(self):
+        self.connection.close()
+
+    def __enter__(self) -> 'PairCache':
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __len__(self) -> int:
+        return self._get_row_count()
+
+    def _get_row_count(self) -> Optional[int]:
+        row = self.connection.execute(
+            "SELECT value FROM meta WHERE name = 'row_count'").fetchone()
+
+        return None if row is None else row[0]
+
+    def get_many(
+            self,
+            key_s: Sequence[bytes],
+            minscore: Optional[float] = None
+            ) -> List[Optional[Tuple[float, Optional[float]]]]:
+        """\
+        Look up pairs.
+
+        A row is a hit, if it is below the threshold, or if its
+        quantifier is known.  Hits are marked as recently used.
+
+        :param key_s:
+            Sequence of bytes (see get_pair_key)
+
+        :param minscore:
+            float or None
+
+            Threshold of the score (see
+            src.modules.gotoh.iterate_all_pair_alignments).
+
+        :return:
+            List (for each key), None for a miss, else Tuple:
+            - float: score (or upper bound of the score, if below
+              minscore)
+            - float or None: quantifier
+              (NaN, if it can NOT be calculated; None, if below minscore)
+        """
+        key_to_row = {}
+        for start in range(0, len(key_s), _QUERY_SIZE):
+            part_s = list(set(key_s[start:start + _QUERY_SIZE]))
+            key_to_row.update(
+                (key, (score, quantified, quantifier))
+                for key, score, quantified, quantifier
+                in self.connection.execute(
+                    f'SELECT key, score, quantified, quantifier FROM pair'
+                    f' WHERE key IN ({",".join("?" * len(part_s))})',
+                    part_s))
+
+        result_s = []
+        hit_key_s = set()
+        for key in key_s:
+            result = None
+            if key in key_to_row:
+                score, quantified, quantifier = key_to_row[key]
+                # Below the threshold.
+                if minscore is not None and score < minscore:
+                    result = (score, None)
+                # Quantified (NULL: can NOT be calculated).
+                elif quantified:
+                    result = (score,
+                              math.nan if quantifier is None else quantifier)
+            if result is None:
+                self.miss_count += 1
+            else:
+                self.hit_count += 1
+                hit_key_s.add(key)
+            result_s.append(result)
+
+        # Mark as recently used.
+        self._touch(list(hit_key_s))
+
+        return result_s
+
+    def get_alignment(
+            self,
+            key: bytes
+            ) -> Optional[Tuple[str, str]]:
+        """\
+        Look up the alignment of a pair (NOT counted as hit or miss).
+
+        :param key:
+            bytes (see get_pair_key)
+
+        :return:
+            Tuple of str: aligned FASTA-bodies, or None, if NOT stored
+        """
+        row = self.connection.execute(
+            'SELECT ali_a, ali_b FROM pair WHERE key = ?', (key,)).fetchone()
+        if row is None or row[0] is None:
+            return None
+
+        return row[0], row[1]
+
+    def put_many(
+            self,
+            item_s: Iterable[Tuple[bytes, float, Optional[float],
+                                   Optional[Tuple[str, str]]]]
+            ):
+        """\
+        Store pairs (replaces existing rows) and evict the least recently
+        used rows.
+
+        :param item_s:
+            Iterable of Tuple:
+            - bytes: key (see get_pair_key)
+            - float: score (or upper bound of the score, if below the
+              threshold)
+            - float or None: quantifier
+              (NaN, if it can NOT be calculated; None, if NOT quantified)
+            - Tuple of str or None: alignment
+              (only stored with store_alignments)
+        """
+        now = time.time()
+        # (The last row of each key replaces the others.)
+        key_to_row = {}
+        for key, score, quantifier, gali in item_s:
+            if gali is None or not self.store_alignments:
+                gali = (None, None)
+            # SQLite does NOT keep the sign of zero.
+            # -> Store -0.0 as the smallest negative value (written as
+            #    -0.0000 all the same, see
+            #    src.modules.pairwise.round_to_ssv_precision).
+            if quantifier == 0.0 and math.copysign(1.0, quantifier) < 0:
+                quantifier = -_MIN_POSITIVE
+            key_to_row[key] = (key, float(score),
+                               quantifier is not None,
+                               None if quantifier is None
+                               or math.isnan(quantifier)
+                               else float(quantifier),
+                               *gali, now)
+        key_s = list(key_to_row)
+        row_s = list(key_to_row.values())
+
+        # Trivial case:
+        # Nothing to do.
+        if not row_s:
+            return
+
+        self.connection.execute('BEGIN IMMEDIATE')
+        try:
+            # Rows that are replaced (i.e. NOT counted again).
+            replaced_count = 0
+            for start in range(0, len(key_s), _QUERY_SIZE):
+                part_s = key_s[start:start + _QUERY_SIZE]
+                replaced_count += self.connection.execute(
+                    f'SELECT COUNT(*) FROM pair'
+                    f' WHERE key IN ({",".join("?" * len(part_s))})',
+                    part_s).fetchone()[0]
+
+            self.connection.executemany(
+                'INSERT OR REPLACE INTO pair'
+                ' (key, score, quantified, quantifier, ali_a, ali_b,'
+                '  last_used)'
+                ' VALUES (?, ?, ?, ?, ?, ?, ?)',
+                row_s)
+            row_count = (self._get_row_count()
+                         + len(row_s) - replaced_count)
+
+            # Evict least recently used rows
+            # (ties: least recently inserted rows).
+            excess = row_count - self.max_entries
+            if excess > 0:
+                self.connection.execute(
+                    'DELETE FROM pair WHERE key IN'
+                    ' (SELECT key FROM pair'
+                    '  ORDER BY last_used, rowid LIMIT ?)',
+                    (excess,))
+                self.evicted_count += excess
+                row_count -= excess
+
+            self.connection.execute(
+                "UPDATE meta SET value = ? WHERE name = 'row_count'",
+                (row_count,))
+        except BaseException:
+            self.connection.execute('ROLLBACK')
+            raise
+        self.connection.execute('COMMIT')
+
+    def _touch(
+            self,
+            key_s: List[bytes]
+            ):
+        """\
+        Mark rows as recently used.
+        """
+        # Trivial case:
+        # Nothing to do.
+        if not key_s:
+            return
+
+        now = time.time()
+        self.connection.execute('BEGIN IMMEDIATE')
+        try:
+            for start in range(0, len(key_s), _QUERY_SIZE):
+                part_s = key_s[start:start + _QUERY_SIZE]
+                self.connection.execute(
+                    f'UPDATE pair SET last_used = ?'
+                    f' WHERE key IN ({",".join("?" * len(part_s))})',
+                    [now, *part_s])
+        except BaseException:
+            self.connection.execute('ROLLBACK')
+            raise
+        self.connection.execute('COMMIT')
+
+    def report(self) -> str:
+        """\
+        Summarise the counters.
+
+        :return:
+            str
+        """
+        return (f"pair cache:\n"
+                f"  hits:    {self.hit_count}\n"
+                f"  misses:  {self.miss_count}\n"
+                f"  evicted: {self.evicted_count}")
+
+
+def merge_cached_results(
+        pair_cache: PairCache,
+        seq_s: Sequence[str],
+        settings_digest: bytes,
+        align: Callable[..., Iterable[Tuple[int, int, float,
+                                            Optional[tuple]]]],
+        new_result_s: List[Tuple[int, int, float]],
+        pair_s: Optional[Iterable[Tuple[int, int]]] = None,
+        minscore: Optional[float] = None,
+        chunk_size: int = CACHE_CHUNK_SIZE
+        ) -> Generator[Tuple[int, int, float, Optional[float],
+                             Optional[tuple]], None, None]:
+    """\
+    Look up the pairs in the cache chunk by chunk, align the pairs that
+    are NOT in the cache and merge both results (in the order of the
+    pairs).
+
+    Only the chunks that are looked up but NOT merged yet are kept in
+    memory (NOT all pairs).
+
+    :param pair_cache:
+        PairCache
+
+    :param seq_s:
+        Sequence of str: sequences
+
+    :param settings_digest:
+        bytes (see get_settings_digest)
+
+    :param align:
+        Callable
+
+        Aligns the pairs that were NOT in the cache, passed as keyword
+        pair_s (consumed lazily), in their order (see
+        src.modules.gotoh.iterate_all_pair_alignments).
+
+    :param new_result_s:
+        List
+
+        (idx_a, idx_b, score) of each aligned pair is appended
+        (i.e. the results that should be stored in the cache).
+
+    :param pair_s:
+        Iterable of Tuple: (idx_a, idx_b)
+
+        (default: None, i.e. all pairs (idx_a < idx_b).)
+
+    :param minscore:
+        float or None (see PairCache.get_many)
+
+    :param chunk_size:
+        int (positive)
+
+        Number of pairs that are looked up together.
+
+    :return:
+        Generator of Tuple (for each pair):
+        - int: idx_a
+        - int: idx_b
+        - float: score
+        - float or None: quantifier (from the cache)
+        - Tuple of str or None: alignment (NOT from the cache)
+    """
+    if pair_s is None:
+        pair_s = ((idx_a, idx_b)
+                  for idx_a in range(len(seq_s) - 1)
+                  for idx_b in range(idx_a + 1, len(seq_s)))
+    pair_s = iter(pair_s)
+
+    # Chunks that are looked up, but NOT merged yet:
+    # (pairs, results from the cache).
+    looked_up_s = collections.deque()
+
+    # Pairs that are NOT in the cache and NOT aligned yet.
+    missed_pair_s = collections.deque()
+
+    def look_up() -> bool:
+        chunk_pair_s = list(itertools.islice(pair_s, chunk_size))
+
+        # Trivial case:
+        # All pairs are looked up.
+        if not chunk_pair_s:
+            return False
+
+        cached_s = pair_cache.get_many(
+            [get_pair_key(seq_s[idx_a], seq_s[idx_b], settings_digest)
+             for idx_a, idx_b in chunk_pair_s],
+            minscore)
+        looked_up_s.append((chunk_pair_s, cached_s))
+        missed_pair_s.extend(pair
+                             for pair, cached in zip(chunk_pair_s, cached_s)
+                             if cached is None)
+
+        return True
+
+    def iterate_missed_pairs():
+        # (The aligner may run ahead of the merge, e.g. with several
+        #  worker-processes.)
+        while missed_pair_s or look_up():
+            while missed_pair_s:
+                yield missed_pair_s.popleft()
+
+    result_s = iter(align(pair_s=iterate_missed_pairs()))
+
+    while looked_up_s or look_up():
+        chunk_pair_s, cached_s = looked_up_s.popleft()
+        for (idx_a, idx_b), cached in zip(chunk_pair_s, cached_s):
+
+            # From the cache.
+            if cached is not None:
+                score, quantifier = cached
+                yield idx_a, idx_b, score, quantifier, None
+
+            # Calculated.
+            else:
+                _, _, score, gali = next(result_s)
+                new_result_s.append((idx_a, idx_b, score))
+                yield idx_a, idx_b, score, None, gali
@@ -9,6 +9,26 @@ Each line contains 3 space-separated values:
 The numbering starts with 1. Additionally, object_a_num < object_b_num.
 """
 
+import warnings
+from typing import Generator, Iterable, TextIO, Tuple, Union
+
+import numpy as np
+
+
+# Number of decimals of the pairwise relations in the output-format.
+SSV_DECIMALS = 4
+
+# Format of a single line of the output-format
+# (identical to "{0:6} {1:6} {2:7.4f}\n").
+SSV_LINE_FORMAT = f"%6d %6d %7.{SSV_DECIMALS}f\n"
+
+# Number of characters that are parsed at once (see iterate_ssv_blocks).
+SSV_CHUNK_SIZE = 1 << 24
+
+# Number of set bits of each byte (see CondensedPairs.__len__).
+_BIT_COUNT_S = np.array([bin(byte).count('1') for byte in range(256)],
+                        dtype=np.uint8)
+
 
 def is_pairwise(
         s: str
@@ -140,3 +160,605 @@ def count_objects(
                 max_num = num
 
     return max_num
+
+
+def parse_ssv(
+        f: TextIO
+        ) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """\
+    Parse pairwise relations in space-separated-format.
+
+    Assumes that given file has the correct format.
+
+    :param f:
+        TextIO (opened for reading)
+
+    :return:
+        Tuple:
+        - np.ndarray (int64): object_a_num
+        - np.ndarray (int64): object_b_num
+        - np.ndarray (float64): pairwise_relation
+    """
+    num_a_s = []
+    num_b_s = []
+    value_s = []
+
+    for line in f:
+
+        # Ignore empty lines.
+        if not line.strip():
+            continue
+
+        # Parse ssv-elements.
+        a_num, b_num, value = line.split()
+
+        num_a_s.append(int(a_num))
+        num_b_s.append(int(b_num))
+        value_s.append(float(value))
+
+    return (np.array(num_a_s, dtype=np.int64),
+            np.array(num_b_s, dtype=np.int64),
+            np.array(value_s, dtype=np.float64))
+
+
+def iterate_ssv_blocks(
+        f: TextIO,
+        chunk_size: int = SSV_CHUNK_SIZE
+        ) -> Generator[Tuple[np.ndarray, np.ndarray, np.ndarray],
+                       None, None]:
+    """\
+    Parse pairwise relations in space-separated-format block by block.
+
+    Same values as parse_ssv (block by block), but each chunk of lines
+    is parsed at once, i.e. without Python-objects per line.
+
+    Throw ValueError, if the file contains values that are NOT numbers
+    or the number of values is NOT a multiple of 3.
+
+    :param f:
+        TextIO (opened for reading)
+
+    :param chunk_size:
+        int
+
+        Number of characters that are read at once (lines are NOT
+        split between blocks).
+
+    :yield:
+        Tuple: block of pairwise relations
+        - np.ndarray (int64): object_a_num
+        - np.ndarray (int64): object_b_num
+        - np.ndarray (float64): pairwise_relation
+    """
+    # Incomplete last line of the previous chunk.
+    rest = ''
+
+    while True:
+        chunk = f.read(chunk_size)
+
+        # Only complete lines (apart from the end of the file).
+        text = rest + chunk
+        if chunk:
+            end = text.rfind('\n') + 1
+            text, rest = text[:end], text[end:]
+        else:
+            rest = ''
+
+        if text.strip():
+
+            # Parse all values of the lines at once.
+            # (Older versions of numpy only warn about unmatched data.)
+            try:
+                with warnings.catch_warnings():
+                    warnings.simplefilter('error', DeprecationWarning)
+                    el_s = np.fromstring(text, dtype=np.float64, sep=' ')
+            # Sanity check: fail.
+            # Values that are NOT numbers.
+            except (ValueError, DeprecationWarning):
+                raise ValueError(
+                    f'Faulty pairwise relations:\n'
+                    f'  The file contains values that are NOT numbers.')
+
+            # Sanity check: fail.
+            # Lines without 3 values.
+            if len(el_s) % 3:
+                raise ValueError(
+                    f'Faulty pairwise relations:\n'
+                    f'  The file does NOT contain 3 values per line.')
+
+            el_s = el_s.reshape(-1, 3)
+            yield (el_s[:, 0].astype(np.int64),
+                   el_s[:, 1].astype(np.int64),
+                   el_s[:, 2].copy())
+
+        if not chunk:
+            return
+
+
+def parse_ssv_as_condensed(
+        f: TextIO,
+        n: Union[int, None] = None
+        ) -> 'CondensedPairs':
+    """\
+    Parse pairwise relations in space-separated-format directly into
+    condensed form (see iterate_ssv_blocks and CondensedPairs).
+
+    Self-pairs are ignored, repeated pairs: the last one counts.
+
+    :param f:
+        TextIO (opened for reading)
+
+    :param n:
+        int
+
+        Number of objects (numbered from 1 to n).
+
+        (default: None, i.e. highest number in the file.)
+
+    :raise ValueError:
+        - if the file can NOT be parsed (see iterate_ssv_blocks).
+        - if a number is NOT within 1 to n.
+
+    :return:
+        CondensedPairs
+    """
+    pair_to_relation = CondensedPairs(0 if n is None else n)
+
+    for num_a_s, num_b_s, value_s in iterate_ssv_blocks(f):
+
+        # Without self-pairs.
+        is_other = num_a_s != num_b_s
+        num_smaller_s = np.minimum(num_a_s, num_b_s)[is_other]
+        num_larger_s = np.maximum(num_a_s, num_b_s)[is_other]
+        value_s = value_s[is_other]
+
+        # Trivial case:
+        # Nothing to do.
+        if not len(num_smaller_s):
+            continue
+
+        # Sanity check: fail.
+        # Numbers outside of the numbering.
+        max_num = int(num_larger_s.max())
+        if (int(num_smaller_s.min()) < 1
+                or (n is not None and max_num > n)):
+            raise ValueError(f'Faulty numbers of objects:\n'
+                             f'not within 1 to {n or max_num}')
+
+        # Grow to the highest number (exactly).
+        pair_to_relation.resize(max_num)
+
+        pair_to_relation.set_many(num_smaller_s, num_larger_s, value_s)
+
+    return pair_to_relation
+
+
+def round_to_ssv_precision(
+        value_s: np.ndarray
+        ) -> np.ndarray:
+    """\
+    Round the input values to the precision of the output-format
+    ('{:7.4f}'), i.e. to 4 decimals (round half to even, as for the
+    exact binary value).
+
+    The rounded values are written identically, even after conversion
+    to float32 (for absolute values < 100).
+
+    :param value_s:
+        np.ndarray (float)
+
+    :return:
+        np.ndarray (float64)
+    """
+    value_s = np.asarray(value_s, dtype=np.float64)
+
+    # Round.
+    scale = 10 ** SSV_DECIMALS
+    rounded_s = np.round(value_s * scale) / scale
+
+    # Values very close to a tie may be rounded wrongly, because the
+    # multiplication above is NOT exact.
+    # -> Round these values with the string-formatting itself.
+    fraction_s = np.abs(value_s * scale) % 1
+    is_close_to_tie = np.abs(fraction_s - 0.5) < 1e-6
+    for idx in np.flatnonzero(is_close_to_tie):
+        rounded_s[idx] = float(f"{value_s[idx]:.{SSV_DECIMALS}f}")
+
+    return rounded_s
+
+
+def condensed_size(
+        n: int
+        ) -> int:
+    """\
+    Number of pairs of n objects (without self-pairs).
+
+    :param n:
+        int
+
+    :return:
+        int
+    """
+    return n * (n - 1) // 2
+
+
+class CondensedPairs:
+    """\
+    Pairwise relations of n objects (numbered from 1 to n).
+
+    The relations are stored in a preallocated float32-array in
+    condensed form, i.e. the upper triangle of the n*n matrix row by
+    row:
+        (1, 2), (1, 3), ..., (1, n), (2, 3), ..., (n-1, n)
+
+    A bitmap marks which pairs are present.
+
+    Pairs are given as tuples (num_smaller, num_larger).
+    """
+
+    def __init__(
+            self,
+            n: int = 0
+            ):
+        """\
+        :param n:
+            int
+
+            Number of objects.
+            (Can be increased later, see resize.)
+        """
+        self.n = n
+
+        # Relations.
+        self.values = np.zeros(condensed_size(n), dtype=np.float32)
+
+        # Bitmap of present pairs
+        # (bit k of byte i: pair with index 8*i + k).
+        self.present = bytearray((condensed_size(n) + 7) // 8)
+
+    def index(
+            self,
+            num_smaller,
+            num_larger):
+        """\
+        Get index of pair(s) in the condensed form.
+
+        :param num_smaller:
+            int or np.ndarray (int)
+
+        :param num_larger:
+            int or np.ndarray (int)
+
+        :return:
+            int or np.ndarray (int)
+        """
+        # Number of pairs in all previous rows.
+        row = num_smaller - 1
+        row_start = row * self.n - row * (row + 1) // 2
+
+        return row_start + num_larger - num_smaller - 1
+
+    def __contains__(
+            self,
+            pair: Tuple[int, int]
+            ) -> bool:
+        num_smaller, num_larger = pair
+
+        # Pair of unknown objects.
+        if num_larger > self.n:
+            return False
+
+        idx = self.index(num_smaller, num_larger)
+        return bool(self.present[idx >> 3] & (1 << (idx & 7)))
+
+    def contains_many(
+            self,
+            num_smaller_s: np.ndarray,
+            num_larger_s: np.ndarray
+            ) -> np.ndarray:
+        """\
+        Check for many pairs at once, whether they are present.
+
+        :param num_smaller_s:
+            np.ndarray (int)
+
+        :param num_larger_s:
+            np.ndarray (int)
+
+        :return:
+            np.ndarray (bool)
+        """
+        num_smaller_s = np.asarray(num_smaller_s, dtype=np.int64)
+        num_larger_s = np.asarray(num_larger_s, dtype=np.int64)
+
+        # Pairs of unknown objects are NOT present.
+        is_present_s = np.zeros(len(num_smaller_s), dtype=bool)
+        is_known_s = num_larger_s <= self.n
+
+        idx_s = self.index(num_smaller_s[is_known_s],
+                           num_larger_s[is_known_s])
+        present = np.frombuffer(self.present, dtype=np.uint8)
+        is_present_s[is_known_s] = (present[idx_s >> 3] >> (idx_s & 7)) & 1
+
+        return is_present_s
+
+    def __getitem__(
+            self,
+            pair: Tuple[int, int]
+            ) -> float:
+        if pair not in self:
+            raise KeyError(pair)
+        return float(self.values[self.index(*pair)])
+
+    def __setitem__(
+            self,
+            pair: Tuple[int, int],
+            value: float):
+        num_smaller, num_larger = pair
+
+        # Make space for new objects.
+        self._grow(num_larger)
+
+        idx = self.index(num_smaller, num_larger)
+        self.values[idx] = value
+        self.present[idx >> 3] |= 1 << (idx & 7)
+
+    def __len__(self) -> int:
+        # Count the set bits of the bitmap (block by block, without
+        # unpacking the bitmap).
+        present = np.frombuffer(self.present, dtype=np.uint8)
+        block_size = 1 << 20
+        return sum(int(_BIT_COUNT_S[present[start:start + block_size]]
+                       .sum(dtype=np.int64))
+                   for start in range(0, len(present), block_size))
+
+    def _grow(
+            self,
+            max_num: int):
+        """\
+        Make space for new objects up to max_num.
+
+        Grows by a modest factor (at least 1.25), i.e. the quadratic
+        memory overshoots by at most about 1.56x, but the number of
+        resizes is still logarithmic.
+        (If the number of objects is known, allocate it beforehand, see
+         __init__.)
+        """
+        if max_num > self.n:
+            self.resize(max(max_num, self.n + self.n // 4))
+
+    def _mark_present(
+            self,
+            idx_s: np.ndarray):
+        """\
+        Set the bits of the pairs in the bitmap.
+
+        :param idx_s:
+            np.ndarray (int64, sorted): indices in the condensed form
+        """
+        # Trivial case:
+        # Nothing to do.
+        if len(idx_s) == 0:
+            return
+
+        # Combine the bits of the same byte.
+        # (Sorted, i.e. the pairs of the same byte are consecutive.)
+        byte_s = idx_s >> 3
+        bit_s = (1 << (idx_s & 7)).astype(np.uint8)
+        start_s = np.flatnonzero(np.concatenate(
+            ([True], byte_s[1:] != byte_s[:-1])))
+
+        present = np.frombuffer(self.present, dtype=np.uint8)
+        present[byte_s[start_s]] |= np.bitwise_or.reduceat(bit_s, start_s)
+
+    def resize(
+            self,
+            n: int):
+        """\
+        Increase the number of objects.
+
+        :param n:
+            int
+        """
+        # Trivial case:
+        # Nothing to do.
+        if n <= self.n:
+            return
+
+        # Remember current state.
+        old = CondensedPairs()
+        old.n, old.values, old.present = self.n, self.values, self.present
+
+        # Allocate new memory.
+        self.n = n
+        self.values = np.zeros(condensed_size(n), dtype=np.float32)
+        self.present = bytearray((condensed_size(n) + 7) // 8)
+
+        # Copy the present pairs block by block
+        # (rows get longer, i.e. their start changes).
+        # (Small blocks, i.e. only little memory besides the old and the
+        #  new memory, without unpacking the whole bitmap.)
+        for num_smaller_s, num_larger_s, value_s in \
+                old.iterate_blocks(block_size=1 << 16):
+            idx_s = self.index(num_smaller_s, num_larger_s)
+            self.values[idx_s] = value_s
+            self._mark_present(idx_s)
+
+    def set_many(
+            self,
+            num_smaller_s: np.ndarray,
+            num_larger_s: np.ndarray,
+            value_s: np.ndarray):
+        """\
+        Set the relations of many pairs at once.
+
+        :param num_smaller_s:
+            np.ndarray (int)
+
+        :param num_larger_s:
+            np.ndarray (int)
+
+        :param value_s:
+            np.ndarray (float)
+        """
+        # Trivial case:
+        # Nothing to do.
+        if len(value_s) == 0:
+            return
+
+        # Make space for new objects.
+        self._grow(int(np.max(num_larger_s)))
+
+        idx_s = self.index(np.asarray(num_smaller_s, dtype=np.int64),
+                           np.asarray(num_larger_s, dtype=np.int64))
+        self.values[idx_s] = value_s
+
+        # Update bitmap.
+        self._mark_present(np.sort(idx_s))
+
+    def iterate_blocks(
+            self,
+            block_size: int = 1 << 20
+            ) -> Generator[Tuple[np.ndarray, np.ndarray, np.ndarray],
+                           None, None]:
+        """\
+        Iterate over the present pairs in sorted order
+        (by num_smaller, then by num_larger).
+
+        :param block_size:
+            int
+
+            Number of condensed positions that are processed at once.
+
+        :yield:
+            Tuple: block of present pairs
+            - np.ndarray (int64): num_smaller
+            - np.ndarray (int64): num_larger
+            - np.ndarray (float32): relation
+        """
+        size = condensed_size(self.n)
+
+        # Start of each row in the condensed form.
+        row_start_s = self.index(np.arange(1, self.n + 1, dtype=np.int64),
+                                 np.arange(2, self.n + 2, dtype=np.int64))
+
+        present = np.frombuffer(self.present, dtype=np.uint8)
+
+        # Walk through the condensed form.
+        # (block_size is a multiple of 8, i.e. blocks start at a byte.)
+        block_size = max(8, block_size - block_size % 8)
+        for start in range(0, size, block_size):
+            end = min(start + block_size, size)
+
+            # Present pairs in this block.
+            present_s = np.unpackbits(present[start >> 3:(end + 7) >> 3],
+                                      count=end - start,
+                                      bitorder='little').astype(bool)
+            idx_s = start + np.flatnonzero(present_s)
+
+            # Trivial case:
+            # No present pairs in this block.
+            if len(idx_s) == 0:
+                continue
+
+            # Get numbers of each pair.
+            num_smaller_s = np.searchsorted(row_start_s, idx_s,
+                                            side='right')
+            num_larger_s = (idx_s - row_start_s[num_smaller_s - 1]
+                            + num_smaller_s + 1)
+
+            yield num_smaller_s, num_larger_s, self.values[idx_s]
+
+    def items(self) -> Iterable[Tuple[Tuple[int, int], float]]:
+        """\
+        Iterate over the present pairs in sorted order.
+
+        :yield:
+            Tuple:
+            - Tuple: pair (num_smaller, num_larger)
+            - float: relation
+        """
+        for num_smaller_s, num_larger_s, value_s in self.iterate_blocks():
+            for num_smaller, num_larger, value in zip(num_smaller_s.tolist(),
+                                                      num_larger_s.tolist(),
+                                                      value_s.tolist()):
+                yield (num_smaller, num_larger), value
+
+
+def write_ssv_block(
+        f: TextIO,
+        num_smaller_s: np.ndarray,
+        num_larger_s: np.ndarray,
+        value_s: np.ndarray,
+        chunk_size: int = 1 << 16):
+    """\
+    Write a block of pairwise relations in space-separated-format.
+
+    Each line is identical to
+        "{0:6} {1:6} {2:7.4f}".format(num_smaller, num_larger, value)
+    but chunks of lines are formatted at once and written with a single
+    call.
+
+    :param f:
+        TextIO (opened for writing)
+
+    :param num_smaller_s:
+        np.ndarray (int)
+
+    :param num_larger_s:
+        np.ndarray (int)
+
+    :param value_s:
+        np.ndarray (float)
+
+    :param chunk_size:
+        int
+
+        Maximum number of lines per write.
+        (Limits the memory of the formatted text.)
+    """
+    for start in range(0, len(value_s), chunk_size):
+        end = start + chunk_size
+
+        # Interleave the columns:
+        # num_smaller, num_larger, value, num_smaller, ...
+        # (The numbers become floats, but are written as integers by
+        #  '%d'.  float32-values are written exactly as after conversion
+        #  to float.)
+        el_s = np.column_stack((
+            np.asarray(num_smaller_s[start:end], dtype=np.float64),
+            np.asarray(num_larger_s[start:end], dtype=np.float64),
+            np.asarray(value_s[start:end], dtype=np.float64)))
+
+        f.write(SSV_LINE_FORMAT * len(el_s) % tuple(el_s.ravel().tolist()))
+
+
+def write_ssv_blocks(
+        f: TextIO,
+        block_s: Iterable[Tuple[np.ndarray, np.ndarray, np.ndarray]]
+        ) -> int:
+    """\
+    Write blocks of pairwise relations in space-separated-format
+    (see write_ssv_block).
+
+    :param f:
+        TextIO (opened for writing)
+
+    :param block_s:
+        Iterable: blocks, e.g. from CondensedPairs.iterate_blocks
+        - np.ndarray (int): num_smaller
+        - np.ndarray (int): num_larger
+        - np.ndarray (float): relation
+
+    :return:
+        int
+
+        Number of written lines.
+    """
+    line_count = 0
+
+    for num_smaller_s, num_larger_s, value_s in block_s:
+        write_ssv_block(f, num_smaller_s, num_larger_s, value_s)
+        line_count += len(value_s)
+
+    return line_count
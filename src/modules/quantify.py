@@ -0,0 +1,886 @@
+"""\
+Quantify streams of pairwise global alignments.
+"""
+
+import collections
+import multiprocessing
+import queue
+import sys
+import threading
+from typing import Iterable, List, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+from src.modules.gali import quantify_batch
+from src.modules.pairwise import CondensedPairs
+from src.modules.pairwise import round_to_ssv_precision
+from src.modules.substmat import CompiledSubstmat
+from src.modules.substmat import as_compiled_substmat
+from src.modules.utils import iterate_shard_lines
+
+
+def parse_alignment_line(
+        line: str
+        ) -> Tuple[str, str, str, str]:
+    """\
+    Parse a line of a file containing pairwise alignments in csv-format.
+
+    :param line:
+        str
+
+        csv-elements of a single pairwise alignment:
+        - entry_a_header
+        - entry_b_header
+        - entry_a_body
+        - entry_b_body
+
+    :return:
+        Tuple:
+        - str: entry_a_header
+        - str: entry_b_header
+        - str: entry_a_body
+        - str: entry_b_body
+    """
+    # Remove trailing newline character.
+    parsed_line = line.rstrip()
+    # Split csv-elements.
+    parsed_line = parsed_line.split(',')
+
+    # Unpack csv-elements.
+    header_a, header_b, seq_a, seq_b = parsed_line
+
+    return header_a, header_b, seq_a, seq_b
+
+
+class PairwiseQuantifier:
+    """\
+    Calculate the quantifier for a stream of pairwise global alignments.
+
+    Each entry is mapped to a number (starts with 1, in the order of
+    appearance; for each pair, entry B is numbered before entry A).
+
+    Self-alignments (e.g.: A<->A) will NOT be quantified.
+
+    If there are redundant pairs (e.g.: A<->B and B<->A), only the 1st
+    occurrence, for which the quantifier can be calculated, is kept.
+
+    The alignments are buffered and quantified in chunks
+    (see src.modules.gali.quantify_batch).
+    """
+
+    def __init__(
+            self,
+            substmat: Union[pd.DataFrame, CompiledSubstmat],
+            chunk_size: int = 4096,
+            verbose: bool = False,
+            keep_history: bool = False,
+            count: int = 0
+            ):
+        """\
+        :param substmat:
+            pd.DataFrame (as returned by parse_substmat_as_df)
+
+            - or -
+
+            CompiledSubstmat
+
+        :param chunk_size:
+            int
+
+            Number of alignments that are quantified together.
+
+        :param verbose:
+            bool
+
+            Be verbose with printing to STDERR.
+
+        :param keep_history:
+            bool
+
+            Memorise the result of each unique pair in the order of
+            appearance (needed for merging, see merge).
+
+        :param count:
+            int
+
+            Expected number of entries.
+            (Memory for the quantifiers of all pairs is allocated
+             beforehand; more entries are possible, but slower.)
+        """
+        self.substmat = as_compiled_substmat(substmat)
+        self.chunk_size = chunk_size
+        self.verbose = verbose
+        self.keep_history = keep_history
+
+        # -------------------------------------------------------------|------|
+        # FB:
+        # Counters.
+
+        # Number of parsed alignments.
+        self.parsed_line_count = 0
+
+        # Number of self-alignment-pairs.
+        self.self_pair_count = 0
+        # Number of redundant alignment-pairs.
+        self.redundant_pair_count = 0
+        # Number of unique alignment-pairs.
+        self.unique_pair_count = 0
+
+        # Number of omitted (unique) alignment-pairs.
+        # (Quantifier could NOT be calculated).
+        self.omitted_unique_pair_count = 0
+        # Number of output (unique) alignment-pairs.
+        # (Quantifier could be calculated.)
+        self.output_unique_pair_count = 0
+
+        # Last pair of NON-self-alignments.
+        # (None, if there was none so far.)
+        self.last_pair = None
+
+        # -------------------------------------------------------------|------|
+        # Memory.
+
+        # Map each entry to a number:
+        # - key:   entry-header
+        # - value: number (starts with 1).
+        self.header_to_num = {}
+
+        # Calculated quantifiers.
+        # - key:   tuple: pair of aligned sequences
+        #                 (num_smaller, num_larger)
+        # - value: quantifier
+        #          (if there are redundant pairs, only store the 1st
+        #           result;
+        #           rounded to the precision of the output-format, see
+        #           src.modules.pairwise.round_to_ssv_precision).
+        self.pair_to_quantifier = CondensedPairs(count)
+
+        # Pairs, whose quantifier could NOT be calculated
+        # (num_smaller, num_larger).
+        # (Needed for the connectivity, see connectivity.)
+        self.omitted_pair_set = set()
+
+        # Entries of self-alignments.
+        # (Needed for the connectivity, see connectivity.)
+        self.self_header_set = set()
+
+        # Alignments that still have to be quantified.
+        # - pairs: (num_smaller, num_larger)
+        # - alignments: (header_a, header_b, seq_a, seq_b)
+        self._pending_pair_s = []
+        self._pending_pair_set = set()
+        self._pending_ali_s = []
+
+        # History of the unique pairs (only if keep_history).
+        # - pairs: np.ndarray (int, shape: (k, 2)) for each chunk
+        # - quantifiers: np.ndarray (float, shape: (k,)) for each chunk
+        #   (NaN: quantifier could NOT be calculated)
+        # - omitted alignments:
+        #   - key:   index of the unique pair
+        #   - value: (header_a, header_b, seq_a, seq_b)
+        self.history_pair_s = []
+        self.history_quantifier_s = []
+        self.history_omitted_ali_s = {}
+        self._history_count = 0
+
+    def _register(
+            self,
+            header_a: str,
+            header_b: str
+            ) -> Union[Tuple[int, int], None]:
+        """\
+        Register a pairwise alignment (see add).
+
+        :return:
+            Tuple: pair of aligned sequences (num_smaller, num_larger)
+
+            - or -
+
+            None (if the alignment is ignored: self-alignment or
+            redundant pair)
+        """
+        # FB.
+        self.parsed_line_count += 1
+
+        # -------------------------------------------------------------|------|
+        # Ignore self-alignments.
+
+        # If it is a self-alignment.
+        if header_a == header_b:
+            # FB.
+            self.self_pair_count += 1
+            # Memorise entry.
+            self.self_header_set.add(header_a)
+            # Ignore current pairwise alignment.
+            return None
+
+        # -------------------------------------------------------------|------|
+        # Map each entry to a number.
+
+        # Do the same for both entries of pair.
+        for header in [header_b, header_a]:
+
+            # If it a new entry.
+            if header not in self.header_to_num:
+
+                # Generate number for new entry.
+                num = len(self.header_to_num) + 1
+
+                # Add new entry.
+                self.header_to_num[header] = num
+
+        # Get number of each entry.
+        num_a = self.header_to_num[header_a]
+        num_b = self.header_to_num[header_b]
+
+        # -------------------------------------------------------------|------|
+        # Create key:
+        # Pair of aligned sequences.
+
+        num_smaller, num_larger = sorted([num_a, num_b])
+        pair = (num_smaller, num_larger)
+
+        # FB.
+        self.last_pair = pair
+
+        # -------------------------------------------------------------|------|
+        # Ignore redundant alignments.
+
+        # If the same pair is still waiting to be quantified:
+        # Its result decides whether the current alignment is redundant.
+        if pair in self._pending_pair_set:
+            self.flush()
+
+        # If the quantifier has already been calculated for this pair.
+        if pair in self.pair_to_quantifier:
+            # FB.
+            self.redundant_pair_count += 1
+            # Ignore current pairwise alignment.
+            return None
+
+        # FB.
+        self.unique_pair_count += 1
+
+        return pair
+
+    def add(
+            self,
+            header_a: str,
+            header_b: str,
+            seq_a: str,
+            seq_b: str
+            ):
+        """\
+        Add a pairwise alignment.
+
+        :param header_a:
+            str
+
+        :param header_b:
+            str
+
+        :param seq_a:
+            str
+
+        :param seq_b:
+            str
+
+            The 2 aligned sequences may contain gaps.
+            The alignment may contain gap-gap-pairs.
+        """
+        pair = self._register(header_a, header_b)
+
+        # Ignore current pairwise alignment.
+        if pair is None:
+            return
+
+        # -------------------------------------------------------------|------|
+        # Memorise alignment for quantification.
+
+        self._pending_pair_s.append(pair)
+        self._pending_pair_set.add(pair)
+        self._pending_ali_s.append((header_a, header_b, seq_a, seq_b))
+
+        # If the chunk is complete.
+        if len(self._pending_pair_s) >= self.chunk_size:
+            self.flush()
+
+    def add_quantifier(
+            self,
+            header_a: str,
+            header_b: str,
+            quantifier: float
+            ):
+        """\
+        Add the quantifier of a pairwise alignment that has already been
+        quantified (e.g. the alignment of the same 2 FASTA-bodies under
+        other headers).
+
+        Same numbering, results and counters as for add with the
+        alignment.
+
+        :param header_a:
+            str
+
+        :param header_b:
+            str
+
+        :param quantifier:
+            float
+
+            NaN signals that the quantifier can NOT be calculated.
+        """
+        pair = self._register(header_a, header_b)
+
+        # Ignore current pairwise alignment.
+        if pair is None:
+            return
+
+        # Quantify alignments that are still waiting
+        # (keeps the order of the results).
+        self.flush()
+
+        # Memorise history.
+        if self.keep_history:
+            self.history_pair_s.append(np.array([pair]))
+            self.history_quantifier_s.append(np.array([quantifier]))
+
+        # If quantifier could NOT be calculated.
+        if np.isnan(quantifier):
+
+            # FB.
+            self.omitted_unique_pair_count += 1
+
+            # Memorise pair.
+            self.omitted_pair_set.add(pair)
+
+            # Memorise history.
+            # (The alignment itself is NOT known.)
+            if self.keep_history:
+                self.history_omitted_ali_s[self._history_count] = (
+                    header_a, header_b, '', '')
+            self._history_count += 1
+
+            # FB.
+            if self.verbose:
+                print(
+                    f"\n"
+                    f"pairwise alignment:\n"
+                    f"  {header_a}\n"
+                    f"  {header_b}\n"
+                    f"-> quantifier could NOT be calculated.",
+                    file=sys.stderr, flush=True)
+
+            return
+
+        self._history_count += 1
+
+        # If quantifier could be calculated:
+        # Update memory.
+        self.pair_to_quantifier[pair] = round_to_ssv_precision(
+            np.array([quantifier]))[0]
+
+        # FB.
+        self.output_unique_pair_count += 1
+
+    def get_quantifier(
+            self,
+            header_a: str,
+            header_b: str
+            ) -> float:
+        """\
+        Look up the quantifier of a pairwise alignment that has been
+        added and quantified (see flush).
+
+        :param header_a:
+            str
+
+        :param header_b:
+            str
+
+        :return:
+            float
+
+            NaN signals that the quantifier can NOT be calculated.
+        """
+        pair = tuple(sorted((self.header_to_num[header_a],
+                             self.header_to_num[header_b])))
+
+        return (self.pair_to_quantifier[pair]
+                if pair in self.pair_to_quantifier else np.nan)
+
+    def flush(self):
+        """\
+        Quantify all alignments that are still waiting.
+        """
+        # Trivial case:
+        # Nothing to do.
+        if not self._pending_pair_s:
+            return
+
+        # FB.
+        if self.verbose:
+            num_smaller, num_larger = self._pending_pair_s[-1]
+            print(f"#{num_smaller}<->#{num_larger}      ",
+                  end="\r",
+                  file=sys.stderr, flush=True)
+
+        # Calculate quantifiers.
+        quantifier_s = quantify_batch(
+            [(seq_a, seq_b) for _, _, seq_a, seq_b in self._pending_ali_s],
+            self.substmat)
+
+        # Pairs of the quantified alignments.
+        pair_s = np.array(self._pending_pair_s)
+
+        # Memorise history.
+        if self.keep_history:
+            self.history_pair_s.append(pair_s)
+            self.history_quantifier_s.append(quantifier_s)
+
+        # If quantifier could NOT be calculated.
+        is_omitted = np.isnan(quantifier_s)
+
+        # For each omitted alignment.
+        for idx in np.flatnonzero(is_omitted).tolist():
+
+            ali = self._pending_ali_s[idx]
+
+            # Memorise pair.
+            self.omitted_pair_set.add(self._pending_pair_s[idx])
+
+            # Memorise history.
+            if self.keep_history:
+                self.history_omitted_ali_s[self._history_count + idx] = ali
+
+            # FB.
+            if self.verbose:
+                header_a, header_b, seq_a, seq_b = ali
+                print(
+                    f"\n"
+                    f"pairwise alignment:\n"
+                    f"  {header_a}\n"
+                    f"  {seq_a}\n"
+                    f"  {header_b}\n"
+                    f"  {seq_b}\n"
+                    f"-> quantifier could NOT be calculated.",
+                    file=sys.stderr, flush=True)
+
+        # If quantifier could be calculated:
+        # Update memory.
+        self.pair_to_quantifier.set_many(
+            pair_s[~is_omitted, 0],
+            pair_s[~is_omitted, 1],
+            round_to_ssv_precision(quantifier_s[~is_omitted]))
+
+        # FB.
+        self.omitted_unique_pair_count += int(is_omitted.sum())
+        self.output_unique_pair_count += int((~is_omitted).sum())
+        self._history_count += len(pair_s)
+
+        # Reset memory.
+        self._pending_pair_s = []
+        self._pending_pair_set = set()
+        self._pending_ali_s = []
+
+    def merge(
+            self,
+            other: 'PairwiseQuantifier'
+            ):
+        """\
+        Add the results of another quantification, as if its alignments
+        had been added to this quantification.
+
+        Allows to quantify consecutive parts of the same stream of
+        alignments independently (e.g. in parallel) and to merge the
+        parts in their original order afterwards.  Numbering, results
+        and counters are the same as for a single quantification of the
+        whole stream.
+
+        :param other:
+            PairwiseQuantifier
+
+            Created with keep_history, flushed.
+        """
+        # Quantify own alignments that are still waiting.
+        self.flush()
+
+        # -------------------------------------------------------------|------|
+        # Map each entry to a number.
+
+        # Own number for each number of the other quantification.
+        num_map = np.zeros(len(other.header_to_num) + 1, dtype=int)
+
+        # In the order of the other numbering.
+        for header, other_num in sorted(other.header_to_num.items(),
+                                        key=lambda d: d[1]):
+
+            # If it a new entry.
+            if header not in self.header_to_num:
+                # Add new entry.
+                self.header_to_num[header] = len(self.header_to_num) + 1
+
+            num_map[other_num] = self.header_to_num[header]
+
+        # -------------------------------------------------------------|------|
+        # FB:
+        # Counters that do NOT depend on previous results.
+
+        self.parsed_line_count += other.parsed_line_count
+        self.self_pair_count += other.self_pair_count
+        # (Redundant within the other quantification
+        #  -> also redundant after merging.)
+        self.redundant_pair_count += other.redundant_pair_count
+        self.self_header_set |= other.self_header_set
+
+        # Last pair of NON-self-alignments.
+        if other.last_pair is not None:
+            self.last_pair = tuple(sorted(num_map[list(other.last_pair)]
+                                          .tolist()))
+
+        # -------------------------------------------------------------|------|
+        # Replay unique pairs of the other quantification.
+
+        # Trivial case:
+        # No unique pairs.
+        if not other.history_pair_s:
+            return
+
+        # Translate pairs to own numbering.
+        pair_s = num_map[np.concatenate(other.history_pair_s)]
+        pair_s.sort(axis=1)
+        quantifier_s = np.concatenate(other.history_quantifier_s)
+
+        # If the quantifier has already been calculated for this pair:
+        # redundant.
+        # (The other quantification only repeats a pair after its
+        #  quantifier could NOT be calculated, i.e. the pairs that are
+        #  NOT redundant before the merge stay so during the replay.)
+        is_redundant = self.pair_to_quantifier.contains_many(pair_s[:, 0],
+                                                             pair_s[:, 1])
+        is_omitted = ~is_redundant & np.isnan(quantifier_s)
+        is_output = ~is_redundant & ~is_omitted
+
+        # FB.
+        self.redundant_pair_count += int(is_redundant.sum())
+        self.unique_pair_count += int((~is_redundant).sum())
+        self.omitted_unique_pair_count += int(is_omitted.sum())
+        self.output_unique_pair_count += int(is_output.sum())
+
+        # Position of each unique pair in the own history.
+        history_idx_s = (self._history_count
+                         + np.cumsum(~is_redundant) - 1)
+
+        # Memorise history.
+        if self.keep_history:
+            self.history_pair_s.append(pair_s[~is_redundant])
+            self.history_quantifier_s.append(quantifier_s[~is_redundant])
+
+        # If quantifier could NOT be calculated.
+        for idx in np.flatnonzero(is_omitted).tolist():
+
+            # Memorise pair.
+            self.omitted_pair_set.add(tuple(pair_s[idx].tolist()))
+
+            # Omitted alignment.
+            ali = other.history_omitted_ali_s[idx]
+
+            # Memorise history.
+            if self.keep_history:
+                self.history_omitted_ali_s[int(history_idx_s[idx])] = ali
+
+            # FB.
+            if self.verbose:
+                header_a, header_b, seq_a, seq_b = ali
+                print(
+                    f"\n"
+                    f"pairwise alignment:\n"
+                    f"  {header_a}\n"
+                    f"  {seq_a}\n"
+                    f"  {header_b}\n"
+                    f"  {seq_b}\n"
+                    f"-> quantifier could NOT be calculated.",
+                    file=sys.stderr, flush=True)
+
+        # If quantifier could be calculated:
+        # Update memory.
+        self.pair_to_quantifier.set_many(
+            pair_s[is_output, 0],
+            pair_s[is_output, 1],
+            round_to_ssv_precision(quantifier_s[is_output]))
+
+        self._history_count += int((~is_redundant).sum())
+
+    def connectivity(self) -> List[Tuple[str, int]]:
+        """\
+        Count the connections of each entry, i.e. the number of unique
+        pairs with other entries (whether the quantifier could be
+        calculated or NOT).
+
+        Same counts as src.pipeline.pairwise_to_connectivity for the
+        same alignments.  Entries that only occur in self-alignments
+        have zero connections.
+
+        :return:
+            List of Tuple: sorted by number of connections
+            (then by number of the entry)
+            - str: entry-header
+            - int: number of connections
+        """
+        # Quantify alignments that are still waiting.
+        self.flush()
+
+        # Number of connections of each entry:
+        # - index: number
+        # - value: number of connections.
+        count_s = np.zeros(len(self.header_to_num) + 1, dtype=np.int64)
+
+        # Pairs, whose quantifier could be calculated.
+        for num_smaller_s, num_larger_s, _ in \
+                self.pair_to_quantifier.iterate_blocks():
+            count_s += np.bincount(num_smaller_s, minlength=len(count_s))
+            count_s += np.bincount(num_larger_s, minlength=len(count_s))
+
+        # Pairs, whose quantifier could NOT be calculated.
+        # (Unless a redundant alignment of this pair was quantified
+        #  later.)
+        for pair in self.omitted_pair_set:
+            if pair not in self.pair_to_quantifier:
+                for num in pair:
+                    count_s[num] += 1
+
+        # Entries that only occur in self-alignments.
+        header_count_s = [(header, 0)
+                          for header in sorted(self.self_header_set)
+                          if header not in self.header_to_num]
+
+        # All other entries (sorted by number).
+        header_count_s += [
+            (header, int(count_s[num]))
+            for header, num in sorted(self.header_to_num.items(),
+                                      key=lambda d: d[1])]
+
+        # Sort by number of connections.
+        return sorted(header_count_s, key=lambda d: d[1])
+
+    def report(self) -> str:
+        """\
+        Summarise the counters.
+
+        :return:
+            str
+        """
+        return (f"Success:\n"
+                f"  parsed pairs: {self.parsed_line_count}\n"
+                f"  - self-pairs:      {self.self_pair_count}\n"
+                f"  - redundant pairs: {self.redundant_pair_count}\n"
+                f"  - unique pairs:    {self.unique_pair_count}\n"
+                f"    - omitted quantifiers: "
+                f"{self.omitted_unique_pair_count}\n"
+                f"    - output quantifiers:  "
+                f"{self.output_unique_pair_count}")
+
+
+def quantify_alignments(
+        ali_s: Iterable[Tuple[str, str, str, str]],
+        substmat: CompiledSubstmat,
+        chunk_size: int = 4096
+        ) -> PairwiseQuantifier:
+    """\
+    Quantify a part of a stream of pairwise alignments independently.
+
+    Used by the worker-processes (see quantify_alignment_shard and
+    quantify_stream_in_parallel).
+
+    :param ali_s:
+        Iterable of Tuple: pairwise alignment
+        - str: header_a
+        - str: header_b
+        - str: seq_a
+        - str: seq_b
+
+    :param substmat:
+        CompiledSubstmat
+
+    :param chunk_size:
+        int
+
+        Number of alignments that are quantified together.
+
+    :return:
+        PairwiseQuantifier
+
+        With history, ready to be merged (see PairwiseQuantifier.merge).
+    """
+    pairwise_quantifier = PairwiseQuantifier(substmat,
+                                             chunk_size=chunk_size,
+                                             keep_history=True)
+
+    # For each alignment.
+    for ali in ali_s:
+        pairwise_quantifier.add(*ali)
+
+    # Quantify the last chunk.
+    pairwise_quantifier.flush()
+
+    # The quantifiers are part of the history,
+    # do NOT send them twice to the parent-process.
+    pairwise_quantifier.pair_to_quantifier = CondensedPairs()
+
+    return pairwise_quantifier
+
+
+def quantify_alignment_shard(
+        path: str,
+        shard: Tuple[int, int],
+        substmat: CompiledSubstmat,
+        chunk_size: int = 4096
+        ) -> PairwiseQuantifier:
+    """\
+    Quantify the pairwise alignments of a byte-range of the input file.
+
+    Used by the worker-processes of pairwiseCSV_to_pairwiseQuantifier.
+
+    :param path:
+        str
+
+        File containing pairwise alignments in csv-format
+        (see parse_alignment_line).
+
+    :param shard:
+        Tuple:
+        - int: start (byte-offset of the 1st line)
+        - int: end (byte-offset after the last line)
+
+        (see src.modules.utils.get_line_shards)
+
+    :param substmat:
+        CompiledSubstmat
+
+    :param chunk_size:
+        int
+
+        Number of alignments that are quantified together.
+
+    :return:
+        PairwiseQuantifier
+
+        With history, ready to be merged (see PairwiseQuantifier.merge).
+    """
+    # For each line of the shard.
+    start, end = shard
+    ali_s = map(parse_alignment_line, iterate_shard_lines(path, start, end))
+
+    return quantify_alignments(ali_s, substmat, chunk_size)
+
+
+def quantify_stream_in_parallel(
+        pairwise_quantifier: PairwiseQuantifier,
+        ali_s: Iterable[Tuple[str, str, str, str]],
+        workers: int,
+        batch_size: int = 65536):
+    """\
+    Quantify a stream of pairwise alignments with several
+    worker-processes, while the stream is still being read
+    (e.g. from a pipe).
+
+    A reader-thread collects batches of alignments from the stream and
+    puts them into a bounded queue.  The batches are quantified by a
+    pool of worker-processes (see quantify_alignments) and merged into
+    the input quantification in the order of the stream, i.e. all
+    results are identical to the ones of a single process.
+
+    At most 2*workers batches are queued and at most workers+1 batches
+    are quantified at the same time, i.e. the memory does NOT depend on
+    the length of the stream.
+
+    :param pairwise_quantifier:
+        PairwiseQuantifier
+
+        Quantification to merge the results into.
+
+    :param ali_s:
+        Iterable of Tuple: pairwise alignment
+        - str: header_a
+        - str: header_b
+        - str: seq_a
+        - str: seq_b
+
+    :param workers:
+        int
+
+        Number of worker-processes.
+
+    :param batch_size:
+        int
+
+        Number of alignments per batch.
+    """
+    # Batches of alignments.
+    # (None signals the end of the stream.)
+    batch_queue = queue.Queue(maxsize=2 * workers)
+
+    # Exception of the reader-thread (if any).
+    error_s = []
+
+    def read():
+        """\
+        Collect batches of alignments from the stream.
+        """
+        try:
+            batch = []
+            for ali in ali_s:
+                batch.append(ali)
+                # If the batch is complete.
+                if len(batch) >= batch_size:
+                    batch_queue.put(batch)
+                    batch = []
+            # Last batch.
+            if batch:
+                batch_queue.put(batch)
+        except Exception as e:
+            error_s.append(e)
+        finally:
+            batch_queue.put(None)
+
+    # (Start the worker-processes before the reader-thread, because
+    #  forking while another thread holds a lock may deadlock the
+    #  worker-processes.)
+    with multiprocessing.Pool(workers) as pool:
+
+        reader = threading.Thread(target=read, daemon=True)
+        reader.start()
+
+        # Batches that are being quantified (in the order of the
+        # stream).
+        pending_s = collections.deque()
+
+        for batch_num, batch in enumerate(iter(batch_queue.get, None), 1):
+
+            # FB.
+            if pairwise_quantifier.verbose:
+                print(f"batch {batch_num}      ",
+                      end="\r",
+                      file=sys.stderr, flush=True)
+
+            pending_s.append(pool.apply_async(
+                quantify_alignments,
+                (batch, pairwise_quantifier.substmat,
+                 pairwise_quantifier.chunk_size)))
+
+            # Merge finished batches,
+            # while keeping all worker-processes busy.
+            while len(pending_s) > workers:
+                pairwise_quantifier.merge(pending_s.popleft().get())
+
+        # Merge remaining batches.
+        while pending_s:
+            pairwise_quantifier.merge(pending_s.popleft().get())
+
+        reader.join()
+
+    # Sanity check: fail.
+    # The stream could NOT be read.
+    if error_s:
+        raise error_s[0]
@@ -2,10 +2,56 @@
 Handle substitution matrices (e.g. BLOSUM-matrices).
 """
 
-from typing import TextIO
+from typing import NamedTuple, TextIO, Tuple, Union
 
+import numpy as np
 import pandas as pd
 
+from src.modules.utils import is_ascii
+
+
+# Gap-character of alignments.
+GAP_CHAR = '-'
+
+# Code of characters that are neither a label of the substitution matrix
+# nor a gap.
+UNKNOWN_CODE = 255
+
+
+class CompiledSubstmat(NamedTuple):
+    """\
+    Substitution matrix prepared for table-lookups with NumPy.
+
+    - code_table:
+        np.ndarray (uint8, shape: (256,))
+
+        Map each ASCII-character to its residue-code:
+        - 0, 1, ..., K-1: labels of the substitution matrix
+          (in the order of the rows).
+        - K: gap-character.
+        - UNKNOWN_CODE: any other character.
+
+    - scores:
+        np.ndarray (int64, shape: (K+1, K+1))
+
+        Cells of the substitution matrix, indexed by residue-codes.
+        The last row and the last column (gap-code) only contain zeros.
+
+    - labels:
+        Tuple of str: labels of the substitution matrix
+        (index is the residue-code).
+    """
+    code_table: np.ndarray
+    scores: np.ndarray
+    labels: Tuple[str, ...]
+
+    @property
+    def gap_code(self) -> int:
+        """\
+        Residue-code of the gap-character.
+        """
+        return len(self.labels)
+
 
 def parse_substmat_as_df(
         opened_infile: TextIO
@@ -96,3 +142,145 @@ def parse_substmat_as_df(
                           columns=column_label_s)
 
     return result
+
+
+def compile_substmat(
+        substmat: pd.DataFrame
+        ) -> CompiledSubstmat:
+    """\
+    Compile the input substitution matrix for table-lookups with NumPy.
+
+    Throw ValueError, if the row-labels and the column-labels differ or
+    if a label is NOT a single ASCII-character.
+
+    :param substmat:
+        pd.DataFrame
+
+        Substitution matrix
+        (as returned by parse_substmat_as_df).
+
+    :return:
+        CompiledSubstmat
+    """
+    # Labels of the substitution matrix.
+    # (The order of the rows determines the residue-codes.)
+    label_s = tuple(substmat.index)
+
+    # Sanity check: fail.
+    # Rows and columns do NOT have the same labels.
+    if sorted(label_s) != sorted(substmat.columns):
+        raise ValueError(
+            f'Faulty substitution matrix:\n'
+            f'  The row-labels and the column-labels differ.')
+
+    # Sanity check: fail.
+    # A label can NOT be used as a residue.
+    for label in label_s:
+        if len(label) != 1 or not is_ascii(label) or label == GAP_CHAR:
+            raise ValueError(
+                f'Faulty substitution matrix:\n'
+                f'  The label \'{label}\' is NOT a single residue.')
+
+    # Residue-code of the gap-character.
+    gap_code = len(label_s)
+
+    # Map each ASCII-character to its residue-code.
+    code_table = np.full(256, UNKNOWN_CODE, dtype=np.uint8)
+    for code, label in enumerate(label_s):
+        code_table[ord(label)] = code
+    code_table[ord(GAP_CHAR)] = gap_code
+
+    # Cells of the substitution matrix
+    # (columns in the same order as the rows),
+    # extended by a zero-row and a zero-column for the gap-code.
+    scores = np.zeros((gap_code + 1, gap_code + 1), dtype=np.int64)
+    scores[:gap_code, :gap_code] = substmat.loc[list(label_s),
+                                                list(label_s)].to_numpy()
+
+    return CompiledSubstmat(code_table=code_table,
+                            scores=scores,
+                            labels=label_s)
+
+
+def parse_substmat_as_array(
+        opened_infile: TextIO
+        ) -> CompiledSubstmat:
+    """\
+    Parse the input substitution matrix as a CompiledSubstmat.
+
+    :param opened_infile:
+        TextIO
+
+    :return:
+        CompiledSubstmat
+    """
+    return compile_substmat(parse_substmat_as_df(opened_infile))
+
+
+def as_compiled_substmat(
+        substmat: Union[pd.DataFrame, CompiledSubstmat]
+        ) -> CompiledSubstmat:
+    """\
+    Get the input substitution matrix as a CompiledSubstmat.
+
+    :param substmat:
+        pd.DataFrame (as returned by parse_substmat_as_df)
+
+        - or -
+
+        CompiledSubstmat (returned unchanged)
+
+    :return:
+        CompiledSubstmat
+    """
+    # Already compiled.
+    if isinstance(substmat, CompiledSubstmat):
+        return substmat
+
+    return compile_substmat(substmat)
+
+
+def encode_seq(
+        seq: str,
+        substmat: CompiledSubstmat
+        ) -> np.ndarray:
+    """\
+    Encode the input sequence as residue-codes of the substitution
+    matrix.
+
+    Throw ValueError, if the sequence contains a character that is
+    neither a label of the substitution matrix nor a gap.
+
+    :param seq:
+        str
+
+        The sequence may contain gaps.
+
+    :param substmat:
+        CompiledSubstmat
+
+    :return:
+        np.ndarray (uint8, shape: (len(seq),))
+    """
+    # Sanity check: fail.
+    # NON-ASCII-characters can NOT be encoded.
+    if not is_ascii(seq):
+        raise ValueError(
+            f'Faulty sequence:\n'
+            f'  {seq}\n'
+            f'  The sequence contains NON-ASCII-characters.')
+
+    # Look up residue-code of each character.
+    codes = substmat.code_table[np.frombuffer(seq.encode('ascii'),
+                                              dtype=np.uint8)]
+
+    # Sanity check: fail.
+    # Characters that are NOT part of the substitution matrix.
+    if (codes == UNKNOWN_CODE).any():
+        raise ValueError(
+            f'Faulty sequence:\n'
+            f'  {seq}\n'
+            f'  The sequence contains residues that are NOT part of the '
+            f'substitution matrix.')
+
+    return codes
@@ -1,3 +1,5 @@
+import os
+from typing import Generator, List, Tuple
 
 
 def is_ascii(
@@ -9,3 +11,101 @@ def is_ascii(
         return False
     else:
         return True
+
+
+def get_line_shards(
+        path: str,
+        shard_count: int
+        ) -> List[Tuple[int, int]]:
+    """\
+    Split the input file into byte-ranges of similar size, which start
+    and end at line boundaries.
+
+    :param path:
+        str
+
+    :param shard_count:
+        int (positive)
+
+        Maximum number of shards.
+        (Small files may result in fewer shards.)
+
+    :return:
+        List of Tuple: shard
+        - int: start (byte-offset of the 1st line)
+        - int: end (byte-offset after the last line)
+
+        The shards are sorted, do NOT overlap and cover the whole file.
+    """
+    # Size of the file.
+    size = os.path.getsize(path)
+
+    # Initialise.
+    # (1st shard starts at the start of the file.)
+    boundary_s = [0]
+
+    with open(path, 'rb') as f:
+
+        # For each boundary between 2 shards.
+        for shard_num in range(1, shard_count):
+
+            # Approximate boundary.
+            pos = size * shard_num // shard_count
+
+            # Move boundary to the start of the next line.
+            f.seek(max(pos - 1, 0))
+            f.readline()
+            pos = f.tell()
+
+            # Ignore empty shards.
+            if boundary_s[-1] < pos < size:
+                boundary_s.append(pos)
+
+    # Last shard ends at the end of the file.
+    boundary_s.append(size)
+
+    return list(zip(boundary_s[:-1], boundary_s[1:]))
+
+
+def iterate_shard_lines(
+        path: str,
+        start: int,
+        end: int
+        ) -> Generator[str, None, None]:
+    """\
+    Iterate over the lines of a byte-range of the input file.
+
+    :param path:
+        str
+
+    :param start:
+        int
+
+        Byte-offset of the 1st line.
+
+    :param end:
+        int
+
+        Byte-offset after the last line.
+
+    :yield:
+        str: line (including the trailing newline character)
+    """
+    with open(path, 'rb') as f:
+
+        # Go to the 1st line.
+        f.seek(start)
+        pos = start
+
+        # Before the end of the shard is reached.
+        while pos < end:
+
+            line = f.readline()
+
+            # EOF.
+            if not line:
+                break
+
+            pos += len(line)
+
+            yield line.decode()
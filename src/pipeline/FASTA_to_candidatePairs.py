@@ -0,0 +1,157 @@
+import argparse
+import sys
+import textwrap
+
+import numpy as np
+
+from src.modules.fasta import iterate_fasta
+from src.modules.kmer import KMER_SIZE
+from src.modules.kmer import MAX_KMER_FRACTION
+from src.modules.kmer import MIN_SHARED_KMERS
+from src.modules.kmer import MIN_SIGNIFICANCE
+from src.modules.kmer import select_candidate_pairs
+
+
+def parse_args() -> argparse.Namespace:
+    """\
+    Parse command-line arguments.
+    """
+    parser = argparse.ArgumentParser(
+        formatter_class=argparse.RawTextHelpFormatter,
+        description=textwrap.dedent("""\
+        Select the candidate pairs of sequences for the pairwise
+        alignments (sparse mode) by shared k-mers
+        (inverted k-mer index, see src.modules.kmer).
+
+        A pair is a candidate, if its sequences share enough distinct
+        k-mers (also significantly more than unrelated sequences by
+        chance), or if it is one of the best pairs of one of its
+        sequences (at least --min_partners partners per sequence).
+
+        Output (STDOUT):
+        each line:
+        csv-elements of a single candidate pair:
+        - FASTA-header A
+        - FASTA-header B
+        (FASTA-headers without '>', entry A before entry B in the
+         infile, sorted by the position of entry A and entry B.)
+        """))
+    parser.add_argument(
+        "in_fasta_file", type=str,
+        help=textwrap.dedent("""\
+        str
+        infile
+
+        FASTA-entries (with unique headers) of the sequences.
+        """))
+    parser.add_argument(
+        "-k", "--kmer_size", type=int, default=KMER_SIZE,
+        help=textwrap.dedent(f"""\
+        int (positive)
+
+        Length of the k-mers.
+
+        (default: {KMER_SIZE})
+        """))
+    parser.add_argument(
+        "-ms", "--min_shared_kmers", type=int, default=MIN_SHARED_KMERS,
+        help=textwrap.dedent(f"""\
+        int
+
+        Minimum number of shared distinct k-mers of a candidate pair.
+
+        (default: {MIN_SHARED_KMERS})
+        """))
+    parser.add_argument(
+        "-mp", "--min_partners", type=int, default=0,
+        help=textwrap.dedent("""\
+        int
+
+        Minimum number of partners of each sequence
+        (should be >= dim, see the connectivity check of the pipeline).
+
+        (default: 0)
+        """))
+    parser.add_argument(
+        "-mz", "--min_significance", type=float, default=MIN_SIGNIFICANCE,
+        help=textwrap.dedent(f"""\
+        float
+
+        Minimum number of standard deviations above the number of shared
+        distinct k-mers of unrelated sequences (by chance).
+
+        (default: {MIN_SIGNIFICANCE})
+        """))
+    parser.add_argument(
+        "-mf", "--max_kmer_fraction", type=float,
+        default=MAX_KMER_FRACTION,
+        help=textwrap.dedent(f"""\
+        float
+
+        Ignore k-mers that occur in more than this fraction of the
+        sequences.
+
+        (default: {MAX_KMER_FRACTION})
+        """))
+    parser.add_argument(
+        "-v", "--verbose", action="store_true",
+        help=textwrap.dedent("""\
+        Be verbose with printing to STDERR.
+        """))
+    args = parser.parse_args()
+
+    return args
+
+
+# ---------------------------------------------------------------------|------|
+# Preparations.
+
+# Parse command-line arguments.
+args = parse_args()
+
+# Parse infile.
+with open(args.in_fasta_file) as f:
+
+    # Get FASTA-entries from infile.
+    # (Remove starting '>'-character(s) from FASTA-headers.)
+    entry_s = [(header.lstrip('>'), body)
+               for header, body in iterate_fasta(f)]
+
+header_s = [header for header, _ in entry_s]
+seq_s = [body for _, body in entry_s]
+
+# Sanity check: fail.
+# Redundant FASTA-headers.
+if len(set(header_s)) != len(header_s):
+    sys.exit("The FASTA-entries contain redundant headers.")
+
+# ---------------------------------------------------------------------|------|
+# Select candidate pairs.
+
+pair_s = select_candidate_pairs(seq_s,
+                                kmer_size=args.kmer_size,
+                                min_shared_kmers=args.min_shared_kmers,
+                                min_partners=args.min_partners,
+                                min_significance=args.min_significance,
+                                max_kmer_fraction=args.max_kmer_fraction)
+
+# ---------------------------------------------------------------------|------|
+# STDOUT.
+
+for idx_a, idx_b in pair_s:
+    sys.stdout.write(f"{header_s[idx_a]},{header_s[idx_b]}\n")
+sys.stdout.flush()
+
+# ---------------------------------------------------------------------|------|
+# FB.
+
+if args.verbose:
+    partner_count_s = np.bincount(np.array(pair_s, dtype=np.int64).ravel(),
+                                  minlength=len(seq_s))
+    all_pair_count = len(seq_s) * (len(seq_s) - 1) // 2
+    print(f"Success:\n"
+          f"  entries: {len(seq_s)}\n"
+          f"  candidate pairs: {len(pair_s)} of {all_pair_count}\n"
+          f"  partners per entry: "
+          f"min {partner_count_s.min()}, max {partner_count_s.max()}",
+          file=sys.stderr, flush=True)
@@ -0,0 +1,366 @@
+import argparse
+import collections
+import sys
+import textwrap
+
+from src.modules.fasta import iterate_fasta
+from src.modules.gotoh import iterate_all_pair_alignments
+from src.modules.pairwise import parse_ssv
+from src.modules.pairwise import round_to_ssv_precision
+from src.modules.pairwise import write_ssv_blocks
+from src.modules.quantify import PairwiseQuantifier
+from src.modules.substmat import parse_substmat_as_array
+
+
+def parse_args() -> argparse.Namespace:
+    """\
+    Parse command-line arguments.
+    """
+    parser = argparse.ArgumentParser(
+        formatter_class=argparse.RawTextHelpFormatter,
+        description=textwrap.dedent("""\
+        Extend the quantifier and connectivity of a previous job with new
+        sequences (incremental mode).
+
+        Only the pairs new-vs-old and new-vs-new are aligned natively
+        (see src.modules.gotoh) and quantified.  The previous numbering
+        is kept, the new entries are numbered after the old entries.
+
+        Output (STDOUT):
+        The quantifiers of all pairs (old and new, same format as
+        FASTA_to_pairwiseQuantifier).
+        """))
+    parser.add_argument(
+        "in_old_fasta_file", type=str,
+        help=textwrap.dedent("""\
+        str
+        infile
+
+        FASTA-entries of the previous job.
+        """))
+    parser.add_argument(
+        "in_new_fasta_file", type=str,
+        help=textwrap.dedent("""\
+        str
+        infile
+
+        New FASTA-entries (with headers that do NOT occur in the
+        previous job).
+        """))
+    parser.add_argument(
+        "in_substmat_file", type=str,
+        help=textwrap.dedent("""\
+        str
+        infile
+
+        Substitution matrix.
+        """))
+    parser.add_argument(
+        "in_quantifier_file", type=str,
+        help=textwrap.dedent("""\
+        str
+        infile
+
+        Quantifiers of the previous job (ssv-format).
+        """))
+    parser.add_argument(
+        "in_map_file", type=str,
+        help=textwrap.dedent("""\
+        str
+        infile
+
+        Numbering of the previous job
+        (csv-format: FASTA-header, number).
+        """))
+    parser.add_argument(
+        "in_connectivity_file", type=str,
+        help=textwrap.dedent("""\
+        str
+        infile
+
+        Connectivity of the previous job
+        (csv-format: FASTA-header, number of connections).
+        """))
+    parser.add_argument(
+        "out_map_file", type=str,
+        help=textwrap.dedent("""\
+        str
+        outfile
+
+        Map each entry to a number (old and new entries, same format as
+        in_map_file).
+        """))
+    parser.add_argument(
+        "out_connectivity_file", type=str,
+        help=textwrap.dedent("""\
+        str
+        outfile
+
+        Number of connections of each entry (old and new entries, same
+        format as in_connectivity_file).
+        """))
+    parser.add_argument(
+        "-go", "--gapopen_penalty", type=float, default=10.0,
+        help=textwrap.dedent("""\
+        float (positive)
+
+        (default: 10.0,
+         same default as for needleall.)
+        """))
+    parser.add_argument(
+        "-ge", "--gapextend_penalty", type=float, default=0.5,
+        help=textwrap.dedent("""\
+        float (positive)
+
+        (default: 0.5,
+         same default as for needleall.)
+        """))
+    parser.add_argument(
+        "-ew", "--endweight", action="store_true",
+        help=textwrap.dedent("""\
+        Apply end gap penalties.
+        """))
+    parser.add_argument(
+        "-eo", "--endopen_penalty", type=float, default=10.0,
+        help=textwrap.dedent("""\
+        float (positive)
+
+        (default: 10.0,
+         same default as for needleall.)
+        """))
+    parser.add_argument(
+        "-ee", "--endextend_penalty", type=float, default=0.5,
+        help=textwrap.dedent("""\
+        float (positive)
+
+        (default: 0.5,
+         same default as for needleall.)
+        """))
+    parser.add_argument(
+        "-ms", "--minscore", type=float, default=None,
+        help=textwrap.dedent("""\
+        float
+
+        Omit alignments with a score below this threshold
+        (same as for needleall).
+
+        (default: None, i.e. all alignments are kept.)
+        """))
+    parser.add_argument(
+        "-e", "--engine", type=str, default='batch',
+        choices=['single', 'batch', 'adaptive'],
+        help=textwrap.dedent("""\
+        str
+
+        Alignment engine (see FASTA_to_pairwiseQuantifier).
+
+        (default: batch)
+        """))
+    parser.add_argument(
+        "-c", "--chunk_size", type=int, default=4096,
+        help=textwrap.dedent("""\
+        int (positive)
+
+        Number of alignments that are quantified together.
+
+        (default: 4096)
+        """))
+    parser.add_argument(
+        "-w", "--workers", type=int, default=1,
+        help=textwrap.dedent("""\
+        int (positive)
+
+        Number of worker-processes for the alignments.
+
+        (default: 1)
+        """))
+    parser.add_argument(
+        "-v", "--verbose", action="store_true",
+        help=textwrap.dedent("""\
+        Be verbose with printing to STDERR.
+        """))
+    args = parser.parse_args()
+
+    return args
+
+
+# ---------------------------------------------------------------------|------|
+# Preparations.
+
+# Parse command-line arguments.
+args = parse_args()
+
+# Parse substitution-matrix.
+with open(args.in_substmat_file) as f:
+    substmat = parse_substmat_as_array(f)
+
+# Parse infiles.
+# (Remove starting '>'-character(s) from FASTA-headers.)
+entry_s = []
+for path in [args.in_old_fasta_file, args.in_new_fasta_file]:
+    with open(path) as f:
+        entry_s.append([(header.lstrip('>'), body)
+                        for header, body in iterate_fasta(f)])
+old_entry_s, new_entry_s = entry_s
+
+# Old entries first, then new entries.
+header_s = [header for header, _ in old_entry_s + new_entry_s]
+seq_s = [body for _, body in old_entry_s + new_entry_s]
+old_count = len(old_entry_s)
+
+# Sanity check: fail.
+# Redundant FASTA-headers (also between old and new entries).
+if len(set(header_s)) != len(header_s):
+    sys.exit("The FASTA-entries contain redundant headers.")
+
+# Previous numbering.
+with open(args.in_map_file) as f:
+    old_header_to_num = {}
+    for line in f:
+        header, num = line.rstrip('\n').rsplit(',', 1)
+        old_header_to_num[header] = int(num)
+
+# Previous number of connections.
+with open(args.in_connectivity_file) as f:
+    old_header_to_count = {}
+    for line in f:
+        header, count = line.rstrip('\n').rsplit(',', 1)
+        old_header_to_count[header] = int(count)
+
+# Sanity check: fail.
+# The previous results do NOT belong to the old entries.
+if not set(old_header_to_num) <= set(header_s[:old_count]):
+    sys.exit("The previous numbering contains unknown FASTA-headers.")
+
+# Initialise quantification.
+# (Continues the previous numbering, i.e. new entries are numbered after
+#  the old entries.)
+pairwise_quantifier = PairwiseQuantifier(substmat,
+                                         chunk_size=args.chunk_size,
+                                         verbose=args.verbose,
+                                         count=len(header_s))
+pairwise_quantifier.header_to_num = dict(old_header_to_num)
+
+# ---------------------------------------------------------------------|------|
+# Calculate and quantify the alignment of each new pair.
+
+# Penalties (see src.modules.gotoh.align_global).
+penalty_kwargs = dict(gapopen_penalty=args.gapopen_penalty,
+                      gapextend_penalty=args.gapextend_penalty,
+                      endweight=args.endweight,
+                      endopen_penalty=args.endopen_penalty,
+                      endextend_penalty=args.endextend_penalty)
+
+# FB.
+below_minscore_pair_count = 0
+path_count = collections.Counter()
+
+# Self-alignments of the new entries above the threshold
+# (see FASTA_to_pairwiseQuantifier).
+# (Same engine and worker-processes as for the pairs, but NOT counted in
+#  path_count.)
+is_self_kept_s = [True] * (len(seq_s) - old_count)
+if args.minscore is not None:
+    is_self_kept_s = [score >= args.minscore
+                      for _, _, score, _ in iterate_all_pair_alignments(
+                          seq_s,
+                          substmat,
+                          workers=args.workers,
+                          engine=args.engine,
+                          minscore=args.minscore,
+                          pair_s=((idx, idx)
+                                  for idx in range(old_count, len(seq_s))),
+                          **penalty_kwargs)]
+for header, is_self_kept in zip(header_s[old_count:], is_self_kept_s):
+    if is_self_kept:
+        pairwise_quantifier.add(header, header, '', '')
+
+# New pairs: new-vs-old and new-vs-new
+# (in the order of needleall for all entries).
+pair_s = ((idx_a, idx_b)
+          for idx_a in range(len(seq_s) - 1)
+          for idx_b in range(max(idx_a + 1, old_count), len(seq_s)))
+
+for idx_a, idx_b, score, gali in iterate_all_pair_alignments(
+        seq_s,
+        substmat,
+        workers=args.workers,
+        engine=args.engine,
+        minscore=args.minscore,
+        path_count=path_count,
+        pair_s=pair_s,
+        **penalty_kwargs):
+
+    # Omit alignments below the threshold.
+    if args.minscore is not None and score < args.minscore:
+        below_minscore_pair_count += 1
+        continue
+
+    # Quantify alignment
+    # (in chunks, together with the following alignments).
+    pairwise_quantifier.add(header_s[idx_a], header_s[idx_b], *gali)
+
+# Quantify the last chunk.
+pairwise_quantifier.flush()
+
+# Get results.
+header_to_num = pairwise_quantifier.header_to_num
+pair_to_quantifier = pairwise_quantifier.pair_to_quantifier
+
+# Number of connections:
+# previous connections + connections of the new pairs.
+header_to_count = collections.Counter(old_header_to_count)
+for header, count in pairwise_quantifier.connectivity():
+    header_to_count[header] += count
+
+# Add the previous quantifiers.
+with open(args.in_quantifier_file) as f:
+    num_a_s, num_b_s, quantifier_s = parse_ssv(f)
+pair_to_quantifier.set_many(num_a_s, num_b_s,
+                            round_to_ssv_precision(quantifier_s))
+
+# ---------------------------------------------------------------------|------|
+# STDOUT.
+
+# For sorted alignment-pairs.
+write_ssv_blocks(sys.stdout, pair_to_quantifier.iterate_blocks())
+sys.stdout.flush()
+
+# ---------------------------------------------------------------------|------|
+# Output mapping of each header to its number.
+
+# Prepare file for writing.
+with open(args.out_map_file, 'w') as f:
+    # Sort by number.
+    for header, num in sorted(header_to_num.items(), key=lambda d: d[1]):
+        # Write in csv-format.
+        f.write(f"{header},{num}\n")
+
+# Output number of connections of each header.
+# (Same order as src.modules.quantify.PairwiseQuantifier.connectivity:
+#  entries without number first, then by number; sorted by number of
+#  connections.)
+with open(args.out_connectivity_file, 'w') as f:
+    header_count_s = sorted(
+        header_to_count.items(),
+        key=lambda d: (d[0] in header_to_num,
+                       header_to_num.get(d[0], 0),
+                       d[0]))
+    # Sort by number of connections.
+    for header, count in sorted(header_count_s, key=lambda d: d[1]):
+        # Write in csv-format.
+        f.write(f"{header},{count}\n")
+
+# ---------------------------------------------------------------------|------|
+# FB.
+
+if args.verbose:
+    print(f"\n"
+          f"{pairwise_quantifier.report()}\n"
+          f"  old entries: {old_count}\n"
+          f"  new entries: {len(new_entry_s)}\n"
+          f"  alignments below minscore: {below_minscore_pair_count}\n"
+          f"  computations (see src.modules.gotoh.align_global_adaptive):\n"
+          + '\n'.join(f"    {path}: {count}"
+                      for path, count in sorted(path_count.items())),
+          file=sys.stderr, flush=True)
@@ -0,0 +1,173 @@
+import argparse
+import sys
+import textwrap
+
+from src.modules.fasta import iterate_fasta
+from src.modules.kmer import KMER_SIZE
+from src.modules.landmark import HELDOUT_SIZE
+from src.modules.landmark import LANDMARK_COUNT
+from src.modules.landmark import sample_heldout_pairs
+from src.modules.landmark import select_landmark_pairs
+from src.modules.landmark import select_landmarks
+
+
+def parse_args() -> argparse.Namespace:
+    """\
+    Parse command-line arguments.
+    """
+    parser = argparse.ArgumentParser(
+        formatter_class=argparse.RawTextHelpFormatter,
+        description=textwrap.dedent("""\
+        Select the pairs of sequences for the pairwise alignments
+        (landmark mode, see src.modules.landmark):
+        - diverse landmarks by farthest-point selection on k-mer profiles
+        - all pairs among the landmarks
+        - the pairs of each other sequence with the landmarks
+        - a random sample of held-out pairs of other sequences
+          (only for the estimation of the embedding error)
+
+        Output (STDOUT):
+        each line:
+        csv-elements of a single selected pair (incl. held-out pairs):
+        - FASTA-header A
+        - FASTA-header B
+        (FASTA-headers without '>', entry A before entry B in the
+         infile, sorted by the position of entry A and entry B.)
+        """))
+    parser.add_argument(
+        "in_fasta_file", type=str,
+        help=textwrap.dedent("""\
+        str
+        infile
+
+        FASTA-entries (with unique headers) of the sequences.
+        """))
+    parser.add_argument(
+        "out_landmark_file", type=str,
+        help=textwrap.dedent("""\
+        str
+        outfile
+
+        each line:
+        FASTA-header of a single landmark (in order of selection).
+        """))
+    parser.add_argument(
+        "out_heldout_file", type=str,
+        help=textwrap.dedent("""\
+        str
+        outfile
+
+        each line:
+        csv-elements of a single held-out pair:
+        - FASTA-header A
+        - FASTA-header B
+        """))
+    parser.add_argument(
+        "-l", "--landmark_count", type=int, default=LANDMARK_COUNT,
+        help=textwrap.dedent(f"""\
+        int (positive)
+
+        Number of landmarks (should be > dim).
+
+        (default: {LANDMARK_COUNT})
+        """))
+    parser.add_argument(
+        "-hs", "--heldout_size", type=int, default=HELDOUT_SIZE,
+        help=textwrap.dedent(f"""\
+        int
+
+        Number of held-out pairs.
+
+        (default: {HELDOUT_SIZE})
+        """))
+    parser.add_argument(
+        "-k", "--kmer_size", type=int, default=KMER_SIZE,
+        help=textwrap.dedent(f"""\
+        int (positive)
+
+        Length of the k-mers.
+
+        (default: {KMER_SIZE})
+        """))
+    parser.add_argument(
+        "-s", "--seed", type=int, default=0,
+        help=textwrap.dedent("""\
+        int
+
+        Seed of the sample of held-out pairs.
+
+        (default: 0)
+        """))
+    parser.add_argument(
+        "-v", "--verbose", action="store_true",
+        help=textwrap.dedent("""\
+        Be verbose with printing to STDERR.
+        """))
+    args = parser.parse_args()
+
+    return args
+
+
+# ---------------------------------------------------------------------|------|
+# Preparations.
+
+# Parse command-line arguments.
+args = parse_args()
+
+# Parse infile.
+with open(args.in_fasta_file) as f:
+
+    # Get FASTA-entries from infile.
+    # (Remove starting '>'-character(s) from FASTA-headers.)
+    entry_s = [(header.lstrip('>'), body)
+               for header, body in iterate_fasta(f)]
+
+header_s = [header for header, _ in entry_s]
+seq_s = [body for _, body in entry_s]
+
+# Sanity check: fail.
+# Redundant FASTA-headers.
+if len(set(header_s)) != len(header_s):
+    sys.exit("The FASTA-entries contain redundant headers.")
+
+# ---------------------------------------------------------------------|------|
+# Select landmarks and pairs.
+
+landmark_s = select_landmarks(seq_s,
+                              landmark_count=args.landmark_count,
+                              kmer_size=args.kmer_size)
+pair_s = select_landmark_pairs(len(seq_s), landmark_s)
+heldout_pair_s = sample_heldout_pairs(len(seq_s), landmark_s,
+                                      sample_size=args.heldout_size,
+                                      seed=args.seed)
+
+# ---------------------------------------------------------------------|------|
+# Outfiles.
+
+with open(args.out_landmark_file, 'w') as f:
+    for idx in landmark_s:
+        f.write(f"{header_s[idx]}\n")
+
+with open(args.out_heldout_file, 'w') as f:
+    for idx_a, idx_b in heldout_pair_s:
+        f.write(f"{header_s[idx_a]},{header_s[idx_b]}\n")
+
+# ---------------------------------------------------------------------|------|
+# STDOUT.
+
+# The held-out pairs are disjoint from the landmark pairs.
+for idx_a, idx_b in sorted(pair_s + heldout_pair_s):
+    sys.stdout.write(f"{header_s[idx_a]},{header_s[idx_b]}\n")
+sys.stdout.flush()
+
+# ---------------------------------------------------------------------|------|
+# FB.
+
+if args.verbose:
+    all_pair_count = len(seq_s) * (len(seq_s) - 1) // 2
+    print(f"Success:\n"
+          f"  entries: {len(seq_s)}\n"
+          f"  landmarks: {len(landmark_s)}\n"
+          f"  landmark pairs: {len(pair_s)} of {all_pair_count}\n"
+          f"  held-out pairs: {len(heldout_pair_s)}",
+          file=sys.stderr, flush=True)
@@ -0,0 +1,269 @@
+import argparse
+import os
+import sys
+import tempfile
+import textwrap
+
+from src.modules.fasta import iterate_fasta
+from src.modules.needleall import get_block_count
+from src.modules.needleall import iterate_block_rows
+from src.modules.needleall import merge_block_row
+from src.modules.needleall import plan_block_pairs
+from src.modules.needleall import split_into_blocks
+from src.modules.substmat import parse_substmat_as_array
+
+
+def parse_args() -> argparse.Namespace:
+    """\
+    Parse command-line arguments.
+    """
+    parser = argparse.ArgumentParser(
+        formatter_class=argparse.RawTextHelpFormatter,
+        description=textwrap.dedent("""\
+        Calculate the pairwise global alignments of all sequences in
+        parallel blocks.
+
+        Equivalent to:
+          needleall -asequence in_fasta_file -bsequence in_fasta_file
+        but only the diagonal block-pairs and the block-pairs above the
+        diagonal are aligned, concurrently
+        (see src.modules.needleall).
+
+        Output (STDOUT):
+        The pairwise alignments (FASTA-format, same as needleall with
+        -aformat3 fasta): for each entry A, its alignments with the
+        entries B of its own and the following blocks.
+        (The self-alignments and the 1st occurrence of each pair, in the
+         same order as for needleall, i.e. the outputs of
+         pairwiseFASTA_to_pairwiseQuantifier are the same.)
+        """))
+    parser.add_argument(
+        "in_fasta_file", type=str,
+        help=textwrap.dedent("""\
+        str
+        infile
+
+        FASTA-entries of the unaligned sequences.
+        """))
+    parser.add_argument(
+        "-a", "--aligner", type=str, default='needleall',
+        choices=['needleall', 'native'],
+        help=textwrap.dedent("""\
+        str
+
+        - needleall: EMBOSS needleall (see --executable).
+        - native:    src.modules.gotoh (see --substmat_file).
+
+        (default: needleall)
+        """))
+    parser.add_argument(
+        "-x", "--executable", type=str, default='needleall',
+        help=textwrap.dedent("""\
+        str
+
+        needleall-executable.
+
+        (default: needleall)
+        """))
+    parser.add_argument(
+        "-s", "--substmat_file", type=str, default=None,
+        help=textwrap.dedent("""\
+        str
+        infile
+
+        Substitution matrix (required for the native aligner).
+        """))
+    parser.add_argument(
+        "-go", "--gapopen_penalty", type=float, default=10.0,
+        help=textwrap.dedent("""\
+        float (positive)
+
+        (default: 10.0,
+         same default as for needleall.)
+        """))
+    parser.add_argument(
+        "-ge", "--gapextend_penalty", type=float, default=0.5,
+        help=textwrap.dedent("""\
+        float (positive)
+
+        (default: 0.5,
+         same default as for needleall.)
+        """))
+    parser.add_argument(
+        "-ew", "--endweight", action="store_true",
+        help=textwrap.dedent("""\
+        Apply end gap penalties.
+        """))
+    parser.add_argument(
+        "-eo", "--endopen_penalty", type=float, default=10.0,
+        help=textwrap.dedent("""\
+        float (positive)
+
+        (default: 10.0,
+         same default as for needleall.)
+        """))
+    parser.add_argument(
+        "-ee", "--endextend_penalty", type=float, default=0.5,
+        help=textwrap.dedent("""\
+        float (positive)
+
+        (default: 0.5,
+         same default as for needleall.)
+        """))
+    parser.add_argument(
+        "-ms", "--minscore", type=float, default=None,
+        help=textwrap.dedent("""\
+        float
+
+        Omit alignments with a score below this threshold
+        (same as for needleall).
+
+        (default: None, i.e. all alignments are kept.)
+        """))
+    parser.add_argument(
+        "-w", "--workers", type=int, default=1,
+        help=textwrap.dedent("""\
+        int (positive)
+
+        Number of block-pairs that are aligned concurrently.
+
+        (default: 1)
+        """))
+    parser.add_argument(
+        "-nb", "--block_count", type=int, default=None,
+        help=textwrap.dedent("""\
+        int (positive)
+
+        Number of blocks.
+
+        (default: None, i.e. at least 4 block-pairs per worker.)
+        """))
+    parser.add_argument(
+        "-t", "--tmp_dir", type=str, default=None,
+        help=textwrap.dedent("""\
+        str
+        directory
+
+        Temporary outputs of the block-pairs (a subdirectory is created
+        and removed), e.g. on the same disk as the outfile.
+
+        (default: None, i.e. the system's temporary directory.)
+        """))
+    parser.add_argument(
+        "-l", "--log_file", type=str, default=None,
+        help=textwrap.dedent("""\
+        str
+        outfile
+
+        Logs (errfiles) of all needleall-processes.
+
+        (default: None, i.e. NOT written.)
+        """))
+    parser.add_argument(
+        "-v", "--verbose", action="store_true",
+        help=textwrap.dedent("""\
+        Be verbose with printing to STDERR.
+        """))
+    args = parser.parse_args()
+
+    return args
+
+
+# ---------------------------------------------------------------------|------|
+# Preparations.
+
+# Parse command-line arguments.
+args = parse_args()
+
+# Sanity check: fail.
+# The native aligner needs a substitution matrix.
+if args.aligner == 'native' and args.substmat_file is None:
+    sys.exit("The native aligner needs a substitution matrix "
+             "(--substmat_file).")
+
+# Parse substitution-matrix.
+substmat = None
+if args.substmat_file is not None:
+    with open(args.substmat_file) as f:
+        substmat = parse_substmat_as_array(f)
+
+# Parse infile.
+with open(args.in_fasta_file) as f:
+
+    # Get FASTA-entries from infile.
+    entry_s = list(iterate_fasta(f))
+
+# Number of blocks.
+block_count = args.block_count
+if block_count is None:
+    block_count = get_block_count(len(entry_s), args.workers)
+
+# FB.
+if args.verbose:
+    length_s = [len(body) for _, body in entry_s]
+    cost_s = [cost for _, _, cost
+              in plan_block_pairs(length_s,
+                                  split_into_blocks(length_s, block_count))]
+    print(f"block-pairs: {len(cost_s)}\n"
+          f"  estimated cost (sum of L_a*L_b): "
+          f"min {min(cost_s)}, max {max(cost_s)}",
+          file=sys.stderr, flush=True)
+
+# ---------------------------------------------------------------------|------|
+# Align block-pairs.
+# STDOUT.
+
+# FB.
+ali_count = 0
+
+with tempfile.TemporaryDirectory(dir=args.tmp_dir) as tmp_dir_path:
+
+    for row_idx, (block_entry_s, out_path_s, log_path_s) in enumerate(
+            iterate_block_rows(
+                entry_s,
+                tmp_dir_path,
+                block_count,
+                workers=args.workers,
+                aligner=args.aligner,
+                executable=args.executable,
+                substmat=substmat,
+                minscore=args.minscore,
+                gapopen_penalty=args.gapopen_penalty,
+                gapextend_penalty=args.gapextend_penalty,
+                endweight=args.endweight,
+                endopen_penalty=args.endopen_penalty,
+                endextend_penalty=args.endextend_penalty)):
+
+        # STDOUT.
+        ali_count += merge_block_row(sys.stdout, block_entry_s, out_path_s)
+        sys.stdout.flush()
+
+        # Append logs.
+        if args.log_file is not None:
+            with open(args.log_file, 'a' if row_idx else 'w') as f:
+                for log_path in log_path_s:
+                    if log_path is not None and os.path.exists(log_path):
+                        with open(log_path) as f_log:
+                            f.write(f_log.read())
+
+        # Free disk-space of the finished row.
+        for path in out_path_s + log_path_s:
+            if path is not None and os.path.exists(path):
+                os.remove(path)
+
+        # FB.
+        if args.verbose:
+            print(f"row {row_idx + 1}/{block_count}      ",
+                  end="\r",
+                  file=sys.stderr, flush=True)
+
+# ---------------------------------------------------------------------|------|
+# FB.
+
+if args.verbose:
+    print(f"\n"
+          f"Success:\n"
+          f"  entries: {len(entry_s)}\n"
+          f"  blocks: {block_count}\n"
+          f"  alignments: {ali_count}",
+          file=sys.stderr, flush=True)
@@ -0,0 +1,540 @@
+import argparse
+import collections
+import functools
+import sys
+import textwrap
+
+import numpy as np
+
+from src.modules.fasta import iterate_fasta
+from src.modules.fasta import map_unique_bodies
+from src.modules.gotoh import align_unique_bodies
+from src.modules.gotoh import get_unique_body_pairs
+from src.modules.gotoh import iterate_all_pair_alignments
+from src.modules.paircache import CACHE_CHUNK_SIZE
+from src.modules.paircache import CACHE_SIZE
+from src.modules.paircache import PairCache
+from src.modules.paircache import get_pair_key
+from src.modules.paircache import get_settings_digest
+from src.modules.paircache import merge_cached_results
+from src.modules.pairwise import write_ssv_blocks
+from src.modules.quantify import PairwiseQuantifier
+from src.modules.substmat import parse_substmat_as_array
+
+
+def parse_args() -> argparse.Namespace:
+    """\
+    Parse command-line arguments.
+    """
+    parser = argparse.ArgumentParser(
+        formatter_class=argparse.RawTextHelpFormatter,
+        description=textwrap.dedent("""\
+        Calculate the pairwise global alignments of all sequences and
+        their quantifier and connectivity.
+
+        Same outputs as the chain:
+          needleall (same file as -asequence and -bsequence)
+          -> pairwiseFASTA_to_pairwiseQuantifier
+        but the alignments are calculated natively
+        (see src.modules.gotoh) and quantified in memory, without
+        text-output.
+
+        The quantifier has the value range [0; 1]:
+        Short low-similarity alignments yield values closer to zero,
+        while long high-similarity alignments result in values closer to
+        1.
+
+        Special case:
+        If the quantifier can NOT be calculated, it will be omitted.
+        """))
+    parser.add_argument(
+        "in_fasta_file", type=str,
+        help=textwrap.dedent("""\
+        str
+        infile
+
+        FASTA-entries (with unique headers) of the unaligned sequences.
+        """))
+    parser.add_argument(
+        "in_substmat_file", type=str,
+        help=textwrap.dedent("""\
+        str
+        infile
+
+        Substitution matrix.
+        """))
+    parser.add_argument(
+        "out_map_file", type=str,
+        help=textwrap.dedent("""\
+        str
+        outfile
+
+        Map each entry to a number:
+
+        each line of file:
+        csv-elements of a single entry:
+        - FASTA-header
+        - number (starts with 1)
+        """))
+    parser.add_argument(
+        "out_connectivity_file", type=str,
+        help=textwrap.dedent("""\
+        str
+        outfile
+
+        Number of connections of each entry
+        (same format as pairwise_to_connectivity):
+
+        each line of file:
+        csv-elements of a single entry:
+        - FASTA-header
+        - number of connections
+        """))
+    parser.add_argument(
+        "-go", "--gapopen_penalty", type=float, default=10.0,
+        help=textwrap.dedent("""\
+        float (positive)
+
+        (default: 10.0,
+         same default as for needleall.)
+        """))
+    parser.add_argument(
+        "-ge", "--gapextend_penalty", type=float, default=0.5,
+        help=textwrap.dedent("""\
+        float (positive)
+
+        (default: 0.5,
+         same default as for needleall.)
+        """))
+    parser.add_argument(
+        "-ew", "--endweight", action="store_true",
+        help=textwrap.dedent("""\
+        Apply end gap penalties.
+        """))
+    parser.add_argument(
+        "-eo", "--endopen_penalty", type=float, default=10.0,
+        help=textwrap.dedent("""\
+        float (positive)
+
+        (default: 10.0,
+         same default as for needleall.)
+        """))
+    parser.add_argument(
+        "-ee", "--endextend_penalty", type=float, default=0.5,
+        help=textwrap.dedent("""\
+        float (positive)
+
+        (default: 0.5,
+         same default as for needleall.)
+        """))
+    parser.add_argument(
+        "-ms", "--minscore", type=float, default=None,
+        help=textwrap.dedent("""\
+        float
+
+        Omit alignments with a score below this threshold
+        (same as for needleall).
+
+        (default: None, i.e. all alignments are kept.)
+        """))
+    parser.add_argument(
+        "-p", "--pair_file", type=str, default=None,
+        help=textwrap.dedent("""\
+        str
+        infile
+
+        Only align these pairs (sparse mode, as written by
+        FASTA_to_candidatePairs):
+
+        each line of file:
+        csv-elements of a single pair:
+        - FASTA-header A
+        - FASTA-header B
+
+        (default: None, i.e. all pairs are aligned.)
+        """))
+    parser.add_argument(
+        "-d", "--dedup", action="store_true",
+        help=textwrap.dedent("""\
+        Align and quantify each unique FASTA-body only once
+        (see src.modules.gotoh.align_unique_bodies).
+        The results of redundant FASTA-bodies are copied to their
+        headers, i.e. all outputs are identical.
+        """))
+    parser.add_argument(
+        "-cf", "--cache_file", type=str, default=None,
+        help=textwrap.dedent("""\
+        str
+        infile/outfile
+
+        Cache of the results across jobs (SQLite-file, created if it
+        does NOT exist, see src.modules.paircache).
+        Only the pairs of FASTA-bodies that are NOT in the cache are
+        aligned and quantified, i.e. all outputs are identical.
+
+        (default: None, i.e. no cache.)
+        """))
+    parser.add_argument(
+        "-cs", "--cache_size", type=int, default=CACHE_SIZE,
+        help=textwrap.dedent(f"""\
+        int (positive)
+
+        Maximum number of pairs in the cache
+        (least recently used pairs are evicted).
+
+        (default: {CACHE_SIZE})
+        """))
+    parser.add_argument(
+        "-e", "--engine", type=str, default='batch',
+        choices=['single', 'batch', 'adaptive'],
+        help=textwrap.dedent("""\
+        str
+
+        Alignment engine (see src.modules.gotoh):
+        - single:   one pair at a time.
+        - batch:    many pairs of similar length together
+                    (vectorised, same results).
+        - adaptive: one pair at a time, with a band of diagonals for
+                    near-identical pairs and a score-only pass for the
+                    pairs below --minscore (same results).
+
+        (default: batch)
+        """))
+    parser.add_argument(
+        "-c", "--chunk_size", type=int, default=4096,
+        help=textwrap.dedent("""\
+        int (positive)
+
+        Number of alignments that are quantified together.
+
+        (default: 4096)
+        """))
+    parser.add_argument(
+        "-w", "--workers", type=int, default=1,
+        help=textwrap.dedent("""\
+        int (positive)
+
+        Number of worker-processes for the alignments.
+        The results are in the same order as for a single process, i.e.
+        all outputs are identical.
+
+        (default: 1)
+        """))
+    parser.add_argument(
+        "-v", "--verbose", action="store_true",
+        help=textwrap.dedent("""\
+        Be verbose with printing to STDERR.
+        """))
+    args = parser.parse_args()
+
+    return args
+
+
+# ---------------------------------------------------------------------|------|
+# Preparations.
+
+# Parse command-line arguments.
+args = parse_args()
+
+# Parse substitution-matrix.
+with open(args.in_substmat_file) as f:
+    substmat = parse_substmat_as_array(f)
+
+# Parse infile.
+with open(args.in_fasta_file) as f:
+
+    # Get FASTA-entries from infile.
+    # (Remove starting '>'-character(s) from FASTA-headers.)
+    entry_s = [(header.lstrip('>'), body)
+               for header, body in iterate_fasta(f)]
+
+header_s = [header for header, _ in entry_s]
+seq_s = [body for _, body in entry_s]
+
+# Sanity check: fail.
+# Redundant FASTA-headers.
+if len(set(header_s)) != len(header_s):
+    sys.exit("The FASTA-entries contain redundant headers.")
+
+# Parse pair-file.
+pair_s = None
+if args.pair_file is not None:
+    header_to_idx = {header: idx for idx, header in enumerate(header_s)}
+    with open(args.pair_file) as f:
+        try:
+            idx_pair_s = [tuple(header_to_idx[header]
+                                for header in line.rstrip('\n').split(','))
+                          for line in f if line.strip()]
+        except KeyError as e:
+            sys.exit(f"The pair-file contains an unknown header: {e}")
+    # In the order of needleall (entry A before entry B).
+    pair_s = sorted({(min(pair), max(pair))
+                     for pair in idx_pair_s if pair[0] != pair[1]})
+
+# Initialise quantification.
+# (Maps each entry to a number, ignores self-alignments and memorises the
+#  calculated quantifiers.)
+pairwise_quantifier = PairwiseQuantifier(substmat,
+                                         chunk_size=args.chunk_size,
+                                         verbose=args.verbose,
+                                         count=len(header_s))
+
+# ---------------------------------------------------------------------|------|
+# Calculate and quantify the alignment of each pair.
+
+# Penalties (see src.modules.gotoh.align_global).
+penalty_kwargs = dict(gapopen_penalty=args.gapopen_penalty,
+                      gapextend_penalty=args.gapextend_penalty,
+                      endweight=args.endweight,
+                      endopen_penalty=args.endopen_penalty,
+                      endextend_penalty=args.endextend_penalty)
+
+# FB.
+below_minscore_pair_count = 0
+path_count = collections.Counter()
+
+# Cache of the results across jobs.
+pair_cache = None
+if args.cache_file is not None:
+    pair_cache = PairCache(args.cache_file, max_entries=args.cache_size)
+    settings_digest = get_settings_digest(substmat, **penalty_kwargs)
+
+# Results that are NOT in the cache yet:
+# (idx_a, idx_b, score).
+# (Only if all pairs are aligned, see merge_cached_results.)
+new_result_s = []
+
+# If each unique FASTA-body is aligned only once.
+if args.dedup:
+
+    # Pairs of unique FASTA-bodies.
+    body_s, body_idx_s = map_unique_bodies(seq_s)
+    body_pair_s = get_unique_body_pairs(body_idx_s, pair_s)
+
+    # Look up the pairs of unique FASTA-bodies in the cache.
+    if pair_cache is not None:
+        body_pair_s = list(body_pair_s)
+        cached_s = pair_cache.get_many(
+            [get_pair_key(body_s[body_idx_a], body_s[body_idx_b],
+                          settings_digest)
+             for body_idx_a, body_idx_b in body_pair_s],
+            args.minscore)
+        cached_body_pair_s = [
+            (body_pair, cached)
+            for body_pair, cached in zip(body_pair_s, cached_s)
+            if cached is not None]
+        body_pair_s = [body_pair
+                       for body_pair, cached in zip(body_pair_s, cached_s)
+                       if cached is None]
+
+    # Align and quantify the unique FASTA-bodies.
+    body_pair_to_score, body_pair_to_quantifier = align_unique_bodies(
+        body_s,
+        substmat,
+        body_pair_s,
+        minscore=args.minscore,
+        chunk_size=args.chunk_size,
+        workers=args.workers,
+        engine=args.engine,
+        path_count=path_count,
+        **penalty_kwargs)
+
+    # Store the new results in the cache.
+    # (Quantifier only above the threshold, i.e. if it was calculated.)
+    if pair_cache is not None:
+        pair_cache.put_many(
+            (get_pair_key(body_s[body_idx_a], body_s[body_idx_b],
+                          settings_digest),
+             body_pair_to_score[body_idx_a, body_idx_b],
+             body_pair_to_quantifier.get((body_idx_a, body_idx_b), np.nan)
+             if args.minscore is None
+             or body_pair_to_score[body_idx_a, body_idx_b] >= args.minscore
+             else None,
+             None)
+            for body_idx_a, body_idx_b in body_pair_s)
+
+        # Results from the cache.
+        for (body_idx_a, body_idx_b), (score, quantifier) in \
+                cached_body_pair_s:
+            body_pair_to_score[body_idx_a, body_idx_b] = score
+            if quantifier is not None:
+                body_pair_to_quantifier[body_idx_a, body_idx_b] = quantifier
+
+    # Pairs of entries (in the order of needleall).
+    if pair_s is None:
+        pair_s = ((idx_a, idx_b)
+                  for idx_a in range(len(seq_s) - 1)
+                  for idx_b in range(idx_a + 1, len(seq_s)))
+
+    # Copy the results to all pairs of entries.
+    # (Scores and quantifiers instead of alignments,
+    #  NaN: quantifier NOT calculated, i.e. below the threshold.)
+    result_s = ((idx_a, idx_b,
+                 body_pair_to_score[body_idx_s[idx_a], body_idx_s[idx_b]],
+                 body_pair_to_quantifier.get(
+                     (body_idx_s[idx_a], body_idx_s[idx_b]), np.nan),
+                 None)
+                for idx_a, idx_b in pair_s)
+
+    # Scores of the self-alignments.
+    self_score_s = [body_pair_to_score[body_idx, body_idx]
+                    for body_idx in body_idx_s]
+
+# If all pairs are aligned.
+else:
+
+    # Align all pairs or the input pairs.
+    align = functools.partial(iterate_all_pair_alignments,
+                              seq_s,
+                              substmat,
+                              workers=args.workers,
+                              engine=args.engine,
+                              minscore=args.minscore,
+                              path_count=path_count,
+                              **penalty_kwargs)
+
+    # Look up the pairs in the cache chunk by chunk and align only the
+    # other pairs (in the order of needleall).
+    if pair_cache is not None:
+        result_s = merge_cached_results(pair_cache,
+                                        seq_s,
+                                        settings_digest,
+                                        align,
+                                        new_result_s,
+                                        pair_s=pair_s,
+                                        minscore=args.minscore)
+    else:
+        result_s = ((idx_a, idx_b, score, None, gali)
+                    for idx_a, idx_b, score, gali in align(pair_s=pair_s))
+
+    # Scores of the self-alignments (only needed for the threshold).
+    # (Same engine and worker-processes as for the pairs, but NOT
+    #  counted in path_count.)
+    self_score_s = [False] * len(seq_s)
+    if args.minscore is not None:
+        self_score_s = [score for _, _, score, _ in align(
+            pair_s=((idx, idx) for idx in range(len(seq_s))),
+            path_count=None)]
+
+# Self-alignments above the threshold.
+# (Only needed for the connectivity: entries without any other
+#  alignment have zero connections.)
+is_self_kept_s = [args.minscore is None or score >= args.minscore
+                  for score in self_score_s]
+
+# Self-alignments are NOT quantified, but memorised for the
+# connectivity (as if needleall had written them).
+# (needleall writes the self-alignment of entry A before its other
+#  alignments.)
+next_self_idx = 0
+
+for idx_a, idx_b, score, quantifier, gali in result_s:
+
+    # Self-alignments up to entry A.
+    while next_self_idx <= idx_a:
+        if is_self_kept_s[next_self_idx]:
+            pairwise_quantifier.add(header_s[next_self_idx],
+                                    header_s[next_self_idx],
+                                    seq_s[next_self_idx],
+                                    seq_s[next_self_idx])
+        next_self_idx += 1
+
+    # Omit alignments below the threshold.
+    # (Without alignment for the engine adaptive.)
+    if args.minscore is not None and score < args.minscore:
+        below_minscore_pair_count += 1
+
+    # Already quantified (unique FASTA-bodies or cache).
+    elif quantifier is not None:
+        pairwise_quantifier.add_quantifier(header_s[idx_a], header_s[idx_b],
+                                           quantifier)
+
+    # Quantify alignment
+    # (in chunks, together with the following alignments).
+    else:
+        pairwise_quantifier.add(header_s[idx_a], header_s[idx_b], *gali)
+
+    # Store the new results in the cache chunk by chunk
+    # (once they are quantified).
+    if len(new_result_s) >= CACHE_CHUNK_SIZE:
+        pairwise_quantifier.flush()
+        pair_cache.put_many(
+            (get_pair_key(seq_s[idx_a], seq_s[idx_b], settings_digest),
+             score,
+             pairwise_quantifier.get_quantifier(header_s[idx_a],
+                                                header_s[idx_b])
+             if args.minscore is None or score >= args.minscore else None,
+             None)
+            for idx_a, idx_b, score in new_result_s)
+        new_result_s.clear()
+
+# Self-alignments of the remaining entries.
+for idx in range(next_self_idx, len(header_s)):
+    if is_self_kept_s[idx]:
+        pairwise_quantifier.add(header_s[idx], header_s[idx],
+                                seq_s[idx], seq_s[idx])
+
+# Quantify the last chunk.
+pairwise_quantifier.flush()
+
+# Sanity check: fail.
+# There are NO pairwise alignments (apart from self-alignments).
+if pairwise_quantifier.last_pair is None:
+    sys.exit("There are NO pairwise alignments to quantify.")
+
+# Get results.
+header_to_num = pairwise_quantifier.header_to_num
+pair_to_quantifier = pairwise_quantifier.pair_to_quantifier
+
+# Store the remaining new results in the cache.
+if new_result_s:
+    pair_cache.put_many(
+        (get_pair_key(seq_s[idx_a], seq_s[idx_b], settings_digest),
+         score,
+         pairwise_quantifier.get_quantifier(header_s[idx_a], header_s[idx_b])
+         if args.minscore is None or score >= args.minscore else None,
+         None)
+        for idx_a, idx_b, score in new_result_s)
+
+# ---------------------------------------------------------------------|------|
+# STDOUT.
+
+# For sorted alignment-pairs.
+# (Walk through the condensed memory in order and write block by block.)
+write_ssv_blocks(sys.stdout, pair_to_quantifier.iterate_blocks())
+sys.stdout.flush()
+
+# ---------------------------------------------------------------------|------|
+# Output mapping of each header to its number.
+
+# Prepare file for writing.
+with open(args.out_map_file, 'w') as f:
+    # Sort by number.
+    for header, num in sorted(header_to_num.items(), key=lambda d: d[1]):
+        # Write in csv-format.
+        f.write(f"{header},{num}\n")
+
+# Output number of connections of each header.
+with open(args.out_connectivity_file, 'w') as f:
+    # Sort by number of connections.
+    for header, count in pairwise_quantifier.connectivity():
+        # Write in csv-format.
+        f.write(f"{header},{count}\n")
+
+# ---------------------------------------------------------------------|------|
+# FB.
+
+if args.verbose:
+    print(f"\n"
+          f"{pairwise_quantifier.report()}\n"
+          f"  alignments below minscore: {below_minscore_pair_count}\n"
+          f"  unique FASTA-bodies: {len(set(seq_s))} of {len(seq_s)}\n"
+          f"  computations (see src.modules.gotoh.align_global_adaptive):\n"
+          + '\n'.join(f"    {path}: {count}"
+                       for path, count in sorted(path_count.items())),
+          file=sys.stderr, flush=True)
+    if pair_cache is not None:
+        print(pair_cache.report(), file=sys.stderr, flush=True)
+
+if pair_cache is not None:
+    pair_cache.close()
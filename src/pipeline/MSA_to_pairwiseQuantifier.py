@@ -0,0 +1,217 @@
+import argparse
+import sys
+import textwrap
+
+from src.modules.fasta import iterate_fasta
+from src.modules.msa import encode_msa
+from src.modules.msa import iterate_msa_quantifiers
+from src.modules.pairwise import write_ssv_block
+from src.modules.substmat import parse_substmat_as_array
+
+
+def parse_args() -> argparse.Namespace:
+    """\
+    Parse command-line arguments.
+    """
+    parser = argparse.ArgumentParser(
+        formatter_class=argparse.RawTextHelpFormatter,
+        description=textwrap.dedent("""\
+        Calculate quantifier for all pairwise alignments of the MSA.
+
+        Same outputs as the chain:
+          MSA_to_pairwiseFASTA
+          -> pairwiseFASTA_to_pairwiseCSV
+          -> pairwiseCSV_to_pairwiseQuantifier
+        but without any pairwise intermediates:
+        The MSA is encoded once and the quantifiers are calculated for
+        whole tiles of pairs at once.
+
+        The quantifier has the value range [0; 1]:
+        Short low-similarity alignments yield values closer to zero,
+        while long high-similarity alignments result in values closer to
+        1.
+
+        Special case:
+        If the quantifier can NOT be calculated, it will be omitted.
+        """))
+    parser.add_argument(
+        "in_msa_file", type=str,
+        help=textwrap.dedent("""\
+        str
+        infile
+
+        MSA containing n FASTA-entries (with unique headers).
+        """))
+    parser.add_argument(
+        "in_substmat_file", type=str,
+        help=textwrap.dedent("""\
+        str
+        infile
+
+        Substitution matrix.
+        """))
+    parser.add_argument(
+        "out_map_file", type=str,
+        help=textwrap.dedent("""\
+        str
+        outfile
+
+        Map each entry to a number:
+
+        each line of file:
+        csv-elements of a single entry:
+        - FASTA-header
+        - number (starts with 1)
+        """))
+    parser.add_argument(
+        "-co", "--out_connectivity_file", type=str, default=None,
+        help=textwrap.dedent("""\
+        str
+        outfile
+
+        Number of connections of each entry
+        (same format as pairwise_to_connectivity):
+
+        each line of file:
+        csv-elements of a single entry:
+        - FASTA-header
+        - number of connections (n-1, all pairs are aligned)
+
+        (default: None, i.e. NOT written.)
+        """))
+    parser.add_argument(
+        "-m", "--memory", type=int, default=1024,
+        help=textwrap.dedent("""\
+        int (positive)
+
+        Memory-budget (in MiB) of the pairwise computation.
+        The pairs are quantified in tiles, whose size is chosen to stay
+        within this budget (independent of the number of entries).
+
+        (default: 1024)
+        """))
+    parser.add_argument(
+        "-b", "--block_size", type=int, default=None,
+        help=textwrap.dedent("""\
+        int (positive)
+
+        Number of entries per tile-side, i.e. block_size*block_size
+        pairs are quantified at once.
+
+        (default: None, i.e. chosen by the memory-budget.)
+        """))
+    parser.add_argument(
+        "-w", "--workers", type=int, default=1,
+        help=textwrap.dedent("""\
+        int (positive)
+
+        Number of worker-processes.
+
+        If > 1:
+        Blocks of entries are quantified in parallel (each
+        worker-process gets an equal share of the memory-budget).
+        The results are written in sorted order, i.e. all outputs are
+        identical to the ones of a single process.
+
+        (default: 1)
+        """))
+    parser.add_argument(
+        "-v", "--verbose", action="store_true",
+        help=textwrap.dedent("""\
+        Be verbose with printing to STDERR.
+        """))
+    args = parser.parse_args()
+
+    return args
+
+
+# ---------------------------------------------------------------------|------|
+# Preparations.
+
+# Parse command-line arguments.
+args = parse_args()
+
+# Parse substitution-matrix.
+with open(args.in_substmat_file) as f:
+    substmat = parse_substmat_as_array(f)
+
+# Parse infile.
+with open(args.in_msa_file) as f:
+
+    # Get FASTA-entries from infile.
+    entry_s = list(iterate_fasta(f))
+
+# Remove starting '>'-character(s) from FASTA-headers.
+header_s = [header.lstrip('>') for header, _ in entry_s]
+
+# Sanity check: fail.
+# Redundant FASTA-headers.
+if len(set(header_s)) != len(header_s):
+    sys.exit("The FASTA-entries contain redundant headers.")
+
+# Special case:
+# There are NO pairwise alignments (apart from self-alignments).
+# -> Empty outputs (same as for pairwiseFASTA_to_pairwiseQuantifier).
+if len(header_s) < 2:
+    entry_s = []
+    header_s = []
+
+# Encode MSA.
+codes = encode_msa([body for _, body in entry_s], substmat)
+
+# ---------------------------------------------------------------------|------|
+# Calculate quantifier for each pairwise alignment.
+# STDOUT.
+
+# FB.
+output_pair_count = 0
+
+# For sorted alignment-pairs.
+for num_smaller_s, num_larger_s, quantifier_s in \
+        iterate_msa_quantifiers(codes,
+                                substmat,
+                                block_size=args.block_size,
+                                memory_budget=args.memory << 20,
+                                workers=args.workers):
+
+    # STDOUT.
+    write_ssv_block(sys.stdout, num_smaller_s, num_larger_s, quantifier_s)
+
+    # FB.
+    output_pair_count += len(quantifier_s)
+    if args.verbose and len(num_smaller_s) != 0:
+        print(f"#{num_smaller_s[-1]}/{len(header_s)}      ",
+              end="\r",
+              file=sys.stderr, flush=True)
+
+sys.stdout.flush()
+
+# ---------------------------------------------------------------------|------|
+# Output mapping of each header to its number.
+
+# Prepare file for writing.
+with open(args.out_map_file, 'w') as f:
+    for num, header in enumerate(header_s, 1):
+        # Write in csv-format.
+        f.write(f"{header},{num}\n")
+
+# Output number of connections of each header.
+if args.out_connectivity_file is not None:
+    with open(args.out_connectivity_file, 'w') as f:
+        for header in header_s:
+            # Write in csv-format.
+            f.write(f"{header},{len(header_s) - 1}\n")
+
+# ---------------------------------------------------------------------|------|
+# FB.
+
+if args.verbose:
+    pair_count = len(header_s) * (len(header_s) - 1) // 2
+    print(f"\n"
+          f"Success:\n"
+          f"  entries: {len(header_s)}\n"
+          f"  columns: {codes.shape[1]} (without gap-only columns)\n"
+          f"  unique pairs: {pair_count}\n"
+          f"  - omitted quantifiers: {pair_count - output_pair_count}\n"
+          f"  - output quantifiers:  {output_pair_count}",
+          file=sys.stderr, flush=True)
@@ -1,11 +1,15 @@
 import argparse
+import collections
+import multiprocessing
 import sys
 import textwrap
 
-from src.modules.ali import is_valid_ali
-from src.modules.ali import ali_to_dense_ali
-from src.modules.gali import dense_gali_to_quantifier
-from src.modules.substmat import parse_substmat_as_df
+from src.modules.pairwise import write_ssv_blocks
+from src.modules.quantify import PairwiseQuantifier
+from src.modules.quantify import parse_alignment_line
+from src.modules.quantify import quantify_alignment_shard
+from src.modules.substmat import parse_substmat_as_array
+from src.modules.utils import get_line_shards
 
 
 def parse_args() -> argparse.Namespace:
@@ -89,6 +93,40 @@ def parse_args() -> argparse.Namespace:
         (default: 0.5,
          same default as for needleall.)
         """))
+    parser.add_argument(
+        "-c", "--chunk_size", type=int, default=4096,
+        help=textwrap.dedent("""\
+        int (positive)
+
+        Number of alignments that are quantified together.
+
+        (default: 4096)
+        """))
+    parser.add_argument(
+        "-n", "--count", type=int, default=0,
+        help=textwrap.dedent("""\
+        int (positive)
+
+        Expected number of entries.
+        Memory for the quantifiers of all pairs is allocated beforehand.
+
+        (default: 0, i.e. memory is extended whenever necessary.)
+        """))
+    parser.add_argument(
+        "-w", "--workers", type=int, default=1,
+        help=textwrap.dedent("""\
+        int (positive)
+
+        Number of worker-processes.
+
+        If > 1:
+        The infile is split into shards (4 per worker-process, aligned
+        to line boundaries), which are quantified in parallel.
+        The results are merged in the order of the infile, i.e. all
+        outputs are identical to the ones of a single process.
+
+        (default: 1)
+        """))
     parser.add_argument(
         "-v", "--verbose", action="store_true",
         help=textwrap.dedent("""\
@@ -107,194 +145,92 @@ args = parse_args()
 
 # Parse substitution-matrix.
 with open(args.in_substmat_file) as f:
-    substmat = parse_substmat_as_df(f)
+    substmat = parse_substmat_as_array(f)
 
-# ---------------------------------------------------------------------|------|
-# FB:
-# Initialise counters.
-
-# Number of parsed lines.
-parsed_line_count = 0
-
-# Number of self-alignment-pairs.
-self_pair_count = 0
-# Number of redundant alignment-pairs.
-redundant_pair_count = 0
-# Number of unique alignment-pairs.
-unique_pair_count = 0
-
-# Number of omitted (unique) alignment-pairs.
-# (Quantifier could NOT be calculated).
-omitted_unique_pair_count = 0
-# Number of output (unique) alignment-pairs.
-# (Quantifier could be calculated.)
-output_unique_pair_count = 0
-
-# ---------------------------------------------------------------------|------|
-# Initialise memory.
-
-# Map each entry to a number:
-# - key:   entry-header
-# - value: number (starts with 1).
-header_to_num = {}
-
-# Calculated quantifiers.
-# - key:   tuple: pair of aligned sequences
-#                 (num_smaller, num_larger)
-# - value: quantifier
-#          (if there are redundant pairs, only store the 1st result).
-pair_to_quantifier = {}
+# Initialise quantification.
+# (Maps each entry to a number, ignores self-alignments and redundant
+#  alignments, and memorises the calculated quantifiers.)
+pairwise_quantifier = PairwiseQuantifier(substmat,
+                                         chunk_size=args.chunk_size,
+                                         verbose=args.verbose,
+                                         count=args.count)
 
 # ---------------------------------------------------------------------|------|
 # Calculate quantifier for each pairwise alignment.
 
-# Open file containing pairwise alignments.
-with open(args.in_alignment_file) as f:
-
-    # For each line.
-    for line in f:
+# Single process.
+if args.workers == 1:
 
-        # -------------------------------------------------------------|------|
-        # Parse pair of aligned sequences.
+    # Open file containing pairwise alignments.
+    with open(args.in_alignment_file) as f:
 
-        # Remove trailing newline character.
-        parsed_line = line.rstrip()
-        # Split csv-elements.
-        parsed_line = parsed_line.split(',')
+        # For each line.
+        for line in f:
 
-        # Unpack csv-elements.
-        header_a, header_b, seq_a, seq_b = parsed_line
+            # Parse pair of aligned sequences.
+            header_a, header_b, seq_a, seq_b = parse_alignment_line(line)
 
-        # FB.
-        parsed_line_count += 1
+            # Quantify alignment
+            # (in chunks, together with the following alignments).
+            pairwise_quantifier.add(header_a, header_b, seq_a, seq_b)
 
-        # -------------------------------------------------------------|------|
-        # Ignore self-alignments.
+    # Quantify the last chunk.
+    pairwise_quantifier.flush()
 
-        # If it is a self-alignment.
-        if header_a == header_b:
-            # FB.
-            self_pair_count += 1
-            # Ignore current pairwise alignment,
-            # continue with next one.
-            continue
-
-        # -------------------------------------------------------------|------|
-        # Map each entry to a number.
-
-        # Do the same for both entries of pair.
-        for header in [header_b, header_a]:
-
-            # If it a new entry.
-            if header not in header_to_num:
-
-                # Generate number for new entry.
-                num = len(header_to_num) + 1
-
-                # Add new entry.
-                header_to_num[header] = num
-
-        # Get number of each entry.
-        num_a = header_to_num[header_a]
-        num_b = header_to_num[header_b]
-
-        # -------------------------------------------------------------|------|
-        # Prepare dense alignment.
-
-        # Pack alignment.
-        gali = seq_a, seq_b
-
-        # Sanity check: fail.
-        # If the 2 aligned sequences do NOT have the same length:
-        # -> ValueError.
-        if not is_valid_ali(gali):
-            pass
-
-        # Get dense alignment.
-        dense_gali = ali_to_dense_ali(gali)
+# Several processes.
+else:
 
-        # -------------------------------------------------------------|------|
-        # Create key:
-        # Pair of aligned sequences.
+    # Split file containing pairwise alignments.
+    shard_s = get_line_shards(args.in_alignment_file, args.workers * 4)
 
-        num_smaller, num_larger = sorted([num_a, num_b])
-        pair = (num_smaller, num_larger)
+    # Quantify shards in parallel.
+    with multiprocessing.Pool(args.workers) as pool:
 
-        # -------------------------------------------------------------|------|
-        # Ignore redundant alignments.
+        # Shards that are being quantified (in the order of the shards).
+        # (At most workers + 1 shards in flight, i.e. the finished shards
+        #  do NOT pile up, while they are merged.)
+        pending_s = collections.deque()
 
-        # If the quantifier has already been calculated for this pair.
-        if pair in pair_to_quantifier:
-            # FB.
-            redundant_pair_count += 1
-            # Ignore current pairwise alignment,
-            # continue with next one.
-            continue
-
-        # -------------------------------------------------------------|------|
-        # Calculate and memorise quantifier.
-
-        # FB.
-        unique_pair_count += 1
+        for shard_num, shard in enumerate(shard_s, 1):
 
-        # FB.
-        if args.verbose:
-            print(f"#{num_smaller}<->#{num_larger}      ",
-                  end="\r",
-                  file=sys.stderr, flush=True)
+            pending_s.append(pool.apply_async(
+                quantify_alignment_shard,
+                (args.in_alignment_file, shard, substmat, args.chunk_size)))
 
-        # Calculate quantifier.
-        quantifier = dense_gali_to_quantifier(
-            dense_gali,
-            substmat,
-            gapopen_penalty=args.gapopen_penalty,
-            gapextend_penalty=args.gapextend_penalty)
-
-        # If quantifier could NOT be calculated.
-        if quantifier is None:
-
-            # FB.
-            omitted_unique_pair_count += 1
+            # Merge finished shards,
+            # while keeping all worker-processes busy.
+            while len(pending_s) > args.workers:
+                pairwise_quantifier.merge(pending_s.popleft().get())
 
             # FB.
             if args.verbose:
-                print(
-                    f"\n"
-                    f"pairwise alignment:\n"
-                    f"  {header_a}\n"
-                    f"  {seq_a}\n"
-                    f"  {header_b}\n"
-                    f"  {seq_b}\n"
-                    f"-> quantifier could NOT be calculated.",
-                    file=sys.stderr, flush=True)
-
-        # If quantifier could be calculated.
-        else:
-
-            # Update memory.
-            pair_to_quantifier[pair] = quantifier
+                print(f"shard {shard_num}/{len(shard_s)}      ",
+                      end="\r",
+                      file=sys.stderr, flush=True)
 
-            # FB.
-            output_unique_pair_count += 1
+        # Merge remaining shards.
+        while pending_s:
+            pairwise_quantifier.merge(pending_s.popleft().get())
 
 # FB.
-if args.verbose:
+# (Special case: there are NO pairwise alignments (apart from
+#  self-alignments), i.e. the outputs are empty.)
+if args.verbose and pairwise_quantifier.last_pair is not None:
+    num_smaller, num_larger = pairwise_quantifier.last_pair
     print(f"last pair: #{num_smaller}<->#{num_larger}",
           file=sys.stderr, flush=True)
 
+# Get results.
+header_to_num = pairwise_quantifier.header_to_num
+pair_to_quantifier = pairwise_quantifier.pair_to_quantifier
+
 # ---------------------------------------------------------------------|------|
 # STDOUT.
 
 # For sorted alignment-pairs.
-for pair in sorted(pair_to_quantifier.keys()):
-
-    # Get numbers of pair.
-    num_smaller, num_larger = pair
-    # Get quantifier of pair.
-    quantifier = pair_to_quantifier[pair]
-
-    # STDOUT.
-    print("{0:6} {1:6} {2:7.4f}".format(num_smaller, num_larger, quantifier))
+# (Walk through the condensed memory in order and write block by block.)
+write_ssv_blocks(sys.stdout, pair_to_quantifier.iterate_blocks())
+sys.stdout.flush()
 
 # ---------------------------------------------------------------------|------|
 # Output mapping of each header to its number.
@@ -311,11 +247,5 @@ with open(args.out_map_file, 'w') as f:
 
 if args.verbose:
     print(f"\n"
-          f"Success:\n"
-          f"  parsed pairs: {parsed_line_count}\n"
-          f"  - self-pairs:      {self_pair_count}\n"
-          f"  - redundant pairs: {redundant_pair_count}\n"
-          f"  - unique pairs:    {unique_pair_count}\n"
-          f"    - omitted quantifiers: {omitted_unique_pair_count}\n"
-          f"    - output quantifiers:  {output_unique_pair_count}",
+          f"{pairwise_quantifier.report()}",
           file=sys.stderr, flush=True)
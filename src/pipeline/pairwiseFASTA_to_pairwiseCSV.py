@@ -2,7 +2,7 @@ import argparse
 import sys
 import textwrap
 
-from src.modules.fasta import iterate_fasta
+from src.modules.fasta import iterate_fasta_pairs
 
 
 def parse_args() -> argparse.Namespace:
@@ -52,32 +52,35 @@ def parse_args() -> argparse.Namespace:
 # Parse command-line arguments.
 args = parse_args()
 
-# Parse infile.
-with open(args.infile) as f:
-
-    # Get FASTA-entries from infile.
-    entry_s = list(iterate_fasta(f))
-
-# Iterate over all pairwise alignments,
-# i.e. pairs of FASTA-entries.
-# FB: start numbering at 1.
-for num, (entry_a, entry_b) in enumerate(zip(entry_s[0::2], entry_s[1::2]),
-                                         1):
-
-    # Unpack FASTA-entries.
-    entry_a_header, entry_a_body = entry_a
-    entry_b_header, entry_b_body = entry_b
-
-    # Remove starting '>'-character(s) from FASTA-headers.
-    entry_a_header = entry_a_header.lstrip('>')
-    entry_b_header = entry_b_header.lstrip('>')
-
-    # STDOUT.
-    # Print as csv-elements.
-    print(','.join([entry_a_header,
-                    entry_b_header,
-                    entry_a_body,
-                    entry_b_body]))
+# FB.
+num = 0
+
+# Open infile and buffered STDOUT.
+with open(args.infile) as f, \
+        open(sys.stdout.fileno(), 'w', buffering=1 << 20,
+             closefd=False) as out:
+
+    # Iterate over all pairwise alignments,
+    # i.e. pairs of FASTA-entries.
+    # (Lazy: only the current pair is kept in memory.)
+    # FB: start numbering at 1.
+    for num, (entry_a, entry_b) in enumerate(iterate_fasta_pairs(f), 1):
+
+        # Unpack FASTA-entries.
+        entry_a_header, entry_a_body = entry_a
+        entry_b_header, entry_b_body = entry_b
+
+        # Remove starting '>'-character(s) from FASTA-headers.
+        entry_a_header = entry_a_header.lstrip('>')
+        entry_b_header = entry_b_header.lstrip('>')
+
+        # STDOUT.
+        # Write as csv-elements.
+        out.write(','.join([entry_a_header,
+                            entry_b_header,
+                            entry_a_body,
+                            entry_b_body]))
+        out.write('\n')
 
 # FB.
 if args.verbose:
@@ -0,0 +1,265 @@
+import argparse
+import sys
+import textwrap
+
+from src.modules.fasta import iterate_fasta_pairs
+from src.modules.pairwise import write_ssv_blocks
+from src.modules.quantify import PairwiseQuantifier
+from src.modules.quantify import quantify_stream_in_parallel
+from src.modules.substmat import parse_substmat_as_array
+
+
+def parse_args() -> argparse.Namespace:
+    """\
+    Parse command-line arguments.
+    """
+    parser = argparse.ArgumentParser(
+        formatter_class=argparse.RawTextHelpFormatter,
+        description=textwrap.dedent("""\
+        Calculate quantifier and connectivity for the pairwise global
+        alignments in FASTA-format.
+
+        Same outputs as the chain:
+          pairwiseFASTA_to_pairwiseCSV
+          -> pairwise_to_connectivity
+          -> pairwiseCSV_to_pairwiseQuantifier
+        but the pairwise alignments are only read once, without
+        intermediate csv-file.
+
+        The quantifier has the value range [0; 1]:
+        Short low-similarity alignments yield values closer to zero,
+        while long high-similarity alignments result in values closer to
+        1.
+
+        Special case:
+        If the quantifier can NOT be calculated, it will be omitted.
+        """))
+    parser.add_argument(
+        "in_alignment_file", type=str,
+        help=textwrap.dedent("""\
+        str
+        infile
+
+        Pairwise alignments (e.g. output of needleall):
+
+        each 2 consecutive FASTA-entries:
+        a single pairwise alignment
+        - entry_a
+        - entry_b
+
+        If there are redundant pairs (e.g.: A<->B and B<->A), only the
+        1st occurrence will be quantified.
+
+        Self-alignments (e.g.: A<->A) will NOT be quantified.
+
+        '-': read from STDIN.
+        The alignments are read incrementally, i.e. they can be
+        quantified while they are still being written to a pipe
+        (e.g. by needleall).
+        """))
+    parser.add_argument(
+        "in_substmat_file", type=str,
+        help=textwrap.dedent("""\
+        str
+        infile
+
+        Substitution matrix.
+        """))
+    parser.add_argument(
+        "out_map_file", type=str,
+        help=textwrap.dedent("""\
+        str
+        outfile
+
+        Map each entry to a number:
+
+        each line of file:
+        csv-elements of a single entry:
+        - FASTA-header
+        - number (starts with 1)
+        """))
+    parser.add_argument(
+        "out_connectivity_file", type=str,
+        help=textwrap.dedent("""\
+        str
+        outfile
+
+        Number of connections of each entry
+        (same format as pairwise_to_connectivity):
+
+        each line of file:
+        csv-elements of a single entry:
+        - FASTA-header
+        - number of connections
+        """))
+    parser.add_argument(
+        "-go", "--gapopen_penalty", type=float, default=10.0,
+        help=textwrap.dedent("""\
+        float (positive)
+
+        (default: 10.0,
+         same default as for needleall.)
+        """))
+    parser.add_argument(
+        "-ge", "--gapextend_penalty", type=float, default=0.5,
+        help=textwrap.dedent("""\
+        float (positive)
+
+        (default: 0.5,
+         same default as for needleall.)
+        """))
+    parser.add_argument(
+        "-c", "--chunk_size", type=int, default=4096,
+        help=textwrap.dedent("""\
+        int (positive)
+
+        Number of alignments that are quantified together.
+
+        (default: 4096)
+        """))
+    parser.add_argument(
+        "-n", "--count", type=int, default=0,
+        help=textwrap.dedent("""\
+        int (positive)
+
+        Expected number of entries.
+        Memory for the quantifiers of all pairs is allocated beforehand.
+
+        (default: 0, i.e. memory is extended whenever necessary.)
+        """))
+    parser.add_argument(
+        "-w", "--workers", type=int, default=1,
+        help=textwrap.dedent("""\
+        int (positive)
+
+        Number of worker-processes.
+
+        If > 1:
+        A reader-thread collects batches of alignments, which are
+        quantified in parallel (while the input is still being read).
+        The results are merged in the order of the infile, i.e. all
+        outputs are identical to the ones of a single process.
+
+        (default: 1)
+        """))
+    parser.add_argument(
+        "-b", "--batch_size", type=int, default=65536,
+        help=textwrap.dedent("""\
+        int (positive)
+
+        Number of alignments per batch of a worker-process.
+        (Only used, if workers > 1.)
+
+        (default: 65536)
+        """))
+    parser.add_argument(
+        "-v", "--verbose", action="store_true",
+        help=textwrap.dedent("""\
+        Be verbose with printing to STDERR.
+        """))
+    args = parser.parse_args()
+
+    return args
+
+
+# ---------------------------------------------------------------------|------|
+# Preparations.
+
+# Parse command-line arguments.
+args = parse_args()
+
+# Parse substitution-matrix.
+with open(args.in_substmat_file) as f:
+    substmat = parse_substmat_as_array(f)
+
+# Initialise quantification.
+# (Maps each entry to a number, ignores self-alignments and redundant
+#  alignments, and memorises the calculated quantifiers.)
+pairwise_quantifier = PairwiseQuantifier(substmat,
+                                         chunk_size=args.chunk_size,
+                                         verbose=args.verbose,
+                                         count=args.count)
+
+# ---------------------------------------------------------------------|------|
+# Calculate quantifier for each pairwise alignment.
+
+# Open file containing pairwise alignments.
+# ('-': STDIN, e.g. a pipe from needleall.)
+if args.in_alignment_file == '-':
+    f = sys.stdin
+else:
+    f = open(args.in_alignment_file)
+
+with f:
+
+    # For each pairwise alignment,
+    # i.e. pair of FASTA-entries.
+    # (Remove starting '>'-character(s) from FASTA-headers.)
+    ali_s = ((header_a.lstrip('>'), header_b.lstrip('>'), seq_a, seq_b)
+             for (header_a, seq_a), (header_b, seq_b)
+             in iterate_fasta_pairs(f))
+
+    # Single process.
+    if args.workers == 1:
+
+        for ali in ali_s:
+
+            # Quantify alignment
+            # (in chunks, together with the following alignments).
+            pairwise_quantifier.add(*ali)
+
+        # Quantify the last chunk.
+        pairwise_quantifier.flush()
+
+    # Several processes.
+    # (Reader-thread and pool of worker-processes.)
+    else:
+        quantify_stream_in_parallel(pairwise_quantifier,
+                                    ali_s,
+                                    args.workers,
+                                    batch_size=args.batch_size)
+
+# FB.
+# (Special case: there are NO pairwise alignments (apart from
+#  self-alignments), i.e. the outputs are empty.)
+if args.verbose and pairwise_quantifier.last_pair is not None:
+    num_smaller, num_larger = pairwise_quantifier.last_pair
+    print(f"last pair: #{num_smaller}<->#{num_larger}",
+          file=sys.stderr, flush=True)
+
+# Get results.
+header_to_num = pairwise_quantifier.header_to_num
+pair_to_quantifier = pairwise_quantifier.pair_to_quantifier
+
+# ---------------------------------------------------------------------|------|
+# STDOUT.
+
+# For sorted alignment-pairs.
+# (Walk through the condensed memory in order and write block by block.)
+write_ssv_blocks(sys.stdout, pair_to_quantifier.iterate_blocks())
+sys.stdout.flush()
+
+# ---------------------------------------------------------------------|------|
+# Output mapping of each header to its number.
+
+# Prepare file for writing.
+with open(args.out_map_file, 'w') as f:
+    # Sort by number.
+    for header, num in sorted(header_to_num.items(), key=lambda d: d[1]):
+        # Write in csv-format.
+        f.write(f"{header},{num}\n")
+
+# Output number of connections of each header.
+with open(args.out_connectivity_file, 'w') as f:
+    # Sort by number of connections.
+    for header, count in pairwise_quantifier.connectivity():
+        # Write in csv-format.
+        f.write(f"{header},{count}\n")
+
+# ---------------------------------------------------------------------|------|
+# FB.
+
+if args.verbose:
+    print(f"\n"
+          f"{pairwise_quantifier.report()}",
+          file=sys.stderr, flush=True)
@@ -0,0 +1,167 @@
+import argparse
+import sys
+import textwrap
+
+from src.modules.cc_analysis import MAX_ITERATION_COUNT
+from src.modules.cc_analysis import TOLERANCE
+from src.modules.cc_analysis import cc_analysis
+from src.modules.cc_analysis import cc_analysis_sparse
+from src.modules.cc_analysis import condensed_to_matrix
+from src.modules.cc_analysis import parse_ssv_as_sparse
+from src.modules.cc_analysis import write_vec_ssv
+from src.modules.pairwise import parse_ssv_as_condensed
+
+
+def parse_args() -> argparse.Namespace:
+    """\
+    Parse command-line arguments.
+    """
+    parser = argparse.ArgumentParser(
+        formatter_class=argparse.RawTextHelpFormatter,
+        description=textwrap.dedent("""\
+        Native replacement for the cc_analysis binary
+        (see src.modules.cc_analysis):
+        Represent each object by a vector in dim dimensions, so that the
+        dot products fit the pairwise quantifiers (least squares,
+        missing pairs are allowed).
+
+        Output (STDOUT):
+        each line:
+        ssv-elements of a single object (sorted by number):
+        - number
+        - dim coordinates
+        - length
+        - dim-1 angles
+        (Same layout as the cc_analysis binary.)
+
+        Exits with non-zero status, if an object has less than dim
+        connections or if the objects fall apart into loose groups.
+        """))
+    parser.add_argument(
+        "in_quantifier_file", type=str,
+        help=textwrap.dedent("""\
+        str
+        infile
+
+        Pairwise quantifiers (ssv-format, same as for cc_analysis):
+
+        each line:
+        - number A
+        - number B
+        - quantifier
+        """))
+    parser.add_argument(
+        "dim", type=int,
+        help=textwrap.dedent("""\
+        int (positive)
+
+        Number of dimensions.
+        """))
+    parser.add_argument(
+        "-c", "--count", type=int, default=None,
+        help=textwrap.dedent("""\
+        int
+
+        Number of objects (numbered from 1 to count).
+        (Objects without any pair fail the connectivity check.)
+
+        (default: None, i.e. highest number in the infile.)
+        """))
+    parser.add_argument(
+        "-i", "--max_iteration_count", type=int,
+        default=MAX_ITERATION_COUNT,
+        help=textwrap.dedent(f"""\
+        int (positive)
+
+        Maximum number of refinement-iterations.
+
+        (default: {MAX_ITERATION_COUNT})
+        """))
+    parser.add_argument(
+        "-t", "--tolerance", type=float, default=TOLERANCE,
+        help=textwrap.dedent(f"""\
+        float
+
+        Stop, if the residual decreases by less than this fraction.
+
+        (default: {TOLERANCE})
+        """))
+    parser.add_argument(
+        "-s", "--sparse", action="store_true",
+        help=textwrap.dedent("""\
+        Keep only the known pairs in memory (compressed sparse rows)
+        instead of dense n*n matrices, i.e. memory and time per iteration
+        proportional to the number of known pairs
+        (for large numbers of objects with many missing pairs).
+        """))
+    parser.add_argument(
+        "-v", "--verbose", action="store_true",
+        help=textwrap.dedent("""\
+        Be verbose with printing to STDERR.
+        """))
+    args = parser.parse_args()
+
+    return args
+
+
+# ---------------------------------------------------------------------|------|
+# Preparations.
+
+# Parse command-line arguments.
+args = parse_args()
+
+# ---------------------------------------------------------------------|------|
+# Calculate vectors.
+
+try:
+    if args.sparse:
+
+        # Parse infile directly into compressed sparse rows.
+        # (Vectorised, without Python-objects per pair.)
+        with open(args.in_quantifier_file) as f:
+            relations = parse_ssv_as_sparse(f, args.count)
+
+        # Number of objects.
+        count = relations.n
+        known_pair_count = len(relations.indices) // 2
+        vec_s, residual, iteration_count = cc_analysis_sparse(
+            relations, args.dim,
+            max_iteration_count=args.max_iteration_count,
+            tolerance=args.tolerance)
+    else:
+
+        # Parse infile directly into condensed form.
+        # (Vectorised, without Python-objects per pair.)
+        with open(args.in_quantifier_file) as f:
+            pair_to_quantifier = parse_ssv_as_condensed(f, args.count)
+
+        # Number of objects.
+        count = pair_to_quantifier.n
+        known_pair_count = len(pair_to_quantifier)
+
+        rel_mat, known_mat = condensed_to_matrix(pair_to_quantifier)
+        del pair_to_quantifier
+        vec_s, residual, iteration_count = cc_analysis(
+            rel_mat, known_mat, args.dim,
+            max_iteration_count=args.max_iteration_count,
+            tolerance=args.tolerance)
+except ValueError as e:
+    sys.exit(str(e))
+
+# ---------------------------------------------------------------------|------|
+# STDOUT.
+
+write_vec_ssv(sys.stdout, vec_s)
+sys.stdout.flush()
+
+# ---------------------------------------------------------------------|------|
+# FB.
+
+if args.verbose:
+    print(f"Success:\n"
+          f"  objects: {count}\n"
+          f"  known pairs: {known_pair_count}\n"
+          f"  dim: {args.dim}\n"
+          f"  iterations: {iteration_count}\n"
+          f"  residual: {residual:.6g}",
+          file=sys.stderr, flush=True)
@@ -0,0 +1,204 @@
+import argparse
+import sys
+import textwrap
+
+import numpy as np
+
+from src.modules.cc_analysis import MAX_ITERATION_COUNT
+from src.modules.cc_analysis import TOLERANCE
+from src.modules.cc_analysis import write_vec_ssv
+from src.modules.landmark import get_embedding_error
+from src.modules.landmark import map_with_landmarks
+from src.modules.pairwise import parse_ssv
+
+
+def parse_args() -> argparse.Namespace:
+    """\
+    Parse command-line arguments.
+    """
+    parser = argparse.ArgumentParser(
+        formatter_class=argparse.RawTextHelpFormatter,
+        description=textwrap.dedent("""\
+        Map the sequences with landmarks (landmark mode, see
+        src.modules.landmark):
+        The landmarks are mapped by cc_analysis (pairs among the
+        landmarks), the other sequences are placed into the same frame
+        by projection (pairs with the landmarks).
+
+        The embedding error (root-mean-square error of the dot products)
+        is reported for the held-out pairs, which are NOT used for the
+        map (see --verbose).
+
+        Output (STDOUT):
+        each line:
+        ssv-elements of a single object (sorted by number):
+        - number
+        - dim coordinates
+        - length
+        - dim-1 angles
+        (Same layout as the cc_analysis binary.)
+
+        Exits with non-zero status, if the landmarks are NOT connected
+        enough or if a sequence has less than dim landmarks.
+        """))
+    parser.add_argument(
+        "in_quantifier_file", type=str,
+        help=textwrap.dedent("""\
+        str
+        infile
+
+        Pairwise quantifiers (ssv-format, same as for cc_analysis).
+        """))
+    parser.add_argument(
+        "in_map_file", type=str,
+        help=textwrap.dedent("""\
+        str
+        infile
+
+        Numbering of in_quantifier_file
+        (csv-format: FASTA-header, number).
+        """))
+    parser.add_argument(
+        "in_landmark_file", type=str,
+        help=textwrap.dedent("""\
+        str
+        infile
+
+        each line:
+        FASTA-header of a single landmark
+        (see FASTA_to_landmarkPairs).
+        """))
+    parser.add_argument(
+        "dim", type=int,
+        help=textwrap.dedent("""\
+        int (positive)
+
+        Number of dimensions.
+        """))
+    parser.add_argument(
+        "-hf", "--heldout_file", type=str, default=None,
+        help=textwrap.dedent("""\
+        str
+        infile
+
+        each line:
+        csv-elements of a single held-out pair
+        (see FASTA_to_landmarkPairs):
+        - FASTA-header A
+        - FASTA-header B
+
+        (default: None, i.e. no embedding error.)
+        """))
+    parser.add_argument(
+        "-i", "--max_iteration_count", type=int,
+        default=MAX_ITERATION_COUNT,
+        help=textwrap.dedent(f"""\
+        int (positive)
+
+        Maximum number of refinement-iterations (landmarks).
+
+        (default: {MAX_ITERATION_COUNT})
+        """))
+    parser.add_argument(
+        "-t", "--tolerance", type=float, default=TOLERANCE,
+        help=textwrap.dedent(f"""\
+        float
+
+        Stop, if the residual decreases by less than this fraction.
+
+        (default: {TOLERANCE})
+        """))
+    parser.add_argument(
+        "-v", "--verbose", action="store_true",
+        help=textwrap.dedent("""\
+        Be verbose with printing to STDERR.
+        """))
+    args = parser.parse_args()
+
+    return args
+
+
+# ---------------------------------------------------------------------|------|
+# Preparations.
+
+# Parse command-line arguments.
+args = parse_args()
+
+# Numbering.
+with open(args.in_map_file) as f:
+    header_to_num = {}
+    for line in f:
+        header, num = line.rstrip('\n').rsplit(',', 1)
+        header_to_num[header] = int(num)
+
+# Number of objects.
+count = max(header_to_num.values(), default=0)
+
+# Landmarks.
+# (Landmarks without any quantifier are NOT numbered.)
+with open(args.in_landmark_file) as f:
+    landmark_num_s = [header_to_num[header]
+                      for header in (line.rstrip('\n') for line in f)
+                      if header in header_to_num]
+
+# Held-out pairs.
+# (Pairs without quantifier are ignored.)
+heldout_pair_s = set()
+if args.heldout_file is not None:
+    with open(args.heldout_file) as f:
+        for line in f:
+            header_a, header_b = line.rstrip('\n').split(',')
+            if header_a in header_to_num and header_b in header_to_num:
+                num_a = header_to_num[header_a]
+                num_b = header_to_num[header_b]
+                heldout_pair_s.add((min(num_a, num_b), max(num_a, num_b)))
+
+# Parse quantifiers.
+with open(args.in_quantifier_file) as f:
+    num_a_s, num_b_s, quantifier_s = parse_ssv(f)
+
+# Split off the held-out pairs.
+is_heldout = np.array([(min(num_a, num_b), max(num_a, num_b))
+                       in heldout_pair_s
+                       for num_a, num_b in zip(num_a_s.tolist(),
+                                               num_b_s.tolist())],
+                      dtype=bool)
+
+# ---------------------------------------------------------------------|------|
+# Calculate vectors.
+
+try:
+    vec_s, landmark_residual, other_residual = map_with_landmarks(
+        count, num_a_s[~is_heldout], num_b_s[~is_heldout],
+        quantifier_s[~is_heldout], landmark_num_s, args.dim,
+        max_iteration_count=args.max_iteration_count,
+        tolerance=args.tolerance)
+except ValueError as e:
+    sys.exit(str(e))
+
+# ---------------------------------------------------------------------|------|
+# STDOUT.
+
+write_vec_ssv(sys.stdout, vec_s)
+sys.stdout.flush()
+
+# ---------------------------------------------------------------------|------|
+# FB.
+
+if args.verbose:
+    fitted_error = get_embedding_error(vec_s, num_a_s[~is_heldout],
+                                       num_b_s[~is_heldout],
+                                       quantifier_s[~is_heldout])
+    heldout_error = get_embedding_error(vec_s, num_a_s[is_heldout],
+                                        num_b_s[is_heldout],
+                                        quantifier_s[is_heldout])
+    print(f"Success:\n"
+          f"  objects: {count}\n"
+          f"  landmarks: {len(landmark_num_s)}\n"
+          f"  dim: {args.dim}\n"
+          f"  residual (landmarks): {landmark_residual:.6g}\n"
+          f"  residual (projection): {other_residual:.6g}\n"
+          f"  embedding error (rms, fitted pairs): {fitted_error:.6g}\n"
+          f"  embedding error (rms, held-out pairs): "
+          f"{heldout_error:.6g} ({int(is_heldout.sum())} pairs)",
+          file=sys.stderr, flush=True)
@@ -0,0 +1,196 @@
+import argparse
+import sys
+import textwrap
+
+import numpy as np
+
+from src.modules.cc_analysis import get_lengths_and_angles
+from src.modules.cc_analysis import parse_vec_ssv
+from src.modules.cc_analysis import project_vectors
+from src.modules.pairwise import parse_ssv
+
+
+def parse_args() -> argparse.Namespace:
+    """\
+    Parse command-line arguments.
+    """
+    parser = argparse.ArgumentParser(
+        formatter_class=argparse.RawTextHelpFormatter,
+        description=textwrap.dedent("""\
+        Place new sequences onto the map of a previous job
+        (out-of-sample projection, see src.modules.cc_analysis):
+        The vector of each new sequence is the least-squares solution for
+        its quantifiers against (a subset of) the mapped sequences, i.e.
+        the map is NOT recomputed and the coordinates are in the same
+        frame.
+
+        The quantifiers of the new sequences can be calculated e.g. by
+        FASTA_to_pairwiseQuantifier (FASTA-entries of the previous job
+        and new FASTA-entries, with --pair_file for the pairs
+        new-vs-reference only).
+
+        Output (STDOUT):
+        each line:
+        csv-elements of a single new sequence (same layout as
+        vec+info.csv of the previous job):
+        - number (numbered after the mapped sequences)
+        - dim coordinates
+        - length
+        - dim-1 angles
+        - FASTA-header
+        """))
+    parser.add_argument(
+        "in_vec_file", type=str,
+        help=textwrap.dedent("""\
+        str
+        infile
+
+        Vectors of the previous job (vec.ssv).
+        """))
+    parser.add_argument(
+        "in_map_file", type=str,
+        help=textwrap.dedent("""\
+        str
+        infile
+
+        Numbering of the previous job
+        (info.csv, csv-format: FASTA-header, number).
+        """))
+    parser.add_argument(
+        "in_quantifier_file", type=str,
+        help=textwrap.dedent("""\
+        str
+        infile
+
+        Quantifiers of the new sequences against mapped sequences
+        (ssv-format, numbered as in in_quantifier_map_file).
+
+        Pairs among new sequences or among mapped sequences are ignored.
+        """))
+    parser.add_argument(
+        "in_quantifier_map_file", type=str,
+        help=textwrap.dedent("""\
+        str
+        infile
+
+        Numbering of in_quantifier_file
+        (csv-format: FASTA-header, number).
+
+        FASTA-headers that are NOT in in_map_file are the new sequences.
+        """))
+    parser.add_argument(
+        "-v", "--verbose", action="store_true",
+        help=textwrap.dedent("""\
+        Be verbose with printing to STDERR.
+        """))
+    args = parser.parse_args()
+
+    return args
+
+
+# ---------------------------------------------------------------------|------|
+# Preparations.
+
+# Parse command-line arguments.
+args = parse_args()
+
+# Vectors of the previous job.
+with open(args.in_vec_file) as f:
+    ref_num_s, ref_vec_s = parse_vec_ssv(f)
+
+# Numbering of the previous job.
+with open(args.in_map_file) as f:
+    old_header_to_num = {}
+    for line in f:
+        header, num = line.rstrip('\n').rsplit(',', 1)
+        old_header_to_num[header] = int(num)
+
+# Numbering of the quantifiers.
+with open(args.in_quantifier_map_file) as f:
+    header_to_num = {}
+    for line in f:
+        header, num = line.rstrip('\n').rsplit(',', 1)
+        header_to_num[header] = int(num)
+
+# Sanity check: fail.
+# The vectors do NOT belong to the numbering of the previous job.
+if not set(ref_num_s.tolist()) <= set(old_header_to_num.values()):
+    sys.exit("The vectors do not match the numbering of the previous job.")
+
+# Translate the numbering of the quantifiers:
+# - mapped sequences: index of the vector
+# - new sequences: index of the new sequence (in order of numbers)
+ref_num_to_idx = {num: idx for idx, num in enumerate(ref_num_s.tolist())}
+new_header_s = sorted((header for header in header_to_num
+                       if header not in old_header_to_num),
+                      key=header_to_num.get)
+max_num = max(header_to_num.values(), default=0)
+ref_idx_of_num = np.full(max_num + 1, -1, dtype=np.int64)
+new_idx_of_num = np.full(max_num + 1, -1, dtype=np.int64)
+for header, num in header_to_num.items():
+    if old_header_to_num.get(header) in ref_num_to_idx:
+        ref_idx_of_num[num] = ref_num_to_idx[old_header_to_num[header]]
+for idx, header in enumerate(new_header_s):
+    new_idx_of_num[header_to_num[header]] = idx
+
+# Parse quantifiers.
+with open(args.in_quantifier_file) as f:
+    num_a_s, num_b_s, quantifier_s = parse_ssv(f)
+
+# Sanity check: fail.
+# Unknown numbers.
+if len(num_a_s) and (min(num_a_s.min(), num_b_s.min()) < 1
+                     or max(num_a_s.max(), num_b_s.max()) > max_num):
+    sys.exit("The quantifiers contain unknown numbers.")
+
+# ---------------------------------------------------------------------|------|
+# Select pairs new-vs-reference.
+
+# Either order.
+is_new_ref = (new_idx_of_num[num_a_s] >= 0) & (ref_idx_of_num[num_b_s] >= 0)
+is_ref_new = (ref_idx_of_num[num_a_s] >= 0) & (new_idx_of_num[num_b_s] >= 0)
+idx_new_s = np.concatenate([new_idx_of_num[num_a_s[is_new_ref]],
+                            new_idx_of_num[num_b_s[is_ref_new]]])
+idx_ref_s = np.concatenate([ref_idx_of_num[num_b_s[is_new_ref]],
+                            ref_idx_of_num[num_a_s[is_ref_new]]])
+value_s = np.concatenate([quantifier_s[is_new_ref],
+                          quantifier_s[is_ref_new]])
+
+# ---------------------------------------------------------------------|------|
+# Calculate vectors.
+
+try:
+    vec_s, residual = project_vectors(ref_vec_s, len(new_header_s),
+                                      idx_new_s, idx_ref_s, value_s)
+except ValueError as e:
+    sys.exit(str(e))
+
+# ---------------------------------------------------------------------|------|
+# STDOUT.
+
+length_s, angle_s = get_lengths_and_angles(vec_s)
+first_num = int(ref_num_s.max(initial=0)) + 1
+for num, header, vec, length, angles in zip(
+        range(first_num, first_num + len(new_header_s)), new_header_s,
+        vec_s, length_s, angle_s):
+
+    # Write in csv-format.
+    print(','.join([str(num)]
+                   + [f'{value:.6f}' for value in vec]
+                   + [f'{length:.6f}']
+                   + [f'{value:.6f}' for value in angles]
+                   + [header]))
+
+sys.stdout.flush()
+
+# ---------------------------------------------------------------------|------|
+# FB.
+
+if args.verbose:
+    print(f"Success:\n"
+          f"  mapped sequences: {len(ref_num_s)}\n"
+          f"  new sequences: {len(new_header_s)}\n"
+          f"  pairs new-vs-mapped: {len(value_s)}\n"
+          f"  dim: {ref_vec_s.shape[1]}\n"
+          f"  residual: {residual:.6g}",
+          file=sys.stderr, flush=True)
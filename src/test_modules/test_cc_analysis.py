@@ -0,0 +1,391 @@
+import io
+
+import numpy as np
+import pytest
+
+import src.modules.cc_analysis as cc_analysis
+import src.modules.pairwise as pairwise
+
+
+def get_relations(n, dim, missing_fraction=0.0, seed=0):
+    """\
+    Exact dot products of random vectors (with missing pairs).
+    """
+    rng = np.random.default_rng(seed)
+    vec_s = rng.standard_normal((n, dim)) * 0.3 + 0.5
+    num_a_s, num_b_s = np.triu_indices(n, 1)
+    is_kept = rng.random(len(num_a_s)) >= missing_fraction
+    num_a_s, num_b_s = num_a_s[is_kept], num_b_s[is_kept]
+    value_s = np.einsum('ij,ij->i', vec_s[num_a_s], vec_s[num_b_s])
+    return vec_s, num_a_s + 1, num_b_s + 1, value_s
+
+
+class TestPairsToMatrix:
+
+    def test(self):
+        # Observed output.
+        obs_rel, obs_known = cc_analysis.pairs_to_matrix(
+            3, np.array([1, 2, 3]), np.array([2, 3, 3]),
+            np.array([0.5, 0.25, 1.0]))
+        # Expected output.
+        # (Without self-pairs.)
+        exp_rel = np.array([[0, 0.5, 0], [0.5, 0, 0.25], [0, 0.25, 0]])
+        exp_known = exp_rel != 0
+        # Test.
+        assert obs_rel.dtype == np.float32
+        np.testing.assert_array_equal(obs_rel, exp_rel)
+        np.testing.assert_array_equal(obs_known, exp_known)
+
+    def test_condensed(self):
+        # Input parameter.
+        _, num_a_s, num_b_s, value_s = get_relations(6, 2, 0.3)
+        pair_to_quantifier = pairwise.CondensedPairs(6)
+        pair_to_quantifier.set_many(num_a_s, num_b_s, value_s)
+        # Observed output.
+        obs = cc_analysis.condensed_to_matrix(pair_to_quantifier)
+        # Expected output.
+        exp = cc_analysis.pairs_to_matrix(6, num_a_s, num_b_s, value_s)
+        # Test.
+        np.testing.assert_array_equal(obs[0], exp[0])
+        np.testing.assert_array_equal(obs[1], exp[1])
+
+    def test_faulty(self):
+        # Test.
+        with pytest.raises(ValueError):
+            cc_analysis.pairs_to_matrix(2, np.array([1]), np.array([3]),
+                                        np.array([0.5]))
+
+
+class TestPairsToSparse:
+
+    def test(self):
+        # Observed output.
+        obs = cc_analysis.pairs_to_sparse(
+            3, np.array([1, 2, 3, 3]), np.array([2, 3, 3, 2]),
+            np.array([0.5, 0.25, 1.0, 0.75]))
+        # Expected output.
+        # (Without self-pairs, last of repeated pairs in any order.)
+        exp_indptr = [0, 1, 3, 4]
+        exp_indices = [1, 0, 2, 1]
+        exp_values = [0.5, 0.5, 0.75, 0.75]
+        # Test.
+        assert obs.n == 3
+        assert obs.values.dtype == np.float32
+        np.testing.assert_array_equal(obs.indptr, exp_indptr)
+        np.testing.assert_array_equal(obs.indices, exp_indices)
+        np.testing.assert_array_equal(obs.values, exp_values)
+
+    def test_condensed(self):
+        # Input parameter.
+        _, num_a_s, num_b_s, value_s = get_relations(6, 2, 0.3)
+        pair_to_quantifier = pairwise.CondensedPairs(6)
+        pair_to_quantifier.set_many(num_a_s, num_b_s, value_s)
+        # Observed output.
+        obs = cc_analysis.condensed_to_sparse(pair_to_quantifier)
+        # Expected output.
+        exp = cc_analysis.pairs_to_sparse(6, num_a_s, num_b_s, value_s)
+        # Test.
+        for obs_part, exp_part in zip(obs, exp):
+            np.testing.assert_array_equal(obs_part, exp_part)
+
+    def test_faulty(self):
+        # Test.
+        with pytest.raises(ValueError):
+            cc_analysis.pairs_to_sparse(2, np.array([0]), np.array([1]),
+                                        np.array([0.5]))
+
+
+class TestParseSsvAsSparse:
+
+    @pytest.mark.parametrize('is_sorted', [True, False])
+    def test(self, is_sorted):
+        # Input parameter.
+        _, num_a_s, num_b_s, value_s = get_relations(6, 2, 0.3)
+        order_s = np.arange(len(value_s))
+        if not is_sorted:
+            order_s = order_s[::-1]
+        s = ''.join(f"{num_a} {num_b} {value:.4f}\n"
+                    for num_a, num_b, value
+                    in zip(num_a_s[order_s], num_b_s[order_s],
+                           value_s[order_s]))
+        # Observed output.
+        obs = cc_analysis.parse_ssv_as_sparse(io.StringIO(s), 8)
+        # Expected output.
+        exp = cc_analysis.pairs_to_sparse(8, num_a_s, num_b_s,
+                                          value_s.round(4))
+        # Test.
+        for obs_part, exp_part in zip(obs, exp):
+            np.testing.assert_array_equal(obs_part, exp_part)
+
+    def test_repeated(self):
+        # Input parameter.
+        # (Self-pairs are ignored, last of repeated pairs in any order.)
+        s = '1 2 0.5\n2 2 1.0\n2 3 0.25\n3 2 0.75\n'
+        # Observed output.
+        obs = cc_analysis.parse_ssv_as_sparse(io.StringIO(s))
+        # Expected output.
+        exp_indptr = [0, 1, 3, 4]
+        exp_indices = [1, 0, 2, 1]
+        exp_values = [0.5, 0.5, 0.75, 0.75]
+        # Test.
+        assert obs.n == 3
+        np.testing.assert_array_equal(obs.indptr, exp_indptr)
+        np.testing.assert_array_equal(obs.indices, exp_indices)
+        np.testing.assert_array_equal(obs.values, exp_values)
+
+    @pytest.mark.parametrize('s, n', [('1 3 0.5\n', 2),
+                                      ('0 1 0.5\n', None)])
+    def test_faulty(self, s, n):
+        # Test.
+        with pytest.raises(ValueError):
+            cc_analysis.parse_ssv_as_sparse(io.StringIO(s), n)
+
+
+class TestCheckConnectivity:
+
+    def test_components(self):
+        # Input parameter.
+        _, known_mat = cc_analysis.pairs_to_matrix(
+            5, np.array([1, 2, 4]), np.array([3, 3, 5]), np.ones(3))
+        # Observed output.
+        obs = cc_analysis.get_components(known_mat)
+        # Expected output.
+        exp = [0, 0, 0, 3, 3]
+        # Test.
+        np.testing.assert_array_equal(obs, exp)
+
+    @pytest.mark.parametrize('num_a_s, num_b_s, dim', [
+        # Loose object.
+        ([1, 1, 2], [2, 3, 3], 3),
+        # Loose groups.
+        ([1, 1, 2, 4, 4, 5], [2, 3, 3, 5, 6, 6], 2)])
+    def test_faulty(self, num_a_s, num_b_s, dim):
+        # Input parameter.
+        _, known_mat = cc_analysis.pairs_to_matrix(
+            6, np.array(num_a_s), np.array(num_b_s), np.ones(len(num_a_s)))
+        # Test.
+        with pytest.raises(ValueError):
+            cc_analysis.check_connectivity(known_mat, dim)
+
+    def test_sparse(self):
+        # Input parameter.
+        num_a_s, num_b_s = np.array([1, 2, 4, 6]), np.array([3, 3, 5, 6])
+        relations = cc_analysis.pairs_to_sparse(6, num_a_s, num_b_s,
+                                                np.ones(4))
+        # Observed output.
+        obs = cc_analysis.get_sparse_components(relations)
+        # Expected output.
+        # (Object 6: only a self-pair.)
+        exp = [0, 0, 0, 3, 3, 5]
+        # Test.
+        np.testing.assert_array_equal(obs, exp)
+        with pytest.raises(ValueError):
+            cc_analysis.check_sparse_connectivity(relations, 1)
+
+
+class TestGetResidual:
+
+    @pytest.mark.parametrize('missing_fraction', [0.0, 0.3])
+    def test(self, missing_fraction):
+        # Input parameter.
+        _, num_a_s, num_b_s, value_s = get_relations(30, 2,
+                                                     missing_fraction)
+        rel_mat, known_mat = cc_analysis.pairs_to_matrix(
+            30, num_a_s, num_b_s, value_s)
+        vec_s = np.random.default_rng(2).standard_normal((30, 2))
+        # Observed output.
+        obs = cc_analysis.get_residual(rel_mat, known_mat, vec_s)
+        # Expected output.
+        exp = np.sum((rel_mat[num_a_s - 1, num_b_s - 1]
+                      - np.einsum('ij,ij->i', vec_s[num_a_s - 1],
+                                  vec_s[num_b_s - 1])) ** 2)
+        # Test.
+        assert obs == pytest.approx(exp, rel=1e-5)
+
+    def test_exact(self):
+        # Input parameter.
+        # (Exact vectors of all pairs, with long vectors on the diagonal.)
+        vec_s, num_a_s, num_b_s, value_s = get_relations(200, 3)
+        vec_s *= 10.0
+        value_s *= 100.0
+        rel_mat, known_mat = cc_analysis.pairs_to_matrix(
+            200, num_a_s, num_b_s, value_s)
+        # Observed output.
+        obs = cc_analysis.get_residual(rel_mat, known_mat, vec_s)
+        # Test.
+        assert 0.0 <= obs < 1e-3
+
+
+class TestCcAnalysis:
+
+    @pytest.mark.parametrize('n, dim, missing_fraction', [(30, 1, 0.0),
+                                                          (40, 2, 0.0),
+                                                          (60, 3, 0.3)])
+    def test(self, n, dim, missing_fraction):
+        # Input parameter.
+        vec_s, num_a_s, num_b_s, value_s = get_relations(
+            n, dim, missing_fraction)
+        rel_mat, known_mat = cc_analysis.pairs_to_matrix(
+            n, num_a_s, num_b_s, value_s)
+        # Observed output.
+        obs, obs_residual, _ = cc_analysis.cc_analysis(
+            rel_mat, known_mat, dim, tolerance=1e-12)
+        # Expected output.
+        # (Same dot products, i.e. the same vectors up to a rotation.)
+        exp = vec_s @ vec_s.T
+        # Test.
+        assert obs_residual < 1e-6
+        np.testing.assert_allclose(obs @ obs.T, exp, atol=1e-3)
+
+    def test_principal_axes(self):
+        # Input parameter.
+        vec_s, num_a_s, num_b_s, value_s = get_relations(50, 3)
+        rel_mat, known_mat = cc_analysis.pairs_to_matrix(
+            50, num_a_s, num_b_s, value_s)
+        # Observed output.
+        obs, _, _ = cc_analysis.cc_analysis(rel_mat, known_mat, 3)
+        # Test.
+        # (Uncorrelated axes with ascending variance, positive means.)
+        cov = obs.T @ obs
+        np.testing.assert_allclose(cov, np.diag(np.diag(cov)), atol=1e-6)
+        assert np.all(np.diff(np.diag(cov)) > 0)
+        assert np.all(obs.sum(axis=0) > 0)
+
+    def test_dim(self):
+        # Input parameter.
+        _, num_a_s, num_b_s, value_s = get_relations(5, 1)
+        rel_mat, known_mat = cc_analysis.pairs_to_matrix(
+            5, num_a_s, num_b_s, value_s)
+        # Test.
+        with pytest.raises(ValueError):
+            cc_analysis.cc_analysis(rel_mat, known_mat, 0)
+
+
+class TestCcAnalysisSparse:
+
+    @pytest.mark.parametrize('n, dim, missing_fraction', [(30, 1, 0.0),
+                                                          (60, 3, 0.3),
+                                                          (200, 4, 0.7)])
+    def test(self, n, dim, missing_fraction):
+        # Input parameter.
+        _, num_a_s, num_b_s, value_s = get_relations(
+            n, dim, missing_fraction)
+        value_s += np.random.default_rng(1).normal(0.0, 0.05, len(value_s))
+        # Observed output.
+        obs, obs_residual, _ = cc_analysis.cc_analysis_sparse(
+            cc_analysis.pairs_to_sparse(n, num_a_s, num_b_s, value_s), dim)
+        # Expected output.
+        # (Same as the dense relations.)
+        exp, exp_residual, _ = cc_analysis.cc_analysis(
+            *cc_analysis.pairs_to_matrix(n, num_a_s, num_b_s, value_s), dim)
+        # Test.
+        assert obs_residual == pytest.approx(exp_residual, rel=1e-5)
+        np.testing.assert_allclose(obs, exp, atol=1e-4)
+
+    def test_blocks(self):
+        # Input parameter.
+        # (Blocks of a few known pairs.)
+        _, num_a_s, num_b_s, value_s = get_relations(40, 2, 0.5)
+        relations = cc_analysis.pairs_to_sparse(40, num_a_s, num_b_s,
+                                                value_s)
+        vec_s = np.random.default_rng(2).standard_normal((40, 2))
+        # Observed output.
+        obs = cc_analysis.get_sparse_residual(relations, vec_s)
+        # Expected output.
+        exp = cc_analysis.get_residual(
+            *cc_analysis.pairs_to_matrix(40, num_a_s, num_b_s, value_s),
+            vec_s)
+        # Test.
+        assert obs == pytest.approx(exp, rel=1e-5)
+        assert len(list(cc_analysis._iterate_entry_blocks(
+            relations.indptr, block_size=7))) > 1
+
+
+class TestProjectVectors:
+
+    def test(self):
+        # Input parameter.
+        # (References: first 30 vectors, new objects: last 5 vectors, a
+        #  subset of the references for each new object.)
+        vec_s, _, _, _ = get_relations(35, 3)
+        rng = np.random.default_rng(3)
+        idx_new_s = np.repeat(np.arange(5), 10)
+        idx_ref_s = np.concatenate([rng.choice(30, 10, replace=False)
+                                    for _ in range(5)])
+        value_s = np.einsum('ij,ij->i', vec_s[30 + idx_new_s],
+                            vec_s[idx_ref_s])
+        # Observed output.
+        obs, obs_residual = cc_analysis.project_vectors(
+            vec_s[:30], 5, idx_new_s, idx_ref_s, value_s)
+        # Expected output.
+        exp = vec_s[30:]
+        # Test.
+        assert obs_residual < 1e-9
+        np.testing.assert_allclose(obs, exp, atol=1e-5)
+
+    @pytest.mark.parametrize('idx_new_s, idx_ref_s', [
+        # Unknown reference.
+        ([0, 0], [0, 3]),
+        # Less than dim references.
+        ([0, 1, 1], [0, 1, 2])])
+    def test_faulty(self, idx_new_s, idx_ref_s):
+        # Test.
+        with pytest.raises(ValueError):
+            cc_analysis.project_vectors(np.eye(3)[:, :2], 2,
+                                        np.array(idx_new_s),
+                                        np.array(idx_ref_s),
+                                        np.ones(len(idx_new_s)))
+
+
+class TestGetLengthsAndAngles:
+
+    def test(self):
+        # Input parameter.
+        vec_s = np.array([[0.0, 0.0, 2.0],
+                          [1.0, 1.0, 0.0],
+                          [0.0, -3.0, 4.0]])
+        # Observed output.
+        obs_length_s, obs_angle_s = cc_analysis.get_lengths_and_angles(
+            vec_s)
+        # Expected output.
+        exp_length_s = [2.0, np.sqrt(2), 5.0]
+        exp_angle_s = [[90.0, 90.0],
+                       [45.0, 0.0],
+                       [90.0, np.degrees(np.arctan2(4, -3))]]
+        # Test.
+        np.testing.assert_allclose(obs_length_s, exp_length_s)
+        np.testing.assert_allclose(obs_angle_s, exp_angle_s)
+
+
+class TestParseVecSsv:
+
+    def test(self):
+        # Input parameter.
+        f = io.StringIO('3 0.000000 2.000000 2.000000 90.000000\n'
+                        '5 1.000000 0.000000 1.000000 0.000000\n')
+        # Observed output.
+        obs_num_s, obs_vec_s = cc_analysis.parse_vec_ssv(f)
+        # Test.
+        np.testing.assert_array_equal(obs_num_s, [3, 5])
+        np.testing.assert_array_equal(obs_vec_s, [[0.0, 2.0], [1.0, 0.0]])
+
+    def test_faulty(self):
+        # Test.
+        with pytest.raises(ValueError):
+            cc_analysis.parse_vec_ssv(io.StringIO('1 0.5 0.5 0.5\n'))
+
+
+class TestWriteVecSsv:
+
+    def test(self):
+        # Input parameter.
+        vec_s = np.array([[0.0, 2.0], [1.0, 0.0]])
+        # Observed output.
+        f = io.StringIO()
+        cc_analysis.write_vec_ssv(f, vec_s)
+        obs = f.getvalue()
+        # Expected output.
+        exp = ('1 0.000000 2.000000 2.000000 90.000000\n'
+               '2 1.000000 0.000000 1.000000 0.000000\n')
+        # Test.
+        assert obs == exp
@@ -353,3 +353,77 @@ class TestIterateFasta:
         exp = [('>seq_a', 'ASDF'), ('>seq_b', 'TSDF')]
         # Test.
         assert obs == exp
+
+
+class TestIterateFastaPairs:
+
+    def test_two(self):
+        # Input parameter.
+        s = '\n'.join([
+            '>seq_a',
+            'AS-F',
+            '>seq_b',
+            'TS',
+            'DF',
+            '>seq_c',
+            'ASDF',
+            '>seq_a',
+            'A-DF'])
+        opened_infile = io.StringIO(s)
+        # Observed output.
+        obs = list(fasta.iterate_fasta_pairs(opened_infile))
+        # Expected output.
+        exp = [(('>seq_a', 'AS-F'), ('>seq_b', 'TSDF')),
+               (('>seq_c', 'ASDF'), ('>seq_a', 'A-DF'))]
+        # Test.
+        assert obs == exp
+
+    def test_lazy(self):
+        # Input parameter.
+        # (The 2nd pair is faulty.)
+        s = '\n'.join([
+            '>seq_a',
+            'ASDF',
+            '>seq_b',
+            'TSDF',
+            '>seq_c',
+            '>seq_d',
+            'ASDF'])
+        opened_infile = io.StringIO(s)
+        # Observed output.
+        obs = fasta.iterate_fasta_pairs(opened_infile)
+        # Test.
+        assert next(obs) == (('>seq_a', 'ASDF'), ('>seq_b', 'TSDF'))
+        with pytest.raises(ValueError):
+            next(obs)
+
+    def test_odd(self):
+        # Input parameter.
+        s = '\n'.join([
+            '>seq_a',
+            'ASDF',
+            '>seq_b',
+            'TSDF',
+            '>seq_c',
+            'ASDF'])
+        opened_infile = io.StringIO(s)
+        # Observed output.
+        obs = list(fasta.iterate_fasta_pairs(opened_infile))
+        # Expected output.
+        # (The last FASTA-entry without partner is ignored.)
+        exp = [(('>seq_a', 'ASDF'), ('>seq_b', 'TSDF'))]
+        # Test.
+        assert obs == exp
+
+
+class TestMapUniqueBodies:
+
+    def test(self):
+        # Input parameter.
+        body_s = ['ARN', 'WW', 'ARN', 'A', 'WW']
+        # Observed output.
+        obs = fasta.map_unique_bodies(body_s)
+        # Expected output.
+        exp = (['ARN', 'WW', 'A'], [0, 1, 0, 2, 1])
+        # Test.
+        assert obs == exp
@@ -1,7 +1,9 @@
 import io
 
+import numpy as np
 import pytest
 
+import src.modules.ali as ali
 import src.modules.gali as gali
 import src.modules.substmat as substmat
 
@@ -41,6 +43,8 @@ s = '\n'.join([
             '* -4 -4 -4 -4 -4 -4 -4 -4 -4 -4 -4 -4 -4 -4 -4 -4 -4 -4 -4 -4 -4 -4 -4  1 '])
 opened_infile = io.StringIO(s)
 smat = substmat.parse_substmat_as_df(opened_infile)
+# Compiled substitution matrix.
+csmat = substmat.compile_substmat(smat)
 
 
 class TestGaliToScore:
@@ -247,3 +251,207 @@ class TestDenseGaliToQuantifier:
         exp = 0.0214
         # Test.
         assert obs == exp
+
+
+class TestCompiledSubstmat:
+
+    @pytest.mark.parametrize('mat', [csmat, smat])
+    def test_gali_to_score(self, mat):
+        # Input parameter.
+        ga = ('-A--NDC--',
+              'AR-W-RC-K')
+        # Observed output.
+        obs = gali.gali_to_score(ga,
+                                 mat,
+                                 gapopen_penalty=10.0, gapextend_penalty=0.5)
+        # Expected output.
+        # (Same as the implementation with pd.DataFrame-lookups.)
+        exp = -34.0
+        # Test.
+        assert obs == exp
+
+    def test_gap_state(self):
+        # Input parameter.
+        # (A gap in sequence B does NOT end a gap in sequence A.)
+        ga = ('-A-',
+              'R-N')
+        # Observed output.
+        obs = gali.gali_to_score(ga,
+                                 csmat,
+                                 gapopen_penalty=10.0, gapextend_penalty=0.5)
+        # Expected output.
+        exp = -20.5
+        # Test.
+        assert obs == exp
+
+    def test_indelfree_gali_to_mean_score(self):
+        # Input parameter.
+        ga = ('ARAA',
+              'AARR')
+        # Observed output.
+        obs = gali.indelfree_gali_to_mean_score(ga,
+                                                csmat)
+        # Expected output.
+        exp = 6.5
+        # Test.
+        assert obs == exp
+
+    def test_indelfree_gali_to_max_score(self):
+        # Input parameter.
+        ga = ('ARW',
+              'ARN')
+        # Observed output.
+        obs = gali.indelfree_gali_to_max_score(ga,
+                                               csmat)
+        # Expected output.
+        exp = 15.0
+        # Test.
+        assert obs == exp
+
+    @pytest.mark.parametrize('mat', [csmat, smat])
+    def test_dense_gali_to_quantifier(self, mat):
+        # Input parameter.
+        ga = ('----------------------------------------------DKVLKEKRKLFIRSM----GEGTINGLLDEL-------LQTRVLNKEEMEKVKRENATVMDKTRALIDSVIPKGAQACQICITYICEEDSYLAGTLGLS',
+              'MTAEQRHNLQAYSDYVRKSLDPTHILSYMTPWLPENEVQSIQAEKNNKGPMEAASLFLRLLLELQVEGWFRGFLDALNHAGYSGLYEAIENWD----------------------------------------------------')
+        # Observed output.
+        obs = gali.dense_gali_to_quantifier(
+            ga,
+            mat,
+            gapopen_penalty=10.0, gapextend_penalty=0.5)
+        # Expected output.
+        # (Same as the implementation with pd.DataFrame-lookups.)
+        exp = 0.1571202230813106
+        # Test.
+        assert obs == exp
+
+
+class TestEncodedGaliToQuantifier:
+
+    @pytest.mark.parametrize('ga', [
+        ('MTAEQRHNLQAYSDYVRKSLDPTHILSYMTPWLPENEVQSIQAEKNNKGPMEAASLFLRLLLELQVEGWFRGFLDALNHAGYSGLYEAIENWD',
+         'MTAEQRHNLQAYSDYVRKSLDPTHILSYMTPWLPENEVQSIQAEKNNKGPMEAASLFLRLLLELQVEGWFRGFLDALNHAGYSGLYEAIENWD'),
+        ('----------------------------------------------DKVLKEKRKLFIRSM----GEGTINGLLDEL-------LQTRVLNKEEMEKVKRENATVMDKTRALIDSVIPKGAQACQICITYICEEDSYLAGTLGLS',
+         'MTAEQRHNLQAYSDYVRKSLDPTHILSYMTPWLPENEVQSIQAEKNNKGPMEAASLFLRLLLELQVEGWFRGFLDALNHAGYSGLYEAIENWD----------------------------------------------------'),
+        ('-----------------------------------------------------------------------------------NDDLDLEAAVARVRPQLVEFLSHCPDWLLTTCQRFLPEVALNGLDGITDHKEKVSALLELLEKAGPATWKQFAQYLCMECDLPLDLEIQLISSAG',
+         'REQFYNKGIRPYMGRFATDIKVREILPYLQCLTISDREEIEAKKEQYGNYNAVQTLLDNLRRRENWIDEFITALRKCELGSLANEMSDIY----------------------------------------------------------------------------------------'),
+        ('ARN-DC',
+         'A-NWDC')])
+    def test_same_as_dense_gali_to_quantifier(self, ga):
+        # Input parameter.
+        ega = (substmat.encode_seq(ga[0], csmat),
+               substmat.encode_seq(ga[1], csmat))
+        # Observed output.
+        obs = gali.encoded_gali_to_quantifier(ega,
+                                              csmat)
+        # Expected output.
+        exp = gali.dense_gali_to_quantifier(ga,
+                                            smat)
+        # Test.
+        assert obs == pytest.approx(exp)
+
+    def test_gap_gap_pairs(self):
+        # Input parameter.
+        ga = ('A-R-N-DC',
+              'A--WNWDC')
+        ega = (substmat.encode_seq(ga[0], csmat),
+               substmat.encode_seq(ga[1], csmat))
+        # Observed output.
+        obs = gali.encoded_gali_to_quantifier(ega,
+                                              csmat)
+        # Expected output.
+        exp = gali.dense_gali_to_quantifier(('AR-N-DC',
+                                             'A-WNWDC'),
+                                            smat)
+        # Test.
+        assert obs == pytest.approx(exp)
+
+    def test_none(self):
+        # Input parameter.
+        # (max_score == mean_score.)
+        ega = (substmat.encode_seq('XX-', csmat),
+               substmat.encode_seq('XXX', csmat))
+        # Observed output.
+        obs = gali.encoded_gali_to_quantifier(ega,
+                                              csmat)
+        # Test.
+        assert obs is None
+
+
+class TestQuantifyBatch:
+
+    def test(self):
+        # Input parameter.
+        ga_s = [
+            ('----------------------------------------------DKVLKEKRKLFIRSM----GEGTINGLLDEL-------LQTRVLNKEEMEKVKRENATVMDKTRALIDSVIPKGAQACQICITYICEEDSYLAGTLGLS',
+             'MTAEQRHNLQAYSDYVRKSLDPTHILSYMTPWLPENEVQSIQAEKNNKGPMEAASLFLRLLLELQVEGWFRGFLDALNHAGYSGLYEAIENWD----------------------------------------------------'),
+            ('ARN-DC',
+             'A-NWDC'),
+            ('A-R-N-DC',
+             'A--WNWDC'),
+            ('',
+             '')]
+        # Observed output.
+        obs = gali.quantify_batch(ga_s,
+                                  csmat)
+        # Expected output.
+        exp = [gali.dense_gali_to_quantifier(ali.ali_to_dense_ali(ga),
+                                             smat)
+               for ga in ga_s]
+        # Test.
+        assert obs[:3].tolist() == exp[:3]
+        assert exp[3] is None
+        assert np.isnan(obs[3])
+
+    @pytest.mark.parametrize('position_count', [1, 8, 20])
+    def test_position_count(self, position_count):
+        # Input parameter.
+        # (Mixed lengths, i.e. several sub-batches.)
+        ga_s = [('ARNDCQEGHI',
+                 'ARN-CQEGHW'),
+                ('ARN-DC',
+                 'A-NWDC'),
+                ('A-R-N-DC',
+                 'A--WNWDC'),
+                ('AR',
+                 'AW'),
+                ('ARNDCQ',
+                 'ARNDCQ')]
+        # Observed output.
+        obs = gali.quantify_batch(ga_s,
+                                  csmat,
+                                  position_count=position_count)
+        # Expected output.
+        exp = [gali.quantify_batch([ga],
+                                   csmat)[0]
+               for ga in ga_s]
+        # Test.
+        assert obs.tolist() == exp
+
+    def test_none(self):
+        # Input parameter.
+        ga_s = [('XXX',
+                 'XXX'),
+                ('ARN',
+                 'ARN')]
+        # Observed output.
+        obs = gali.quantify_batch(ga_s,
+                                  smat)
+        # Test.
+        assert np.isnan(obs[0])
+        assert obs[1] == 1.0
+
+    def test_empty(self):
+        # Observed output.
+        obs = gali.quantify_batch([],
+                                  csmat)
+        # Test.
+        assert obs.shape == (0,)
+
+    def test_fail(self):
+        # Input parameter.
+        ga_s = [('ARN',
+                 'AR')]
+        # Test.
+        with pytest.raises(ValueError):
+            gali.quantify_batch(ga_s,
+                                csmat)
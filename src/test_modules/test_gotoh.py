@@ -0,0 +1,375 @@
+import collections
+import io
+import itertools
+
+import numpy as np
+import pytest
+
+import src.modules.gali as gali_module
+import src.modules.gotoh as gotoh
+import src.modules.substmat as substmat
+
+
+# Substitution matrix.
+s = '\n'.join([
+    '#  Small matrix.',
+    '   A  R  N  W',
+    'A  4 -1 -2 -3',
+    'R -1  5  0 -3',
+    'N -2  0  6 -4',
+    'W -3 -3 -4 11'])
+csmat = substmat.parse_substmat_as_array(io.StringIO(s))
+
+
+def score_gali(gali, gapopen, gapextend, endweight, endopen, endextend):
+    """\
+    Score of the alignment (gap by gap, independent of the module).
+    """
+    score = 0.0
+    for seq in gali:
+        residue_idx_s = [idx for idx, char in enumerate(seq) if char != '-']
+        for is_gap, group in itertools.groupby(enumerate(seq),
+                                               lambda d: d[1] == '-'):
+            if not is_gap:
+                continue
+            idx_s = [idx for idx, _ in group]
+            is_end = (not residue_idx_s
+                      or idx_s[0] < residue_idx_s[0]
+                      or idx_s[-1] > residue_idx_s[-1])
+            if is_end and not endweight:
+                continue
+            if is_end:
+                score -= endopen + (len(idx_s) - 1) * endextend
+            else:
+                score -= gapopen + (len(idx_s) - 1) * gapextend
+    for char_a, char_b in zip(*gali):
+        if char_a != '-' and char_b != '-':
+            score += csmat.scores[csmat.code_table[ord(char_a)],
+                                  csmat.code_table[ord(char_b)]]
+    return score
+
+
+def iterate_galis(seq_a, seq_b):
+    """\
+    All global alignments of the 2 sequences (without gap-gap-pairs).
+    """
+    if not seq_a and not seq_b:
+        yield '', ''
+        return
+    if seq_a and seq_b:
+        for ali_a, ali_b in iterate_galis(seq_a[:-1], seq_b[:-1]):
+            yield ali_a + seq_a[-1], ali_b + seq_b[-1]
+    if seq_a:
+        for ali_a, ali_b in iterate_galis(seq_a[:-1], seq_b):
+            yield ali_a + seq_a[-1], ali_b + '-'
+    if seq_b:
+        for ali_a, ali_b in iterate_galis(seq_a, seq_b[:-1]):
+            yield ali_a + '-', ali_b + seq_b[-1]
+
+
+class TestGetScoreScale:
+
+    @pytest.mark.parametrize('penalty_s, exp', [([10.0, 0.5], 2),
+                                                ([10.0, 1.0], 1),
+                                                ([0.25, 0.1], 20)])
+    def test(self, penalty_s, exp):
+        # Observed output.
+        obs = gotoh.get_score_scale(penalty_s)
+        # Test.
+        assert obs == exp
+
+    def test_faulty(self):
+        # Test.
+        with pytest.raises(ValueError):
+            gotoh.get_score_scale([1 / 3 + 1e-4])
+
+
+class TestAlignGlobal:
+
+    def test(self):
+        # Input parameter.
+        seq_a = 'ARNWAR'
+        seq_b = 'ARWAR'
+        # Observed output.
+        obs = gotoh.align_global(seq_a, seq_b, csmat, endweight=True)
+        # Expected output.
+        exp = (19.0, ('ARNWAR', 'AR-WAR'))
+        # Test.
+        assert obs == exp
+
+    @pytest.mark.parametrize('gapopen, gapextend, endweight, '
+                             'endopen, endextend',
+                             [(10.0, 0.5, False, 10.0, 0.5),
+                              (10.0, 0.5, True, 10.0, 0.5),
+                              (3.0, 0.5, True, 1.0, 2.0),
+                              (1.5, 1.0, True, 8.0, 0.25)])
+    def test_exhaustive(self, gapopen, gapextend, endweight,
+                        endopen, endextend):
+        # Input parameter.
+        rng = np.random.RandomState(0)
+        seq_pair_s = [(''.join(rng.choice(list('ARNW'), rng.randint(5))),
+                       ''.join(rng.choice(list('ARNW'), rng.randint(5))))
+                      for _ in range(40)]
+        penalty_s = (gapopen, gapextend, endweight, endopen, endextend)
+        for seq_a, seq_b in seq_pair_s:
+            # Observed output.
+            score, gali = gotoh.align_global(
+                seq_a, seq_b, csmat,
+                gapopen_penalty=gapopen,
+                gapextend_penalty=gapextend,
+                endweight=endweight,
+                endopen_penalty=endopen,
+                endextend_penalty=endextend)
+            # Expected output.
+            exp = max(score_gali(gali, *penalty_s)
+                      for gali in iterate_galis(seq_a, seq_b))
+            # Test.
+            assert score == exp
+            assert score_gali(gali, *penalty_s) == score
+            assert gali[0].replace('-', '') == seq_a
+            assert gali[1].replace('-', '') == seq_b
+
+    def test_empty(self):
+        # Observed output.
+        obs = gotoh.align_global('AR', '', csmat, endweight=True)
+        # Expected output.
+        exp = (-10.5, ('AR', '--'))
+        # Test.
+        assert obs == exp
+
+    def test_unknown(self):
+        # Test.
+        with pytest.raises(ValueError):
+            gotoh.align_global('AR', 'AX', csmat)
+
+
+class TestAlignGlobalBatch:
+
+    @pytest.mark.parametrize('endweight, lane_count, trace_memory',
+                             [(False, 256, 1 << 26),
+                              (True, 256, 1 << 26),
+                              (True, 7, 1 << 26),
+                              (True, 256, 1)])
+    def test(self, endweight, lane_count, trace_memory):
+        # Input parameter.
+        rng = np.random.RandomState(1)
+        seq_pair_s = [(''.join(rng.choice(list('ARNW-'), rng.randint(30))),
+                       ''.join(rng.choice(list('ARNW-'), rng.randint(30))))
+                      for _ in range(60)]
+        # Observed output.
+        obs = gotoh.align_global_batch(seq_pair_s, csmat,
+                                       gapopen_penalty=3.0,
+                                       endweight=endweight,
+                                       endopen_penalty=2.0,
+                                       endextend_penalty=1.5,
+                                       lane_count=lane_count,
+                                       trace_memory=trace_memory)
+        # Expected output.
+        exp = [gotoh.align_global(seq_a, seq_b, csmat,
+                                  gapopen_penalty=3.0,
+                                  endweight=endweight,
+                                  endopen_penalty=2.0,
+                                  endextend_penalty=1.5)
+               for seq_a, seq_b in seq_pair_s]
+        # Test.
+        assert obs == exp
+
+
+class TestAlignGlobalAdaptive:
+
+    # Penalties.
+    penalty_kwargs = dict(gapopen_penalty=3.0,
+                          endweight=True,
+                          endopen_penalty=2.0,
+                          endextend_penalty=1.5)
+
+    def iterate_seq_pairs(self):
+        """\
+        Random and near-identical pairs of sequences.
+        """
+        rng = np.random.RandomState(2)
+        for _ in range(60):
+            seq_a = ''.join(rng.choice(list('ARNW'), rng.randint(40)))
+            seq_b = list(seq_a)
+            for _ in range(rng.randint(4)):
+                idx = rng.randint(len(seq_b) + 1)
+                if rng.randint(2):
+                    seq_b.insert(idx, rng.choice(list('ARNW')))
+                else:
+                    del seq_b[idx:idx + 1]
+            yield seq_a, ''.join(seq_b)
+            yield seq_a, ''.join(rng.choice(list('ARNW'), rng.randint(40)))
+
+    @pytest.mark.parametrize('endweight, band_margin', [(False, 2),
+                                                        (True, 0),
+                                                        (True, 2),
+                                                        (True, 50)])
+    def test(self, endweight, band_margin):
+        # Input parameter.
+        penalty_kwargs = dict(self.penalty_kwargs, endweight=endweight)
+        path_s = set()
+        for seq_a, seq_b in self.iterate_seq_pairs():
+            # Observed output.
+            path, score, gali = gotoh.align_global_adaptive(
+                seq_a, seq_b, csmat, band_margin=band_margin,
+                **penalty_kwargs)
+            path_s.add(path)
+            # Expected output.
+            exp = gotoh.align_global(seq_a, seq_b, csmat, **penalty_kwargs)
+            # Test.
+            assert (score, gali) == exp
+        # Bands need end gap penalties.
+        assert (gotoh.PATH_BANDED in path_s) == (endweight
+                                                 and band_margin < 50)
+        assert gotoh.PATH_REJECTED not in path_s
+
+    def test_minscore(self):
+        # Input parameter.
+        minscore = 5.0
+        path_s = set()
+        for seq_a, seq_b in self.iterate_seq_pairs():
+            # Observed output.
+            path, score, gali = gotoh.align_global_adaptive(
+                seq_a, seq_b, csmat, minscore=minscore, band_margin=0,
+                **self.penalty_kwargs)
+            path_s.add(path)
+            # Expected output.
+            exp = gotoh.align_global(seq_a, seq_b, csmat,
+                                     **self.penalty_kwargs)
+            # Test.
+            # (Rejected: score or upper bound below minscore.)
+            if exp[0] < minscore:
+                assert path == gotoh.PATH_REJECTED
+                assert exp[0] <= score < minscore
+                assert gali is None
+            else:
+                assert (score, gali) == exp
+        assert path_s == {gotoh.PATH_BANDED,
+                          gotoh.PATH_REJECTED,
+                          gotoh.PATH_FULL}
+
+
+class TestIterateAllPairAlignments:
+
+    @pytest.mark.parametrize('workers, engine, chunk_size',
+                             [(1, 'single', 4),
+                              (2, 'single', 4),
+                              (1, 'batch', 2),
+                              (2, 'batch', 5),
+                              (1, 'adaptive', 4),
+                              (2, 'adaptive', 5)])
+    def test(self, workers, engine, chunk_size):
+        # Input parameter.
+        seq_s = ['ARNW', 'ARW', 'WWA', 'NNRA']
+        # Observed output.
+        obs = list(gotoh.iterate_all_pair_alignments(seq_s, csmat,
+                                                     workers=workers,
+                                                     engine=engine,
+                                                     chunk_size=chunk_size,
+                                                     endweight=True))
+        # Expected output.
+        exp = [(idx_a, idx_b) + gotoh.align_global(seq_s[idx_a],
+                                                   seq_s[idx_b],
+                                                   csmat,
+                                                   endweight=True)
+               for idx_a in range(4) for idx_b in range(idx_a + 1, 4)]
+        # Test.
+        assert obs == exp
+
+    @pytest.mark.parametrize('workers, engine, exp', [
+        (1, 'single', {gotoh.PATH_FULL: 6}),
+        (1, 'adaptive', {gotoh.PATH_REJECTED: 5, gotoh.PATH_BANDED: 1}),
+        (2, 'adaptive', {gotoh.PATH_REJECTED: 5, gotoh.PATH_BANDED: 1})])
+    def test_path_count(self, workers, engine, exp):
+        # Input parameter.
+        seq_s = ['ARNW', 'ARW', 'WWA', 'NNRA']
+        path_count = collections.Counter()
+        # Observed output.
+        result_s = list(gotoh.iterate_all_pair_alignments(
+            seq_s, csmat, workers=workers, engine=engine, chunk_size=2,
+            minscore=5.0, path_count=path_count, endweight=True))
+        # Test.
+        assert path_count == exp
+        assert len(result_s) == 6
+
+    @pytest.mark.parametrize('workers', [1, 2])
+    def test_pair_s(self, workers):
+        # Input parameter.
+        seq_s = ['ARNW', 'ARW', 'WWA', 'NNRA']
+        pair_s = [(0, 2), (1, 2), (1, 3)]
+        # Observed output.
+        obs = list(gotoh.iterate_all_pair_alignments(seq_s, csmat,
+                                                     workers=workers,
+                                                     chunk_size=2,
+                                                     pair_s=pair_s))
+        # Expected output.
+        exp = [(idx_a, idx_b) + gotoh.align_global(seq_s[idx_a],
+                                                   seq_s[idx_b],
+                                                   csmat)
+               for idx_a, idx_b in pair_s]
+        # Test.
+        assert obs == exp
+
+    def test_engine(self):
+        # Test.
+        with pytest.raises(ValueError):
+            list(gotoh.iterate_all_pair_alignments(['AR', 'RA'], csmat,
+                                                   engine='faulty'))
+
+
+class TestGetUniqueBodyPairs:
+
+    def test(self):
+        # Input parameter.
+        # (Bodies of the sequences.)
+        body_idx_s = [0, 1, 0, 2, 1]
+        # Observed output.
+        obs = list(gotoh.get_unique_body_pairs(body_idx_s))
+        # Expected output.
+        exp = sorted({(body_idx_s[idx_a], body_idx_s[idx_b])
+                      for idx_a in range(5) for idx_b in range(idx_a + 1, 5)
+                      if body_idx_s[idx_a] != body_idx_s[idx_b]})
+        # Test.
+        assert obs == exp
+        assert (2, 0) not in obs
+
+    def test_pair_s(self):
+        # Input parameter.
+        body_idx_s = [0, 1, 0, 2, 1]
+        pair_s = [(0, 2), (0, 3), (2, 3), (3, 4)]
+        # Observed output.
+        obs = list(gotoh.get_unique_body_pairs(body_idx_s, pair_s))
+        # Expected output.
+        exp = [(0, 2), (2, 1)]
+        # Test.
+        assert obs == exp
+
+
+class TestAlignUniqueBodies:
+
+    @pytest.mark.parametrize('workers, engine', [(1, 'single'),
+                                                 (2, 'adaptive')])
+    def test(self, workers, engine):
+        # Input parameter.
+        body_s = ['ARNW', 'ARW', 'WWA']
+        body_pair_s = [(0, 1), (0, 2), (2, 1)]
+        minscore = 0.0
+        # Observed output.
+        pair_to_score, pair_to_quantifier = gotoh.align_unique_bodies(
+            body_s, csmat, body_pair_s, minscore=minscore, workers=workers,
+            engine=engine, endweight=True)
+        # Test.
+        for idx_a, idx_b in body_pair_s + [(0, 0), (1, 1), (2, 2)]:
+            score, gali = gotoh.align_global(body_s[idx_a], body_s[idx_b],
+                                             csmat, endweight=True)
+            quantifier = gali_module.quantify_batch([gali], csmat)[0]
+            if score < minscore:
+                assert pair_to_score[idx_a, idx_b] < minscore
+                assert (idx_a, idx_b) not in pair_to_quantifier
+            else:
+                assert pair_to_score[idx_a, idx_b] == score
+                assert pair_to_quantifier[idx_a, idx_b] == quantifier
+        # (Only the aligned pairs.)
+        assert set(pair_to_score) == set(body_pair_s + [(0, 0), (1, 1),
+                                                        (2, 2)])
+        assert set(pair_to_quantifier) <= set(pair_to_score)
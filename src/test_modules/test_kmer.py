@@ -0,0 +1,120 @@
+import numpy as np
+import pytest
+
+import src.modules.kmer as kmer
+
+
+# Sequences.
+seq_s = ['ARNDCQ', 'RNDCQE', 'WWWWWW', 'AR-ND', 'GHIL']
+
+
+class TestGetKmers:
+
+    @pytest.mark.parametrize('seq, kmer_size, exp', [
+        ('ARNDA', 3, {'ARN', 'RND', 'NDA'}),
+        ('ar-na', 2, {'AR', 'RN', 'NA'}),
+        ('AAAA', 2, {'AA'}),
+        ('AR', 3, set())])
+    def test(self, seq, kmer_size, exp):
+        # Observed output.
+        obs = kmer.get_kmers(seq, kmer_size)
+        # Test.
+        assert obs == exp
+
+
+class TestBuildKmerIndex:
+
+    def test(self):
+        # Observed output.
+        obs = kmer.build_kmer_index(seq_s, 3)
+        # Test.
+        assert list(obs['RND']) == [0, 1, 3]
+        assert list(obs['ARN']) == [0, 3]
+        assert list(obs['WWW']) == [2]
+        assert 'GHI' in obs
+        assert 'AR-' not in obs
+
+
+class TestCountSharedKmers:
+
+    def test(self):
+        # Observed output.
+        obs = list(kmer.count_shared_kmers(seq_s, 3))
+        # Expected output.
+        exp = [([1, 3], [3, 2]),
+               ([0, 3], [3, 1]),
+               ([], []),
+               ([0, 1], [2, 1]),
+               ([], [])]
+        # Test.
+        assert [(list(partner_s), list(count_s))
+                for partner_s, count_s in obs] == exp
+
+
+class TestSelectCandidatePairs:
+
+    @pytest.mark.parametrize('min_shared_kmers, min_partners, exp', [
+        (2, 0, [(0, 1), (0, 3)]),
+        (3, 0, [(0, 1)]),
+        (3, 1, [(0, 1), (0, 2), (0, 3), (0, 4)]),
+        (1, 2, [(0, 1), (0, 2), (0, 3), (0, 4), (1, 2), (1, 3), (1, 4)]),
+        (1, 10, [(idx_a, idx_b) for idx_a in range(5)
+                 for idx_b in range(idx_a + 1, 5)])])
+    def test(self, min_shared_kmers, min_partners, exp):
+        # Observed output.
+        # (All k-mers, 'RND' occurs in 3 of 5 sequences.)
+        obs = kmer.select_candidate_pairs(seq_s,
+                                          kmer_size=3,
+                                          min_shared_kmers=min_shared_kmers,
+                                          min_partners=min_partners,
+                                          max_kmer_fraction=1.0)
+        # Test.
+        assert obs == exp
+
+    def test_min_partners(self):
+        # Input parameter.
+        rng = np.random.RandomState(0)
+        seq_s = [''.join(rng.choice(list('ARNDCQEGHILKMFPSTWYV'), 30))
+                 for _ in range(20)]
+        # Observed output.
+        obs = kmer.select_candidate_pairs(seq_s, min_shared_kmers=100,
+                                          min_partners=3)
+        # Test.
+        partner_count_s = np.bincount(np.array(obs).ravel(), minlength=20)
+        assert partner_count_s.min() >= 3
+        assert obs == sorted(set(obs))
+
+    def test_unrelated(self):
+        # Input parameter.
+        # (Unrelated sequences share many 3-mers by chance.)
+        rng = np.random.RandomState(0)
+        seq_s = [''.join(rng.choice(list('ARNDCQEGHILKMFPSTWYV'),
+                                    rng.randint(200, 400)))
+                 for _ in range(300)]
+        # Observed output.
+        obs = kmer.select_candidate_pairs(seq_s, min_partners=4)
+        # Test.
+        # (About n * min_partners pairs, NOT n^2.)
+        partner_count_s = np.bincount(np.array(obs).ravel(), minlength=300)
+        assert partner_count_s.min() >= 4
+        assert len(obs) <= 300 * 4
+
+    def test_related(self):
+        # Input parameter.
+        # (Mutated copies of the same sequence among unrelated sequences.)
+        rng = np.random.RandomState(1)
+        alphabet = list('ARNDCQEGHILKMFPSTWYV')
+        seq_s = [''.join(rng.choice(alphabet, 300)) for _ in range(50)]
+        for _ in range(5):
+            seq = list(seq_s[0])
+            for pos in rng.choice(300, 60, replace=False):
+                seq[pos] = rng.choice(alphabet)
+            seq_s.append(''.join(seq))
+        # Observed output.
+        obs = kmer.select_candidate_pairs(seq_s, min_partners=0)
+        # Expected output.
+        # (Only the pairs of the related sequences.)
+        exp = [(idx_a, idx_b) for idx_a in [0] + list(range(50, 55))
+               for idx_b in range(50, 55) if idx_a < idx_b]
+        # Test.
+        assert obs == exp
@@ -0,0 +1,131 @@
+import numpy as np
+import pytest
+
+import src.modules.landmark as landmark
+
+
+# Sequences.
+seq_s = ['ARNDCQ', 'RNDCQE', 'WWWWWW', 'AR-ND', 'GHIL']
+
+
+def get_relations(n, dim, seed=0):
+    """\
+    Exact dot products of random vectors (all pairs).
+    """
+    rng = np.random.default_rng(seed)
+    vec_s = rng.standard_normal((n, dim)) * 0.3 + 0.5
+    num_a_s, num_b_s = np.triu_indices(n, 1)
+    value_s = np.einsum('ij,ij->i', vec_s[num_a_s], vec_s[num_b_s])
+    return vec_s, num_a_s + 1, num_b_s + 1, value_s
+
+
+class TestSelectLandmarks:
+
+    @pytest.mark.parametrize('landmark_count, exp', [
+        # Most k-mers first, then the farthest sequences
+        # (ties by index).
+        (3, [0, 2, 4]),
+        # Closer to landmark 0: sequence 1 (3 of 5 k-mers shared) before
+        # sequence 3 (2 of 4 k-mers shared).
+        (10, [0, 2, 4, 3, 1]),
+        (0, [])])
+    def test(self, landmark_count, exp):
+        # Observed output.
+        obs = landmark.select_landmarks(seq_s, landmark_count, 3)
+        # Test.
+        assert obs == exp
+
+
+class TestSelectLandmarkPairs:
+
+    def test(self):
+        # Observed output.
+        obs = landmark.select_landmark_pairs(5, [3, 0])
+        # Expected output.
+        exp = [(0, 1), (0, 2), (0, 3), (0, 4), (1, 3), (2, 3), (3, 4)]
+        # Test.
+        assert obs == exp
+
+
+class TestSampleHeldoutPairs:
+
+    @pytest.mark.parametrize('seq_count, sample_size, exp_len', [
+        # All pairs of other sequences.
+        (5, 100, 3),
+        # Few pairs.
+        (10, 20, 20),
+        # Many pairs.
+        (1000, 50, 50)])
+    def test(self, seq_count, sample_size, exp_len):
+        # Input parameter.
+        landmark_s = [0, 3]
+        # Observed output.
+        obs = landmark.sample_heldout_pairs(seq_count, landmark_s,
+                                            sample_size)
+        # Test.
+        assert len(obs) == exp_len == len(set(obs))
+        assert obs == sorted(obs)
+        assert all(idx_a < idx_b for idx_a, idx_b in obs)
+        assert not {idx for pair in obs for idx in pair} & set(landmark_s)
+        assert obs == landmark.sample_heldout_pairs(seq_count, landmark_s,
+                                                    sample_size)
+
+
+class TestMapWithLandmarks:
+
+    def test(self):
+        # Input parameter.
+        # (Only the pairs with the landmarks.)
+        _, num_a_s, num_b_s, value_s = get_relations(40, 3)
+        landmark_num_s = [2, 5, 9, 14, 20, 27, 33, 38]
+        is_kept = np.isin(num_a_s, landmark_num_s) | np.isin(num_b_s,
+                                                             landmark_num_s)
+        # Observed output.
+        obs, obs_landmark_residual, obs_other_residual = \
+            landmark.map_with_landmarks(
+                40, num_a_s[is_kept], num_b_s[is_kept], value_s[is_kept],
+                landmark_num_s, 3, tolerance=1e-12)
+        obs_error = landmark.get_embedding_error(
+            obs, num_a_s[~is_kept], num_b_s[~is_kept], value_s[~is_kept])
+        # Expected output.
+        # (Same dot products, also for the pairs NOT used for the map.)
+        exp = value_s
+        # Test.
+        # (Landmarks in single precision.)
+        assert obs_landmark_residual < 1e-6
+        assert obs_other_residual < 1e-4
+        assert obs_error < 1e-3
+        np.testing.assert_allclose(
+            np.einsum('ij,ij->i', obs[num_a_s - 1], obs[num_b_s - 1]), exp,
+            atol=1e-3)
+
+    def test_faulty(self):
+        # Input parameter.
+        # (Object 4 with only 1 landmark.)
+        _, num_a_s, num_b_s, value_s = get_relations(4, 2)
+        is_kept = num_b_s != 4
+        is_kept[(num_a_s == 1) & (num_b_s == 4)] = True
+        # Test.
+        with pytest.raises(ValueError):
+            landmark.map_with_landmarks(4, num_a_s[is_kept],
+                                        num_b_s[is_kept], value_s[is_kept],
+                                        [1, 2, 3], 2)
+
+
+class TestGetEmbeddingError:
+
+    def test(self):
+        # Input parameter.
+        vec_s = np.array([[1.0, 0.0], [1.0, 1.0], [0.0, 2.0]])
+        # Observed output.
+        obs = landmark.get_embedding_error(vec_s, np.array([1, 2]),
+                                           np.array([2, 3]),
+                                           np.array([2.0, 2.0]))
+        # Expected output.
+        # (Differences: 1 and 0.)
+        exp = np.sqrt(0.5)
+        # Test.
+        assert obs == pytest.approx(exp)
+        assert np.isnan(landmark.get_embedding_error(
+            vec_s, np.array([], dtype=int), np.array([], dtype=int),
+            np.array([])))
@@ -0,0 +1,165 @@
+import io
+
+import numpy as np
+import pytest
+
+import src.modules.gali as gali
+import src.modules.msa as msa
+import src.modules.substmat as substmat
+
+
+# Substitution matrix
+# (NOT symmetric, to check the roles of the sequences A and B).
+s = '\n'.join([
+    '#  Small matrix.',
+    '   A  R  N  W',
+    'A  4 -1 -2 -3',
+    'R -1  5  0 -3',
+    'N -2  1  6 -4',
+    'W -3 -3 -4 11'])
+csmat = substmat.parse_substmat_as_array(io.StringIO(s))
+
+
+def random_msa(n, length, seed):
+    """\
+    Random MSA with gaps, all-gap columns and a sequence without
+    residues.
+    """
+    rng = np.random.RandomState(seed)
+    char_s = np.array(list('ARNW--'))
+    seq_s = [''.join(rng.choice(char_s, length)) for _ in range(n)]
+    seq_s = [seq[:3] + '--' + seq[3:] for seq in seq_s]
+    seq_s[1] = '-' * len(seq_s[1])
+    return seq_s
+
+
+class TestEncodeMsa:
+
+    def test(self):
+        # Input parameter.
+        seq_s = ['A-R-',
+                 'W-N-',
+                 '--A-']
+        # Observed output.
+        obs = msa.encode_msa(seq_s, csmat)
+        # Expected output.
+        exp = [[0, 1],
+               [3, 2],
+               [4, 0]]
+        # Test.
+        assert obs.tolist() == exp
+
+    def test_length(self):
+        # Input parameter.
+        seq_s = ['A-R',
+                 'W-']
+        # Test.
+        with pytest.raises(ValueError):
+            msa.encode_msa(seq_s, csmat)
+
+    def test_unknown(self):
+        # Input parameter.
+        seq_s = ['A-R',
+                 'W-X']
+        # Test.
+        with pytest.raises(ValueError):
+            msa.encode_msa(seq_s, csmat)
+
+
+class TestQuantifyMsaTile:
+
+    def test(self):
+        # Input parameter.
+        seq_s = random_msa(12, 30, 0)
+        codes = msa.encode_msa(seq_s, csmat)
+        # Observed output.
+        obs = msa.quantify_msa_tile(codes[:5], codes[3:], csmat)
+        # Expected output.
+        exp = gali.quantify_batch([(seq_a, seq_b)
+                                   for seq_a in seq_s[:5]
+                                   for seq_b in seq_s[3:]],
+                                  csmat).reshape(5, 9)
+        # Test.
+        np.testing.assert_array_equal(obs, exp)
+        assert np.isnan(obs[1]).all()
+
+
+class TestIterateMsaQuantifiers:
+
+    @pytest.mark.parametrize('block_size', [1, 4, 256])
+    def test(self, block_size):
+        # Input parameter.
+        seq_s = random_msa(10, 20, 1)
+        codes = msa.encode_msa(seq_s, csmat)
+        # Observed output.
+        obs = []
+        for a_s, b_s, quantifier_s in msa.iterate_msa_quantifiers(
+                codes, csmat, block_size):
+            obs += list(zip(a_s.tolist(), b_s.tolist(),
+                            quantifier_s.tolist()))
+        # Expected output.
+        # (sequence A: num_larger, sequence B: num_smaller)
+        pair_s = [(a, b) for a in range(1, 11) for b in range(a + 1, 11)]
+        quantifier_s = gali.quantify_batch([(seq_s[b - 1], seq_s[a - 1])
+                                            for a, b in pair_s],
+                                           csmat)
+        exp = [(a, b, quantifier)
+               for (a, b), quantifier in zip(pair_s, quantifier_s.tolist())
+               if not np.isnan(quantifier)]
+        # Test.
+        assert obs == exp
+        assert len(exp) < len(pair_s)
+
+    @pytest.mark.parametrize('memory_budget, workers', [(1, 1),
+                                                        (1 << 20, 1),
+                                                        (1 << 20, 3)])
+    def test_memory_budget(self, memory_budget, workers):
+        # Input parameter.
+        seq_s = random_msa(17, 20, 2)
+        codes = msa.encode_msa(seq_s, csmat)
+        # Observed output.
+        obs = []
+        for a_s, b_s, quantifier_s in msa.iterate_msa_quantifiers(
+                codes, csmat,
+                memory_budget=memory_budget,
+                workers=workers):
+            obs += list(zip(a_s.tolist(), b_s.tolist(),
+                            quantifier_s.tolist()))
+        # Expected output.
+        exp = []
+        for a_s, b_s, quantifier_s in msa.iterate_msa_quantifiers(
+                codes, csmat, block_size=17):
+            exp += list(zip(a_s.tolist(), b_s.tolist(),
+                            quantifier_s.tolist()))
+        # Test.
+        assert obs == exp
+
+
+class TestGetMsaBlockSizes:
+
+    def test_budget(self):
+        # Input parameter.
+        memory_budget = 1 << 30
+        # Observed output.
+        obs_s = [msa.get_msa_block_sizes(n, 24, memory_budget, 4)
+                 for n in [1000, 10000, 100000]]
+        # Test.
+        for n, (row_block_size, col_block_size) in zip([1000, 10000, 100000],
+                                                       obs_s):
+            assert 1 <= row_block_size <= -(-n // 16)
+            assert 1 <= col_block_size <= n
+            # Results of a block of rows and a tile stay within the
+            # share of each worker-process.
+            row_bytes = row_block_size * n * msa.ROW_PAIR_BYTES
+            tile_bytes = (row_block_size * col_block_size
+                          * (24 * msa.TILE_PAIR_BYTES_PER_CODE
+                             + msa.TILE_PAIR_BYTES))
+            assert row_bytes + tile_bytes <= memory_budget // 4
+
+    def test_small(self):
+        # Observed output.
+        obs = msa.get_msa_block_sizes(10, 24, 1, 1)
+        # Expected output.
+        exp = (1, 1)
+        # Test.
+        assert obs == exp
@@ -0,0 +1,190 @@
+import io
+import os
+import stat
+import sys
+import textwrap
+
+import pytest
+
+import src.modules.gotoh as gotoh
+import src.modules.needleall as needleall
+import src.modules.substmat as substmat
+
+
+# Substitution matrix.
+s = '\n'.join([
+    '#  Small matrix.',
+    '   A  R  N  W',
+    'A  4 -1 -2 -3',
+    'R -1  5  0 -3',
+    'N -2  0  6 -4',
+    'W -3 -3 -4 11'])
+csmat = substmat.parse_substmat_as_array(io.StringIO(s))
+
+# FASTA-entries.
+entry_s = [(f'>seq_{k} description', seq)
+           for k, seq in enumerate(['ARNW', 'AR', 'WWWARN', 'N', 'ARRA',
+                                    'NNWA', 'W'])]
+
+
+@pytest.fixture
+def stand_in(tmp_path):
+    """\
+    Stand-in for needleall: writes each pair of -asequence and
+    -bsequence (ungapped, padded with gaps) and a line per pair to the
+    errfile.
+    """
+    path = tmp_path / 'needleall'
+    path.write_text(textwrap.dedent(f"""\
+        #!{sys.executable}
+        import sys
+        arg_s = sys.argv[1:]
+        opt = dict(zip(arg_s[:-1], arg_s[1:]))
+        def read(path):
+            entry_s = []
+            for line in open(path):
+                if line.startswith('>'):
+                    entry_s.append([line[1:].split()[0], ''])
+                else:
+                    entry_s[-1][1] += line.strip()
+            return entry_s
+        with open(opt['-errfile'], 'w') as f_log:
+            for name_a, seq_a in read(opt['-asequence']):
+                for name_b, seq_b in read(opt['-bsequence']):
+                    length = max(len(seq_a), len(seq_b))
+                    print(f'>{{name_a}}\\n{{seq_a.ljust(length, "-")}}')
+                    print(f'>{{name_b}}\\n{{seq_b.ljust(length, "-")}}')
+                    f_log.write(f'{{name_a}} {{name_b}}\\n')
+        """))
+    path.chmod(path.stat().st_mode | stat.S_IEXEC)
+    return str(path)
+
+
+def merge(tmp_path, block_count, workers, **kwargs):
+    """\
+    Merged output of all block-rows.
+    """
+    f = io.StringIO()
+    log_s = []
+    for block_entry_s, out_path_s, log_path_s in needleall.iterate_block_rows(
+            entry_s, str(tmp_path), block_count, workers=workers, **kwargs):
+        needleall.merge_block_row(f, block_entry_s, out_path_s)
+        for log_path in log_path_s:
+            if log_path is not None:
+                log_s.append(open(log_path).read())
+    return f.getvalue(), ''.join(log_s)
+
+
+class TestGetBlockCount:
+
+    @pytest.mark.parametrize('seq_count, workers, exp', [(100, 4, 6),
+                                                         (100, 1, 3),
+                                                         (3, 8, 3),
+                                                         (1, 1, 1)])
+    def test(self, seq_count, workers, exp):
+        # Observed output.
+        obs = needleall.get_block_count(seq_count, workers)
+        # Test.
+        assert obs == exp
+
+
+class TestSplitIntoBlocks:
+
+    @pytest.mark.parametrize('length_s, block_count, exp', [
+        ([1] * 10, 3, [(0, 4), (4, 7), (7, 10)]),
+        ([100, 1, 1], 3, [(0, 1), (1, 2), (2, 3)]),
+        ([1, 1, 100], 2, [(0, 2), (2, 3)]),
+        ([1, 1, 100], 3, [(0, 1), (1, 2), (2, 3)]),
+        ([5, 5], 1, [(0, 2)])])
+    def test(self, length_s, block_count, exp):
+        # Observed output.
+        obs = needleall.split_into_blocks(length_s, block_count)
+        # Test.
+        assert obs == exp
+
+
+class TestPlanBlockPairs:
+
+    def test(self):
+        # Input parameter.
+        length_s = [2, 3, 4, 1]
+        block_range_s = [(0, 2), (2, 4)]
+        # Observed output.
+        obs = needleall.plan_block_pairs(length_s, block_range_s)
+        # Expected output.
+        exp = [(0, 0, 25), (0, 1, 25), (1, 1, 25)]
+        # Test.
+        assert obs == exp
+
+
+class TestIterateBlockRows:
+
+    @pytest.mark.parametrize('block_count, workers', [(1, 1),
+                                                      (3, 1),
+                                                      (3, 2),
+                                                      (7, 3)])
+    def test_needleall(self, tmp_path, stand_in, block_count, workers):
+        # Observed output.
+        obs, obs_log = merge(tmp_path, block_count, workers,
+                             executable=stand_in)
+        # Expected output.
+        # (For each entry A: entries B of its own and the following
+        #  blocks.)
+        block_range_s = needleall.split_into_blocks(
+            [len(seq) for _, seq in entry_s], block_count)
+        pair_s = [(idx_a, idx_b)
+                  for start, end in block_range_s
+                  for idx_a in range(start, end)
+                  for idx_b in range(start, len(entry_s))]
+        exp = ''
+        exp_log = ''
+        for idx_a, idx_b in pair_s:
+            seq_a = entry_s[idx_a][1]
+            seq_b = entry_s[idx_b][1]
+            length = max(len(seq_a), len(seq_b))
+            exp += (f'>seq_{idx_a}\n{seq_a.ljust(length, "-")}\n'
+                    f'>seq_{idx_b}\n{seq_b.ljust(length, "-")}\n')
+        for start_a, end_a in block_range_s:
+            for start_b, end_b in block_range_s:
+                if start_b < start_a:
+                    continue
+                exp_log += ''.join(f'seq_{idx_a} seq_{idx_b}\n'
+                                   for idx_a in range(start_a, end_a)
+                                   for idx_b in range(start_b, end_b))
+        # Test.
+        assert obs == exp
+        assert obs_log == exp_log
+
+    def test_needleall_fails(self, tmp_path):
+        # Test.
+        with pytest.raises(Exception):
+            merge(tmp_path, 2, 1, executable=os.devnull)
+
+    @pytest.mark.parametrize('block_count, workers', [(1, 1), (3, 2)])
+    def test_native(self, tmp_path, block_count, workers):
+        # Input parameter.
+        minscore = 1.0
+        # Observed output.
+        obs, _ = merge(tmp_path, block_count, workers,
+                       aligner='native', substmat=csmat, minscore=minscore,
+                       endweight=True)
+        # Expected output.
+        block_range_s = needleall.split_into_blocks(
+            [len(seq) for _, seq in entry_s], block_count)
+        exp = ''
+        for start, end in block_range_s:
+            for idx_a in range(start, end):
+                for idx_b in range(start, len(entry_s)):
+                    (header_a, seq_a), (header_b, seq_b) = (entry_s[idx_a],
+                                                            entry_s[idx_b])
+                    score, (ali_a, ali_b) = gotoh.align_global(
+                        seq_a, seq_b, csmat, endweight=True)
+                    if score >= minscore:
+                        exp += f'{header_a}\n{ali_a}\n{header_b}\n{ali_b}\n'
+        # Test.
+        assert obs == exp
+
+    def test_aligner(self, tmp_path):
+        # Test.
+        with pytest.raises(ValueError):
+            merge(tmp_path, 2, 1, aligner='faulty')
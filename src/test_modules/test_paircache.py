@@ -0,0 +1,212 @@
+import io
+import math
+
+import pytest
+
+import src.modules.paircache as paircache
+import src.modules.substmat as substmat
+
+
+# Substitution matrix.
+s = '\n'.join([
+    '#  Small matrix.',
+    '   A  R  N  W',
+    'A  4 -1 -2 -3',
+    'R -1  5  0 -3',
+    'N -2  0  6 -4',
+    'W -3 -3 -4 11'])
+csmat = substmat.parse_substmat_as_array(io.StringIO(s))
+
+# Scoring scheme.
+digest = paircache.get_settings_digest(csmat)
+
+
+def key(seq_a, seq_b):
+    return paircache.get_pair_key(seq_a, seq_b, digest)
+
+
+class TestGetSettingsDigest:
+
+    def test_penalties(self):
+        # Test.
+        assert digest == paircache.get_settings_digest(csmat,
+                                                       endopen_penalty=1.0)
+        assert digest != paircache.get_settings_digest(csmat,
+                                                       gapopen_penalty=9.0)
+        assert (paircache.get_settings_digest(csmat, endweight=True)
+                != paircache.get_settings_digest(csmat, endweight=True,
+                                                 endopen_penalty=1.0))
+
+    def test_substmat(self):
+        # Input parameter.
+        other_csmat = substmat.parse_substmat_as_array(
+            io.StringIO(s.replace('W -3 -3 -4 11', 'W -3 -3 -4 12')))
+        # Test.
+        assert digest != paircache.get_settings_digest(other_csmat)
+
+
+class TestGetPairKey:
+
+    def test(self):
+        # Test.
+        assert key('AR', 'NW') == key('AR', 'NW')
+        assert key('AR', 'NW') != key('NW', 'AR')
+        assert key('A', 'RNW') != key('AR', 'NW')
+
+
+class TestPairCache:
+
+    def test(self, tmp_path):
+        # Input parameter.
+        path = str(tmp_path / 'cache.sqlite')
+        item_s = [(key('AR', 'NW'), 5.0, 0.5, None),
+                  (key('AR', 'AR'), -3.0, None, None),
+                  (key('W', 'N'), 2.0, math.nan, None)]
+        # Observed output.
+        with paircache.PairCache(path) as pair_cache:
+            pair_cache.put_many(item_s)
+        with paircache.PairCache(path) as pair_cache:
+            obs = pair_cache.get_many([key('AR', 'NW'), key('AR', 'AR'),
+                                       key('W', 'N'), key('NW', 'AR')],
+                                      minscore=1.0)
+            obs_count = (pair_cache.hit_count, pair_cache.miss_count)
+        # Expected output.
+        exp = [(5.0, 0.5), (-3.0, None), (2.0, math.nan), None]
+        # Test.
+        assert obs[:2] == exp[:2]
+        assert obs[2][0] == 2.0 and math.isnan(obs[2][1])
+        assert obs[3] is None
+        assert obs_count == (3, 1)
+
+    @pytest.mark.parametrize('minscore, exp', [(-5.0, None),
+                                               (None, None),
+                                               (0.0, (-3.0, None))])
+    def test_minscore(self, tmp_path, minscore, exp):
+        # Input parameter.
+        # (Not quantified: only a hit below the threshold.)
+        item_s = [(key('AR', 'AR'), -3.0, None, None)]
+        # Observed output.
+        with paircache.PairCache(str(tmp_path / 'cache.sqlite')) \
+                as pair_cache:
+            pair_cache.put_many(item_s)
+            obs, = pair_cache.get_many([key('AR', 'AR')], minscore=minscore)
+        # Test.
+        assert obs == exp
+
+    def test_eviction(self, tmp_path):
+        # Input parameter.
+        seq_s = ['A', 'R', 'N', 'W']
+        # Observed output.
+        with paircache.PairCache(str(tmp_path / 'cache.sqlite'),
+                                 max_entries=3) as pair_cache:
+            pair_cache.put_many([(key(seq, seq), 1.0, 1.0, None)
+                                 for seq in seq_s[:3]])
+            # Recently used.
+            pair_cache.get_many([key('A', 'A')])
+            pair_cache.put_many([(key('W', 'W'), 1.0, 1.0, None)])
+            obs = [result is not None
+                   for result in pair_cache.get_many([key(seq, seq)
+                                                      for seq in seq_s])]
+            obs_len = len(pair_cache)
+            obs_evicted = pair_cache.evicted_count
+        # Expected output.
+        # ('R' is the least recently used pair.)
+        exp = [True, False, True, True]
+        # Test.
+        assert obs == exp
+        assert obs_len == 3
+        assert obs_evicted == 1
+
+    def test_len(self, tmp_path):
+        # Input parameter.
+        path = str(tmp_path / 'cache.sqlite')
+        # Observed output.
+        # (Replaced rows and redundant keys are counted once.)
+        with paircache.PairCache(path) as pair_cache:
+            pair_cache.put_many([(key('A', 'R'), 1.0, 1.0, None),
+                                 (key('A', 'N'), 1.0, 1.0, None),
+                                 (key('A', 'N'), 2.0, 1.0, None)])
+            pair_cache.put_many([(key('A', 'R'), 3.0, 1.0, None),
+                                 (key('A', 'W'), 1.0, 1.0, None)])
+        with paircache.PairCache(path) as pair_cache:
+            obs = len(pair_cache)
+            obs_score = pair_cache.get_many([key('A', 'N')])[0][0]
+        # Test.
+        assert obs == 3
+        assert obs_score == 2.0
+
+    @pytest.mark.parametrize('store_alignments, exp', [(True, ('AR-', 'ARN')),
+                                                       (False, None)])
+    def test_get_alignment(self, tmp_path, store_alignments, exp):
+        # Observed output.
+        with paircache.PairCache(str(tmp_path / 'cache.sqlite'),
+                                 store_alignments=store_alignments) \
+                as pair_cache:
+            pair_cache.put_many([(key('AR', 'ARN'), 9.0, 0.9,
+                                  ('AR-', 'ARN'))])
+            obs = pair_cache.get_alignment(key('AR', 'ARN'))
+        # Test.
+        assert obs == exp
+
+    def test_max_entries(self, tmp_path):
+        # Test.
+        with pytest.raises(ValueError):
+            paircache.PairCache(str(tmp_path / 'cache.sqlite'),
+                                max_entries=0)
+
+
+class TestMergeCachedResults:
+
+    @pytest.mark.parametrize('chunk_size', [1, 2, 3, 100])
+    def test(self, tmp_path, chunk_size):
+        # Input parameter.
+        seq_s = ['AR', 'NW', 'W', 'RN']
+        aligned_pair_s = []
+
+        def align(pair_s):
+            for idx_a, idx_b in pair_s:
+                aligned_pair_s.append((idx_a, idx_b))
+                yield idx_a, idx_b, float(idx_a + idx_b), (seq_s[idx_a],
+                                                          seq_s[idx_b])
+
+        new_result_s = []
+        # Observed output.
+        with paircache.PairCache(str(tmp_path / 'cache.sqlite')) \
+                as pair_cache:
+            pair_cache.put_many([(key('AR', 'NW'), 5.0, 0.5, None),
+                                 (key('NW', 'W'), -1.0, None, None),
+                                 (key('RN', 'W'), -1.0, None, None)])
+            obs = list(paircache.merge_cached_results(
+                pair_cache, seq_s, digest, align, new_result_s,
+                pair_s=[(0, 1), (0, 2), (1, 2), (1, 3), (2, 3)],
+                minscore=0.0, chunk_size=chunk_size))
+        # Expected output.
+        # ((2, 3) is in the cache, but NOT for the pair (RN, W).)
+        exp = [(0, 1, 5.0, 0.5, None),
+               (0, 2, 2.0, None, ('AR', 'W')),
+               (1, 2, -1.0, None, None),
+               (1, 3, 4.0, None, ('NW', 'RN')),
+               (2, 3, 5.0, None, ('W', 'RN'))]
+        exp_new = [(0, 2, 2.0), (1, 3, 4.0), (2, 3, 5.0)]
+        # Test.
+        assert obs == exp
+        assert new_result_s == exp_new
+        assert aligned_pair_s == [(0, 2), (1, 3), (2, 3)]
+
+    def test_all_pairs(self, tmp_path):
+        # Input parameter.
+        seq_s = ['AR', 'NW', 'W']
+
+        def align(pair_s):
+            for idx_a, idx_b in pair_s:
+                yield idx_a, idx_b, 1.0, None
+
+        # Observed output.
+        with paircache.PairCache(str(tmp_path / 'cache.sqlite')) \
+                as pair_cache:
+            obs = [result[:2] for result in paircache.merge_cached_results(
+                pair_cache, seq_s, digest, align, [])]
+        # Expected output.
+        exp = [(0, 1), (0, 2), (1, 2)]
+        # Test.
+        assert obs == exp
@@ -1,3 +1,6 @@
+import io
+
+import numpy as np
 import pytest
 
 import src.modules.pairwise as pairwise
@@ -216,3 +219,258 @@ class TestCountObjects:
         exp_count = 4
         # Test.
         assert obs_count == exp_count
+
+
+class TestParseSsv:
+
+    def test(self):
+        # Input parameter.
+        s = '\n'.join([
+            '     1      2  0.8123',
+            '',
+            '     1      3 -0.5123'])
+        # Observed output.
+        obs_a, obs_b, obs_value = pairwise.parse_ssv(io.StringIO(s))
+        # Test.
+        assert obs_a.tolist() == [1, 1]
+        assert obs_b.tolist() == [2, 3]
+        assert obs_value.tolist() == [0.8123, -0.5123]
+
+    def test_empty(self):
+        # Observed output.
+        obs = pairwise.parse_ssv(io.StringIO(''))
+        # Test.
+        assert [len(el) for el in obs] == [0, 0, 0]
+
+
+class TestIterateSsvBlocks:
+
+    @pytest.mark.parametrize('chunk_size', [5, 22, 1000])
+    def test(self, chunk_size):
+        # Input parameter.
+        # (Lines split between chunks.)
+        s = '\n'.join([
+            '     1      2  0.8123',
+            '',
+            '     1      3 -0.5123',
+            '     2      3  1.0000'])
+        # Observed output.
+        block_s = list(pairwise.iterate_ssv_blocks(io.StringIO(s),
+                                                   chunk_size=chunk_size))
+        obs = [np.concatenate(part_s).tolist() for part_s in zip(*block_s)]
+        # Expected output.
+        # (Same as parse_ssv.)
+        exp = [el.tolist() for el in pairwise.parse_ssv(io.StringIO(s))]
+        # Test.
+        assert obs == exp
+        assert block_s[0][0].dtype == np.int64
+
+    @pytest.mark.parametrize('s', ['1 2 0.5\n1 3 x\n',
+                                   '1 2 0.5\n1 3\n'])
+    def test_faulty(self, s):
+        # Test.
+        with pytest.raises(ValueError):
+            list(pairwise.iterate_ssv_blocks(io.StringIO(s)))
+
+
+class TestParseSsvAsCondensed:
+
+    def test(self):
+        # Input parameter.
+        # (Self-pair, either order, repeated pair.)
+        s = '\n'.join([
+            '1 2 0.5',
+            '2 2 1.0',
+            '4 3 0.25',
+            '1 2 0.75'])
+        # Observed output.
+        obs = pairwise.parse_ssv_as_condensed(io.StringIO(s))
+        # Expected output.
+        exp = [((1, 2), 0.75), ((3, 4), 0.25)]
+        # Test.
+        assert obs.n == 4
+        assert list(obs.items()) == exp
+
+    def test_n(self):
+        # Observed output.
+        obs = pairwise.parse_ssv_as_condensed(io.StringIO('1 2 0.5\n'), 5)
+        # Test.
+        assert obs.n == 5
+        assert list(obs.items()) == [((1, 2), 0.5)]
+        with pytest.raises(ValueError):
+            pairwise.parse_ssv_as_condensed(io.StringIO('1 6 0.5\n'), 5)
+
+
+class TestRoundToSsvPrecision:
+
+    def test(self):
+        # Input parameter.
+        value_s = np.array([0.12344999, 0.12345001, -0.00001, 1.0,
+                            0.00005, 0.00015, -0.71235])
+        # Observed output.
+        obs = pairwise.round_to_ssv_precision(value_s)
+        # Expected output.
+        exp = [float(f'{value:.4f}') for value in value_s]
+        # Test.
+        assert obs.tolist() == exp
+
+    def test_float32(self):
+        # Input parameter.
+        value_s = np.random.RandomState(0).uniform(-1, 1, 10000)
+        # Observed output.
+        obs = pairwise.round_to_ssv_precision(value_s).astype(np.float32)
+        # Test.
+        for value, rounded in zip(value_s.tolist(), obs.tolist()):
+            assert f'{rounded:7.4f}' == f'{value:7.4f}'
+
+
+class TestCondensedPairs:
+
+    def test_index(self):
+        # Input parameter.
+        cp = pairwise.CondensedPairs(4)
+        # Observed output.
+        obs = [cp.index(1, 2), cp.index(1, 4), cp.index(2, 3),
+               cp.index(3, 4)]
+        # Expected output.
+        exp = [0, 2, 3, 5]
+        # Test.
+        assert obs == exp
+
+    def test_set_get(self):
+        # Input parameter.
+        cp = pairwise.CondensedPairs(4)
+        cp[(2, 4)] = 0.5
+        cp[(1, 3)] = -0.25
+        # Test.
+        assert (2, 4) in cp
+        assert (1, 2) not in cp
+        assert (4, 5) not in cp
+        assert cp[(1, 3)] == -0.25
+        assert len(cp) == 2
+        with pytest.raises(KeyError):
+            cp[(1, 2)]
+
+    def test_contains_many(self):
+        # Input parameter.
+        pair_to_relation = pairwise.CondensedPairs(4)
+        pair_to_relation[1, 3] = 0.5
+        pair_to_relation[3, 4] = 0.25
+        # Observed output.
+        obs = pair_to_relation.contains_many(np.array([1, 1, 3, 2, 4]),
+                                             np.array([3, 2, 4, 7, 5]))
+        # Test.
+        assert obs.tolist() == [True, False, True, False, False]
+
+    def test_resize(self):
+        # Input parameter.
+        cp = pairwise.CondensedPairs(2)
+        cp[(1, 2)] = 0.5
+        # Observed output.
+        # (Implicit resize.)
+        cp[(3, 7)] = 0.25
+        cp.resize(9)
+        cp.set_many(np.array([2, 1]), np.array([9, 8]), np.array([1., 0.]))
+        # Expected output.
+        exp = [((1, 2), 0.5),
+               ((1, 8), 0.0),
+               ((2, 9), 1.0),
+               ((3, 7), 0.25)]
+        # Test.
+        assert cp.n == 9
+        assert list(cp.items()) == exp
+
+    def test_resize_many(self):
+        # Input parameter.
+        # (Rows across byte-boundaries.)
+        rng = np.random.default_rng(0)
+        num_smaller_s, num_larger_s = np.triu_indices(37, 1)
+        is_kept = rng.random(len(num_smaller_s)) < 0.3
+        value_s = rng.random(int(is_kept.sum())).astype(np.float32)
+        cp = pairwise.CondensedPairs(37)
+        cp.set_many(num_smaller_s[is_kept] + 1, num_larger_s[is_kept] + 1,
+                    value_s)
+        # Observed output.
+        cp.resize(53)
+        # Expected output.
+        exp = list(zip(zip(num_smaller_s[is_kept] + 1,
+                           num_larger_s[is_kept] + 1),
+                       value_s))
+        # Test.
+        assert list(cp.items()) == exp
+        assert len(cp) == len(exp)
+
+    def test_grow(self):
+        # Input parameter.
+        cp = pairwise.CondensedPairs(100)
+        # Observed output.
+        # (Modest growth, unless more objects are needed.)
+        cp[(1, 101)] = 0.5
+        obs_n = cp.n
+        cp.set_many(np.array([1]), np.array([400]), np.array([0.25]))
+        # Test.
+        assert obs_n == 125
+        assert cp.n == 400
+        assert len(cp) == 2
+
+    @pytest.mark.parametrize('block_size', [8, 16, 1 << 20])
+    def test_iterate_blocks(self, block_size):
+        # Input parameter.
+        n = 20
+        pair_s = [(a, b) for a in range(1, n + 1) for b in range(a + 1, n + 1)
+                  if (a * b) % 3 == 0]
+        cp = pairwise.CondensedPairs(n)
+        for a, b in pair_s:
+            cp[(a, b)] = a / b
+        # Observed output.
+        obs = []
+        for a_s, b_s, value_s in cp.iterate_blocks(block_size):
+            obs += list(zip(a_s.tolist(), b_s.tolist(), value_s.tolist()))
+        # Expected output.
+        exp = [(a, b, float(np.float32(a / b))) for a, b in pair_s]
+        # Test.
+        assert obs == exp
+
+
+class TestWriteSsvBlocks:
+
+    def test_block(self):
+        # Input parameter.
+        a_s = np.array([1, 1, 12, 123456])
+        b_s = np.array([2, 30, 1234567, 123457])
+        value_s = np.array([0.5, -0.123456, 1.0, -0.0])
+        f = io.StringIO()
+        # Observed output.
+        pairwise.write_ssv_block(f, a_s, b_s, value_s)
+        obs_s = f.getvalue()
+        # Expected output.
+        exp_s = ''.join("{0:6} {1:6} {2:7.4f}\n".format(a, b, value)
+                        for a, b, value in zip(a_s.tolist(),
+                                               b_s.tolist(),
+                                               value_s.tolist()))
+        # Test.
+        assert obs_s == exp_s
+
+    def test_float32(self):
+        # Input parameter.
+        rng = np.random.RandomState(0)
+        value_s = pairwise.round_to_ssv_precision(
+            rng.uniform(-1, 1, 10000)).astype(np.float32)
+        a_s = np.arange(1, 10001)
+        b_s = a_s + 1
+        f = io.StringIO()
+        # Observed output.
+        obs_count = pairwise.write_ssv_blocks(
+            f, [(a_s[:5000], b_s[:5000], value_s[:5000]),
+                (a_s[:0], b_s[:0], value_s[:0]),
+                (a_s[5000:], b_s[5000:], value_s[5000:])])
+        obs_s = f.getvalue()
+        # Expected output.
+        exp_count = 10000
+        exp_s = ''.join("{0:6} {1:6} {2:7.4f}\n".format(a, b, value)
+                        for a, b, value in zip(a_s.tolist(),
+                                               b_s.tolist(),
+                                               value_s.tolist()))
+        # Test.
+        assert obs_count == exp_count
+        assert obs_s == exp_s
@@ -0,0 +1,257 @@
+import io
+
+import pytest
+
+import src.modules.gali as gali
+import src.modules.quantify as quantify
+import src.modules.substmat as substmat
+import src.modules.utils as utils
+from src.test_modules.test_gali import s
+
+
+# Substitution matrix.
+csmat = substmat.parse_substmat_as_array(io.StringIO(s))
+
+
+class TestPairwiseQuantifier:
+
+    def test(self):
+        # Input parameter.
+        ali_s = [
+            ('s1', 's1', 'ARNDC', 'ARNDC'),
+            ('s2', 's1', 'ARN-DC', 'A-NWDC'),
+            ('s3', 's1', 'ARNDC', 'ARNDC'),
+            ('s1', 's2', 'A-NWDC', 'ARN-DC'),
+            ('s3', 's2', 'XXX', 'XXX'),
+            ('s2', 's3', 'ARN', 'ARN')]
+        # Observed output.
+        pq = quantify.PairwiseQuantifier(csmat, chunk_size=2)
+        for ali in ali_s:
+            pq.add(*ali)
+        pq.flush()
+        # Expected output.
+        exp_header_to_num = {'s1': 1, 's2': 2, 's3': 3}
+        exp_pair_to_quantifier = {
+            (1, 2): pytest.approx(
+                gali.dense_gali_to_quantifier(('ARN-DC', 'A-NWDC'),
+                                              csmat),
+                abs=5e-5),
+            (1, 3): 1.0,
+            (2, 3): 1.0}
+        # Test.
+        assert pq.header_to_num == exp_header_to_num
+        assert dict(pq.pair_to_quantifier.items()) == exp_pair_to_quantifier
+        assert pq.parsed_line_count == 6
+        assert pq.self_pair_count == 1
+        assert pq.redundant_pair_count == 1
+        assert pq.unique_pair_count == 4
+        assert pq.omitted_unique_pair_count == 1
+        assert pq.output_unique_pair_count == 3
+        assert pq.last_pair == (2, 3)
+
+    @pytest.mark.parametrize('chunk_size', [1, 2, 100])
+    def test_omitted_pair_is_not_redundant(self, chunk_size):
+        # Input parameter.
+        # (The 1st occurrence of the pair can NOT be quantified,
+        #  therefore the 2nd occurrence is NOT redundant.)
+        ali_s = [
+            ('s2', 's1', 'XXX', 'XXX'),
+            ('s1', 's2', 'ARN', 'ARN'),
+            ('s2', 's1', 'ARN', 'ARN')]
+        # Observed output.
+        pq = quantify.PairwiseQuantifier(csmat, chunk_size=chunk_size)
+        for ali in ali_s:
+            pq.add(*ali)
+        pq.flush()
+        # Test.
+        assert dict(pq.pair_to_quantifier.items()) == {(1, 2): 1.0}
+        assert pq.unique_pair_count == 2
+        assert pq.redundant_pair_count == 1
+        assert pq.omitted_unique_pair_count == 1
+
+    @pytest.mark.parametrize('chunk_size', [1, 2, 100])
+    def test_add_quantifier(self, chunk_size):
+        # Input parameter.
+        ali_s = [
+            ('s1', 's1', 'ARNDC', 'ARNDC'),
+            ('s2', 's1', 'ARN-DC', 'A-NWDC'),
+            ('s3', 's2', 'XXX', 'XXX'),
+            ('s3', 's1', 'ARNDC', 'ARNDC'),
+            ('s1', 's2', 'A-NWDC', 'ARN-DC'),
+            ('s2', 's3', 'ARN', 'ARN')]
+        # Observed output.
+        # (Alternately with and without alignment.)
+        obs = quantify.PairwiseQuantifier(csmat, chunk_size=chunk_size)
+        for idx, (header_a, header_b, seq_a, seq_b) in enumerate(ali_s):
+            if idx % 2:
+                obs.add_quantifier(
+                    header_a, header_b,
+                    gali.quantify_batch([(seq_a, seq_b)], csmat)[0])
+            else:
+                obs.add(header_a, header_b, seq_a, seq_b)
+        obs.flush()
+        # Expected output.
+        exp = quantify.PairwiseQuantifier(csmat, chunk_size=chunk_size)
+        for ali in ali_s:
+            exp.add(*ali)
+        exp.flush()
+        # Test.
+        assert obs.header_to_num == exp.header_to_num
+        assert (dict(obs.pair_to_quantifier.items())
+                == dict(exp.pair_to_quantifier.items()))
+        assert obs.report() == exp.report()
+        assert obs.connectivity() == exp.connectivity()
+
+    def test_connectivity(self):
+        # Input parameter.
+        ali_s = [
+            ('s5', 's5', 'ARN', 'ARN'),
+            ('s2', 's1', 'XXX', 'XXX'),
+            ('s3', 's1', 'XXX', 'XXX'),
+            ('s1', 's3', 'ARN', 'ARN'),
+            ('s4', 's2', 'ARN', 'ARN'),
+            ('s1', 's4', 'ARN', 'ARN'),
+            ('s4', 's1', 'ARN', 'ARN'),
+            ('s4', 's4', 'ARN', 'ARN')]
+        # Observed output.
+        pq = quantify.PairwiseQuantifier(csmat, chunk_size=2)
+        for ali in ali_s:
+            pq.add(*ali)
+        obs = pq.connectivity()
+        # Expected output.
+        # (Same counts as pairwise_to_connectivity:
+        #  unique pairs, whether quantified or NOT.)
+        exp = [('s5', 0),
+               ('s2', 2),
+               ('s3', 1),
+               ('s4', 2),
+               ('s1', 3)]
+        # Test.
+        assert sorted(obs) == sorted(exp)
+        assert [count for _, count in obs] == [0, 1, 2, 2, 3]
+
+
+class TestMerge:
+
+    # Alignments, including redundant pairs and pairs that can NOT be
+    # quantified.
+    ali_s = [
+        ('s1', 's1', 'ARNDC', 'ARNDC'),
+        ('s2', 's1', 'XXX', 'XXX'),
+        ('s3', 's1', 'ARN-DC', 'A-NWDC'),
+        ('s1', 's2', 'ARNDC', 'ARNDC'),
+        ('s4', 's2', 'ARNDC', 'ARNWC'),
+        ('s2', 's1', 'WRNDC', 'ARNDC'),
+        ('s1', 's3', 'XXX', 'XXX'),
+        ('s4', 's4', 'ARNDC', 'ARNDC'),
+        ('s3', 's4', 'XXX', 'XXX'),
+        ('s4', 's3', 'XXX', 'XXX')]
+
+    @pytest.mark.parametrize('split_s', [[0], [3], [1, 5], [2, 4, 6, 8]])
+    def test(self, split_s):
+        # Expected output.
+        exp = quantify.PairwiseQuantifier(csmat)
+        for ali in self.ali_s:
+            exp.add(*ali)
+        exp.flush()
+        # Observed output.
+        obs = quantify.PairwiseQuantifier(csmat)
+        for start, end in zip([0] + split_s, split_s + [len(self.ali_s)]):
+            part = quantify.PairwiseQuantifier(csmat, keep_history=True)
+            for ali in self.ali_s[start:end]:
+                part.add(*ali)
+            part.flush()
+            obs.merge(part)
+        # Test.
+        assert obs.header_to_num == exp.header_to_num
+        assert (dict(obs.pair_to_quantifier.items())
+                == dict(exp.pair_to_quantifier.items()))
+        assert obs.report() == exp.report()
+        assert obs.last_pair == exp.last_pair
+        assert obs.connectivity() == exp.connectivity()
+
+    @pytest.mark.parametrize('split_s', [[3], [1, 5], [2, 4, 6, 8]])
+    def test_history(self, split_s):
+        # Expected output.
+        exp = quantify.PairwiseQuantifier(csmat)
+        for ali in self.ali_s:
+            exp.add(*ali)
+        exp.flush()
+        # Observed output.
+        # (Merged history is merged again.)
+        merged = quantify.PairwiseQuantifier(csmat, keep_history=True)
+        for start, end in zip([0] + split_s, split_s + [len(self.ali_s)]):
+            part = quantify.PairwiseQuantifier(csmat, keep_history=True)
+            for ali in self.ali_s[start:end]:
+                part.add(*ali)
+            part.flush()
+            merged.merge(part)
+        obs = quantify.PairwiseQuantifier(csmat)
+        obs.merge(merged)
+        # Test.
+        assert (dict(obs.pair_to_quantifier.items())
+                == dict(exp.pair_to_quantifier.items()))
+        assert obs.report() == exp.report()
+        assert obs.connectivity() == exp.connectivity()
+
+
+class TestQuantifyAlignmentShard:
+
+    def test(self, tmp_path):
+        # Input parameter.
+        path = tmp_path / 'alignments.csv'
+        path.write_text(''.join([','.join(ali) + '\n'
+                                 for ali in TestMerge.ali_s]))
+        # Expected output.
+        exp = quantify.PairwiseQuantifier(csmat)
+        for ali in TestMerge.ali_s:
+            exp.add(*ali)
+        exp.flush()
+        # Observed output.
+        obs = quantify.PairwiseQuantifier(csmat)
+        for shard in utils.get_line_shards(str(path), 3):
+            obs.merge(quantify.quantify_alignment_shard(str(path),
+                                                        shard,
+                                                        csmat))
+        # Test.
+        assert obs.header_to_num == exp.header_to_num
+        assert (dict(obs.pair_to_quantifier.items())
+                == dict(exp.pair_to_quantifier.items()))
+        assert obs.report() == exp.report()
+
+
+class TestQuantifyStreamInParallel:
+
+    @pytest.mark.parametrize('workers, batch_size', [(2, 1), (2, 3),
+                                                     (3, 100)])
+    def test(self, workers, batch_size):
+        # Expected output.
+        exp = quantify.PairwiseQuantifier(csmat)
+        for ali in TestMerge.ali_s:
+            exp.add(*ali)
+        exp.flush()
+        # Observed output.
+        # (Read from a generator, like from a pipe.)
+        obs = quantify.PairwiseQuantifier(csmat)
+        quantify.quantify_stream_in_parallel(obs,
+                                             (ali for ali in TestMerge.ali_s),
+                                             workers,
+                                             batch_size=batch_size)
+        # Test.
+        assert obs.header_to_num == exp.header_to_num
+        assert (dict(obs.pair_to_quantifier.items())
+                == dict(exp.pair_to_quantifier.items()))
+        assert obs.report() == exp.report()
+        assert obs.connectivity() == exp.connectivity()
+
+    def test_faulty_stream(self):
+        # Input parameter.
+        def iterate_ali():
+            yield from TestMerge.ali_s
+            raise ValueError('Faulty infile!')
+        # Observed output.
+        obs = quantify.PairwiseQuantifier(csmat)
+        # Test.
+        with pytest.raises(ValueError):
+            quantify.quantify_stream_in_parallel(obs, iterate_ali(), 2,
+                                                 batch_size=3)
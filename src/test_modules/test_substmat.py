@@ -84,3 +84,82 @@ class TestIsAscii:
                            columns=column_label_s)
         # Test.
         assert obs.equals(exp)
+
+
+# Small substitution matrix
+# (columns in a different order than the rows).
+small_s = '\n'.join([
+    '#  Small matrix.',
+    '   R  A  *',
+    'A -1  4 -4',
+    'R  5 -1 -4',
+    '* -4 -4  1'])
+
+
+class TestCompileSubstmat:
+
+    def test(self):
+        # Input parameter.
+        df = substmat.parse_substmat_as_df(io.StringIO(small_s))
+        # Observed output.
+        obs = substmat.compile_substmat(df)
+        # Expected output.
+        exp_labels = ('A', 'R', '*')
+        exp_scores = [[ 4, -1, -4, 0],
+                      [-1,  5, -4, 0],
+                      [-4, -4,  1, 0],
+                      [ 0,  0,  0, 0]]
+        # Test.
+        assert obs.labels == exp_labels
+        assert obs.scores.tolist() == exp_scores
+        assert obs.gap_code == 3
+        assert obs.code_table[ord('R')] == 1
+        assert obs.code_table[ord('-')] == 3
+        assert obs.code_table[ord('r')] == substmat.UNKNOWN_CODE
+
+    def test_parse_substmat_as_array(self):
+        # Observed output.
+        obs = substmat.parse_substmat_as_array(io.StringIO(small_s))
+        # Expected output.
+        exp = substmat.compile_substmat(
+            substmat.parse_substmat_as_df(io.StringIO(small_s)))
+        # Test.
+        assert obs.labels == exp.labels
+        assert (obs.scores == exp.scores).all()
+
+    def test_as_compiled_substmat(self):
+        # Input parameter.
+        csm = substmat.parse_substmat_as_array(io.StringIO(small_s))
+        # Observed output.
+        obs = substmat.as_compiled_substmat(csm)
+        # Test.
+        assert obs is csm
+
+    def test_fail(self):
+        # Input parameter.
+        df = pd.DataFrame(data=[[1, 0], [0, 1]],
+                          index=['A', 'R'],
+                          columns=['A', 'N'])
+        # Test.
+        with pytest.raises(ValueError):
+            substmat.compile_substmat(df)
+
+
+class TestEncodeSeq:
+
+    def test(self):
+        # Input parameter.
+        csm = substmat.parse_substmat_as_array(io.StringIO(small_s))
+        # Observed output.
+        obs = substmat.encode_seq('AR-*A', csm)
+        # Expected output.
+        exp = [0, 1, 3, 2, 0]
+        # Test.
+        assert obs.tolist() == exp
+
+    def test_fail(self):
+        # Input parameter.
+        csm = substmat.parse_substmat_as_array(io.StringIO(small_s))
+        # Test.
+        with pytest.raises(ValueError):
+            substmat.encode_seq('ARN', csm)
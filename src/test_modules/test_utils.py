@@ -24,3 +24,36 @@ class TestIsAscii:
         exp_bool = False
         # Test.
         assert obs_bool == exp_bool
+
+
+class TestGetLineShards:
+
+    @pytest.mark.parametrize('shard_count', [1, 2, 3, 5, 100])
+    def test(self, tmp_path, shard_count):
+        # Input parameter.
+        content = ''.join([f'line_{num}\n' for num in range(20)])
+        path = tmp_path / 'infile.txt'
+        path.write_text(content)
+        # Observed output.
+        obs_shard_s = utils.get_line_shards(str(path), shard_count)
+        obs_line_s = []
+        for start, end in obs_shard_s:
+            shard_line_s = list(utils.iterate_shard_lines(str(path),
+                                                          start, end))
+            # Test: no empty shards.
+            assert shard_line_s
+            obs_line_s += shard_line_s
+        # Test.
+        assert len(obs_shard_s) <= shard_count
+        assert obs_line_s == content.splitlines(keepends=True)
+
+    def test_empty(self, tmp_path):
+        # Input parameter.
+        path = tmp_path / 'infile.txt'
+        path.write_text('')
+        # Observed output.
+        obs = utils.get_line_shards(str(path), 4)
+        # Expected output.
+        exp = [(0, 0)]
+        # Test.
+        assert obs == exp